@@ -1,10 +1,14 @@
 """
-Credit Scoring Agent - Builds behavioral alternative credit scores using LangChain + Gemini.
+Credit Scoring Agent - Builds behavioral alternative credit scores using LangChain + Gemini,
+deterministically with the behavioral scorecard, or tiered (scorecard first, Gemini only
+for profiles near a lender cut-off).
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 import json
+import threading
+import time
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
@@ -15,13 +19,76 @@ from ..core.types import AgentOutput, BehavioralScore
 from ..tools.data_parser import extract_transactions_from_json
 from ..tools.financial_calculator import compute_cashflow_metrics, compute_stability_score
 from ..tools.anomaly_detector import detect_anomalies, detect_red_flags
+from ..tools.transaction_categorizer import detect_cashflow_patterns
+from ..tools.counterparty_analyzer import build_counterparty_index, compute_concentration
+from ..tools.health_calculator import compute_monthly_cashflow, count_emi_transactions
+from ..tools.recurring_payments import analyze_recurring_obligations
+from ..tools.behavioral_scorecard import compute_behavioral_scorecard, escalation_decision, policy_score_cutoffs
 from ..core.llm import get_gemini_llm
+from ..core.config import settings
+from .policy_matching_agent import load_lender_policies
+
+
+SCORING_MODES = ("llm", "deterministic", "tiered")
+
+
+class TierStats:
+    """Thread-safe escalation and latency counters of tiered scoring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all counters."""
+        with self._lock:
+            self._requests = 0
+            self._escalated = 0
+            self._latency = {"scorecard": [0, 0.0, 0.0], "llm": [0, 0.0, 0.0]}  # count, total ms, max ms
+            self._llm_failures = 0
+
+    def record(self, scorecard_ms: float, llm_ms: Optional[float] = None, llm_failed: bool = False) -> None:
+        """Record one tiered request; llm_ms is None when it was not escalated."""
+        with self._lock:
+            self._requests += 1
+            self._add("scorecard", scorecard_ms)
+            if llm_ms is not None:
+                self._escalated += 1
+                self._add("llm", llm_ms)
+                self._llm_failures += int(llm_failed)
+
+    def _add(self, tier: str, ms: float) -> None:
+        entry = self._latency[tier]
+        entry[0] += 1
+        entry[1] += ms
+        entry[2] = max(entry[2], ms)
+
+    def summary(self) -> Dict[str, Any]:
+        """Escalation rate and per-tier request counts and latency."""
+        with self._lock:
+            tiers = {
+                tier: {
+                    "count": count,
+                    "mean_ms": round(total / count, 2) if count else None,
+                    "max_ms": round(peak, 2) if count else None,
+                }
+                for tier, (count, total, peak) in self._latency.items()
+            }
+            tiers["llm"]["failures"] = self._llm_failures
+            return {
+                "requests": self._requests,
+                "escalated": self._escalated,
+                "escalation_rate": round(self._escalated / self._requests, 4) if self._requests else None,
+                "tiers": tiers,
+            }
 
 
 class CreditScoringAgent(BaseAgent):
     """
     Agent responsible for:
     - Building behavioral alternative credit scores with Gemini
+    - Scoring deterministically with the behavioral scorecard (no-LLM mode and fallback)
+    - Tiered scoring: escalating only borderline scorecard results to Gemini
     - Detecting repayment patterns and anomalies (tool outputs)
     - Producing LangChain-native reasoning pipelines
     """
@@ -32,7 +99,19 @@ class CreditScoringAgent(BaseAgent):
             description="Gemini-powered behavioral credit scoring agent"
         )
         self._parser = JsonOutputParser(pydantic_object=BehavioralScore)
-        self._chain = self._build_chain()
+        # Built on first LLM use, so deterministic scoring works without an API key
+        self._chain: Optional[Runnable] = None
+        self._default_cutoffs: Optional[List[float]] = None
+
+    # Shared by all instances, so the API reports every tiered request in the process
+    tier_stats = TierStats()
+
+    @property
+    def chain(self) -> Runnable:
+        """The Gemini scoring chain (built lazily)."""
+        if self._chain is None:
+            self._chain = self._build_chain()
+        return self._chain
 
     def _build_chain(self) -> Runnable:
         """Create the LangChain runnable pipeline."""
@@ -61,11 +140,18 @@ class CreditScoringAgent(BaseAgent):
 
     def run(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> AgentOutput:
         """
-        Analyze transactions and financial health to compute behavioral credit score
-        via LangChain + Gemini.
+        Analyze transactions and financial health to compute behavioral credit score.
+
+        The scoring mode comes from context["scoring_mode"], input_data["scoring_mode"]
+        or settings.SCORING_MODE: "llm" uses LangChain + Gemini (falling back to the
+        scorecard on failure when enabled), "deterministic" uses the scorecard only and
+        "tiered" escalates to Gemini only when the scorecard result lies within
+        SCORING_ESCALATION_BAND of a policy min_behavioral_score cut-off. Cut-offs come
+        from context["policy_cutoffs"], input_data["lender_policies"] or the stored policies.
         """
         try:
-            self.log_step("Starting credit scoring analysis (LangChain + Gemini)")
+            mode = self._scoring_mode(input_data, context)
+            self.log_step(f"Starting credit scoring analysis ({mode})")
 
             # Extract transactions (handles both old and new formats)
             transactions = self._extract_transactions(input_data)
@@ -78,49 +164,31 @@ class CreditScoringAgent(BaseAgent):
                     errors=["No transaction or financial health data provided"],
                 )
 
-            metrics_snapshot = self._summarize_behavioral_metrics(transactions, financial_health)
+            metrics_snapshot = self._summarize_behavioral_metrics(
+                transactions, financial_health, input_data.get("features")
+            )
 
-            llm_payload = {
-                "financial_health_json": json.dumps(financial_health, default=str, indent=2),
-                "metrics_json": json.dumps(metrics_snapshot, default=str, indent=2),
-                "format_instructions": self._parser.get_format_instructions(),
-            }
+            if mode == "deterministic":
+                data = self._score_with_scorecard(metrics_snapshot, financial_health)
+            elif mode == "tiered":
+                data = self._score_tiered(
+                    metrics_snapshot, financial_health, self._policy_cutoffs(input_data, context)
+                )
+            else:
+                data = self._score_with_fallback(metrics_snapshot, financial_health)
 
-            self.log_step("Invoking Gemini behavioral scoring chain")
-            result = self._chain.invoke(llm_payload)  # could be dict or Pydantic model
+            data = self._apply_deterministic_components(data, metrics_snapshot)
+            engine = data.get("metadata", {}).get("engine", "LangChain-Gemini")
 
             self.log_step("Credit scoring analysis completed successfully")
 
-            # Normalize result to a dict for AgentOutput. Try to coerce to BehavioralScore model when possible.
-            data: Dict[str, Any]
-            try:
-                # If it's already a Pydantic model with model_dump
-                if hasattr(result, "model_dump"):
-                    data = result.model_dump()
-                elif isinstance(result, dict):
-                    # Attempt to validate/normalize via BehavioralScore
-                    try:
-                        validated = BehavioralScore(**result)
-                        data = validated.model_dump()
-                    except Exception:
-                        data = result
-                else:
-                    # Last resort: try to convert to dict
-                    try:
-                        data = dict(result)
-                    except Exception:
-                        data = {"raw_result": str(result)}
-            except Exception as e:
-                self.logger.exception("Failed to normalize LLM result: %s", e)
-                data = {"raw_result": str(result)}
-
             return self.create_output(
                 success=True,
                 data=data,
                 metadata={
                     "agent": self.name,
                     "timestamp": datetime.now().isoformat(),
-                    "engine": "LangChain-Gemini",
+                    "engine": engine,
                 },
             )
 
@@ -132,19 +200,196 @@ class CreditScoringAgent(BaseAgent):
                 errors=[f"Credit scoring failed: {exc}"],
             )
 
-    def _summarize_behavioral_metrics(self, transactions: list, financial_health: Dict[str, Any]) -> Dict[str, Any]:
-        """Aggregate tool-based insights that the LLM will reason over."""
+    def score_deterministic(self, transactions: list, financial_health: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score transactions with the behavioral scorecard only (no LLM, no logging of steps).
+
+        Used for previews, where the same statement is scored on several samples.
+
+        Args:
+            transactions: Normalized transactions
+            financial_health: Financial health summary
+
+        Returns:
+            BehavioralScore dictionary
+        """
+        metrics_snapshot = self._summarize_behavioral_metrics(transactions, financial_health)
+        data = compute_behavioral_scorecard(
+            metrics_snapshot,
+            financial_health,
+            weights=settings.SCORECARD_WEIGHTS,
+            risk_bands=settings.RISK_LEVEL_BANDS
+        )
+        return self._apply_deterministic_components(BehavioralScore(**data).model_dump(), metrics_snapshot)
+
+    def _scoring_mode(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]]) -> str:
+        """Resolve the scoring mode for this request."""
+        mode = (context or {}).get("scoring_mode") or input_data.get("scoring_mode") or settings.SCORING_MODE
+        mode = str(mode).lower()
+        if mode not in SCORING_MODES:
+            self.logger.warning(f"Unknown scoring mode '{mode}', using {settings.SCORING_MODE}")
+            mode = settings.SCORING_MODE
+        return mode
+
+    def _policy_cutoffs(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]]) -> List[float]:
+        """Resolve the min_behavioral_score cut-offs used to detect borderline profiles."""
+        cutoffs = (context or {}).get("policy_cutoffs")
+        if cutoffs is not None:
+            return sorted(float(cutoff) for cutoff in cutoffs)
+        if input_data.get("lender_policies"):
+            return policy_score_cutoffs(input_data["lender_policies"])
+        if self._default_cutoffs is None:
+            self._default_cutoffs = policy_score_cutoffs(load_lender_policies())
+        return self._default_cutoffs
+
+    def _score_tiered(
+        self,
+        metrics_snapshot: Dict[str, Any],
+        financial_health: Dict[str, Any],
+        cutoffs: List[float]
+    ) -> Dict[str, Any]:
+        """Score with the scorecard and escalate borderline profiles to the LLM."""
+        started = time.perf_counter()
+        data = self._score_with_scorecard(metrics_snapshot, financial_health)
+        scorecard_ms = (time.perf_counter() - started) * 1000
+
+        decision = escalation_decision(
+            data["behavioral_score"], data["confidence"], cutoffs, settings.SCORING_ESCALATION_BAND
+        )
+        tiering = {
+            "tier": "scorecard",
+            "escalated": decision["escalate"],
+            "scorecard_score": data["behavioral_score"],
+            "scorecard_confidence": data["confidence"],
+            "nearest_cutoff": decision["nearest_cutoff"],
+            "distance": decision["distance"],
+            "band": decision["band"],
+            "latency_ms": {"scorecard": round(scorecard_ms, 2)},
+        }
+
+        llm_ms = None
+        if decision["escalate"]:
+            self.log_step(
+                f"Score {data['behavioral_score']:.0f} within {decision['band']:.0f} of "
+                f"cut-off {decision['nearest_cutoff']:.0f}, escalating to Gemini"
+            )
+            started = time.perf_counter()
+            data = self._score_with_fallback(metrics_snapshot, financial_health)
+            llm_ms = (time.perf_counter() - started) * 1000
+            tiering["latency_ms"]["llm"] = round(llm_ms, 2)
+            if data.get("metadata", {}).get("engine") != "scorecard":
+                tiering["tier"] = "llm"
+
+        self.tier_stats.record(scorecard_ms, llm_ms, llm_failed=llm_ms is not None and tiering["tier"] != "llm")
+        metadata = dict(data.get("metadata") or {})
+        metadata["tiering"] = tiering
+        data["metadata"] = metadata
+        return data
+
+    def _score_with_fallback(self, metrics_snapshot: Dict[str, Any], financial_health: Dict[str, Any]) -> Dict[str, Any]:
+        """Score with the LLM, falling back to the scorecard on failure when enabled."""
+        try:
+            data = self._score_with_llm(metrics_snapshot, financial_health)
+        except Exception as exc:
+            if not settings.SCORECARD_FALLBACK_ENABLED:
+                raise
+            self.logger.warning(f"LLM scoring failed, falling back to scorecard: {exc}")
+            return self._score_with_scorecard(metrics_snapshot, financial_health, fallback_reason=str(exc))
+
+        if "raw_result" in data and settings.SCORECARD_FALLBACK_ENABLED:
+            self.logger.warning("LLM returned an unparseable score, falling back to scorecard")
+            return self._score_with_scorecard(
+                metrics_snapshot, financial_health, fallback_reason="unparseable LLM result"
+            )
+        return data
+
+    def _score_with_scorecard(
+        self,
+        metrics_snapshot: Dict[str, Any],
+        financial_health: Dict[str, Any],
+        fallback_reason: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Score with the deterministic behavioral scorecard."""
+        self.log_step("Scoring with deterministic behavioral scorecard")
+        data = compute_behavioral_scorecard(
+            metrics_snapshot,
+            financial_health,
+            weights=settings.SCORECARD_WEIGHTS,
+            risk_bands=settings.RISK_LEVEL_BANDS
+        )
+        if fallback_reason:
+            data["metadata"]["fallback_reason"] = fallback_reason
+        return BehavioralScore(**data).model_dump()
+
+    def _score_with_llm(self, metrics_snapshot: Dict[str, Any], financial_health: Dict[str, Any]) -> Dict[str, Any]:
+        """Score with the Gemini chain and normalize the result to a dict."""
+        llm_payload = {
+            "financial_health_json": json.dumps(financial_health, default=str, indent=2),
+            "metrics_json": json.dumps(metrics_snapshot, default=str, indent=2),
+            "format_instructions": self._parser.get_format_instructions(),
+        }
+
+        self.log_step("Invoking Gemini behavioral scoring chain")
+        result = self.chain.invoke(llm_payload)  # could be dict or Pydantic model
+
+        # Normalize result to a dict for AgentOutput. Try to coerce to BehavioralScore model when possible.
+        data: Dict[str, Any]
+        try:
+            # If it's already a Pydantic model with model_dump
+            if hasattr(result, "model_dump"):
+                data = result.model_dump()
+            elif isinstance(result, dict):
+                # Attempt to validate/normalize via BehavioralScore
+                try:
+                    validated = BehavioralScore(**result)
+                    data = validated.model_dump()
+                except Exception:
+                    data = result
+            else:
+                # Last resort: try to convert to dict
+                try:
+                    data = dict(result)
+                except Exception:
+                    data = {"raw_result": str(result)}
+        except Exception as e:
+            self.logger.exception("Failed to normalize LLM result: %s", e)
+            data = {"raw_result": str(result)}
+
+        return data
+
+    def _summarize_behavioral_metrics(
+        self,
+        transactions: list,
+        financial_health: Dict[str, Any],
+        features: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Aggregate tool-based insights that the LLM will reason over.
+
+        Stability, red flags and the EMI count are read from the MSME's feature
+        vector when given instead of being recomputed.
+        """
         cashflow_metrics = compute_cashflow_metrics(transactions) if transactions else {}
-        stability_score = compute_stability_score(transactions) if transactions else 0
         anomalies = detect_anomalies(transactions)[:5] if transactions else []
-        red_flags = detect_red_flags(transactions, financial_health)
-
-        emi_count = sum(
-            1
-            for tx in transactions
-            if "emi" in str(tx.get("description", "")).lower() or "loan" in str(tx.get("description", "")).lower()
+        if features:
+            stability_score = features["cashflow_stability_score"]
+            red_flags = list(features["red_flags"])
+            emi_count = features["emi_count"]
+        else:
+            stability_score = compute_stability_score(transactions) if transactions else 0
+            red_flags = detect_red_flags(transactions, financial_health)
+            emi_count = count_emi_transactions(transactions)
+        recurring = (
+            analyze_recurring_obligations(transactions, compute_monthly_cashflow(transactions)["inflow"])
+            if transactions
+            else {}
         )
 
+        # Reuse the seasonality computed by the Financial Health Agent when available
+        seasonality = financial_health.get("metadata", {}).get("pattern_analysis", {}).get("seasonality")
+        if seasonality is None:
+            seasonality = detect_cashflow_patterns(transactions).get("seasonality", {}) if transactions else {}
+
         return {
             "transaction_count": len(transactions),
             "cashflow_metrics": cashflow_metrics,
@@ -152,7 +397,56 @@ class CreditScoringAgent(BaseAgent):
             "anomalies_detected": anomalies,
             "red_flags_detected": red_flags,
             "emi_payments_detected": emi_count,
+            "recurring_obligations": recurring,
+            "seasonality": seasonality,
+            "concentration": compute_concentration(build_counterparty_index(transactions)) if transactions else {},
+        }
+
+    def _apply_deterministic_components(self, data: Dict[str, Any], metrics_snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Overwrite score components that tools compute deterministically."""
+        if "raw_result" in data:
+            return data
+
+        seasonality = metrics_snapshot.get("seasonality") or {}
+        if "cyclicality_score" in seasonality:
+            data["cyclicality_score"] = seasonality["cyclicality_score"]
+
+        concentration = metrics_snapshot.get("concentration") or {}
+        if concentration.get("concentration_risk_score") is not None:
+            data["concentration_risk_score"] = concentration["concentration_risk_score"]
+
+        recurring = metrics_snapshot.get("recurring_obligations") or {}
+        if recurring.get("repayment_pattern_score") is not None:
+            data["repayment_pattern_score"] = recurring["repayment_pattern_score"]
+
+        metadata = dict(data.get("metadata") or {})
+        metadata["deterministic_components"] = {
+            "cyclicality_score": {
+                "source": "seasonality_detector",
+                "period_months": seasonality.get("period"),
+                "strength": seasonality.get("strength"),
+                "p_value": seasonality.get("p_value"),
+            },
+            "concentration_risk_score": {
+                "source": "counterparty_analyzer",
+                "customer_hhi": concentration.get("customers", {}).get("hhi"),
+                "supplier_hhi": concentration.get("suppliers", {}).get("hhi"),
+                "top_customers": concentration.get("top_customers", []),
+                "top_suppliers": concentration.get("top_suppliers", []),
+                "unattributed_share": concentration.get("unattributed_share"),
+            },
+            "repayment_pattern_score": {
+                "source": (
+                    "recurring_payments" if recurring.get("repayment_pattern_score") is not None
+                    else metadata.get("engine", "llm")
+                ),
+                "emi_obligations": recurring.get("emi_obligations", 0),
+                "monthly_emi": recurring.get("monthly_emi", 0.0),
+                "foir": recurring.get("foir"),
+            },
         }
+        data["metadata"] = metadata
+        return data
     
     def _extract_transactions(self, input_data: Dict[str, Any]) -> list:
         """
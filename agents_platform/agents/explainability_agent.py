@@ -13,9 +13,11 @@ from langchain_core.runnables import Runnable
 from ..core.base_agent import BaseAgent
 from ..core.types import AgentOutput, ExplainabilityReport
 from ..core.llm import get_gemini_llm
+from ..core.config import settings
+from ..tools.narrative_index import NarrativeReuseMixin, narrative_profile
 
 
-class ExplainabilityAgent(BaseAgent):
+class ExplainabilityAgent(NarrativeReuseMixin, BaseAgent):
     """
     Agent responsible for:
     - Explaining the scores in human language using Gemini
@@ -23,6 +25,8 @@ class ExplainabilityAgent(BaseAgent):
     - Providing lender-facing arguments for compliance
     """
 
+    NARRATIVE_MODEL = ExplainabilityReport
+
     def __init__(self):
         super().__init__(
             name="ExplainabilityAgent",
@@ -68,7 +72,20 @@ class ExplainabilityAgent(BaseAgent):
             behavioral_score = input_data.get("behavioral_score", {})
             product_recommendations = input_data.get("product_recommendations", {})
 
-            derived_facts = self._derive_facts(financial_health, behavioral_score)
+            derived_facts = self._derive_facts(financial_health, behavioral_score, input_data.get("features"))
+
+            profile = None
+            if settings.NARRATIVE_REUSE_ENABLED:
+                profile = narrative_profile(
+                    self.name,
+                    input_data.get("features") or financial_health,
+                    behavioral_score,
+                    input_data.get("msme_profile", {}),
+                    product_recommendations,
+                )
+                reused = self._reuse_narrative(profile)
+                if reused is not None:
+                    return reused
 
             payload = {
                 "financial_health_json": json.dumps(financial_health, default=str, indent=2),
@@ -126,6 +143,8 @@ class ExplainabilityAgent(BaseAgent):
                     weaknesses=[],
                     metadata={"fallback": True, "generated_at": datetime.now().isoformat()},
                 )
+            elif profile is not None:
+                self._remember_narrative(profile, rep_model.model_dump(), context)
 
             self.log_step("Explainability analysis completed successfully")
 
@@ -146,11 +165,17 @@ class ExplainabilityAgent(BaseAgent):
                 errors=[f"Explainability analysis failed: {exc}"],
             )
 
-    def _derive_facts(self, financial_health: Dict[str, Any], behavioral_score: Dict[str, Any]) -> Dict[str, Any]:
-        """Create deterministic facts/heuristics that guide the LLM output."""
-        net_cf = financial_health.get("net_cashflow", 0)
-        stability = financial_health.get("cashflow_stability_score", 0)
-        volatility = financial_health.get("volatility_score", 0)
+    def _derive_facts(
+        self,
+        financial_health: Dict[str, Any],
+        behavioral_score: Dict[str, Any],
+        features: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Create deterministic facts/heuristics that guide the LLM output (from the feature vector when given)."""
+        derived = features or financial_health
+        net_cf = derived.get("net_cashflow", 0)
+        stability = derived.get("cashflow_stability_score", 0)
+        volatility = derived.get("volatility_score", 0)
         red_flags = behavioral_score.get("red_flags", [])
         behavioral_value = behavioral_score.get("behavioral_score", 0)
 
@@ -182,7 +207,7 @@ class ExplainabilityAgent(BaseAgent):
         else:
             weaknesses.append(f"{len(red_flags)} red flags detected: {', '.join(red_flags[:3])}")
 
-        return {
+        facts = {
             "net_cashflow": net_cf,
             "stability_score": stability,
             "volatility_score": volatility,
@@ -192,3 +217,18 @@ class ExplainabilityAgent(BaseAgent):
             "weakness_candidates": weaknesses,
         }
 
+        if features:
+            facts["emi_count"] = features.get("emi_count")
+            facts["cheque_bounces"] = features.get("cheque_bounces")
+            compliance = features.get("gst_compliance_rate")
+            facts["gst_compliance_rate"] = compliance
+            if features.get("cheque_bounces"):
+                weaknesses.append(f"{features['cheque_bounces']} cheque bounces")
+            if compliance is not None:
+                if compliance >= 90:
+                    strengths.append(f"Consistent GST filing ({compliance:.0f}% of returns filed)")
+                elif compliance < 60:
+                    weaknesses.append(f"Irregular GST filing ({compliance:.0f}% of returns filed)")
+
+        return facts
+
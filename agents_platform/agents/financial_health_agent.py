@@ -7,14 +7,18 @@ from datetime import datetime
 
 from ..core.base_agent import BaseAgent
 from ..core.types import AgentOutput, FinancialHealthSummary
+from ..core.config import settings
 from ..tools.data_parser import extract_transactions_from_json, parse_date
 from ..tools.transaction_categorizer import categorize_all_transactions, detect_cashflow_patterns
 from ..tools.financial_calculator import (
     compute_cashflow_metrics,
     compute_balance_metrics,
+    compute_distribution_metrics,
     compute_stability_score,
     detect_stress_indicators
 )
+from ..tools.window_metrics import compute_window_metrics
+from ..tools.cashflow_forecaster import forecast_cashflow
 
 
 class FinancialHealthAgent(BaseAgent):
@@ -79,9 +83,21 @@ class FinancialHealthAgent(BaseAgent):
             self.log_step("Step 4: Computing financial metrics")
             cashflow_metrics = compute_cashflow_metrics(categorized_transactions)
             balance_metrics = compute_balance_metrics(categorized_transactions)
+            distribution_metrics = compute_distribution_metrics(categorized_transactions)
             stability_score = compute_stability_score(categorized_transactions)
             stress_indicators = detect_stress_indicators(categorized_transactions)
             
+            # Trailing-window / as-of metrics from monthly prefix sums
+            monthly_breakdown = patterns.get('monthly_breakdown', {})
+            as_of_date = (context or {}).get('as_of_date')
+            window_metrics = compute_window_metrics(
+                {month: m['credits'] for month, m in monthly_breakdown.items()},
+                {month: m['debits'] for month, m in monthly_breakdown.items()},
+                windows=settings.ROLLING_WINDOW_MONTHS,
+                as_of=as_of_date
+            )
+            cashflow_forecast = forecast_cashflow(monthly_breakdown, patterns.get('seasonality'))
+            
             # Step 5: Determine period
             dates = [parse_date(tx.get('date')) for tx in categorized_transactions]
             period_start = min(dates) if dates else datetime.now()
@@ -108,7 +124,11 @@ class FinancialHealthAgent(BaseAgent):
                     'pattern_analysis': patterns,
                     'balance_volatility': balance_metrics.get('balance_volatility', 0),
                     'inflow_count': cashflow_metrics.get('inflow_count', 0),
-                    'outflow_count': cashflow_metrics.get('outflow_count', 0)
+                    'outflow_count': cashflow_metrics.get('outflow_count', 0),
+                    'window_metrics': window_metrics,
+                    'distribution_metrics': distribution_metrics,
+                    'cashflow_forecast': cashflow_forecast,
+                    'as_of_date': str(as_of_date) if as_of_date else None
                 }
             )
             
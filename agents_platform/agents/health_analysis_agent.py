@@ -7,17 +7,22 @@ from datetime import datetime
 
 from ..core.base_agent import BaseAgent
 from ..core.types import AgentOutput, HealthAnalysisSummary
+from ..core.config import settings
 from ..tools.data_parser import extract_transactions_from_json, parse_date
 from ..tools.health_calculator import (
     compute_monthly_cashflow,
     compute_cashflow_volatility,
     compute_avg_monthly_balance,
-    count_low_balance_days,
+    build_daily_min_balances,
+    count_days_below,
+    compute_low_balance_curve,
     count_emi_transactions,
-    count_cheque_bounces,
     count_overdraft_days,
     analyze_gst_data
 )
+from ..tools.recurring_payments import analyze_recurring_obligations
+from ..tools.cheque_returns import link_cheque_returns
+from ..tools.gst_reconciliation import monthly_bank_credits, reconcile_gst_with_bank
 
 
 class HealthAnalysisAgent(BaseAgent):
@@ -83,25 +88,34 @@ class HealthAnalysisAgent(BaseAgent):
             self.log_step("Step 4: Computing average monthly balance")
             avg_balance = compute_avg_monthly_balance(transactions)
             
-            # Step 6: Count low balance days
+            # Step 6: Count low balance days (one sorted index, any number of thresholds)
             self.log_step("Step 5: Counting low balance days")
-            low_balance_days = count_low_balance_days(transactions, threshold=50000)
+            daily_min_balances = build_daily_min_balances(transactions)
+            low_balance_days = count_days_below(daily_min_balances, settings.LOW_BALANCE_THRESHOLD)
+            thresholds = (context or {}).get('low_balance_thresholds') or settings.LOW_BALANCE_THRESHOLDS
+            low_balance_curve = compute_low_balance_curve(daily_min_balances, thresholds)
             
             # Step 7: Count EMI transactions
             self.log_step("Step 6: Counting EMI transactions")
             emi_transactions = count_emi_transactions(transactions)
+            recurring = analyze_recurring_obligations(transactions, monthly_inflow)
             
             # Step 8: Count cheque bounces
             self.log_step("Step 7: Counting cheque bounces")
-            cheque_bounces = count_cheque_bounces(transactions)
+            cheque_returns = link_cheque_returns(transactions)
+            cheque_bounces = len(cheque_returns['events'])
             
             # Step 9: Count overdraft days
             self.log_step("Step 8: Counting overdraft days")
-            overdraft_days = count_overdraft_days(transactions)
+            overdraft_days = count_overdraft_days(transactions, daily_min_balances=daily_min_balances)
             
             # Step 10: Analyze GST data
             self.log_step("Step 9: Analyzing GST data")
             gst_analysis = analyze_gst_data(input_data)
+            gst_analysis['bank_reconciliation'] = reconcile_gst_with_bank(
+                input_data.get('gst_filings', []) if isinstance(input_data, dict) else [],
+                monthly_bank_credits(transactions)
+            )
             
             # Step 11: Determine period
             dates = [parse_date(tx.get('date')) for tx in transactions]
@@ -117,6 +131,7 @@ class HealthAnalysisAgent(BaseAgent):
                 cashflow_volatility=cashflow_volatility,
                 avg_balance=avg_balance,
                 low_balance_days=low_balance_days,
+                low_balance_curve=low_balance_curve,
                 emi_transactions=emi_transactions,
                 cheque_bounces=cheque_bounces,
                 overdraft_days=overdraft_days,
@@ -126,7 +141,10 @@ class HealthAnalysisAgent(BaseAgent):
                 metadata={
                     'total_inflow': total_inflow,
                     'total_outflow': total_outflow,
-                    'months_analyzed': len(set(list(monthly_inflow.keys()) + list(monthly_outflow.keys())))
+                    'months_analyzed': len(set(list(monthly_inflow.keys()) + list(monthly_outflow.keys()))),
+                    'recurring_obligations': recurring,
+                    'foir': recurring['foir'],
+                    'cheque_returns': cheque_returns
                 }
             )
             
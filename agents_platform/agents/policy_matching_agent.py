@@ -4,7 +4,9 @@ Policy Matching Agent - Matches MSME profile to lender product eligibility via L
 
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+import copy
 import json
+import logging
 import os
 
 from langchain_core.prompts import ChatPromptTemplate
@@ -15,6 +17,103 @@ from ..core.base_agent import BaseAgent
 from ..core.types import AgentOutput, ProductRecommendation, ProductEligibility
 from ..core.config import settings
 from ..core.llm import get_gemini_llm
+from ..tools.data_parser import parse_date
+from ..tools.window_metrics import WINDOW_CRITERION_PATTERN, WINDOW_METRIC_FIELDS
+from ..tools.eligibility_frontier import compute_eligibility_frontiers, eligibility_metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Default lender policies for demonstration
+DEFAULT_LENDER_POLICIES = [
+    {
+        "product_id": "working_capital_001",
+        "product_name": "Quick Working Capital Loan",
+        "lender_name": "FastLend Finance",
+        "eligibility_criteria": {
+            "min_net_cashflow": 10000,
+            "min_behavioral_score": 500,
+            "max_volatility": 0.7,
+            "min_stability_score": 0.4,
+            "max_red_flags": 2
+        },
+        "risk_buckets": {
+            "low": {"behavioral_score": [700], "volatility": 0.3},
+            "medium": {"behavioral_score": [500, 700], "volatility": [0.3, 0.6]},
+            "high": {"behavioral_score": [400, 500], "volatility": [0.6, 0.8]}
+        },
+        "amount_range": {"min": 50000, "max": 500000},
+        "interest_rate_range": {"low": 12.0, "medium": 15.0, "high": 18.0}
+    },
+    {
+        "product_id": "term_loan_001",
+        "product_name": "MSME Term Loan",
+        "lender_name": "SecureBank",
+        "eligibility_criteria": {
+            "min_net_cashflow": 20000,
+            "min_behavioral_score": 600,
+            "max_volatility": 0.5,
+            "min_stability_score": 0.6,
+            "max_red_flags": 1
+        },
+        "risk_buckets": {
+            "low": {"behavioral_score": [750], "volatility": 0.25},
+            "medium": {"behavioral_score": [600, 750], "volatility": [0.25, 0.4]},
+            "high": {"behavioral_score": [500, 600], "volatility": [0.4, 0.5]}
+        },
+        "amount_range": {"min": 100000, "max": 2000000},
+        "interest_rate_range": {"low": 10.0, "medium": 13.0, "high": 16.0}
+    },
+    {
+        "product_id": "invoice_financing_001",
+        "product_name": "Invoice Financing",
+        "lender_name": "InvoiceFlow Capital",
+        "eligibility_criteria": {
+            "min_net_cashflow": 5000,
+            "min_behavioral_score": 400,
+            "max_volatility": 0.8,
+            "min_stability_score": 0.3,
+            "max_red_flags": 3
+        },
+        "risk_buckets": {
+            "low": {"behavioral_score": [600], "volatility": 0.4},
+            "medium": {"behavioral_score": [400, 600], "volatility": [0.4, 0.6]},
+            "high": {"behavioral_score": [300, 400], "volatility": [0.6, 0.8]}
+        },
+        "amount_range": {"min": 25000, "max": 1000000},
+        "interest_rate_range": {"low": 14.0, "medium": 17.0, "high": 20.0}
+    }
+]
+
+
+def load_lender_policies() -> List[Dict[str, Any]]:
+    """
+    Load lender policies from DATA_DIR/lender_policies.json.
+    
+    Falls back to the default demonstration policies when the file is
+    missing, unreadable or empty.
+    
+    Returns:
+        List of lender policies
+    """
+    policies = []
+    
+    # Try to load from file
+    policy_file = os.path.join(settings.DATA_DIR, 'lender_policies.json')
+    if os.path.exists(policy_file):
+        try:
+            with open(policy_file, 'r') as f:
+                policies = json.load(f)
+            logger.info(f"Loaded {len(policies)} policies from file")
+        except Exception as e:
+            logger.warning(f"Could not load policies from file: {e}")
+    
+    # If no file, use default policies
+    if not policies:
+        policies = copy.deepcopy(DEFAULT_LENDER_POLICIES)
+        logger.info(f"Using {len(policies)} default policies")
+    
+    return policies
 
 
 class PolicyMatchingAgent(BaseAgent):
@@ -70,6 +169,7 @@ class PolicyMatchingAgent(BaseAgent):
             financial_health = input_data.get("financial_health", {})
             behavioral_score = input_data.get("behavioral_score", {})
             msme_profile = input_data.get("msme_profile", {})
+            features = input_data.get("features")
 
             if not self.policies:
                 return self.create_output(
@@ -85,9 +185,11 @@ class PolicyMatchingAgent(BaseAgent):
                     financial_health,
                     behavioral_score,
                     msme_profile,
+                    features,
                 )
                 if evaluation:
                     evaluations.append(evaluation)
+            frontier = self._eligibility_frontier(evaluations, financial_health, behavioral_score, features)
 
             payload = {
                 "msme_profile_json": json.dumps(msme_profile, default=str, indent=2),
@@ -154,14 +256,22 @@ class PolicyMatchingAgent(BaseAgent):
                 rec_model = rec_model.model_copy(update={
                     "total_products_evaluated": len(evaluations),
                     "matching_criteria_used": self._get_matching_criteria(),
-                    "metadata": {**(getattr(rec_model, 'metadata', {}) or {}), "engine": "LangChain-Gemini"}
+                    "metadata": {
+                        **(getattr(rec_model, 'metadata', {}) or {}),
+                        "engine": "LangChain-Gemini",
+                        "eligibility_frontier": frontier
+                    }
                 })
             except Exception:
                 # If model_copy not available, attempt attribute assignment
                 try:
                     rec_model.total_products_evaluated = len(evaluations)
                     rec_model.matching_criteria_used = self._get_matching_criteria()
-                    rec_model.metadata = {**(getattr(rec_model, 'metadata', {}) or {}), "engine": "LangChain-Gemini"}
+                    rec_model.metadata = {
+                        **(getattr(rec_model, 'metadata', {}) or {}),
+                        "engine": "LangChain-Gemini",
+                        "eligibility_frontier": frontier
+                    }
                 except Exception:
                     self.logger.exception("Unable to set fields on ProductRecommendation model")
 
@@ -178,7 +288,7 @@ class PolicyMatchingAgent(BaseAgent):
 
         except Exception as exc:
             self.logger.error("Error in policy matching", exc_info=True)
-            fallback = self._fallback_recommendation(financial_health, behavioral_score, msme_profile)
+            fallback = self._fallback_recommendation(financial_health, behavioral_score, msme_profile, features)
             return self.create_output(
                 success=False,
                 data=fallback,
@@ -187,101 +297,38 @@ class PolicyMatchingAgent(BaseAgent):
     
     def _load_policies(self) -> List[Dict[str, Any]]:
         """Load lender policies from storage."""
-        policies = []
-        
-        # Try to load from file
-        policy_file = os.path.join(settings.DATA_DIR, 'lender_policies.json')
-        if os.path.exists(policy_file):
-            try:
-                with open(policy_file, 'r') as f:
-                    policies = json.load(f)
-                self.logger.info(f"Loaded {len(policies)} policies from file")
-            except Exception as e:
-                self.logger.warning(f"Could not load policies from file: {e}")
-        
-        # If no file, use default policies
-        if not policies:
-            policies = self._get_default_policies()
-            self.logger.info(f"Using {len(policies)} default policies")
-        
-        return policies
+        return load_lender_policies()
     
     def _get_default_policies(self) -> List[Dict[str, Any]]:
         """Get default lender policies for demonstration."""
-        return [
-            {
-                "product_id": "working_capital_001",
-                "product_name": "Quick Working Capital Loan",
-                "lender_name": "FastLend Finance",
-                "eligibility_criteria": {
-                    "min_net_cashflow": 10000,
-                    "min_behavioral_score": 500,
-                    "max_volatility": 0.7,
-                    "min_stability_score": 0.4,
-                    "max_red_flags": 2
-                },
-                "risk_buckets": {
-                    "low": {"behavioral_score": [700], "volatility": 0.3},
-                    "medium": {"behavioral_score": [500, 700], "volatility": [0.3, 0.6]},
-                    "high": {"behavioral_score": [400, 500], "volatility": [0.6, 0.8]}
-                },
-                "amount_range": {"min": 50000, "max": 500000},
-                "interest_rate_range": {"low": 12.0, "medium": 15.0, "high": 18.0}
-            },
-            {
-                "product_id": "term_loan_001",
-                "product_name": "MSME Term Loan",
-                "lender_name": "SecureBank",
-                "eligibility_criteria": {
-                    "min_net_cashflow": 20000,
-                    "min_behavioral_score": 600,
-                    "max_volatility": 0.5,
-                    "min_stability_score": 0.6,
-                    "max_red_flags": 1
-                },
-                "risk_buckets": {
-                    "low": {"behavioral_score": [750], "volatility": 0.25},
-                    "medium": {"behavioral_score": [600, 750], "volatility": [0.25, 0.4]},
-                    "high": {"behavioral_score": [500, 600], "volatility": [0.4, 0.5]}
-                },
-                "amount_range": {"min": 100000, "max": 2000000},
-                "interest_rate_range": {"low": 10.0, "medium": 13.0, "high": 16.0}
-            },
-            {
-                "product_id": "invoice_financing_001",
-                "product_name": "Invoice Financing",
-                "lender_name": "InvoiceFlow Capital",
-                "eligibility_criteria": {
-                    "min_net_cashflow": 5000,
-                    "min_behavioral_score": 400,
-                    "max_volatility": 0.8,
-                    "min_stability_score": 0.3,
-                    "max_red_flags": 3
-                },
-                "risk_buckets": {
-                    "low": {"behavioral_score": [600], "volatility": 0.4},
-                    "medium": {"behavioral_score": [400, 600], "volatility": [0.4, 0.6]},
-                    "high": {"behavioral_score": [300, 400], "volatility": [0.6, 0.8]}
-                },
-                "amount_range": {"min": 25000, "max": 1000000},
-                "interest_rate_range": {"low": 14.0, "medium": 17.0, "high": 20.0}
-            }
-        ]
+        return copy.deepcopy(DEFAULT_LENDER_POLICIES)
     
     def _evaluate_product(
         self,
         product: Dict[str, Any],
         financial_health: Dict[str, Any],
         behavioral_score: Dict[str, Any],
-        msme_profile: Dict[str, Any]
+        msme_profile: Dict[str, Any],
+        features: Optional[Dict[str, Any]] = None
     ) -> Optional[Dict[str, Any]]:
-        """Evaluate a single product for eligibility."""
+        """
+        Evaluate a single product for eligibility.
+        
+        Net cashflow, volatility and stability are read from the MSME's
+        feature vector when given, otherwise from the financial health summary.
+        
+        Besides the full-history criteria, eligibility_criteria may contain
+        trailing-window criteria named "<min|max>_<net_cashflow|volatility|stability_score>_<n>m",
+        evaluated against financial_health.metadata.window_metrics.
+        """
         criteria = product.get('eligibility_criteria', {})
         reasons = []
         requirements_met = {}
         
+        derived = features or financial_health
+        
         # Check net cashflow
-        net_cashflow = financial_health.get('net_cashflow', 0)
+        net_cashflow = derived.get('net_cashflow', 0)
         min_cashflow = criteria.get('min_net_cashflow', 0)
         cashflow_met = net_cashflow >= min_cashflow
         requirements_met['net_cashflow'] = cashflow_met
@@ -297,7 +344,7 @@ class PolicyMatchingAgent(BaseAgent):
             reasons.append(f"Behavioral score {score:.0f} below minimum {min_score:.0f}")
         
         # Check volatility
-        volatility = financial_health.get('volatility_score', 1.0)
+        volatility = derived.get('volatility_score', 1.0)
         max_volatility = criteria.get('max_volatility', 1.0)
         volatility_met = volatility <= max_volatility
         requirements_met['volatility'] = volatility_met
@@ -305,7 +352,7 @@ class PolicyMatchingAgent(BaseAgent):
             reasons.append(f"Volatility {volatility:.2f} exceeds maximum {max_volatility:.2f}")
         
         # Check stability
-        stability = financial_health.get('cashflow_stability_score', 0)
+        stability = derived.get('cashflow_stability_score', 0)
         min_stability = criteria.get('min_stability_score', 0)
         stability_met = stability >= min_stability
         requirements_met['stability'] = stability_met
@@ -320,6 +367,26 @@ class PolicyMatchingAgent(BaseAgent):
         if not red_flags_met:
             reasons.append(f"Red flags count {len(red_flags)} exceeds maximum {max_red_flags}")
         
+        # Check trailing-window criteria (e.g. min_net_cashflow_3m)
+        window_metrics = financial_health.get('metadata', {}).get('window_metrics', {})
+        for criterion, limit in criteria.items():
+            match = WINDOW_CRITERION_PATTERN.match(criterion)
+            if not match:
+                continue
+            bound, metric, months = match.groups()
+            requirement = f"{metric}_{months}m"
+            window = window_metrics.get(f"{months}m")
+            if not window or not window.get('months'):
+                requirements_met[requirement] = False
+                reasons.append(f"{months}-month {metric.replace('_', ' ')} not available")
+                continue
+            value = window[WINDOW_METRIC_FIELDS[metric]]
+            met = value >= limit if bound == 'min' else value <= limit
+            requirements_met[requirement] = met
+            if not met:
+                comparison = "below minimum" if bound == 'min' else "exceeds maximum"
+                reasons.append(f"{months}-month {metric.replace('_', ' ')} {value:,.2f} {comparison} {limit:,.2f}")
+        
         # Determine eligibility
         eligible = all(requirements_met.values())
         
@@ -362,13 +429,14 @@ class PolicyMatchingAgent(BaseAgent):
         self,
         financial_health: Dict[str, Any],
         behavioral_score: Dict[str, Any],
-        msme_profile: Dict[str, Any]
+        msme_profile: Dict[str, Any],
+        features: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Deterministic fallback recommendation if the LLM call fails."""
         evaluations = [
             eval_result
             for product in self.policies
-            if (eval_result := self._evaluate_product(product, financial_health, behavioral_score, msme_profile))
+            if (eval_result := self._evaluate_product(product, financial_health, behavioral_score, msme_profile, features))
         ]
         evaluations.sort(key=lambda x: x["eligibility_score"], reverse=True)
         recommendation = ProductRecommendation(
@@ -376,10 +444,43 @@ class PolicyMatchingAgent(BaseAgent):
             alternative_products=[self._dict_to_eligibility(e) for e in evaluations[3:6]],
             total_products_evaluated=len(evaluations),
             matching_criteria_used=self._get_matching_criteria(),
-            metadata={"fallback": True},
+            metadata={
+                "fallback": True,
+                "eligibility_frontier": self._eligibility_frontier(evaluations, financial_health, behavioral_score, features)
+            },
         )
         return recommendation.model_dump()
     
+    def _eligibility_frontier(
+        self,
+        evaluations: List[Dict[str, Any]],
+        financial_health: Dict[str, Any],
+        behavioral_score: Dict[str, Any],
+        features: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Minimal metric changes per product to become eligible or reach a better risk bucket.
+        
+        Args:
+            evaluations: Product evaluations (for the current risk buckets)
+            financial_health: Financial health summary
+            behavioral_score: Behavioral score
+            features: Optional feature vector
+            
+        Returns:
+            Per-product frontiers, closest products first
+        """
+        try:
+            return compute_eligibility_frontiers(
+                self.policies,
+                eligibility_metrics(financial_health, behavioral_score, features),
+                financial_health.get('metadata', {}).get('window_metrics', {}),
+                {e['product_id']: e['risk_bucket'] for e in evaluations}
+            )
+        except Exception as e:
+            self.logger.warning(f"Eligibility frontier computation failed: {e}")
+            return []
+    
     def _determine_risk_bucket(self, product: Dict[str, Any], score: float, volatility: float) -> str:
         """Determine risk bucket for the product."""
         buckets = product.get('risk_buckets', {})
@@ -421,7 +522,14 @@ class PolicyMatchingAgent(BaseAgent):
         financial_health: Dict[str, Any],
         behavioral_score: Dict[str, Any]
     ) -> Optional[float]:
-        """Calculate recommended loan amount."""
+        """
+        Calculate recommended loan amount.
+        
+        Sized as 2-6 months (by behavioral score) of projected monthly net
+        cashflow, taken conservatively from the lower band of the 12-month
+        forecast. Without a forecast, the historical monthly average (net
+        cashflow over the months of history) is used.
+        """
         amount_range = product.get('amount_range', {})
         min_amount = amount_range.get('min', 0)
         max_amount = amount_range.get('max', 0)
@@ -429,11 +537,16 @@ class PolicyMatchingAgent(BaseAgent):
         if min_amount == 0 or max_amount == 0:
             return None
         
-        # Base recommendation on net cashflow and score
-        net_cashflow = financial_health.get('net_cashflow', 0)
+        # Base recommendation on projected (or historical) net cashflow and score
+        forecast = financial_health.get('metadata', {}).get('cashflow_forecast') or {}
+        projection = forecast.get('horizons', {}).get('12m')
+        if projection:
+            net_cashflow = projection['lower'] / 12
+        else:
+            net_cashflow = financial_health.get('net_cashflow', 0) / self._history_months(financial_health)
         score = behavioral_score.get('behavioral_score', 500)
         
-        # Simple heuristic: 3-6 months of net cashflow, adjusted by score
+        # Simple heuristic: 2-6 months of net cashflow, adjusted by score
         score_factor = score / 1000  # 0-1
         months_factor = 4 * score_factor + 2  # 2-6 months
         
@@ -444,6 +557,15 @@ class PolicyMatchingAgent(BaseAgent):
         
         return round(recommended, 2)
     
+    @staticmethod
+    def _history_months(financial_health: Dict[str, Any]) -> int:
+        """Calendar months covered by the statement (at least 1)."""
+        start, end = financial_health.get('period_start'), financial_health.get('period_end')
+        if not start or not end:
+            return 1
+        start, end = parse_date(start), parse_date(end)
+        return max((end.year - start.year) * 12 + end.month - start.month + 1, 1)
+    
     def _get_interest_rate(self, product: Dict[str, Any], risk_bucket: str) -> Optional[Dict[str, float]]:
         """Get interest rate range for risk bucket."""
         rate_range = product.get('interest_rate_range', {})
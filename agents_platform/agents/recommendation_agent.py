@@ -13,9 +13,11 @@ from langchain_core.runnables import Runnable
 from ..core.base_agent import BaseAgent
 from ..core.types import AgentOutput, RecommendationReport
 from ..core.llm import get_gemini_llm
+from ..core.config import settings
+from ..tools.narrative_index import NarrativeReuseMixin, narrative_profile
 
 
-class RecommendationAgent(BaseAgent):
+class RecommendationAgent(NarrativeReuseMixin, BaseAgent):
     """
     Agent responsible for:
     - Analyzing all collected financial data
@@ -26,6 +28,8 @@ class RecommendationAgent(BaseAgent):
     - Identifying risk mitigation strategies
     """
 
+    NARRATIVE_MODEL = RecommendationReport
+
     def __init__(self):
         super().__init__(
             name="RecommendationAgent",
@@ -83,6 +87,19 @@ class RecommendationAgent(BaseAgent):
             # Extract GST analysis from health_analysis if available
             gst_analysis = health_analysis.get("gst_analysis", {}) if health_analysis else {}
 
+            profile = None
+            if settings.NARRATIVE_REUSE_ENABLED:
+                profile = narrative_profile(
+                    self.name,
+                    input_data.get("features") or financial_health,
+                    behavioral_score,
+                    msme_profile,
+                    product_recommendations,
+                )
+                reused = self._reuse_narrative(profile)
+                if reused is not None:
+                    return reused
+
             payload = {
                 "msme_profile_json": json.dumps(msme_profile, default=str, indent=2),
                 "financial_health_json": json.dumps(financial_health, default=str, indent=2),
@@ -134,6 +151,8 @@ class RecommendationAgent(BaseAgent):
                 rep_model = self._generate_deterministic_recommendations(
                     financial_health, health_analysis, behavioral_score, gst_analysis
                 )
+            elif profile is not None:
+                self._remember_narrative(profile, rep_model.model_dump(), context)
 
             self.log_step("Recommendation analysis completed successfully")
 
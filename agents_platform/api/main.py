@@ -2,12 +2,13 @@
 FastAPI main application.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import logging
+import time
 import uuid
 
 from ..core.config import settings
@@ -18,7 +19,15 @@ from ..agents.financial_health_agent import FinancialHealthAgent
 from ..agents.credit_scoring_agent import CreditScoringAgent
 from ..agents.policy_matching_agent import PolicyMatchingAgent
 from ..agents.explainability_agent import ExplainabilityAgent
-from ..tools.data_parser import parse_json_data
+from ..tools.data_parser import parse_json_data, extract_transactions_from_json
+from ..tools.aggregate_cube import AggregateCube
+from ..tools.counterparty_analyzer import CounterpartyIndexStore, compute_concentration
+from ..tools.quantile_sketch import QuantileSketchStore, SKETCH_METRICS
+from ..tools.transaction_store import TransactionStore
+from ..tools.creditworthiness import CreditworthinessStore
+from ..tools.feature_store import FeatureStore, FEATURE_VERSION
+from ..tools.stress_testing import load_stress_frame, run_stress_scenarios
+from ..tools.early_warning import EarlyWarningEngine
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +59,13 @@ financial_health_agent = FinancialHealthAgent()
 credit_scoring_agent = CreditScoringAgent()
 policy_matching_agent = PolicyMatchingAgent()
 explainability_agent = ExplainabilityAgent()
+aggregate_cube = AggregateCube()
+counterparty_store = CounterpartyIndexStore()
+quantile_store = QuantileSketchStore()
+transaction_store = TransactionStore()
+creditworthiness_store = CreditworthinessStore()
+feature_store = FeatureStore()
+early_warning_engine = EarlyWarningEngine()
 
 
 # Request/Response Models
@@ -73,6 +89,19 @@ class AnalysisResponse(BaseModel):
 
 
 class ReportSummaryResponse(BaseModel):
+    """Response model for report summary."""
+    report_id: str
+    msme_id: str
+    generated_at: str
+    overall_creditworthiness: float
+    summary: str
+    risk_level: str
+    behavioral_score: float
+    net_cashflow: float
+    best_fit_products_count: int
+    key_insights: List[str] = []
+
+
 class AgentInvocationResponse(BaseModel):
     """Generic response for single-agent invocations."""
 
@@ -108,9 +137,58 @@ class ExplainabilityRequest(BaseModel):
     context: Optional[Dict[str, Any]] = None
 
 
+class PortfolioMetricsRequest(BaseModel):
+    """Request model for batch portfolio metrics (MSME id -> input data)."""
+    portfolio: Dict[str, Dict[str, Any]]
+    context: Optional[Dict[str, Any]] = None
+
+
+class PortfolioRerankRequest(BaseModel):
+    """Request model for re-ranking persisted reports under new creditworthiness weights."""
+    financial_health_weight: float = Field(default_factory=lambda: settings.FINANCIAL_HEALTH_WEIGHT, ge=0)
+    behavioral_score_weight: float = Field(default_factory=lambda: settings.BEHAVIORAL_SCORE_WEIGHT, ge=0)
+    policy_match_weight: float = Field(default_factory=lambda: settings.POLICY_MATCH_WEIGHT, ge=0)
+    msme_ids: Optional[List[str]] = None
+    latest_only: bool = True
+    top_n: Optional[int] = Field(default=None, ge=1)
+
+
+class StressScenario(BaseModel):
+    """A shock applied to the monthly aggregates of the targeted MSMEs."""
+    name: str
+    inflow_change: float = Field(default=0.0, ge=-1)  # relative, e.g. -0.2 for inflows -20%
+    outflow_change: float = Field(default=0.0, ge=-1)
+    shock_months: Optional[int] = Field(default=None, ge=1)  # only the last N months (None for all)
+    sectors: Optional[List[str]] = None
+    msme_types: Optional[List[str]] = None
+    msme_ids: Optional[List[str]] = None
+
+
+class PortfolioStressRequest(BaseModel):
+    """Request model for stress-testing the portfolio under shock scenarios."""
+    scenarios: List[StressScenario] = Field(min_length=1)
+    msme_ids: Optional[List[str]] = None
+    start_month: Optional[str] = None
+    end_month: Optional[str] = None
+    top_n: int = Field(default=10, ge=0)
+    refresh: bool = False  # reload the portfolio frame even if a cached one is fresh
+
+
+class MonitoringIngestRequest(BaseModel):
+    """Request model for early-warning evaluation of newly ingested transactions (MSME id -> input data)."""
+    borrowers: Dict[str, Dict[str, Any]]
+    as_of: Optional[str] = None  # date the statements are complete up to
+
+
 # In-memory storage for reports (use database in production)
 reports_storage: Dict[str, Dict[str, Any]] = {}
 
+# In-memory storage for preview analysis jobs (job id -> preview and full result)
+analysis_jobs: Dict[str, Dict[str, Any]] = {}
+
+# Stress frames loaded from the cube and feature store ((msme_ids, start, end) -> (loaded at, frame))
+stress_frames: Dict[tuple, tuple] = {}
+
 
 @app.get("/")
 async def root():
@@ -125,6 +203,12 @@ async def root():
             "credit_scoring_agent": "/api/v1/agent/credit-scoring",
             "policy_matching_agent": "/api/v1/agent/policy-matching",
             "explainability_agent": "/api/v1/agent/explainability",
+            "portfolio_metrics": "/api/v1/portfolio/metrics",
+            "aggregates": "/api/v1/aggregates",
+            "counterparties": "/api/v1/counterparties/{msme_id}",
+            "counterparty_exposure": "/api/v1/counterparties/exposure",
+            "quantiles": "/api/v1/quantiles/{metric}",
+            "report_transaction": "/api/v1/report/{report_id}/transactions/{transaction_ref}",
             "report": "/api/v1/report/{report_id}",
             "summary": "/api/v1/report/{report_id}/summary",
             "lender_view": "/api/v1/report/{report_id}/lender",
@@ -144,6 +228,37 @@ async def health_check():
     }
 
 
+def _prepare_analysis_input(request: AnalysisRequest):
+    """Build the orchestrator input data and context of an analysis request."""
+    # Prepare input data
+    input_data = {}
+    
+    # Handle file_path: load JSON and merge into input_data
+    if request.file_path:
+        file_data = parse_json_data(request.file_path)
+        # Merge file data into input_data (preserves bank_accounts, gst_filings, msme_profile structure)
+        input_data.update(file_data)
+        # If file had transactions at root, keep them; otherwise agents will extract from bank_accounts
+        if 'transactions' in file_data:
+            input_data['transactions'] = file_data['transactions']
+    
+    # Handle direct transactions (overrides file data if provided)
+    if request.transactions:
+        input_data['transactions'] = request.transactions
+    
+    # Merge msme_profile (request takes precedence over file data)
+    if request.msme_profile:
+        input_data['msme_profile'] = request.msme_profile
+    elif 'msme_profile' not in input_data:
+        input_data['msme_profile'] = {}
+    
+    # Prepare context
+    context = request.context.copy() if request.context else {}
+    msme_id = context.get('msme_id', f"msme_{uuid.uuid4().hex[:8]}")
+    context['msme_id'] = msme_id
+    return input_data, context
+
+
 @app.post("/api/v1/analyze", response_model=AnalysisResponse)
 async def analyze_credit(
     request: AnalysisRequest,
@@ -162,32 +277,7 @@ async def analyze_credit(
     try:
         logger.info("Received credit analysis request")
         
-        # Prepare input data
-        input_data = {}
-        
-        # Handle file_path: load JSON and merge into input_data
-        if request.file_path:
-            file_data = parse_json_data(request.file_path)
-            # Merge file data into input_data (preserves bank_accounts, gst_filings, msme_profile structure)
-            input_data.update(file_data)
-            # If file had transactions at root, keep them; otherwise agents will extract from bank_accounts
-            if 'transactions' in file_data:
-                input_data['transactions'] = file_data['transactions']
-        
-        # Handle direct transactions (overrides file data if provided)
-        if request.transactions:
-            input_data['transactions'] = request.transactions
-        
-        # Merge msme_profile (request takes precedence over file data)
-        if request.msme_profile:
-            input_data['msme_profile'] = request.msme_profile
-        elif 'msme_profile' not in input_data:
-            input_data['msme_profile'] = {}
-        
-        # Prepare context
-        context = request.context.copy() if request.context else {}
-        msme_id = context.get('msme_id', f"msme_{uuid.uuid4().hex[:8]}")
-        context['msme_id'] = msme_id
+        input_data, context = _prepare_analysis_input(request)
         
         # Run orchestrator
         result = orchestrator.run(input_data, context)
@@ -227,6 +317,85 @@ async def analyze_credit(
         )
 
 
+@app.post("/api/v1/analyze/preview")
+async def analyze_credit_with_preview(
+    request: AnalysisRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Start a credit analysis and return a preview score right away.
+    
+    The preview estimates the deterministic scorecard score from a
+    stratified (account x month) sample, computed within
+    PREVIEW_TIME_BUDGET_MS and returned with 95% bounds. The full pipeline
+    then runs in the background; poll /api/v1/analyze/jobs/{job_id} for its
+    result and the full-statement scorecard score the bounds are checked
+    against.
+    """
+    try:
+        input_data, context = _prepare_analysis_input(request)
+    except Exception as e:
+        logger.error(f"Error preparing preview analysis: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=400, detail=f"Invalid analysis input: {str(e)}")
+    
+    preview = orchestrator.run_preview(input_data, context)
+    job_id = uuid.uuid4().hex
+    analysis_jobs[job_id] = {
+        'job_id': job_id,
+        'msme_id': context['msme_id'],
+        'status': 'running',
+        'created_at': datetime.now().isoformat(),
+        'preview': preview.data if preview.success else None,
+        'preview_errors': preview.errors,
+        'result': None,
+        'errors': []
+    }
+    background_tasks.add_task(_complete_analysis_job, job_id, input_data, context)
+    return analysis_jobs[job_id]
+
+
+@app.get("/api/v1/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Get the preview and, once processing completes, the full result of an analysis job."""
+    if job_id not in analysis_jobs:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Analysis job {job_id} not found"
+        )
+    return analysis_jobs[job_id]
+
+
+def _complete_analysis_job(job_id: str, input_data: Dict[str, Any], context: Dict[str, Any]) -> None:
+    """Run the full pipeline for a preview job and attach the full result."""
+    job = analysis_jobs[job_id]
+    try:
+        result = orchestrator.run(input_data, context)
+        if not result.success:
+            job.update(status='failed', errors=result.errors)
+            return
+        
+        report = UnifiedCreditReport(**result.data)
+        reports_storage[report.report_id] = result.data
+        
+        # The preview estimates the scorecard, so check its bounds against the full-statement scorecard
+        scorecard_score = orchestrator.score_scorecard(input_data)['behavioral_score']
+        bounds = (job['preview'] or {}).get('bounds')
+        job['result'] = {
+            'report_id': report.report_id,
+            'overall_creditworthiness': report.overall_creditworthiness,
+            'behavioral_score': report.behavioral_score.behavioral_score,
+            'risk_level': report.behavioral_score.risk_level.value,
+            'summary': report.summary,
+            'scorecard_score': scorecard_score,
+            'within_preview_bounds': bounds['lower'] <= scorecard_score <= bounds['upper'] if bounds else None
+        }
+        job.update(status='completed', completed_at=datetime.now().isoformat())
+        logger.info(f"Analysis job {job_id} completed. Report ID: {report.report_id}")
+    except Exception as e:
+        logger.error(f"Error in analysis job {job_id}: {str(e)}", exc_info=True)
+        job.update(status='failed', errors=[str(e)])
+
+
 def _agent_response(agent_output) -> AgentInvocationResponse:
     return AgentInvocationResponse(
         success=agent_output.success,
@@ -260,6 +429,12 @@ async def run_credit_scoring_agent_endpoint(request: CreditScoringRequest):
     return _agent_response(result)
 
 
+@app.get("/api/v1/agent/credit-scoring/tiers")
+async def get_credit_scoring_tiers():
+    """Escalation rate and per-tier latency of tiered credit scoring since startup."""
+    return CreditScoringAgent.tier_stats.summary()
+
+
 @app.post("/api/v1/agent/policy-matching", response_model=AgentInvocationResponse)
 async def run_policy_matching_agent_endpoint(request: PolicyMatchingRequest):
     """Run only the Policy Matching Agent."""
@@ -284,6 +459,227 @@ async def run_explainability_agent_endpoint(request: ExplainabilityRequest):
     return _agent_response(result)
 
 
+@app.get("/api/v1/narratives/reuse")
+async def get_narrative_reuse():
+    """Narrative lookups and reuse hits of the analysis pipeline's Gemini agents since startup."""
+    return {
+        agent.name: agent.narrative_index.stats()
+        for agent in (orchestrator.explainability_agent, orchestrator.recommendation_agent)
+    }
+
+
+@app.post("/api/v1/portfolio/metrics", response_model=AgentInvocationResponse)
+async def run_portfolio_metrics_endpoint(request: PortfolioMetricsRequest):
+    """Compute deterministic health metrics for many MSMEs in one batch (no LLM calls)."""
+    result = orchestrator.run_portfolio(request.portfolio, request.context or {})
+    return _agent_response(result)
+
+
+@app.post("/api/v1/portfolio/rerank")
+async def rerank_portfolio_endpoint(request: PortfolioRerankRequest):
+    """
+    Re-rank the portfolio under new creditworthiness weights.
+    
+    Uses the components persisted with each report; no agent or LLM is run.
+    """
+    weights = {
+        'financial_health': request.financial_health_weight,
+        'behavioral': request.behavioral_score_weight,
+        'policy_match': request.policy_match_weight
+    }
+    ranking = creditworthiness_store.rerank(
+        weights,
+        msme_ids=request.msme_ids,
+        latest_only=request.latest_only,
+        limit=request.top_n
+    )
+    return {"weights": weights, "count": len(ranking), "ranking": ranking}
+
+
+@app.post("/api/v1/portfolio/stress")
+async def stress_portfolio_endpoint(request: PortfolioStressRequest):
+    """
+    Stress-test the portfolio under shock scenarios.
+    
+    Shocks are applied to the persisted monthly aggregates of every targeted
+    MSME at once; metrics, deterministic scores and policy eligibility are
+    recomputed column-wise and risk-level migrations are reported. No agent
+    or LLM is run.
+    """
+    key = (tuple(request.msme_ids or ()), request.start_month, request.end_month)
+    cached = stress_frames.get(key)
+    if request.refresh or not cached or time.time() - cached[0] > settings.STRESS_FRAME_MAX_AGE_SECONDS:
+        frame = load_stress_frame(
+            aggregate_cube,
+            feature_store,
+            msme_ids=request.msme_ids,
+            start_month=request.start_month,
+            end_month=request.end_month
+        )
+        stress_frames[key] = (time.time(), frame)
+    else:
+        frame = cached[1]
+    
+    if not frame['msme_ids']:
+        raise HTTPException(status_code=404, detail="No monthly aggregates found for the selected MSMEs")
+    
+    return run_stress_scenarios(
+        frame,
+        [scenario.model_dump() for scenario in request.scenarios],
+        policy_matching_agent.policies,
+        weights=settings.SCORECARD_WEIGHTS,
+        risk_bands=settings.RISK_LEVEL_BANDS,
+        top_n=request.top_n
+    )
+
+
+@app.get("/api/v1/aggregates")
+async def get_aggregates(
+    msme_id: Optional[List[str]] = Query(default=None),
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    category: Optional[List[str]] = Query(default=None),
+    rollup: bool = False
+):
+    """
+    Query the MSME x month x category aggregate cube.
+    
+    Months use the "YYYY-MM" format and ranges are inclusive. Set rollup=true
+    to sum over categories (monthly inflow/outflow charts).
+    """
+    cells = aggregate_cube.query(
+        msme_ids=msme_id,
+        start_month=start_month,
+        end_month=end_month,
+        categories=category,
+        rollup_categories=rollup
+    )
+    return {"count": len(cells), "cells": cells}
+
+
+@app.get("/api/v1/quantiles/{metric}")
+async def get_quantiles(
+    metric: str,
+    msme_id: Optional[List[str]] = Query(default=None),
+    account_id: Optional[List[str]] = Query(default=None),
+    q: Optional[List[float]] = Query(default=None)
+):
+    """
+    Get percentiles of balances or credit/debit amounts from the persisted sketches.
+    
+    Sketches are merged across the selected accounts and MSMEs (the whole
+    portfolio when no filter is given).
+    """
+    if metric not in SKETCH_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metric {metric}; expected one of {', '.join(SKETCH_METRICS)}"
+        )
+    if q and any(not 0 <= value <= 1 for value in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    
+    sketch = quantile_store.get(metric, msme_ids=msme_id, account_ids=account_id)
+    return {"metric": metric, **sketch.summary(q or (0.1, 0.5, 0.9))}
+
+
+@app.get("/api/v1/counterparties/exposure")
+async def get_counterparty_exposure(name: str):
+    """List every MSME in the portfolio that trades with a counterparty."""
+    exposure = counterparty_store.exposure(name)
+    return {"counterparty": name, "msme_count": len(exposure), "exposure": exposure}
+
+
+@app.get("/api/v1/counterparties/{msme_id}")
+async def get_counterparties(msme_id: str, top_n: int = 3):
+    """Get an MSME's persisted counterparty index and concentration metrics."""
+    index = counterparty_store.get_index(msme_id)
+    if not index:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No counterparty data for {msme_id}"
+        )
+    
+    return {
+        "msme_id": msme_id,
+        "concentration": compute_concentration(index, top_n),
+        "counterparties": index
+    }
+
+
+@app.get("/api/v1/features")
+async def scan_features(
+    msme_id: Optional[List[str]] = Query(default=None),
+    as_of: Optional[str] = None,
+    version: int = FEATURE_VERSION
+):
+    """Batch scan of the latest feature vectors on or before a date (whole portfolio when no MSME is given)."""
+    vectors = feature_store.scan(msme_ids=msme_id, as_of=as_of, version=version)
+    return {
+        "count": len(vectors),
+        "version": version,
+        "features": [vector.model_dump(mode="json") for vector in vectors.values()]
+    }
+
+
+@app.get("/api/v1/features/{msme_id}")
+async def get_features(msme_id: str, as_of: Optional[str] = None, version: int = FEATURE_VERSION):
+    """Get an MSME's latest feature vector on or before a date."""
+    vector = feature_store.get(msme_id, as_of=as_of, version=version)
+    if not vector:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No feature vector for {msme_id}"
+        )
+    
+    return vector.model_dump(mode="json")
+
+
+@app.post("/api/v1/monitoring/ingest")
+async def ingest_monitoring_transactions(request: MonitoringIngestRequest):
+    """
+    Evaluate the early-warning rules on newly ingested transactions of existing borrowers.
+    
+    Only transactions not seen before are folded into each borrower's
+    monitoring state; no report is recomputed. A borrower's first batch
+    builds the baseline state without raising alerts.
+    """
+    batches = {}
+    errors = {}
+    for msme_id, data in request.borrowers.items():
+        try:
+            batches[msme_id] = extract_transactions_from_json(data)
+        except Exception as e:
+            errors[msme_id] = str(e)
+    
+    result = early_warning_engine.ingest_batch(batches, as_of=request.as_of)
+    return {**result, "alert_count": len(result['alerts']), "errors": errors}
+
+
+@app.get("/api/v1/monitoring/alerts")
+async def get_monitoring_alerts(
+    msme_id: Optional[List[str]] = Query(default=None),
+    rule_id: Optional[List[str]] = Query(default=None),
+    severity: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000)
+):
+    """List raised early-warning alerts, newest first."""
+    alerts = early_warning_engine.alerts(
+        msme_ids=msme_id,
+        rule_ids=rule_id,
+        severity=severity,
+        since=since,
+        limit=limit
+    )
+    return {"count": len(alerts), "alerts": alerts}
+
+
+@app.get("/api/v1/monitoring/rules")
+async def get_monitoring_rules():
+    """List the active early-warning rules."""
+    return {"count": len(early_warning_engine.rules), "rules": early_warning_engine.rules}
+
+
 @app.get("/api/v1/report/{report_id}")
 async def get_report(report_id: str):
     """
@@ -373,6 +769,32 @@ async def get_report_json(report_id: str):
     }
 
 
+@app.get("/api/v1/report/{report_id}/transactions/{transaction_ref}")
+async def get_report_transaction(report_id: str, transaction_ref: str):
+    """
+    Resolve a transaction reference (e.g. from an anomaly) to the full transaction.
+    """
+    if report_id not in reports_storage:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Report {report_id} not found"
+        )
+    
+    msme_id = reports_storage[report_id].get('msme_id')
+    transaction = transaction_store.get(msme_id, transaction_ref)
+    if transaction is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Transaction {transaction_ref} not found for report {report_id}"
+        )
+    
+    return {
+        "report_id": report_id,
+        "msme_id": msme_id,
+        "transaction": transaction
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,78 @@
+"""
+SQLite helpers for locally persisted analytics (aggregate cube, indexes, feature store).
+"""
+
+import os
+import sqlite3
+from typing import List, Optional, Set
+
+from .config import settings
+
+
+def get_analytics_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Open a connection to the local analytics database.
+
+    Args:
+        db_path: Optional override for settings.ANALYTICS_DB_PATH (":memory:" is supported)
+
+    Returns:
+        sqlite3 connection with dict-like rows
+    """
+    path = db_path or settings.ANALYTICS_DB_PATH
+    if path != ":memory:":
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+_INGESTION_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_ledger (
+    consumer TEXT NOT NULL,
+    msme_id TEXT NOT NULL,
+    tx_key TEXT NOT NULL,
+    PRIMARY KEY (consumer, msme_id, tx_key)
+);
+"""
+
+
+def ensure_ingestion_ledger(conn: sqlite3.Connection) -> None:
+    """Create the shared ingestion ledger used to make incremental updates idempotent."""
+    conn.executescript(_INGESTION_LEDGER_SCHEMA)
+
+
+def filter_unseen_keys(conn: sqlite3.Connection, consumer: str, msme_id: str, keys: List[str]) -> Set[str]:
+    """
+    Return the transaction keys a consumer has not ingested yet for an MSME.
+
+    Args:
+        conn: Analytics database connection
+        consumer: Name of the incremental structure (e.g. "aggregate_cube")
+        msme_id: MSME identifier
+        keys: Candidate transaction keys
+
+    Returns:
+        Subset of keys not present in the ingestion ledger
+    """
+    seen = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT tx_key FROM ingestion_ledger WHERE consumer = ? AND msme_id = ? AND tx_key IN ({placeholders})",
+            [consumer, msme_id, *chunk]
+        ).fetchall()
+        seen.update(row[0] for row in rows)
+    return set(keys) - seen
+
+
+def record_seen_keys(conn: sqlite3.Connection, consumer: str, msme_id: str, keys: List[str]) -> None:
+    """Mark transaction keys as ingested by a consumer (call inside the consumer's transaction)."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO ingestion_ledger (consumer, msme_id, tx_key) VALUES (?, ?, ?)",
+        [(consumer, msme_id, key) for key in keys]
+    )
@@ -3,7 +3,7 @@ Configuration management for the platform.
 """
 
 import os
-from typing import Optional
+from typing import List, Dict, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -19,6 +19,14 @@ class Settings(BaseSettings):
     # Database Settings
     DB_PATH: str = "data/policies.db"
     DATA_DIR: str = "data"
+    ANALYTICS_DB_PATH: str = "data/analytics.db"
+    AGGREGATE_CUBE_ENABLED: bool = True
+    COUNTERPARTY_INDEX_ENABLED: bool = True
+    QUANTILE_SKETCHES_ENABLED: bool = True
+    TRANSACTION_STORE_ENABLED: bool = True
+    REPORT_COMPONENTS_ENABLED: bool = True
+    FEATURE_STORE_ENABLED: bool = True
+    EARLY_WARNING_ENABLED: bool = True
     
     # Agent Settings
     AGENT_TIMEOUT: int = 300  # seconds
@@ -29,10 +37,35 @@ class Settings(BaseSettings):
     BEHAVIORAL_SCORE_WEIGHT: float = 0.4
     POLICY_MATCH_WEIGHT: float = 0.3
     
+    # Behavioral Scoring Settings
+    SCORING_MODE: str = "llm"  # "llm", "deterministic" or "tiered"
+    SCORECARD_FALLBACK_ENABLED: bool = True
+    SCORECARD_WEIGHTS: Dict[str, float] = {}  # overrides of the scorecard's default component weights
+    RISK_LEVEL_BANDS: List[float] = [700, 550, 400]  # lower bounds of low/medium/high risk
+    SCORING_ESCALATION_BAND: float = 50.0  # tiered mode: score points around policy cut-offs sent to the LLM
+    PREVIEW_SAMPLE_SIZE: int = 2000  # rows in the stratified sample behind preview scores
+    PREVIEW_EXACT_MAX_ROWS: int = 5000  # statements up to this many rows are scored in full, not sampled
+    PREVIEW_TIME_BUDGET_MS: float = 1500
+    PREVIEW_GROUPS: int = 5  # random groups scored for the preview confidence bounds
+    STRESS_FRAME_MAX_AGE_SECONDS: int = 300  # reuse of the loaded portfolio frame across stress tests
+    
+    # Transaction Ingestion Settings
+    NET_INTERNAL_TRANSFERS: bool = True
+    TRANSFER_MATCH_WINDOW_DAYS: int = 3
+    STATEMENT_INTEGRITY_ENABLED: bool = True
+    BALANCE_CONTINUITY_TOLERANCE: float = 0.01
+    
+    # Health Analysis Settings
+    LOW_BALANCE_THRESHOLD: float = 50000
+    LOW_BALANCE_THRESHOLDS: List[float] = [10000, 25000, 50000, 100000]
+    ROLLING_WINDOW_MONTHS: List[int] = [3, 6, 12]
+    
     # LLM Settings (Gemini via LangChain)
     GEMINI_MODEL: str = "gemini-2.5-flash"
     GEMINI_API_KEY: Optional[str] = None
     LLM_TEMPERATURE: float = 0.3
+    NARRATIVE_REUSE_ENABLED: bool = False  # reuse explainability/recommendation narratives of similar profiles
+    NARRATIVE_REUSE_DISTANCE: float = 0.05  # max distance between normalized profile vectors
     
     # Logging
     LOG_LEVEL: str = "INFO"
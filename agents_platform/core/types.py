@@ -122,6 +122,7 @@ class HealthAnalysisSummary(BaseModel):
     cashflow_volatility: float = Field(ge=0, le=1)
     avg_balance: float  # Average monthly balance
     low_balance_days: int  # Days with balance below threshold
+    low_balance_curve: Dict[str, int] = {}  # Threshold -> days with balance below it
     emi_transactions: int  # Count of EMI transactions
     cheque_bounces: int  # Count of cheque bounces
     overdraft_days: int  # Days with negative balance
@@ -143,6 +144,29 @@ class RecommendationReport(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
+class FeatureVector(BaseModel):
+    """Derived per-MSME features as of a date, shared by scoring, matching and explainability."""
+    msme_id: str
+    as_of: str  # YYYY-MM-DD
+    version: int  # Feature definition version
+    computed_at: datetime
+    total_inflow: float
+    total_outflow: float
+    net_cashflow: float
+    average_balance: float
+    cashflow_stability_score: float = Field(ge=0, le=1)
+    volatility_score: float = Field(ge=0, le=1)
+    transaction_count: int
+    red_flag_count: int
+    red_flags: List[str] = []
+    emi_count: int
+    cheque_bounces: int
+    gst_filings: int = 0
+    gst_compliance_rate: Optional[float] = None  # % of returns filed; None without GST filings
+    sector: Optional[str] = None
+    msme_type: Optional[str] = None  # Size band (micro/small/medium)
+
+
 class UnifiedCreditReport(BaseModel):
     """Final unified credit report."""
     msme_id: str
@@ -0,0 +1,46 @@
+"""
+Preview example: a fast estimate of the scorecard score from a stratified sample of the statement.
+
+Prints the preview as a single "Preview JSON:" line so callers (e.g. the sync
+flow) can show it while run_end_to_end.py processes the full statement.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agents_platform.orchestrator.orchestrator import OrchestratorAgent
+from agents_platform.examples.run_end_to_end import load_sample_data
+
+
+def main():
+    """Run the preview score."""
+    data = load_sample_data()
+    msme_profile = data.get('msme_profile', {})
+    context = {'msme_id': msme_profile.get('msme_id', data.get('msme_id', 'MSME_001'))}
+    
+    result = OrchestratorAgent().run_preview(data, context)
+    if not result.success:
+        print(f"[X] Preview failed: {', '.join(result.errors)}")
+        sys.exit(1)
+    
+    preview = result.data
+    print(f"Preview Scorecard Score: {preview['score']['behavioral_score']:.0f}/1000 "
+          f"(95% range {preview['bounds']['lower']:.0f}-{preview['bounds']['upper']:.0f}, "
+          f"{preview['sample']['sampled']}/{preview['sample']['population']} transactions sampled)")
+    print("Preview JSON: " + json.dumps({
+        'behavioral_score': preview['score']['behavioral_score'],
+        'risk_level': preview['score']['risk_level'],
+        'bounds': preview['bounds'],
+        'risk_levels': preview['risk_levels'],
+        'exact': preview['exact'],
+        'sample': preview['sample'],
+        'elapsed_ms': preview['elapsed_ms']
+    }, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import uuid
 import logging
 
 from ..core.base_agent import BaseAgent
-from ..core.types import AgentOutput, UnifiedCreditReport
+from ..core.types import AgentOutput, UnifiedCreditReport, FinancialHealthSummary, HealthAnalysisSummary
 from ..agents.financial_health_agent import FinancialHealthAgent
 from ..agents.credit_scoring_agent import CreditScoringAgent
 from ..agents.policy_matching_agent import PolicyMatchingAgent
@@ -16,6 +16,16 @@ from ..agents.explainability_agent import ExplainabilityAgent
 from ..agents.health_analysis_agent import HealthAnalysisAgent
 from ..agents.recommendation_agent import RecommendationAgent
 from ..tools.data_parser import extract_transactions_from_json
+from ..tools.portfolio_metrics import compute_portfolio_metrics
+from ..tools.preview_scoring import compute_preview_score
+from ..tools.aggregate_cube import AggregateCube
+from ..tools.counterparty_analyzer import CounterpartyIndexStore
+from ..tools.quantile_sketch import QuantileSketchStore
+from ..tools.transaction_store import TransactionStore
+from ..tools.statement_integrity import check_balance_continuity
+from ..tools.feature_store import FeatureStore, build_feature_vector
+from ..tools.creditworthiness import CreditworthinessStore, creditworthiness_components, combine_components
+from ..tools.early_warning import EarlyWarningEngine
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -46,6 +56,15 @@ class OrchestratorAgent(BaseAgent):
         self.explainability_agent = ExplainabilityAgent()
         self.health_analysis_agent = HealthAnalysisAgent()
         self.recommendation_agent = RecommendationAgent()
+        
+        # Incremental analytics stores are opened lazily on first ingestion
+        self._aggregate_cube: Optional[AggregateCube] = None
+        self._counterparty_store: Optional[CounterpartyIndexStore] = None
+        self._quantile_store: Optional[QuantileSketchStore] = None
+        self._transaction_store: Optional[TransactionStore] = None
+        self._creditworthiness_store: Optional[CreditworthinessStore] = None
+        self._feature_store: Optional[FeatureStore] = None
+        self._early_warning_engine: Optional[EarlyWarningEngine] = None
     
     def run(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> AgentOutput:
         """
@@ -80,10 +99,16 @@ class OrchestratorAgent(BaseAgent):
             # Step 2: Credit Scoring Analysis
             self.log_step("Step 2: Executing Credit Scoring Agent")
             # Extract transactions from input_data (handles both old and new formats)
-            transactions = self._extract_transactions_for_credit_scoring(input_data)
+            statement_rows = []
+            transactions = self._extract_transactions_for_credit_scoring(input_data, statement_rows)
+            self._update_incremental_stores(msme_id, transactions, context)
+            statement_integrity = self._check_statement_integrity(input_data, statement_rows)
+            features = self._derive_features(msme_id, financial_health, transactions, input_data, context)
             credit_scoring_input = {
                 'transactions': transactions,
-                'financial_health': financial_health
+                'financial_health': financial_health,
+                'features': features,
+                'lender_policies': self.policy_matching_agent.policies
             }
             credit_scoring_output = self.credit_scoring_agent.run(credit_scoring_input, context)
             
@@ -101,6 +126,7 @@ class OrchestratorAgent(BaseAgent):
             policy_matching_input = {
                 'financial_health': financial_health,
                 'behavioral_score': behavioral_score,
+                'features': features,
                 'msme_profile': input_data.get('msme_profile', {})
             }
             policy_matching_output = self.policy_matching_agent.run(policy_matching_input, context)
@@ -133,7 +159,9 @@ class OrchestratorAgent(BaseAgent):
             explainability_input = {
                 'financial_health': financial_health,
                 'behavioral_score': behavioral_score,
-                'product_recommendations': product_recommendations
+                'product_recommendations': product_recommendations,
+                'features': features,
+                'msme_profile': input_data.get('msme_profile', {})
             }
             explainability_output = self.explainability_agent.run(explainability_input, context)
             
@@ -159,7 +187,8 @@ class OrchestratorAgent(BaseAgent):
                 'financial_health': financial_health,
                 'health_analysis': health_analysis or {},
                 'behavioral_score': behavioral_score,
-                'product_recommendations': product_recommendations
+                'product_recommendations': product_recommendations,
+                'features': features
             }
             recommendation_output = self.recommendation_agent.run(recommendation_input, context)
             
@@ -180,9 +209,12 @@ class OrchestratorAgent(BaseAgent):
                 product_recommendations=product_recommendations,
                 explainability=explainability,
                 health_analysis=health_analysis,
-                recommendations=recommendations
+                recommendations=recommendations,
+                statement_integrity=statement_integrity
             )
             
+            self._persist_report_components(unified_report)
+            
             self.log_step("Orchestrator pipeline completed successfully")
             
             return self.create_output(
@@ -204,6 +236,161 @@ class OrchestratorAgent(BaseAgent):
                 errors=[f"Orchestrator pipeline failed: {str(e)}"]
             )
     
+    def run_portfolio(self, portfolio: Dict[str, Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> AgentOutput:
+        """
+        Compute the deterministic metrics for many MSMEs in one batch.
+        
+        Only the tool-based FinancialHealthSummary and HealthAnalysisSummary are
+        produced; no LLM-backed agent is invoked.
+        
+        Args:
+            portfolio: MSME id -> input data (same structure accepted by run())
+            context: Optional context (e.g., low_balance_thresholds, as_of_date)
+            
+        Returns:
+            AgentOutput with one summary pair per MSME
+        """
+        try:
+            self.log_step(f"Starting portfolio metrics for {len(portfolio)} MSMEs")
+            context = context or {}
+            
+            results, skipped = compute_portfolio_metrics(
+                portfolio,
+                low_balance_threshold=settings.LOW_BALANCE_THRESHOLD,
+                low_balance_thresholds=context.get('low_balance_thresholds') or settings.LOW_BALANCE_THRESHOLDS,
+                window_months=settings.ROLLING_WINDOW_MONTHS,
+                as_of=context.get('as_of_date')
+            )
+            
+            summaries = {}
+            vectors = []
+            errors = [f"{msme_id}: {error}" for msme_id, error in skipped.items()]
+            for msme_id, metrics in results.items():
+                try:
+                    summaries[msme_id] = {
+                        'financial_health': FinancialHealthSummary(**metrics['financial_health']).model_dump(),
+                        'health_analysis': HealthAnalysisSummary(**metrics['health_analysis']).model_dump()
+                    }
+                    vectors.append(build_feature_vector(
+                        msme_id,
+                        metrics['financial_health'],
+                        health_analysis=metrics['health_analysis'],
+                        red_flags=metrics['red_flags'],
+                        as_of=context.get('as_of_date'),
+                        msme_profile=portfolio[msme_id].get('msme_profile')
+                    ))
+                except Exception as e:
+                    self.logger.warning(f"Failed to build portfolio summaries for {msme_id}: {e}")
+                    errors.append(f"{msme_id}: {str(e)}")
+            
+            if settings.FEATURE_STORE_ENABLED and vectors:
+                try:
+                    if self._feature_store is None:
+                        self._feature_store = FeatureStore()
+                    self._feature_store.put(vectors)
+                except Exception as e:
+                    self.logger.warning(f"Feature store update failed: {e}")
+            
+            self.log_step(f"Portfolio metrics completed for {len(summaries)} MSMEs")
+            
+            return self.create_output(
+                success=bool(summaries) or not portfolio,
+                data={'summaries': summaries},
+                errors=errors,
+                metadata={
+                    'agent': self.name,
+                    'timestamp': datetime.now().isoformat(),
+                    'msme_count': len(portfolio),
+                    'succeeded': len(summaries)
+                }
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error in portfolio metrics: {str(e)}", exc_info=True)
+            return self.create_output(
+                success=False,
+                data={},
+                errors=[f"Portfolio metrics failed: {str(e)}"]
+            )
+    
+    def run_preview(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> AgentOutput:
+        """
+        Estimate the statement's scorecard score from a stratified sample.
+        
+        Only deterministic tools and the behavioral scorecard are used, within
+        a time budget, so the preview can be shown while run() is still
+        processing the full statement. The estimate targets score_scorecard()
+        on the full statement, not the (possibly LLM) score of run().
+        
+        Args:
+            input_data: Input data dictionary (same structure accepted by run())
+            context: Optional context (preview_sample_size, preview_time_budget_ms)
+            
+        Returns:
+            AgentOutput with the preview score, its 95% bounds and sample statistics
+        """
+        try:
+            context = context or {}
+            self.log_step("Computing preview score on a stratified sample")
+            
+            preview = compute_preview_score(
+                input_data,
+                self._score_sample,
+                sample_size=int(context.get('preview_sample_size') or settings.PREVIEW_SAMPLE_SIZE),
+                time_budget_ms=float(context.get('preview_time_budget_ms') or settings.PREVIEW_TIME_BUDGET_MS),
+                groups=settings.PREVIEW_GROUPS,
+                risk_bands=settings.RISK_LEVEL_BANDS,
+                exact_max_rows=settings.PREVIEW_EXACT_MAX_ROWS
+            )
+            
+            self.log_step(
+                f"Preview score {preview['score']['behavioral_score']:.0f} "
+                f"[{preview['bounds']['lower']:.0f}, {preview['bounds']['upper']:.0f}] "
+                f"from {preview['sample']['sampled']}/{preview['sample']['population']} rows"
+            )
+            
+            return self.create_output(
+                success=True,
+                data=preview,
+                metadata={
+                    'agent': self.name,
+                    'timestamp': datetime.now().isoformat(),
+                    'msme_id': context.get('msme_id', 'unknown'),
+                    'preview': True
+                }
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error in preview scoring: {str(e)}", exc_info=True)
+            return self.create_output(
+                success=False,
+                data={},
+                errors=[f"Preview scoring failed: {str(e)}"]
+            )
+    
+    def score_scorecard(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Deterministic scorecard score of a full statement, the quantity previews estimate.
+        
+        Args:
+            input_data: Input data dictionary (same structure accepted by run())
+            
+        Returns:
+            BehavioralScore dictionary
+        """
+        return self._score_sample(input_data, extract_transactions_from_json(input_data))
+    
+    def _score_sample(self, sample_data: Dict[str, Any], transactions: list) -> Dict[str, Any]:
+        """Deterministic financial health and behavioral score of a sampled statement."""
+        results, errors = compute_portfolio_metrics(
+            {'sample': sample_data},
+            low_balance_threshold=settings.LOW_BALANCE_THRESHOLD,
+            window_months=settings.ROLLING_WINDOW_MONTHS
+        )
+        if 'sample' not in results:
+            raise ValueError(errors.get('sample', "No transactions found in input data"))
+        return self.credit_scoring_agent.score_deterministic(transactions, results['sample']['financial_health'])
+    
     def _build_unified_report(
         self,
         msme_id: str,
@@ -213,7 +400,8 @@ class OrchestratorAgent(BaseAgent):
         product_recommendations: Dict[str, Any],
         explainability: Dict[str, Any],
         health_analysis: Optional[Dict[str, Any]] = None,
-        recommendations: Optional[Dict[str, Any]] = None
+        recommendations: Optional[Dict[str, Any]] = None,
+        statement_integrity: Optional[Dict[str, Any]] = None
     ) -> UnifiedCreditReport:
         """
         Build the final unified credit report from all agent outputs.
@@ -225,16 +413,16 @@ class OrchestratorAgent(BaseAgent):
             behavioral_score: Behavioral score data
             product_recommendations: Product recommendations
             explainability: Explainability report
+            health_analysis: Optional health analysis summary
+            recommendations: Optional recommendation report
+            statement_integrity: Optional balance continuity result
             
         Returns:
             UnifiedCreditReport
         """
-        # Calculate overall creditworthiness (0-100)
-        overall_creditworthiness = self._calculate_overall_creditworthiness(
-            financial_health,
-            behavioral_score,
-            product_recommendations
-        )
+        # Calculate overall creditworthiness (0-100), keeping the components for re-ranking
+        components = creditworthiness_components(financial_health, behavioral_score, product_recommendations)
+        overall_creditworthiness = combine_components(components, self._creditworthiness_weights())
         
         # Generate summary
         summary = self._generate_summary(
@@ -290,53 +478,22 @@ class OrchestratorAgent(BaseAgent):
             summary=summary,
             metadata={
                 'generated_by': 'OrchestratorAgent',
-                'version': settings.API_VERSION
+                'version': settings.API_VERSION,
+                'statement_integrity': statement_integrity,
+                'creditworthiness_components': {name: round(score, 4) for name, score in components.items()}
             }
         )
         
         return report
     
-    def _calculate_overall_creditworthiness(
-        self,
-        financial_health: Dict[str, Any],
-        behavioral_score: Dict[str, Any],
-        product_recommendations: Dict[str, Any]
-    ) -> float:
-        """
-        Calculate overall creditworthiness score (0-100).
-        
-        Uses weighted combination of:
-        - Financial health (30%)
-        - Behavioral score (40%)
-        - Product eligibility (30%)
-        """
-        # Financial health component (0-100)
-        net_cf = financial_health.get('net_cashflow', 0)
-        stability = financial_health.get('cashflow_stability_score', 0)
-        volatility = financial_health.get('volatility_score', 0)
-        
-        # Normalize net cashflow (assume max 100000 for normalization)
-        cf_score = min(100, max(0, (net_cf / 100000) * 100)) if net_cf > 0 else 0
-        health_score = (cf_score * 0.4 + stability * 100 * 0.4 + (1 - volatility) * 100 * 0.2)
-        
-        # Behavioral score component (0-100)
-        b_score = behavioral_score.get('behavioral_score', 0)
-        behavioral_component = (b_score / 1000) * 100
-        
-        # Product eligibility component (0-100)
-        best_fit = product_recommendations.get('best_fit_products', [])
-        eligible_count = len([p for p in best_fit if p.get('eligible', False)])
-        total_evaluated = product_recommendations.get('total_products_evaluated', 1)
-        eligibility_score = (eligible_count / max(total_evaluated, 1)) * 100 if total_evaluated > 0 else 0
-        
-        # Weighted combination
-        overall = (
-            health_score * settings.FINANCIAL_HEALTH_WEIGHT +
-            behavioral_component * settings.BEHAVIORAL_SCORE_WEIGHT +
-            eligibility_score * settings.POLICY_MATCH_WEIGHT
-        )
-        
-        return round(max(0, min(100, overall)), 2)
+    @staticmethod
+    def _creditworthiness_weights() -> Dict[str, float]:
+        """Configured weights of the creditworthiness components."""
+        return {
+            'financial_health': settings.FINANCIAL_HEALTH_WEIGHT,
+            'behavioral': settings.BEHAVIORAL_SCORE_WEIGHT,
+            'policy_match': settings.POLICY_MATCH_WEIGHT
+        }
     
     def _generate_summary(
         self,
@@ -371,13 +528,173 @@ class OrchestratorAgent(BaseAgent):
         
         return summary
     
-    def _extract_transactions_for_credit_scoring(self, input_data: Dict[str, Any]) -> list:
+    def _update_incremental_stores(
+        self,
+        msme_id: str,
+        transactions: list,
+        context: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Fold newly ingested transactions into the persisted analytics stores (non-critical).
+        
+        Early-warning monitoring only covers borrowers flagged as monitored
+        (context "monitored" or "disbursed"), not every MSME that is analysed.
+        """
+        if msme_id == 'unknown':
+            return
+        
+        if settings.AGGREGATE_CUBE_ENABLED:
+            try:
+                if self._aggregate_cube is None:
+                    self._aggregate_cube = AggregateCube()
+                self._aggregate_cube.ingest(msme_id, transactions)
+            except Exception as e:
+                self.logger.warning(f"Aggregate cube update failed: {e}")
+        
+        if settings.COUNTERPARTY_INDEX_ENABLED:
+            try:
+                if self._counterparty_store is None:
+                    self._counterparty_store = CounterpartyIndexStore()
+                self._counterparty_store.ingest(msme_id, transactions)
+            except Exception as e:
+                self.logger.warning(f"Counterparty index update failed: {e}")
+        
+        if settings.QUANTILE_SKETCHES_ENABLED:
+            try:
+                if self._quantile_store is None:
+                    self._quantile_store = QuantileSketchStore()
+                self._quantile_store.ingest(msme_id, transactions)
+            except Exception as e:
+                self.logger.warning(f"Quantile sketch update failed: {e}")
+        
+        if settings.TRANSACTION_STORE_ENABLED:
+            try:
+                if self._transaction_store is None:
+                    self._transaction_store = TransactionStore()
+                self._transaction_store.ingest(msme_id, transactions)
+            except Exception as e:
+                self.logger.warning(f"Transaction store update failed: {e}")
+        
+        context = context or {}
+        if settings.EARLY_WARNING_ENABLED and (context.get('monitored') or context.get('disbursed')):
+            try:
+                if self._early_warning_engine is None:
+                    self._early_warning_engine = EarlyWarningEngine()
+                alerts = self._early_warning_engine.ingest(msme_id, transactions)
+                if alerts:
+                    self.logger.warning(f"Early warning: {len(alerts)} alerts raised for {msme_id}")
+            except Exception as e:
+                self.logger.warning(f"Early-warning evaluation failed: {e}")
+    
+    def _derive_features(
+        self,
+        msme_id: str,
+        financial_health: Dict[str, Any],
+        transactions: list,
+        input_data: Dict[str, Any],
+        context: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Derive the MSME's feature vector once and write it to the feature store.
+        
+        Args:
+            msme_id: MSME identifier
+            financial_health: Financial health summary
+            transactions: Normalized transactions
+            input_data: Input data dictionary (for GST filings and the MSME profile)
+            context: Optional context (as_of_date)
+            
+        Returns:
+            Feature vector dictionary, or None when derivation failed
+        """
+        try:
+            vector = build_feature_vector(
+                msme_id,
+                financial_health,
+                transactions=transactions,
+                gst_data=input_data,
+                as_of=(context or {}).get('as_of_date'),
+                msme_profile=input_data.get('msme_profile')
+            )
+        except Exception as e:
+            self.logger.warning(f"Feature derivation failed: {e}")
+            return None
+        
+        if settings.FEATURE_STORE_ENABLED and msme_id != 'unknown':
+            try:
+                if self._feature_store is None:
+                    self._feature_store = FeatureStore()
+                self._feature_store.put([vector])
+            except Exception as e:
+                self.logger.warning(f"Feature store update failed: {e}")
+        
+        return vector.model_dump()
+    
+    def _persist_report_components(self, report: UnifiedCreditReport) -> None:
+        """Store a report's creditworthiness components for re-ranking (non-critical)."""
+        if not settings.REPORT_COMPONENTS_ENABLED:
+            return
+        
+        try:
+            if self._creditworthiness_store is None:
+                self._creditworthiness_store = CreditworthinessStore()
+            self._creditworthiness_store.save(
+                report.report_id,
+                report.msme_id,
+                report.metadata['creditworthiness_components'],
+                report.overall_creditworthiness,
+                generated_at=report.generated_at
+            )
+        except Exception as e:
+            self.logger.warning(f"Creditworthiness component store update failed: {e}")
+    
+    def _check_statement_integrity(
+        self,
+        input_data: Dict[str, Any],
+        statement_rows: Optional[list] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Verify running-balance continuity of the uploaded statement rows (non-critical).
+        
+        Rows are taken in statement order and before internal-transfer
+        netting so that netted transfers do not appear as gaps.
+        
+        Args:
+            input_data: Input data dictionary
+            statement_rows: Rows captured in statement order during the main
+                extraction (re-extracted from input_data when not given)
+            
+        Returns:
+            Balance continuity result or None when disabled or failed
+        """
+        if not settings.STATEMENT_INTEGRITY_ENABLED:
+            return None
+        
+        try:
+            if 'transactions' in input_data and isinstance(input_data['transactions'], list):
+                rows = input_data['transactions']
+            elif statement_rows is not None:
+                rows = statement_rows
+            else:
+                rows = extract_transactions_from_json(input_data, net_transfers=False, consolidate=False)
+            return check_balance_continuity(rows, tolerance=settings.BALANCE_CONTINUITY_TOLERANCE)
+        except Exception as e:
+            self.logger.warning(f"Statement integrity check failed: {e}")
+            return None
+    
+    def _extract_transactions_for_credit_scoring(
+        self,
+        input_data: Dict[str, Any],
+        statement_rows: Optional[list] = None
+    ) -> list:
         """
         Extract transactions from input_data for credit scoring agent.
         Handles both old format (transactions at root) and new format (transactions in bank_accounts).
         
         Args:
             input_data: Input data dictionary
+            statement_rows: Optional list filled with the rows in statement order
+                (see extract_transactions_from_json)
             
         Returns:
             List of transaction dictionaries
@@ -388,7 +705,7 @@ class OrchestratorAgent(BaseAgent):
         
         # Try to extract from JSON structure (new format with bank_accounts)
         try:
-            return extract_transactions_from_json(input_data)
+            return extract_transactions_from_json(input_data, statement_rows=statement_rows)
         except Exception as e:
             self.logger.warning(f"Failed to extract transactions: {e}")
             return []
@@ -2,7 +2,7 @@
 Unified Credit Report Builder - Utilities for building and formatting reports.
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 import json
 
@@ -90,7 +90,8 @@ class ReportBuilder:
                 'net_cashflow': report.financial_health.net_cashflow,
                 'stability_score': report.financial_health.cashflow_stability_score,
                 'volatility_score': report.financial_health.volatility_score,
-                'stress_indicators': report.financial_health.stress_indicators
+                'stress_indicators': report.financial_health.stress_indicators,
+                'cashflow_forecast': ReportBuilder._forecast_summary(report)
             },
             'product_recommendations': [
                 {
@@ -105,10 +106,52 @@ class ReportBuilder:
                 }
                 for p in report.product_recommendations.best_fit_products
             ],
+            'statement_integrity': ReportBuilder._integrity_summary(report),
             'lender_arguments': report.explainability.lender_arguments,
             'generated_at': report.generated_at.isoformat()
         }
     
+    @staticmethod
+    def _integrity_summary(report: UnifiedCreditReport) -> Optional[Dict[str, Any]]:
+        """Balance continuity status and break counts, if the statement was checked."""
+        integrity = report.metadata.get('statement_integrity')
+        if not integrity:
+            return None
+        return {
+            'status': integrity.get('status'),
+            'integrity_score': integrity.get('integrity_score'),
+            'rows_checked': integrity.get('rows_checked'),
+            'edited_rows': integrity.get('edited_rows'),
+            'gaps': integrity.get('gaps'),
+            'missing_pages': integrity.get('missing_pages'),
+            'breaks': [
+                {k: b.get(k) for k in ('type', 'account_id', 'position', 'transaction_ref', 'discrepancy')}
+                for b in integrity.get('breaks', [])[:10]
+            ]
+        }
+    
+    @staticmethod
+    def _forecast_summary(report: UnifiedCreditReport) -> Optional[Dict[str, Any]]:
+        """Projected 3/6/12-month net cashflow with bands, if a forecast was computed."""
+        forecast = report.financial_health.metadata.get('cashflow_forecast')
+        if not forecast:
+            return None
+        return {
+            'method': forecast.get('method'),
+            'horizons': forecast.get('horizons', {})
+        }
+    
+    @staticmethod
+    def _frontier_summary(report: UnifiedCreditReport) -> Optional[List[Dict[str, Any]]]:
+        """What each product would take: changes to become eligible and to reach a better risk bucket."""
+        frontier = report.product_recommendations.metadata.get('eligibility_frontier')
+        if not frontier:
+            return None
+        return [
+            {k: f.get(k) for k in ('product_name', 'lender_name', 'eligible', 'risk_bucket', 'to_eligible', 'better_buckets')}
+            for f in frontier
+        ]
+    
     @staticmethod
     def format_for_msme(report: UnifiedCreditReport) -> Dict[str, Any]:
         """
@@ -149,6 +192,7 @@ class ReportBuilder:
                 }
                 for p in report.product_recommendations.best_fit_products[:3]
             ],
+            'eligibility_frontier': ReportBuilder._frontier_summary(report),
             'generated_at': report.generated_at.isoformat()
         }
 
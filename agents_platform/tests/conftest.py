@@ -0,0 +1,28 @@
+"""
+Shared fixtures for the tool tests.
+"""
+
+import pytest
+
+from agents_platform.core.analytics_db import get_analytics_connection
+
+
+@pytest.fixture
+def make_tx():
+    """Factory for statement rows; optional fields are only set when given."""
+    def make(date, amount, description='', account_id=None, balance=None, **fields):
+        tx = {'date': date, 'amount': amount, 'description': description, **fields}
+        if account_id is not None:
+            tx['account_id'] = account_id
+        if balance is not None:
+            tx['balance_after'] = balance
+        return tx
+    return make
+
+
+@pytest.fixture
+def analytics_conn():
+    """In-memory analytics database."""
+    conn = get_analytics_connection(':memory:')
+    yield conn
+    conn.close()
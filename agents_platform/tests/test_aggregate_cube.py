@@ -0,0 +1,60 @@
+"""
+Tests for the MSME x month x category aggregate cube.
+"""
+
+import pytest
+
+from agents_platform.tools.aggregate_cube import AggregateCube
+
+
+@pytest.fixture
+def statement(make_tx):
+    return [
+        make_tx('2024-01-05', 50000, 'NEFT ACME LTD', balance=150000),
+        make_tx('2024-01-20', -20000, 'NEFT SUPPLIER', balance=130000),
+        make_tx('2024-02-03', 30000, 'UPI CUSTOMER', balance=160000),
+        make_tx('2024-02-25', -90000, 'NEFT SUPPLIER', balance=70000),
+    ]
+
+
+def test_monthly_series_matches_the_statement(analytics_conn, statement):
+    cube = AggregateCube(conn=analytics_conn)
+
+    assert cube.ingest('M1', statement) == 4
+    assert cube.monthly_series('M1') == {
+        'inflow': {'2024-01': 50000, '2024-02': 30000},
+        'outflow': {'2024-01': 20000, '2024-02': 90000},
+    }
+
+
+def test_rollup_keeps_balance_figures(analytics_conn, statement):
+    cube = AggregateCube(conn=analytics_conn)
+    cube.ingest('M1', statement)
+
+    january, february = cube.query(['M1'], rollup_categories=True)
+
+    assert january['net_cashflow'] == 30000
+    assert january['tx_count'] == 2
+    assert january['min_balance'] == 130000
+    assert january['avg_balance'] == 140000
+    assert february['min_balance'] == 70000
+
+
+def test_reingesting_a_statement_does_not_double_count(analytics_conn, statement, make_tx):
+    cube = AggregateCube(conn=analytics_conn)
+    cube.ingest('M1', statement)
+
+    assert cube.ingest('M1', statement) == 0
+    assert cube.ingest('M1', statement + [make_tx('2024-03-01', 1000, 'UPI CUSTOMER', balance=71000)]) == 1
+    assert cube.monthly_totals(['M1'], start_month='2024-02') == [
+        ('M1', '2024-02', 30000.0, 90000.0),
+        ('M1', '2024-03', 1000.0, 0.0),
+    ]
+
+
+def test_msmes_are_kept_apart(analytics_conn, statement):
+    cube = AggregateCube(conn=analytics_conn)
+    cube.ingest('M1', statement)
+    cube.ingest('M2', statement[:1])
+
+    assert [cell['msme_id'] for cell in cube.query(end_month='2024-01', rollup_categories=True)] == ['M1', 'M2']
@@ -0,0 +1,97 @@
+"""
+Tests for the deterministic behavioral scorecard.
+"""
+
+import pytest
+
+from agents_platform.tools.behavioral_scorecard import (
+    compute_behavioral_scorecard,
+    compute_cashflow_scorecard_batch,
+    escalation_decision,
+    policy_score_cutoffs,
+    risk_level_for,
+)
+
+
+METRICS = {
+    'cashflow_metrics': {'total_inflow': 100000.0, 'net_cashflow': 10000.0},
+    'stability_score': 0.8,
+    'recurring_obligations': {'repayment_pattern_score': 90.0},
+    'concentration': {'concentration_risk_score': 20.0},
+    'seasonality': {'cyclicality_score': 10.0, 'months': 12},
+}
+FINANCIAL_HEALTH = {'volatility_score': 0.2}
+
+
+def test_weighted_components_give_the_score():
+    result = compute_behavioral_scorecard(METRICS, FINANCIAL_HEALTH)
+
+    assert result['metadata']['components'] == {
+        'cashflow_margin': 60.0, 'stability': 80.0, 'volatility': 80.0,
+        'repayment': 90.0, 'concentration': 80.0, 'cyclicality': 90.0
+    }
+    assert result['behavioral_score'] == 780.0
+    assert result['risk_level'] == 'low'
+    assert result['confidence'] == 1.0
+
+
+def test_red_flags_and_high_anomalies_are_penalized():
+    metrics = {
+        **METRICS,
+        'red_flags_detected': ['cheque_bounces'],
+        'anomalies_detected': [{'severity': 'high'}, {'severity': 'low'}],
+    }
+
+    result = compute_behavioral_scorecard(metrics, FINANCIAL_HEALTH)
+
+    assert result['behavioral_score'] == 780.0 - 40.0 - 10.0
+    assert result['metadata']['penalties'] == {'red_flags': 40.0, 'anomalies': 10.0}
+
+
+def test_missing_components_drop_out_with_renormalized_weights():
+    metrics = {'cashflow_metrics': METRICS['cashflow_metrics'], 'stability_score': 0.8}
+
+    result = compute_behavioral_scorecard(metrics, FINANCIAL_HEALTH)
+
+    assert result['behavioral_score'] == pytest.approx(round(10 * (15 + 16 + 12) / 0.6, 2))
+    assert set(result['metadata']['weights']) == {'cashflow_margin', 'stability', 'volatility'}
+    assert result['concentration_risk_score'] == 50.0
+
+
+def test_batch_matches_single_scoring():
+    rows = [
+        (100000.0, 10000.0, 0.8, 0.2, 0),
+        (50000.0, -20000.0, 0.3, 0.7, 2),
+        (0.0, -500.0, None, None, 1),
+    ]
+    scores, levels = compute_cashflow_scorecard_batch(*map(list, zip(*rows)))
+
+    for (inflow, net, stability, volatility, flags), score, level in zip(rows, scores, levels):
+        single = compute_behavioral_scorecard(
+            {
+                'cashflow_metrics': {'total_inflow': inflow, 'net_cashflow': net},
+                'stability_score': stability,
+                'red_flags_detected': ['flag'] * flags,
+            },
+            {'volatility_score': volatility}
+        )
+        assert (score, level) == (single['behavioral_score'], single['risk_level'])
+
+
+@pytest.mark.parametrize('score, level', [(700, 'low'), (699.9, 'medium'), (550, 'medium'), (400, 'high'), (399, 'critical')])
+def test_risk_bands(score, level):
+    assert risk_level_for(score) == level
+
+
+def test_escalation_band_widens_with_low_confidence():
+    cutoffs = policy_score_cutoffs([
+        {'eligibility_criteria': {'min_behavioral_score': 600}},
+        {'eligibility_criteria': {'min_behavioral_score': 500}},
+        {'eligibility_criteria': {}},
+    ])
+
+    assert cutoffs == [500.0, 600.0]
+    assert escalation_decision(590, 1.0, cutoffs, band=20)['escalate']
+    assert not escalation_decision(630, 1.0, cutoffs, band=20)['escalate']
+    assert escalation_decision(630, 0.0, cutoffs, band=20)['escalate']
+    assert not escalation_decision(630, 1.0, [], band=20)['escalate']
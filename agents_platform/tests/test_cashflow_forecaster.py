@@ -0,0 +1,80 @@
+"""
+Tests for the monthly net cashflow forecaster.
+"""
+
+import pytest
+
+from agents_platform.tools.cashflow_forecaster import (
+    forecast_cashflow,
+    forecast_cashflow_batch,
+)
+
+
+def test_seasonal_series_repeats_the_last_cycle():
+    result = forecast_cashflow_batch({
+        's': {
+            'series': [1, 2, 3, 1, 2, 4, 1, 2, 3],
+            'last_month': '2024-12',
+            'seasonality': {'seasonal': True, 'period': 3},
+        }
+    }, horizons=(3, 6))['s']
+
+    assert result['method'] == 'seasonal_naive'
+    assert result['period'] == 3
+    assert [m['month'] for m in result['monthly_forecast'][:3]] == ['2025-01', '2025-02', '2025-03']
+    assert [m['expected'] for m in result['monthly_forecast']] == [1.0, 2.0, 3.0] * 2
+    assert result['horizons']['6m']['expected'] == 12.0
+
+
+def test_non_seasonal_series_is_smoothed_to_a_level():
+    result = forecast_cashflow_batch({
+        'c': {'series': [1000.0] * 6, 'last_month': '2024-06'}
+    }, horizons=(3,))['c']
+
+    assert result['method'] == 'exponential_smoothing'
+    assert result['sigma'] == 0.0
+    assert result['horizons']['3m'] == {
+        'expected': 3000.0, 'lower': 3000.0, 'upper': 3000.0, 'avg_monthly': 1000.0
+    }
+
+
+def test_short_history_falls_back_to_the_mean():
+    result = forecast_cashflow_batch({
+        'x': {'series': [4.0, 6.0], 'last_month': '2024-01'}
+    }, horizons=(3,))['x']
+
+    assert result['method'] == 'insufficient_history'
+    assert result['months_of_history'] == 2
+    assert result['horizons']['3m']['avg_monthly'] == 5.0
+
+
+def test_band_brackets_the_forecast_and_widens_with_horizon():
+    series = [1000, -400, 2500, 300, 1800, -900, 700, 1200]
+    horizons = forecast_cashflow_batch({
+        'n': {'series': series, 'last_month': '2024-08'}
+    })['n']['horizons']
+
+    widths = []
+    for key in ('3m', '6m', '12m'):
+        band = horizons[key]
+        assert band['lower'] <= band['expected'] <= band['upper']
+        widths.append(band['upper'] - band['lower'])
+    assert widths[0] < widths[1] < widths[2]
+
+
+def test_single_forecast_matches_batch():
+    monthly = {
+        '2024-01': {'credits': 500, 'debits': 200},
+        '2024-02': {'credits': 300, 'debits': 400},
+        '2024-04': {'credits': 900, 'debits': 100},
+        '2024-05': {'credits': 600, 'debits': 600},
+    }
+    single = forecast_cashflow(monthly)
+    batch = forecast_cashflow_batch({
+        'm': {'series': [300.0, -100.0, 0.0, 800.0, 0.0], 'last_month': '2024-05'}
+    })['m']
+
+    assert single['method'] == batch['method'] == 'exponential_smoothing'
+    for key, band in batch['horizons'].items():
+        assert single['horizons'][key]['expected'] == pytest.approx(band['expected'])
+        assert single['horizons'][key]['upper'] == pytest.approx(band['upper'])
@@ -0,0 +1,75 @@
+"""
+Tests for cheque return linking.
+"""
+
+from agents_platform.tools.cheque_returns import link_cheque_returns
+
+
+def test_bounce_is_linked_to_original_and_charge(make_tx):
+    result = link_cheque_returns([
+        make_tx('2024-03-01', -15000, 'CHQ PAID 123456 ABC SUPPLIERS'),
+        make_tx('2024-03-03', 15000, 'I/W CHQ RTN 123456 INSUFFICIENT FUNDS'),
+        make_tx('2024-03-03', -590, 'CHQ RTN CHGS 123456'),
+    ])
+
+    assert len(result['events']) == 1
+    event = result['events'][0]
+    assert event['direction'] == 'inward'
+    assert event['cheque_number'] == '123456'
+    assert event['original_date'] == '2024-03-01'
+    assert event['reason'] == 'insufficient_funds'
+    assert event['charge_total'] == 590
+    assert result['unlinked_returns'] == 0
+
+
+def test_generic_return_and_fee_narrations_are_not_bounces(make_tx):
+    result = link_cheque_returns([
+        make_tx('2024-03-05', -1500, 'GST Return Filing Fee'),
+        make_tx('2024-03-06', 20000, 'Sales return refund from ABC'),
+        make_tx('2024-03-07', -5000, 'Income tax return consultant'),
+        make_tx('2024-03-08', -250, 'Annual maintenance charges'),
+        make_tx('2024-03-09', -150, 'Return charges'),
+    ])
+
+    assert result['events'] == []
+    assert result['unlinked_returns'] == 0
+
+
+def test_generic_rows_do_not_add_events_next_to_a_real_bounce(make_tx):
+    result = link_cheque_returns([
+        make_tx('2024-03-01', -15000, 'CHQ PAID 123456 ABC SUPPLIERS'),
+        make_tx('2024-03-03', 15000, 'I/W CHQ RTN 123456 INSUFFICIENT FUNDS'),
+        make_tx('2024-03-04', -1500, 'GST Return Filing Fee'),
+        make_tx('2024-03-05', 20000, 'Sales return refund from ABC'),
+        make_tx('2024-03-06', -5000, 'Income tax return consultant'),
+    ])
+
+    assert len(result['events']) == 1
+    assert result['events'][0]['charges'] == []
+
+
+def test_nach_return_and_explicit_charge_form_one_event(make_tx):
+    result = link_cheque_returns([
+        make_tx('2024-03-08', -25000, 'NACH RETURN BAJAJ FINANCE'),
+        make_tx('2024-03-08', -500, 'ECS RETURN CHARGES'),
+    ])
+
+    assert len(result['events']) == 1
+    assert result['events'][0]['charge_total'] == 500
+
+
+def test_explicit_return_charge_alone_is_a_bounce(make_tx):
+    result = link_cheque_returns([make_tx('2024-03-08', -590, 'I/W CHQ RETURN CHARGES 654321')])
+
+    assert len(result['events']) == 1
+    assert result['events'][0]['direction'] == 'inward'
+
+
+def test_return_word_linked_to_a_cheque_counts(make_tx):
+    result = link_cheque_returns([
+        make_tx('2024-03-01', 8000, 'CHQ DEP 222333 XYZ TRADERS'),
+        make_tx('2024-03-04', -8000, 'RETURNED 222333'),
+    ])
+
+    assert len(result['events']) == 1
+    assert result['events'][0]['direction'] == 'outward'
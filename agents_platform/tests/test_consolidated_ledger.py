@@ -0,0 +1,41 @@
+"""
+Tests for the consolidated ledger.
+"""
+
+from agents_platform.tools.consolidated_ledger import build_consolidated_ledger, ensure_consolidated_ledger
+
+
+def test_accounts_are_merged_with_running_balances(make_tx):
+    ledger = build_consolidated_ledger([
+        make_tx('2024-03-01', 100, account_id='A1', balance=1100),
+        make_tx('2024-03-03', -50, account_id='A1', balance=1050),
+        make_tx('2024-03-02', 200, account_id='A2', balance=700),
+    ])
+
+    assert [tx['date'] for tx in ledger] == ['2024-03-01', '2024-03-02', '2024-03-03']
+    assert [tx['account_balance'] for tx in ledger] == [1100, 700, 1050]
+    assert [tx['consolidated_balance'] for tx in ledger] == [1600, 1800, 1750]
+
+
+def test_caller_rows_are_not_mutated(make_tx):
+    rows = [make_tx('2024-03-01', 100, account_id='A1', balance=1100)]
+
+    build_consolidated_ledger(rows)
+
+    assert 'consolidated_balance' not in rows[0]
+
+
+def test_partially_consolidated_rows_are_rebuilt(make_tx):
+    ledger = build_consolidated_ledger([make_tx('2024-03-01', 100, account_id='A1', balance=1100)])
+    mixed = ledger + [make_tx('2024-03-02', -100, account_id='A1', balance=1000)]
+
+    result = ensure_consolidated_ledger(mixed)
+
+    assert result is not mixed
+    assert [tx['consolidated_balance'] for tx in result] == [1100, 1000]
+
+
+def test_consolidated_rows_are_returned_as_is(make_tx):
+    ledger = build_consolidated_ledger([make_tx('2024-03-01', 100, account_id='A1', balance=1100)])
+
+    assert ensure_consolidated_ledger(ledger) is ledger
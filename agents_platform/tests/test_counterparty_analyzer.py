@@ -0,0 +1,94 @@
+"""
+Tests for counterparty extraction and concentration.
+"""
+
+import pytest
+
+from agents_platform.tools.counterparty_analyzer import (
+    UNATTRIBUTED_KEY,
+    CounterpartyIndexStore,
+    build_counterparty_index,
+    compute_concentration,
+    extract_counterparty,
+    is_trading_flow,
+)
+
+
+@pytest.mark.parametrize('description, expected', [
+    ('Customer Payment - ABC Retail', 'abc retail'),
+    ('UPI/412345678901/ACME TRADERS/acme@okhdfc/Payment', 'acme traders'),
+    ('NEFT-HDFC0001234-XYZ SUPPLIERS LTD-N012345678901', 'xyz suppliers ltd'),
+    ('Customer Payment', None),
+])
+def test_extract_counterparty(description, expected):
+    assert extract_counterparty({'description': description}) == expected
+
+
+def test_structured_counterparty_wins():
+    assert extract_counterparty({'description': 'NEFT 123456789012', 'counterparty': 'Acme Traders Pvt. Ltd.'}) == 'acme traders pvt. ltd.'
+
+
+@pytest.mark.parametrize('tx', [
+    {'description': 'SALARY MARCH', 'amount': -30000},
+    {'description': 'ATM WDL 1234', 'amount': -5000},
+    {'description': 'Shop rent April', 'amount': -12000},
+    {'description': 'Customer Payment - ABC Retail', 'amount': 5000, 'internal_transfer': True},
+])
+def test_non_trading_flows_are_excluded(tx):
+    assert not is_trading_flow(tx)
+
+
+TRANSACTIONS = [
+    {'description': 'Customer Payment - ABC Retail', 'amount': 60000},
+    {'description': 'Customer Payment - XYZ Stores', 'amount': 20000},
+    {'description': 'Customer Payment', 'amount': 20000},
+    {'description': 'Supplier Payment - Steel Co', 'amount': -50000},
+    {'description': 'SALARY MARCH', 'amount': -30000},
+]
+
+
+def test_unattributed_flows_stay_out_of_the_hhi():
+    index = build_counterparty_index(TRANSACTIONS)
+    concentration = compute_concentration(index)
+
+    assert index[UNATTRIBUTED_KEY]['inflow'] == 20000
+    assert concentration['customers']['hhi'] == pytest.approx(0.75 ** 2 + 0.25 ** 2)
+    assert concentration['top_customers'][0] == {'name': 'abc retail', 'share': 0.75}
+    assert concentration['unattributed_share'] == {'inflow': 0.2, 'outflow': 0.0}
+    assert concentration['suppliers']['counterparties'] == 1
+    assert concentration['concentration_risk_score'] == pytest.approx(100 * (0.7 * 0.625 + 0.3 * 1.0))
+
+
+def test_mostly_unattributed_inflow_has_no_risk_score():
+    index = build_counterparty_index([
+        {'description': 'Customer Payment - ABC Retail', 'amount': 10000},
+        {'description': 'Customer Payment', 'amount': 30000},
+    ])
+
+    assert compute_concentration(index)['concentration_risk_score'] is None
+
+
+def test_store_ingests_each_transaction_once(analytics_conn):
+    store = CounterpartyIndexStore(conn=analytics_conn)
+    rows = [dict(tx, date='2024-03-01') for tx in TRANSACTIONS]
+
+    store.ingest('M1', rows)
+    store.ingest('M1', rows)
+
+    assert store.concentration('M1')['top_customers'][0] == {'name': 'abc retail', 'share': 0.75}
+
+
+def test_exposure_shares_match_concentration(analytics_conn):
+    store = CounterpartyIndexStore(conn=analytics_conn)
+    store.ingest('M1', [dict(tx, date='2024-03-01') for tx in TRANSACTIONS])
+    store.ingest('M2', [
+        {'date': '2024-03-01', 'description': 'Customer Payment - ABC Retail', 'amount': 10000},
+        {'date': '2024-03-02', 'description': 'Customer Payment', 'amount': 90000},
+    ])
+
+    exposure = {row['msme_id']: row for row in store.exposure('ABC Retail')}
+    concentration = store.concentration('M1')
+
+    assert exposure['M1']['inflow_share'] == pytest.approx(concentration['top_customers'][0]['share'])
+    assert exposure['M1']['inflow_share'] == pytest.approx(0.75)
+    assert exposure['M2']['inflow_share'] == pytest.approx(1.0)
@@ -0,0 +1,47 @@
+"""
+Tests for creditworthiness components and portfolio re-ranking.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from agents_platform.tools.creditworthiness import (
+    CreditworthinessStore,
+    combine_components,
+    creditworthiness_components,
+)
+
+
+WEIGHTS = {'financial_health': 0.3, 'behavioral': 0.4, 'policy_match': 0.3}
+
+
+def test_components_scale_each_input_to_0_100():
+    components = creditworthiness_components(
+        {'net_cashflow': 50000, 'cashflow_stability_score': 0.5, 'volatility_score': 0.5},
+        {'behavioral_score': 720},
+        {'best_fit_products': [{'eligible': True}, {'eligible': False}], 'total_products_evaluated': 4}
+    )
+
+    assert components == pytest.approx({'financial_health': 50.0, 'behavioral': 72.0, 'policy_match': 25.0})
+    assert combine_components(components, WEIGHTS) == 51.3
+
+
+def test_combined_score_is_clamped():
+    assert combine_components({'financial_health': 100, 'behavioral': 100, 'policy_match': 100}, {'behavioral': 2}) == 100
+    assert combine_components({'behavioral': 50}, {'financial_health': 1}) == 0
+
+
+def test_rerank_applies_new_weights_to_each_msmes_latest_report(analytics_conn):
+    store = CreditworthinessStore(conn=analytics_conn)
+    store.save('r1', 'M1', {'financial_health': 90, 'behavioral': 40, 'policy_match': 50}, 58.0, datetime(2024, 1, 1))
+    store.save('r2', 'M1', {'financial_health': 80, 'behavioral': 50, 'policy_match': 50}, 59.0, datetime(2024, 6, 1))
+    store.save('r3', 'M2', {'financial_health': 30, 'behavioral': 90, 'policy_match': 50}, 60.0, datetime(2024, 6, 1))
+
+    by_behavior = store.rerank({'behavioral': 1.0})
+    assert [(r['rank'], r['report_id'], r['score']) for r in by_behavior] == [(1, 'r3', 90.0), (2, 'r2', 50.0)]
+    assert by_behavior[1]['previous_score'] == 59.0
+
+    by_health = store.rerank({'financial_health': 1.0}, latest_only=False, limit=2)
+    assert [r['report_id'] for r in by_health] == ['r1', 'r2']
+    assert [r['report_id'] for r in store.rerank(WEIGHTS, msme_ids=['M2'])] == ['r3']
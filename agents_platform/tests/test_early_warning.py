@@ -0,0 +1,103 @@
+"""
+Tests for incremental early-warning monitoring.
+"""
+
+import threading
+
+from agents_platform.core.analytics_db import get_analytics_connection
+from agents_platform.tools.cheque_returns import classify_bounce_entry
+from agents_platform.tools.early_warning import EarlyWarningEngine
+
+
+BOUNCE_RULES = [{'rule_id': 'bounce_30d', 'type': 'cheque_bounce', 'window_days': 30, 'severity': 'high'}]
+
+
+def test_classify_bounce_entry_ignores_generic_returns_and_credits(make_tx):
+    assert classify_bounce_entry(make_tx('2024-03-03', 15000, 'I/W CHQ RTN 123456 INSUFFICIENT FUNDS')) == 'return'
+    assert classify_bounce_entry(make_tx('2024-03-08', -25000, 'NACH RETURN BAJAJ FINANCE')) == 'return'
+    assert classify_bounce_entry(make_tx('2024-03-08', -500, 'ECS RETURN CHARGES')) == 'charge'
+    assert classify_bounce_entry(make_tx('2024-03-09', 500, 'ECS RETURN CHARGES REVERSAL')) is None
+    assert classify_bounce_entry(make_tx('2024-03-05', -1500, 'GST Return Filing Fee')) is None
+    assert classify_bounce_entry(make_tx('2024-03-06', 20000, 'Sales return refund from ABC')) is None
+    assert classify_bounce_entry(make_tx('2024-03-07', -5000, 'Income tax return consultant')) is None
+
+
+def test_first_ingestion_builds_baseline_without_alerts(make_tx, analytics_conn):
+    engine = EarlyWarningEngine(conn=analytics_conn, rules=BOUNCE_RULES)
+    alerts = engine.ingest('M1', [make_tx('2024-03-03', 15000, 'I/W CHQ RTN 123456 INSUFFICIENT FUNDS')])
+
+    assert alerts == []
+    assert engine.state('M1') is not None
+
+
+def test_bounce_raises_one_alert_with_its_charge(make_tx, analytics_conn):
+    engine = EarlyWarningEngine(conn=analytics_conn, rules=BOUNCE_RULES)
+    engine.ingest('M1', [make_tx('2024-03-01', 50000, 'NEFT ACME LTD')])
+
+    alerts = engine.ingest('M1', [
+        make_tx('2024-03-10', 15000, 'I/W CHQ RTN 123456 INSUFFICIENT FUNDS'),
+        make_tx('2024-03-10', -590, 'CHQ RTN CHGS 123456'),
+    ])
+
+    assert [alert['rule_id'] for alert in alerts] == ['bounce_30d']
+
+
+def test_generic_return_narrations_raise_no_alerts(make_tx, analytics_conn):
+    engine = EarlyWarningEngine(conn=analytics_conn, rules=BOUNCE_RULES)
+    engine.ingest('M1', [make_tx('2024-03-01', 50000, 'NEFT ACME LTD')])
+
+    alerts = engine.ingest('M1', [
+        make_tx('2024-03-05', -1500, 'GST Return Filing Fee'),
+        make_tx('2024-03-06', 20000, 'Sales return refund from ABC'),
+        make_tx('2024-03-07', -5000, 'Income tax return consultant'),
+    ])
+
+    assert alerts == []
+
+
+def test_resending_a_statement_raises_no_duplicate_alerts(make_tx, analytics_conn):
+    engine = EarlyWarningEngine(conn=analytics_conn, rules=BOUNCE_RULES)
+    engine.ingest('M1', [make_tx('2024-03-01', 50000, 'NEFT ACME LTD')])
+    batch = [make_tx('2024-03-10', -25000, 'NACH RETURN BAJAJ FINANCE')]
+
+    assert len(engine.ingest('M1', batch)) == 1
+    assert engine.ingest('M1', batch) == []
+    assert len(engine.alerts(msme_ids=['M1'])) == 1
+
+
+def test_balance_below_needs_consecutive_days(make_tx, analytics_conn):
+    rules = [{'rule_id': 'low_balance', 'type': 'balance_below', 'threshold': 10000, 'days': 3}]
+    engine = EarlyWarningEngine(conn=analytics_conn, rules=rules)
+    engine.ingest('M1', [make_tx('2024-03-01', 50000, 'NEFT ACME LTD', balance=50000)])
+
+    alerts = engine.ingest('M1', [
+        make_tx('2024-03-02', -45000, 'NEFT SUPPLIER', balance=5000),
+        make_tx('2024-03-03', -500, 'UPI TEA STALL', balance=4500),
+    ])
+    assert alerts == []
+
+    alerts = engine.ingest('M1', [make_tx('2024-03-04', -500, 'UPI TEA STALL', balance=4000)])
+    assert [alert['rule_id'] for alert in alerts] == ['low_balance']
+
+
+def test_engines_sharing_a_database_do_not_lose_updates(make_tx, tmp_path):
+    path = str(tmp_path / 'analytics.db')
+    EarlyWarningEngine(conn=get_analytics_connection(path), rules=BOUNCE_RULES).ingest(
+        'M1', [make_tx('2024-03-01', 1000, 'NEFT ACME LTD')]
+    )
+    engines = [EarlyWarningEngine(conn=get_analytics_connection(path), rules=BOUNCE_RULES) for _ in range(8)]
+    barrier = threading.Barrier(len(engines))
+
+    def ingest(i, engine):
+        barrier.wait()
+        engine.ingest('M1', [make_tx('2024-03-02', 1000, f'NEFT CUSTOMER {i}')])
+
+    threads = [threading.Thread(target=ingest, args=(i, engine)) for i, engine in enumerate(engines)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert engines[0].state('M1')['months']['2024-03'] == 9000
+    for engine in engines:
+        engine.conn.close()
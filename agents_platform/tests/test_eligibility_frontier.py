@@ -0,0 +1,77 @@
+"""
+Tests for the what-if eligibility frontier.
+"""
+
+from agents_platform.tools.eligibility_frontier import compute_eligibility_frontier, compute_eligibility_frontiers
+
+
+PRODUCT = {
+    'product_id': 'wc_001',
+    'product_name': 'Quick Working Capital Loan',
+    'lender_name': 'FastLend Finance',
+    'eligibility_criteria': {
+        'min_net_cashflow': 10000,
+        'min_behavioral_score': 500,
+        'max_volatility': 0.7,
+        'min_stability_score': 0.4,
+        'max_red_flags': 2
+    },
+    'risk_buckets': {
+        'low': {'behavioral_score': [700], 'volatility': 0.3},
+        'medium': {'behavioral_score': [500, 700], 'volatility': [0.3, 0.6]},
+        'high': {'behavioral_score': [400, 500], 'volatility': [0.6, 0.8]}
+    },
+    'interest_rate_range': {'low': 12.0, 'medium': 15.0, 'high': 18.0}
+}
+
+
+def _metrics(**overrides):
+    metrics = {'net_cashflow': 50000, 'behavioral_score': 650, 'volatility': 0.5, 'stability': 0.6, 'red_flags': 0}
+    metrics.update(overrides)
+    return metrics
+
+
+def _bucket(frontier, name):
+    return next(b for b in frontier['better_buckets'] if b['risk_bucket'] == name)
+
+
+def test_unmet_criteria_report_their_gap():
+    frontier = compute_eligibility_frontier(PRODUCT, _metrics(net_cashflow=4000, volatility=0.75), risk_bucket='high')
+
+    assert not frontier['eligible']
+    assert frontier['to_eligible']['net_cashflow'] == {'current': 4000, 'required': 10000, 'change': 6000}
+    assert frontier['to_eligible']['volatility']['change'] == -0.05
+    assert set(frontier['to_eligible']) == {'net_cashflow', 'volatility'}
+
+
+def test_better_buckets_only_suggest_risk_reducing_moves():
+    frontier = compute_eligibility_frontier(PRODUCT, _metrics(behavioral_score=650, volatility=0.1), risk_bucket='high')
+
+    low, medium = _bucket(frontier, 'low'), _bucket(frontier, 'medium')
+    assert low['changes'] == {'behavioral_score': {'current': 650, 'required': 700, 'change': 50}}
+    assert low['note'] is None
+    # Volatility below the medium range is not a target to raise it
+    assert medium['changes'] == {}
+    assert 'bucket classification' in medium['note']
+
+
+def test_score_above_a_range_is_not_lowered():
+    frontier = compute_eligibility_frontier(PRODUCT, _metrics(behavioral_score=720, volatility=0.7), risk_bucket='high')
+
+    medium = _bucket(frontier, 'medium')
+    assert medium['changes'] == {'volatility': {'current': 0.7, 'required': 0.6, 'change': -0.1}}
+    assert medium['note'].startswith('Behavioral score')
+
+
+def test_only_lower_risk_buckets_are_listed():
+    frontier = compute_eligibility_frontier(PRODUCT, _metrics(), risk_bucket='medium')
+
+    assert [b['risk_bucket'] for b in frontier['better_buckets']] == ['low']
+
+
+def test_frontiers_put_eligible_products_first():
+    strict = {**PRODUCT, 'product_id': 'strict', 'eligibility_criteria': {'min_net_cashflow': 10 ** 7}}
+    frontiers = compute_eligibility_frontiers([strict, PRODUCT], _metrics(), risk_buckets={'wc_001': 'medium'})
+
+    assert [f['product_id'] for f in frontiers] == ['wc_001', 'strict']
+    assert frontiers[0]['eligible'] and frontiers[0]['risk_bucket'] == 'medium'
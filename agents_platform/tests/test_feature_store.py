@@ -0,0 +1,88 @@
+"""
+Tests for the per-MSME feature store.
+"""
+
+from agents_platform.tools.feature_store import FEATURE_VERSION, FeatureStore, build_feature_vector
+
+
+HEALTH = {
+    'total_inflow': 500000.0,
+    'total_outflow': 420000.0,
+    'net_cashflow': 80000.0,
+    'average_balance': 120000.0,
+    'cashflow_stability_score': 0.8,
+    'volatility_score': 0.2,
+    'transaction_count': 40,
+    'period_end': '2024-06-30'
+}
+
+
+def _vector(msme_id, as_of, net_cashflow=80000.0, sector='Textiles'):
+    return build_feature_vector(
+        msme_id,
+        {**HEALTH, 'net_cashflow': net_cashflow},
+        red_flags=['Cheque bounces detected'],
+        as_of=as_of,
+        msme_profile={'sector': sector, 'msme_type': 'small'}
+    )
+
+
+def test_vector_takes_counts_from_the_health_analysis():
+    vector = build_feature_vector(
+        'M1', HEALTH,
+        health_analysis={
+            'emi_transactions': 6,
+            'cheque_bounces': 1,
+            'gst_analysis': {'total_filings': 4, 'compliance_rate': 75.0}
+        },
+        red_flags=[]
+    )
+
+    assert vector.version == FEATURE_VERSION
+    assert vector.as_of == '2024-06-30'
+    assert (vector.emi_count, vector.cheque_bounces, vector.gst_filings) == (6, 1, 4)
+    assert vector.gst_compliance_rate == 75.0
+    assert vector.sector is None
+
+
+def test_round_trip_and_point_lookup_as_of(analytics_conn):
+    store = FeatureStore(conn=analytics_conn)
+    assert store.put([_vector('M1', '2024-03-31', 10.0), _vector('M1', '2024-06-30', 20.0)]) == 2
+
+    latest = store.get('M1')
+    assert latest == _vector('M1', '2024-06-30', 20.0).model_copy(update={'computed_at': latest.computed_at})
+    assert store.get('M1', as_of='2024-05-15').net_cashflow == 10.0
+    assert store.get('M1', as_of='2024-01-01') is None
+    assert [v.as_of for v in store.history('M1')] == ['2024-03-31', '2024-06-30']
+
+
+def test_put_replaces_a_vector_with_the_same_key(analytics_conn):
+    store = FeatureStore(conn=analytics_conn)
+    store.put([_vector('M1', '2024-06-30', 10.0)])
+    store.put([_vector('M1', '2024-06-30', 30.0)])
+
+    assert [v.net_cashflow for v in store.history('M1')] == [30.0]
+
+
+def test_scan_and_profiles_read_each_msmes_latest_vector(analytics_conn):
+    store = FeatureStore(conn=analytics_conn)
+    store.put([
+        _vector('M1', '2024-03-31', 10.0, sector='Textiles'),
+        _vector('M1', '2024-06-30', 20.0, sector='Apparel'),
+        _vector('M2', '2024-06-30', 5.0, sector='Food'),
+    ])
+
+    assert {msme_id: v.net_cashflow for msme_id, v in store.scan().items()} == {'M1': 20.0, 'M2': 5.0}
+    assert set(store.scan(msme_ids=['M2'])) == {'M2'}
+    assert store.profiles(as_of='2024-04-30') == {
+        'M1': {'sector': 'Textiles', 'msme_type': 'small', 'red_flags': ['Cheque bounces detected']}
+    }
+
+
+def test_other_versions_are_never_mixed_in(analytics_conn):
+    store = FeatureStore(conn=analytics_conn)
+    store.put([_vector('M1', '2024-06-30').model_copy(update={'version': FEATURE_VERSION - 1})])
+
+    assert store.get('M1') is None
+    assert store.scan() == {}
+    assert store.get('M1', version=FEATURE_VERSION - 1).sector == 'Textiles'
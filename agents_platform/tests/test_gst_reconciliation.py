@@ -0,0 +1,75 @@
+"""
+Tests for GST-to-bank reconciliation.
+"""
+
+import pytest
+
+from agents_platform.tools.gst_reconciliation import (
+    monthly_bank_credits,
+    reconcile_gst_with_bank,
+    reconcile_gst_with_bank_batch,
+)
+
+
+FILINGS = [
+    {'period': '2024-01', 'total_sales': 100000, 'output_tax': 18000},
+    {'period': '2024-02', 'total_sales': 100000, 'output_tax': 18000},
+    {'period': '2024-03', 'total_sales': 100000, 'output_tax': 18000},
+    {'period': '2024-04', 'total_sales': 0, 'output_tax': 0, 'nil_return': True},
+    {'period': '2024-05', 'total_sales': 50000, 'output_tax': 9000},
+]
+CREDITS = {'2024-01': 118000, '2024-02': 60000, '2024-03': 200000, '2024-04': 5000, '2024-06': 7000}
+
+
+def test_bank_credits_leave_out_transfers_and_financing(make_tx):
+    credits = monthly_bank_credits([
+        make_tx('2024-01-03', 50000, 'NEFT CUSTOMER', category='operating'),
+        make_tx('2024-01-09', 20000, 'OWN ACCOUNT', category='operating', internal_transfer=True),
+        make_tx('2024-01-12', 300000, 'TERM LOAN DISBURSAL', category='financing'),
+        make_tx('2024-02-01', 7000, 'UPI CUSTOMER', category='operating'),
+        make_tx('2024-02-02', -9000, 'NEFT SUPPLIER', category='operating'),
+    ])
+
+    assert credits == {'2024-01': 50000, '2024-02': 7000}
+
+
+def test_periods_are_flagged_against_the_coverage_band():
+    result = reconcile_gst_with_bank(FILINGS, CREDITS)
+
+    flags = {row['period']: row['flag'] for row in result['periods']}
+    assert flags == {
+        '2024-01': None,
+        '2024-02': 'bank_shortfall',
+        '2024-03': 'bank_excess',
+        '2024-04': 'nil_return_with_credits',
+        '2024-05': 'bank_shortfall',
+        '2024-06': 'no_gst_filing',
+    }
+    assert result['gst_only_periods'] == ['2024-05']
+    assert result['bank_only_periods'] == ['2024-06']
+    assert result['matched_periods'] == 4
+    assert result['overall_coverage'] == pytest.approx(378000 / 413000)
+    assert result['reconciliation_score'] == 25.0
+    assert result['flagged']
+
+
+def test_output_tax_can_be_left_out():
+    result = reconcile_gst_with_bank_batch(
+        {'m': {'gst_filings': FILINGS[:1], 'monthly_credits': {'2024-01': 118000}}},
+        include_output_tax=False
+    )['m']
+
+    assert result['periods'][0]['coverage_ratio'] == pytest.approx(1.18)
+    assert not result['flagged']
+
+
+def test_batch_keeps_msmes_apart():
+    results = reconcile_gst_with_bank_batch({
+        'A': {'gst_filings': FILINGS, 'monthly_credits': CREDITS},
+        'B': {'gst_filings': FILINGS[:1], 'monthly_credits': {'2024-01': 118000}},
+        'C': {'gst_filings': [], 'monthly_credits': {}},
+    })
+
+    assert results['A'] == reconcile_gst_with_bank(FILINGS, CREDITS)
+    assert results['B']['reconciliation_score'] == 100.0
+    assert results['C']['periods'] == [] and results['C']['overall_coverage'] is None
@@ -0,0 +1,37 @@
+"""
+Tests for narration parsing.
+"""
+
+import pytest
+
+from agents_platform.tools.narration_parser import parse_narration
+
+
+@pytest.mark.parametrize('narration, channel, reference', [
+    ('UPI/412345678901/ACME TRADERS/acme@okhdfc/Payment', 'upi', '412345678901'),
+    ('NEFT-HDFC0001234-ACME LTD-N012345678901', 'neft', 'N012345678901'),
+    ('BY TRANSFER-NEFT-ACME LTD', 'neft', None),
+    ('TO TRANSFER/IMPS/412345678901/RAVI KUMAR', 'imps', '412345678901'),
+    ('ACH D- BAJAJ FINANCE LTD-UMRN HDFC7000000012345678', 'nach', 'HDFC7000000012345678'),
+    ('CHQ DEP 123456 ABC RETAIL', 'cheque', '123456'),
+    ('I/W CHQ RTN 123456 INSUFFICIENT FUNDS', 'cheque', '123456'),
+    ('ABC RETAIL CHEQUE NO 654321', 'cheque', '654321'),
+    ('INWARD CLEARING 112233 CLG', 'cheque', '112233'),
+])
+def test_channel_and_reference(narration, channel, reference):
+    parsed = parse_narration(narration)
+
+    assert parsed.channel == channel
+    assert parsed.reference == reference
+
+
+@pytest.mark.parametrize('narration', [
+    'To check balance fee',
+    'Clearing house subscription',
+])
+def test_cheque_words_in_ordinary_text_are_not_a_channel(narration):
+    assert parse_narration(narration).channel is None
+
+
+def test_transfer_prefix_does_not_become_the_counterparty():
+    assert parse_narration('BY TRANSFER-NEFT-ACME LTD').counterparty == 'ACME LTD'
@@ -0,0 +1,98 @@
+"""
+Tests for narrative templating and reuse.
+"""
+
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from agents_platform.core.base_agent import BaseAgent
+from agents_platform.tools.narrative_index import (
+    NarrativeIndex,
+    NarrativeReuseMixin,
+    fill_template,
+    has_untemplated_numbers,
+    to_template,
+)
+
+
+VALUES = {'business_name': 'Acme Traders', 'total_inflow': 1234567.0, 'behavioral_score': 712.0}
+NEW_VALUES = {'business_name': 'Zen Foods', 'total_inflow': 987654.0, 'behavioral_score': 655.0}
+
+
+def test_template_round_trip_quotes_the_new_profile():
+    narrative = {'summary': 'Acme Traders received ₹12,34,567 with a behavioral score of 712.'}
+
+    template = to_template(narrative, VALUES)
+
+    assert 'Acme' not in template['summary'] and '712' not in template['summary']
+    assert fill_template(template, NEW_VALUES) == {
+        'summary': 'Zen Foods received ₹9,87,654 with a behavioral score of 655.'
+    }
+
+
+def test_western_grouping_and_lists_are_templated():
+    template = to_template({'strengths': ['Inflow of 1,234,567.00 over the period']}, VALUES)
+
+    assert fill_template(template, NEW_VALUES) == {'strengths': ['Inflow of 987,654.00 over the period']}
+
+
+def test_shared_renderings_are_left_alone():
+    template = to_template({'summary': 'Score 700 and balance 700'}, {'behavioral_score': 700.0, 'average_balance': 700.0})
+
+    assert template == {'summary': 'Score 700 and balance 700'}
+
+
+def test_fill_template_needs_every_value():
+    template = to_template({'summary': 'Score 712'}, VALUES)
+
+    assert fill_template(template, {'business_name': 'Zen Foods'}) is None
+
+
+def test_numbers_that_are_not_profile_values_are_detected():
+    template = to_template({'summary': 'Acme Traders pays 3 EMIs of 15,000; avg monthly inflow 82,305'}, VALUES)
+
+    assert has_untemplated_numbers(template)
+    assert has_untemplated_numbers({'confidence': 0.8})
+    assert not has_untemplated_numbers(to_template({'summary': 'Score 712 for Acme Traders'}, VALUES))
+
+
+def _profile(values, vector=(0.5, 0.5)):
+    return {'agent': 'explainability', 'partition': 'p', 'vector': vector, 'values': values}
+
+
+def test_index_reuses_only_fully_templated_narratives(analytics_conn):
+    index = NarrativeIndex(conn=analytics_conn)
+
+    index.add(_profile(VALUES), {'summary': 'Acme Traders has a margin of 12.5%'})
+    assert index.lookup(_profile(NEW_VALUES, (0.51, 0.5)), max_distance=0.05) is None
+
+    index.add(_profile(VALUES), {'summary': 'Acme Traders scores 712', 'metadata': {'engine': 'gemini'}})
+    match = index.lookup(_profile(NEW_VALUES, (0.51, 0.5)), max_distance=0.05)
+    assert match['narrative'] == {'summary': 'Zen Foods scores 655'}
+    assert index.lookup(_profile(NEW_VALUES, (0.9, 0.9)), max_distance=0.05) is None
+
+
+class _Summary(BaseModel):
+    summary: str
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class _SummaryAgent(NarrativeReuseMixin, BaseAgent):
+    NARRATIVE_MODEL = _Summary
+
+    def run(self, input_data, context=None):
+        raise NotImplementedError
+
+
+def test_mixin_reuses_narratives_through_the_report_model(analytics_conn):
+    agent = _SummaryAgent(name="SummaryAgent")
+    agent._narrative_index = NarrativeIndex(conn=analytics_conn)
+
+    assert agent._reuse_narrative(_profile(NEW_VALUES)) is None
+    agent._remember_narrative(_profile(VALUES), {'summary': 'Acme Traders scores 712'}, {'msme_id': 'M1'})
+    output = agent._reuse_narrative(_profile(NEW_VALUES, (0.5, 0.51)))
+
+    assert output.success and output.metadata['narrative_reused']
+    assert output.data['summary'] == 'Zen Foods scores 655'
+    assert output.data['metadata']['reused_from'] == 'M1'
@@ -0,0 +1,34 @@
+"""
+Tests for the portfolio batch metrics engine.
+"""
+
+from agents_platform.core.config import settings
+from agents_platform.tools.portfolio_metrics import compute_portfolio_metrics
+
+
+def _statement(make_tx, rows):
+    return {'bank_accounts': [{
+        'account_id': 'A1',
+        'transactions': [make_tx(date, amount, 'NEFT ACME LTD', balance=balance) for date, amount, balance in rows]
+    }]}
+
+
+def test_low_balance_curve_defaults_to_the_configured_thresholds(make_tx):
+    results, errors = compute_portfolio_metrics({'M1': _statement(make_tx, [
+        ('2024-01-01', 1000, 30000),
+        ('2024-01-02', -20000, 10000),
+        ('2024-01-03', -5000, 5000),
+    ])})
+
+    curve = results['M1']['health_analysis']['low_balance_curve']
+    assert errors == {}
+    assert list(curve) == [str(int(threshold)) for threshold in settings.LOW_BALANCE_THRESHOLDS]
+
+
+def test_explicit_thresholds_win(make_tx):
+    results, _ = compute_portfolio_metrics(
+        {'M1': _statement(make_tx, [('2024-01-01', 1000, 30000)])},
+        low_balance_thresholds=[40000]
+    )
+
+    assert results['M1']['health_analysis']['low_balance_curve'] == {'40000': 1}
@@ -0,0 +1,89 @@
+"""
+Tests for stratified preview scoring.
+"""
+
+from agents_platform.tools.data_parser import extract_transactions_from_json
+from agents_platform.tools.preview_scoring import (
+    compute_preview_score,
+    estimate_totals,
+    stratified_sample,
+)
+
+
+def _statement(rows_per_month=40, months=6):
+    accounts = []
+    for account_id in ('BA001', 'BA002'):
+        transactions = []
+        for month in range(1, months + 1):
+            for day in range(rows_per_month):
+                amount = 1000.0 + 10 * day if day % 2 else -(500.0 + 5 * day)
+                transactions.append({
+                    'date': f"2024-{month:02d}-{day % 28 + 1:02d}",
+                    'amount': amount,
+                    'description': 'SALE' if amount > 0 else 'PURCHASE'
+                })
+        accounts.append({'account_id': account_id, 'transactions': transactions})
+    return {'bank_accounts': accounts}
+
+
+def _mean_amount_score(data, transactions):
+    mean = sum(float(tx['amount']) for tx in transactions) / len(transactions)
+    return {'behavioral_score': max(0.0, min(1000.0, mean)), 'risk_level': 'low'}
+
+
+def test_sample_keeps_every_account_month_and_is_reproducible():
+    data = _statement()
+
+    drawn = stratified_sample(data, sample_size=96, groups=3, seed=7)
+
+    assert drawn['population'] == 480
+    assert drawn['strata'] == 12
+    assert drawn['sampled'] == 96
+    months = {
+        (account['account_id'], tx['date'][:7])
+        for account in drawn['sample']['bank_accounts']
+        for tx in account['transactions']
+    }
+    assert len(months) == 12
+    assert sum(
+        len(account['transactions']) for group in drawn['groups'] for account in group['bank_accounts']
+    ) == 96
+    assert stratified_sample(data, sample_size=96, seed=7)['sample'] == drawn['sample']
+
+
+def test_weighted_totals_of_a_full_sample_are_the_statement_totals():
+    data = _statement(rows_per_month=10, months=2)
+    drawn = stratified_sample(data, sample_size=1000)
+    transactions = extract_transactions_from_json(drawn['sample'])
+
+    totals = estimate_totals(transactions, drawn['weights'])
+
+    inflow = sum(tx['amount'] for tx in transactions if tx['amount'] > 0)
+    outflow = -sum(tx['amount'] for tx in transactions if tx['amount'] < 0)
+    assert totals == {
+        'total_inflow': round(inflow, 2),
+        'total_outflow': round(outflow, 2),
+        'net_cashflow': round(inflow - outflow, 2)
+    }
+
+
+def test_sampled_preview_has_bounds_around_the_sample_score():
+    preview = compute_preview_score(_statement(), _mean_amount_score, sample_size=120, time_budget_ms=10000)
+
+    assert not preview['exact']
+    assert preview['sample']['groups_scored'] == 5
+    assert preview['bounds']['lower'] <= preview['score']['behavioral_score'] <= preview['bounds']['upper']
+    assert preview['standard_error'] > 0
+
+
+def test_small_statements_are_scored_exactly():
+    data = _statement()
+    full = _mean_amount_score(data, extract_transactions_from_json(data))['behavioral_score']
+
+    preview = compute_preview_score(data, _mean_amount_score, sample_size=120, exact_max_rows=500)
+
+    assert preview['exact']
+    assert preview['sample']['sampled'] == 480
+    assert preview['score']['behavioral_score'] == full
+    assert preview['bounds']['lower'] == preview['bounds']['upper'] == round(full, 2)
+    assert preview['standard_error'] == 0.0
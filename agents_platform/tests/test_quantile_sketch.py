@@ -0,0 +1,90 @@
+"""
+Tests for mergeable quantile sketches.
+"""
+
+import json
+import random
+import statistics
+
+from agents_platform.tools.quantile_sketch import (
+    QuantileSketch,
+    QuantileSketchStore,
+    merge_sketches,
+    summarize_quantiles,
+)
+
+
+def _rank_error(values, estimate, q):
+    ordered = sorted(values)
+    rank = sum(1 for value in ordered if value <= estimate) / len(ordered)
+    return abs(rank - q)
+
+
+def test_exact_mode_median_matches_statistics_median():
+    rng = random.Random(3)
+    for n in (1, 2, 7, 100, 2048):
+        values = [rng.uniform(-1000, 1000) for _ in range(n)]
+        sketch = QuantileSketch().extend(values)
+        assert sketch.exact
+        assert sketch.quantile(0.5) == statistics.median(values)
+
+
+def test_compacted_sketch_stays_within_rank_error():
+    rng = random.Random(11)
+    values = [rng.lognormvariate(10, 1) for _ in range(50000)]
+
+    sketch = QuantileSketch().extend(values)
+
+    assert not sketch.exact
+    assert sum(len(items) for items in sketch.levels) < 1000
+    for q, estimate in sketch.quantiles((0.1, 0.5, 0.9)).items():
+        assert _rank_error(values, estimate, q) < 0.005
+    assert (sketch.min, sketch.max) == (min(values), max(values))
+
+
+def test_merged_sketches_match_a_sketch_of_all_values():
+    rng = random.Random(5)
+    parts = [[rng.gauss(50000, 20000) for _ in range(8000)] for _ in range(4)]
+    values = [value for part in parts for value in part]
+
+    merged = merge_sketches(QuantileSketch().extend(part) for part in parts)
+
+    assert merged.n == len(values)
+    for q, estimate in merged.quantiles((0.1, 0.5, 0.9)).items():
+        assert _rank_error(values, estimate, q) < 0.005
+
+
+def test_small_exact_sketches_merge_exactly():
+    merged = QuantileSketch().extend([1, 2, 3]).merge(QuantileSketch().extend([4, 5]))
+
+    assert merged.exact
+    assert summarize_quantiles([1, 2, 3, 4, 5]) == merged.summary()
+
+
+def test_json_round_trip_keeps_the_sketch():
+    sketch = QuantileSketch(k=64).extend(random.Random(2).random() for _ in range(10000))
+
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert restored.summary() == sketch.summary()
+    restored.update(0.5)
+    sketch.update(0.5)
+    assert restored.to_dict() == sketch.to_dict()
+
+
+def test_store_ingest_is_idempotent(make_tx, analytics_conn):
+    store = QuantileSketchStore(conn=analytics_conn)
+    statement = [
+        make_tx('2024-01-05', 1000, 'NEFT A', account_id='BA1', balance=11000),
+        make_tx('2024-01-06', -400, 'NEFT B', account_id='BA1', balance=10600),
+        make_tx('2024-01-07', 3000, 'NEFT C', account_id='BA2', balance=3000),
+    ]
+
+    assert store.ingest('M1', statement) == 3
+    assert store.ingest('M1', statement) == 0
+    assert store.ingest('M1', statement + [make_tx('2024-01-08', 2000, 'NEFT D', account_id='BA1')]) == 1
+
+    credits = store.get('credit_amount', msme_ids=['M1'])
+    assert credits.n == 3 and credits.quantile(0.5) == 2000
+    assert store.get('balance', account_ids=['BA1']).summary()['count'] == 2
+    assert store.get('debit_amount').quantile(0.5) == 400
@@ -0,0 +1,84 @@
+"""
+Tests for recurring payment detection and FOIR.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from agents_platform.tools.recurring_payments import (
+    analyze_recurring_obligations,
+    compute_repayment_pattern_score,
+    detect_recurring_payments,
+    is_emi_transaction,
+)
+
+
+@pytest.fixture
+def emi_series(make_tx):
+    """Monthly EMI due on the 5th, April missed and June paid late."""
+    return [
+        make_tx(f'2024-{month:02d}-{day:02d}', -25000, 'NACH DR BAJAJ FINANCE EMI')
+        for month, day in ((1, 5), (2, 5), (3, 5), (5, 5), (6, 14), (7, 5))
+    ]
+
+
+def test_is_emi_transaction(make_tx):
+    assert is_emi_transaction(make_tx('2024-01-05', -25000, 'ACH D- TP ACH HDFC BANK'))
+    assert is_emi_transaction(make_tx('2024-01-05', -25000, 'PAYMENT', type='emi'))
+    assert not is_emi_transaction(make_tx('2024-01-05', 25000, 'LOAN DISBURSAL'))
+    assert not is_emi_transaction(make_tx('2024-01-05', -25000, 'NEFT SUPPLIER'))
+
+
+def test_monthly_emi_with_missed_and_late_instances(emi_series):
+    [obligation] = detect_recurring_payments(emi_series)
+
+    assert obligation['frequency'] == 'monthly' and obligation['is_emi']
+    assert obligation['expected_day'] == 5
+    assert obligation['missed_periods'] == ['2024-04']
+    assert obligation['late_dates'] == ['2024-06-14']
+    assert obligation['on_time_ratio'] == pytest.approx(5 / 7)
+
+
+def test_weekly_series_and_amount_clusters(make_tx):
+    wages = [
+        make_tx((date(2024, 1, 1) + timedelta(days=7 * week)).isoformat(), -8000, 'UPI/RAMESH KUMAR/WAGES')
+        for week in (0, 1, 2, 4, 5)
+    ]
+    landlord = [
+        make_tx(f'2024-{month:02d}-{day:02d}', amount, f'NEFT/SHREE PROPERTIES/{label}')
+        for month in range(1, 7)
+        for day, amount, label in ((1, -40000, 'RENT'), (10, -12000, 'MAINT'))
+    ]
+    noise = [make_tx('2024-02-11', -300, 'POS CAFE'), make_tx('2024-03-19', -4500, 'POS CAFE')]
+
+    obligations = detect_recurring_payments(wages + landlord + noise)
+
+    assert [(o['counterparty'], o['amount']) for o in obligations] == [
+        ('shree properties', 40000.0), ('ramesh kumar', 8000.0), ('shree properties', 12000.0)
+    ]
+    weekly = obligations[1]
+    assert weekly['frequency'] == 'weekly'
+    assert weekly['monthly_amount'] == pytest.approx(8000 * 52 / 12)
+    assert weekly['missed_periods'] == ['2024-01-22']
+
+
+def test_foir_and_repayment_score(emi_series, make_tx):
+    rent = [make_tx(f'2024-{month:02d}-01', -40000, 'NEFT/SHREE PROPERTIES/RENT') for month in range(1, 7)]
+
+    result = analyze_recurring_obligations(emi_series + rent, {'2024-01': 100000, '2024-02': 100000, '2024-03': 0})
+
+    assert result['emi_obligations'] == 1
+    assert result['monthly_emi'] == 25000
+    assert result['monthly_recurring_outflow'] == 65000
+    assert result['foir'] == 0.25
+    assert result['repayment_pattern_score'] == pytest.approx(100 * 5 / 7, abs=0.01)
+
+
+def test_repayment_score_needs_an_emi():
+    assert compute_repayment_pattern_score([]) is None
+    assert compute_repayment_pattern_score([
+        {'is_emi': True, 'on_time_ratio': 1.0, 'monthly_amount': 30000},
+        {'is_emi': True, 'on_time_ratio': 0.5, 'monthly_amount': 10000},
+        {'is_emi': False, 'on_time_ratio': 0.0, 'monthly_amount': 90000},
+    ]) == 87.5
@@ -0,0 +1,59 @@
+"""
+Tests for the autocorrelation-based seasonality detector.
+"""
+
+import random
+
+from agents_platform.tools.seasonality_detector import (
+    detect_seasonality,
+    detect_seasonality_batch,
+    monthly_net_series,
+)
+
+
+def _noise(seed, n=36):
+    rng = random.Random(seed)
+    return [rng.gauss(0, 1000) for _ in range(n)]
+
+
+def test_monthly_net_series_fills_silent_months():
+    assert monthly_net_series({
+        '2024-01': {'credits': 10, 'debits': 4},
+        '2024-03': {'credits': 1, 'debits': 3},
+    }) == [6.0, 0.0, -2.0]
+
+
+def test_quarterly_cycle_on_a_trend_is_detected():
+    series = [[100, -50, -50][i % 3] * 1000 + 200 * i for i in range(36)]
+
+    result = detect_seasonality_batch({'q': series})['q']
+
+    assert result['seasonal']
+    assert result['period'] == 3
+    assert result['p_value'] < 0.05
+
+
+def test_annual_peak_is_detected_through_noise():
+    series = [(12000 if i % 12 in (9, 10) else 0) + value for i, value in enumerate(_noise(7))]
+
+    result = detect_seasonality_batch({'a': series})['a']
+
+    assert result['seasonal'] and result['period'] == 12
+
+
+def test_noise_and_trends_are_not_seasonal():
+    results = detect_seasonality_batch({
+        'noise': _noise(7),
+        'trend': [5.0 + i for i in range(24)],
+        'short': [1.0, 2.0, 3.0],
+    })
+
+    assert not any(result['seasonal'] for result in results.values())
+    assert results['trend']['period'] is None
+    assert results['short']['months'] == 3
+
+
+def test_single_detection_matches_the_batch():
+    monthly = {f"2024-{m:02d}": {'credits': 1000.0 * (m % 3 == 0), 'debits': 100.0} for m in range(1, 13)}
+
+    assert detect_seasonality(monthly) == detect_seasonality_batch({'x': monthly_net_series(monthly)})['x']
@@ -0,0 +1,91 @@
+"""
+Tests for running-balance verification of statements.
+"""
+
+import pytest
+
+from agents_platform.tools.statement_integrity import check_balance_continuity
+
+
+@pytest.fixture
+def statement(make_tx):
+    """Six consistent rows on BA1 split over two pages."""
+    def build():
+        rows, balance = [], 0.0
+        for day, amount in enumerate((10000, 500, -200, 1000, -3000, 700), start=1):
+            balance += amount
+            rows.append(make_tx(
+                f'2024-01-{day:02d}', amount, f'ROW {day}', account_id='BA1', balance=balance, page=1 + (day > 3)
+            ))
+        return rows
+    return build
+
+
+def test_consistent_statement_is_verified(statement):
+    result = check_balance_continuity(statement())
+
+    assert result['status'] == 'verified'
+    assert result['integrity_score'] == 100.0
+    assert result['rows_checked'] == 5
+    assert result['breaks'] == []
+
+
+def test_edited_balance_fails_the_statement(statement):
+    rows = statement()
+    rows[2]['balance_after'] += 500
+
+    result = check_balance_continuity(rows)
+
+    assert result['status'] == 'failed'
+    assert result['edited_rows'] == 1 and result['break_count'] == 1
+    assert result['breaks'][0]['position'] == 2
+    assert result['breaks'][0]['discrepancy'] == 500
+
+
+def test_dropped_rows_are_gaps_or_missing_pages(statement):
+    rows = statement()
+    within_page = rows[:1] + rows[2:]
+    across_pages = rows[:2] + rows[3:]
+
+    gap = check_balance_continuity(within_page)
+    missing_page = check_balance_continuity(across_pages)
+
+    assert gap['status'] == 'warnings' and gap['gaps'] == 1
+    assert gap['breaks'][0]['expected_balance'] == 9800 and gap['breaks'][0]['reported_balance'] == 10300
+    assert missing_page['missing_pages'] == 1 and missing_page['gaps'] == 0
+
+
+def test_newest_first_statement_is_checked_in_reverse(statement):
+    result = check_balance_continuity(statement()[::-1])
+
+    assert result['status'] == 'verified'
+    assert result['accounts'][0]['order'] == 'reverse'
+
+
+def test_accounts_are_checked_separately(statement, make_tx):
+    rows = statement() + [
+        make_tx('2024-01-02', 100, 'OTHER', account_id='BA2', balance=100),
+        make_tx('2024-01-03', 50, 'OTHER', account_id='BA2', balance=150),
+    ]
+
+    result = check_balance_continuity(rows)
+
+    assert result['status'] == 'verified'
+    assert [a['account_id'] for a in result['accounts']] == ['BA1', 'BA2']
+
+
+def test_statement_without_balances_is_unverifiable(make_tx):
+    result = check_balance_continuity([make_tx('2024-01-01', 100), make_tx('2024-01-02', -50)])
+
+    assert result['status'] == 'unverifiable'
+    assert result['integrity_score'] is None
+    assert result['rows_without_balance'] == 2
+
+
+def test_listed_breaks_are_capped(make_tx):
+    rows = [make_tx(f'2024-01-{day:02d}', 100, account_id='BA1', balance=1000.0 * day) for day in range(1, 12)]
+
+    result = check_balance_continuity(rows, max_breaks=3)
+
+    assert result['break_count'] == 10
+    assert len(result['breaks']) == 3 and result['truncated']
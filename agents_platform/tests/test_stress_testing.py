@@ -0,0 +1,76 @@
+"""
+Tests for portfolio stress scenarios.
+"""
+
+import pytest
+
+from agents_platform.tools.aggregate_cube import AggregateCube
+from agents_platform.tools.feature_store import FeatureStore, build_feature_vector
+from agents_platform.tools.stress_testing import build_stress_frame, load_stress_frame, run_stress_scenarios
+
+
+POLICIES = [{'product_id': 'WC', 'eligibility_criteria': {'min_net_cashflow': 0}}]
+
+
+@pytest.fixture
+def frame(make_tx, analytics_conn):
+    cube = AggregateCube(conn=analytics_conn)
+    store = FeatureStore(conn=analytics_conn)
+    for msme_id, sector in (('M1', 'Textiles'), ('M2', 'Food')):
+        cube.ingest(msme_id, [
+            tx
+            for month in range(1, 7)
+            for tx in (
+                make_tx(f'2024-{month:02d}-05', 100000, f'NEFT CUSTOMER {month}'),
+                make_tx(f'2024-{month:02d}-20', -80000, f'NEFT SUPPLIER {month}'),
+            )
+        ])
+        store.put([build_feature_vector(
+            msme_id, {'period_end': '2024-06-30'}, msme_profile={'sector': sector, 'msme_type': 'micro'}
+        )])
+    return load_stress_frame(cube, store)
+
+
+def test_frame_carries_profiles_and_only_non_cashflow_red_flags():
+    frame = build_stress_frame(
+        [('M1', '2024-01', 10.0, 5.0), ('M1', '2024-02', 20.0, 5.0), ('M2', '2024-01', 1.0, 2.0)],
+        {'M1': {'sector': 'Textiles', 'red_flags': ['Sustained negative cashflow', 'Cheque bounces detected']}}
+    )
+
+    assert frame['msme_ids'] == ['M1', 'M2']
+    assert frame['sectors'] == ['Textiles', None]
+    assert frame['months'] == [['2024-01', '2024-02'], ['2024-01']]
+    assert frame['fixed_red_flags'] == [['Cheque bounces detected'], []]
+
+
+def test_sector_scenario_shocks_only_its_sector(frame):
+    assert frame['sectors'] == ['Textiles', 'Food']
+
+    result = run_stress_scenarios(frame, [
+        {'name': 'textiles slump', 'inflow_change': -0.3, 'sectors': ['textiles']}
+    ], POLICIES)['scenarios'][0]
+
+    assert result['msme_count'] == 1
+    assert result['net_cashflow'] == {'baseline': 120000.0, 'stressed': -60000.0}
+    assert result['eligibility']['WC'] == {'baseline': 1, 'stressed': 0, 'lost': 1, 'gained': 0}
+    assert [m['msme_id'] for m in result['most_affected']] == ['M1']
+    assert result['most_affected'][0]['lost_products'] == ['WC']
+
+
+def test_zero_shock_leaves_every_borrower_unchanged(frame):
+    result = run_stress_scenarios(frame, [{'name': 'flat'}], POLICIES)
+
+    assert result['baseline']['eligible'] == {'WC': 2}
+    scenario = result['scenarios'][0]
+    assert scenario['msme_count'] == 2
+    assert scenario['unchanged'] == 2 and scenario['downgraded'] == 0
+    assert scenario['average_score']['baseline'] == scenario['average_score']['stressed']
+    assert scenario['most_affected'] == []
+
+
+def test_shock_months_limit_the_shock_to_the_latest_months(frame):
+    result = run_stress_scenarios(frame, [
+        {'name': 'recent', 'inflow_change': -0.5, 'shock_months': 2, 'msme_ids': ['M2']}
+    ], POLICIES)['scenarios'][0]
+
+    assert result['net_cashflow'] == {'baseline': 120000.0, 'stressed': 20000.0}
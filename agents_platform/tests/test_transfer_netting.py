@@ -0,0 +1,53 @@
+"""
+Tests for netting transfers between own accounts.
+"""
+
+from agents_platform.tools.transfer_netting import net_internal_transfers, transfer_evidence
+
+
+def test_evidenced_pair_is_excluded(make_tx):
+    result = net_internal_transfers([
+        make_tx('2024-03-01', -50000, 'TRF TO OWN A/C XX2222', account_id='50100012341111'),
+        make_tx('2024-03-02', 50000, 'TRF FROM OWN A/C XX1111', account_id='50100012342222'),
+        make_tx('2024-03-03', 12000, 'NEFT ACME LTD', account_id='50100012341111'),
+    ])
+
+    assert [tx['description'] for tx in result] == ['NEFT ACME LTD']
+
+
+def test_equal_amounts_without_evidence_are_tagged_and_kept(make_tx):
+    result = net_internal_transfers([
+        make_tx('2024-03-01', -25000, 'NEFT TO XYZ SUPPLIERS', account_id='A1'),
+        make_tx('2024-03-02', 25000, 'UPI/412345678901/RETAIL CUSTOMER/cust@okaxis', account_id='A2'),
+    ])
+
+    assert len(result) == 2
+    assert all(not tx['internal_transfer'] for tx in result)
+    assert all(tx['transfer_evidence'] is None for tx in result)
+    assert result[0]['transfer_pair_id'] == result[1]['transfer_pair_id']
+
+
+def test_matching_reference_is_evidence(make_tx):
+    debit = make_tx('2024-03-01', -25000, 'IMPS/412345678901/ACME', account_id='A1')
+    credit = make_tx('2024-03-01', 25000, 'IMPS/412345678901/ACME', account_id='A2')
+
+    assert transfer_evidence(debit, credit) == 'reference'
+
+
+def test_evidenced_credit_is_preferred_within_the_window(make_tx):
+    result = net_internal_transfers([
+        make_tx('2024-03-01', -10000, 'NEFT TO SHARMA', account_id='A1'),
+        make_tx('2024-03-01', 10000, 'UPI/412345678901/CUSTOMER/cust@okaxis', account_id='A2'),
+        make_tx('2024-03-02', 10000, 'BY SELF', account_id='A2'),
+    ])
+
+    assert [tx['description'] for tx in result] == ['UPI/412345678901/CUSTOMER/cust@okaxis']
+
+
+def test_single_account_is_never_netted(make_tx):
+    result = net_internal_transfers([
+        make_tx('2024-03-01', -10000, 'SELF', account_id='A1'),
+        make_tx('2024-03-01', 10000, 'SELF', account_id='A1'),
+    ])
+
+    assert len(result) == 2
@@ -0,0 +1,76 @@
+"""
+Tests for prefix-sum trailing-window metrics.
+"""
+
+import statistics
+
+import pytest
+
+from agents_platform.tools.health_calculator import compute_cashflow_volatility
+from agents_platform.tools.window_metrics import (
+    WINDOW_CRITERION_PATTERN,
+    build_monthly_prefix,
+    compute_window_metrics,
+    month_range,
+    window_metrics,
+)
+
+
+INFLOW = {'2023-11': 90000, '2023-12': 120000, '2024-01': 80000, '2024-02': 100000, '2024-03': 110000}
+OUTFLOW = {'2023-11': 70000, '2023-12': 60000, '2024-01': 95000, '2024-02': 70000, '2024-03': 50000}
+
+
+def test_month_range_crosses_year_boundaries():
+    assert month_range('2023-11', '2024-02') == ['2023-11', '2023-12', '2024-01', '2024-02']
+    assert month_range('2024-03', '2024-02') == []
+
+
+def test_windows_match_direct_computation():
+    prefix = build_monthly_prefix(INFLOW, OUTFLOW)
+    months = sorted(INFLOW)
+    for n in (2, 3, 5):
+        window = months[-n:]
+        inflows = [INFLOW[m] for m in window]
+        nets = [INFLOW[m] - OUTFLOW[m] for m in window]
+
+        metrics = window_metrics(prefix, n)
+
+        assert metrics['start_month'] == window[0] and metrics['months'] == n
+        assert metrics['net_cashflow'] == sum(nets)
+        assert metrics['total_outflow'] == sum(OUTFLOW[m] for m in window)
+        assert metrics['volatility'] == pytest.approx(min(1.0, abs(statistics.stdev(nets) / statistics.mean(nets)) / 2))
+        assert metrics['stability'] == pytest.approx(1 / (1 + statistics.stdev(inflows) / statistics.mean(inflows)))
+
+
+def test_full_history_volatility_matches_the_health_calculator():
+    metrics = compute_window_metrics(INFLOW, OUTFLOW)
+
+    assert set(metrics) == {'3m', '6m', '12m', 'all'}
+    assert metrics['all']['volatility'] == pytest.approx(compute_cashflow_volatility(INFLOW, OUTFLOW))
+    assert metrics['12m'] == metrics['all']
+
+
+def test_as_of_cuts_the_window_and_counts_silent_months():
+    prefix = build_monthly_prefix(INFLOW, OUTFLOW)
+
+    backdated = window_metrics(prefix, 2, as_of='2024-01-15')
+    assert (backdated['start_month'], backdated['end_month']) == ('2023-12', '2024-01')
+    assert backdated['net_cashflow'] == 60000 - 15000
+
+    later = window_metrics(prefix, 3, as_of='2024-05')
+    assert (later['start_month'], later['end_month']) == ('2024-03', '2024-05')
+    assert later['net_cashflow'] == 60000
+    assert later['avg_monthly_net_cashflow'] == 20000
+
+
+def test_empty_window_is_neutral():
+    metrics = window_metrics(build_monthly_prefix(INFLOW, OUTFLOW), 3, as_of='2023-06')
+
+    assert metrics['months'] == 0
+    assert (metrics['volatility'], metrics['stability']) == (0.5, 0.0)
+
+
+def test_window_criterion_pattern():
+    assert WINDOW_CRITERION_PATTERN.match('min_net_cashflow_3m').groups() == ('min', 'net_cashflow', '3')
+    assert WINDOW_CRITERION_PATTERN.match('max_volatility_12m').groups() == ('max', 'volatility', '12')
+    assert WINDOW_CRITERION_PATTERN.match('min_net_cashflow') is None
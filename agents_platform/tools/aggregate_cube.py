@@ -0,0 +1,276 @@
+"""
+Tools for maintaining a persisted MSME x month x category aggregate cube.
+
+Charts and cross-MSME comparisons read monthly inflow/outflow/count/balance
+figures from the cube instead of re-scanning raw transactions. The cube is
+updated incrementally at ingestion; transactions already counted for an MSME
+(identified by their content hash in the shared ingestion ledger) are
+skipped, so re-analysing the same statement does not double count.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+import sqlite3
+import logging
+
+from .data_parser import parse_date, transaction_key
+from .transaction_categorizer import categorize_transaction
+from .consolidated_ledger import ensure_consolidated_ledger
+from ..core.analytics_db import (
+    get_analytics_connection,
+    ensure_ingestion_ledger,
+    filter_unseen_keys,
+    record_seen_keys
+)
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS monthly_aggregates (
+    msme_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    inflow REAL NOT NULL DEFAULT 0,
+    outflow REAL NOT NULL DEFAULT 0,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    min_balance REAL,
+    balance_sum REAL NOT NULL DEFAULT 0,
+    balance_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (msme_id, month, category)
+);
+CREATE INDEX IF NOT EXISTS idx_monthly_aggregates_month ON monthly_aggregates (month);
+"""
+
+_UPSERT = """
+INSERT INTO monthly_aggregates
+    (msme_id, month, category, inflow, outflow, tx_count, min_balance, balance_sum, balance_count)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (msme_id, month, category) DO UPDATE SET
+    inflow = inflow + excluded.inflow,
+    outflow = outflow + excluded.outflow,
+    tx_count = tx_count + excluded.tx_count,
+    min_balance = CASE
+        WHEN min_balance IS NULL THEN excluded.min_balance
+        WHEN excluded.min_balance IS NULL THEN min_balance
+        ELSE MIN(min_balance, excluded.min_balance)
+    END,
+    balance_sum = balance_sum + excluded.balance_sum,
+    balance_count = balance_count + excluded.balance_count
+"""
+
+
+class AggregateCube:
+    """
+    SQLite-backed aggregate cube keyed by (msme_id, month, category).
+    """
+
+    CONSUMER = "aggregate_cube"
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the cube.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+        ensure_ingestion_ledger(self.conn)
+
+    def ingest(self, msme_id: str, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Fold new transactions into the cube.
+
+        Balance figures use the consolidated balance across accounts.
+
+        Args:
+            msme_id: MSME identifier
+            transactions: Transactions to ingest (categorized or raw)
+
+        Returns:
+            Number of transactions newly added to the cube
+        """
+        if not transactions:
+            return 0
+
+        keyed = {transaction_key(tx): tx for tx in ensure_consolidated_ledger(transactions)}
+        unseen = filter_unseen_keys(self.conn, self.CONSUMER, msme_id, list(keyed.keys()))
+
+        cells = defaultdict(lambda: {
+            'inflow': 0.0,
+            'outflow': 0.0,
+            'tx_count': 0,
+            'min_balance': None,
+            'balance_sum': 0.0,
+            'balance_count': 0
+        })
+        new_keys = []
+        for key, tx in keyed.items():
+            if key not in unseen:
+                continue
+            new_keys.append(key)
+
+            date = parse_date(tx.get('date'))
+            month_key = f"{date.year}-{date.month:02d}"
+            category = tx.get('category') or categorize_transaction(tx)[1].value
+            cell = cells[(month_key, category)]
+
+            amount = float(tx.get('amount', 0))
+            if amount > 0:
+                cell['inflow'] += amount
+            else:
+                cell['outflow'] += abs(amount)
+            cell['tx_count'] += 1
+
+            balance = tx['consolidated_balance']
+            if balance is not None:
+                cell['balance_sum'] += balance
+                cell['balance_count'] += 1
+                if cell['min_balance'] is None or balance < cell['min_balance']:
+                    cell['min_balance'] = balance
+
+        if not new_keys:
+            return 0
+
+        with self.conn:
+            self.conn.executemany(
+                _UPSERT,
+                [
+                    (
+                        msme_id, month_key, category,
+                        cell['inflow'], cell['outflow'], cell['tx_count'],
+                        cell['min_balance'], cell['balance_sum'], cell['balance_count']
+                    )
+                    for (month_key, category), cell in cells.items()
+                ]
+            )
+            record_seen_keys(self.conn, self.CONSUMER, msme_id, new_keys)
+
+        logger.info(f"Aggregate cube: ingested {len(new_keys)} transactions for {msme_id}")
+        return len(new_keys)
+
+    @staticmethod
+    def _where(
+        msme_ids: Optional[List[str]],
+        start_month: Optional[str],
+        end_month: Optional[str],
+        categories: Optional[List[str]] = None
+    ) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters of a cube filter."""
+        conditions = []
+        params: List[Any] = []
+        if msme_ids:
+            conditions.append(f"msme_id IN ({','.join('?' * len(msme_ids))})")
+            params.extend(msme_ids)
+        if start_month:
+            conditions.append("month >= ?")
+            params.append(start_month)
+        if end_month:
+            conditions.append("month <= ?")
+            params.append(end_month)
+        if categories:
+            conditions.append(f"category IN ({','.join('?' * len(categories))})")
+            params.extend(categories)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def query(
+        self,
+        msme_ids: Optional[List[str]] = None,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        rollup_categories: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Query cube cells by MSME, month range (inclusive, "YYYY-MM") and category.
+
+        Args:
+            msme_ids: Optional MSME filter
+            start_month: Optional first month
+            end_month: Optional last month
+            categories: Optional category filter
+            rollup_categories: If True, sum over categories per (msme_id, month)
+
+        Returns:
+            List of cells with inflow, outflow, net_cashflow, tx_count, min_balance and avg_balance
+        """
+        where, params = self._where(msme_ids, start_month, end_month, categories)
+
+        if rollup_categories:
+            sql = (
+                "SELECT msme_id, month, 'all' AS category, SUM(inflow) AS inflow, SUM(outflow) AS outflow, "
+                "SUM(tx_count) AS tx_count, MIN(min_balance) AS min_balance, "
+                "SUM(balance_sum) AS balance_sum, SUM(balance_count) AS balance_count "
+                f"FROM monthly_aggregates {where} GROUP BY msme_id, month ORDER BY msme_id, month"
+            )
+        else:
+            sql = (
+                "SELECT msme_id, month, category, inflow, outflow, tx_count, min_balance, balance_sum, balance_count "
+                f"FROM monthly_aggregates {where} ORDER BY msme_id, month, category"
+            )
+
+        cells = []
+        for row in self.conn.execute(sql, params).fetchall():
+            cells.append({
+                'msme_id': row['msme_id'],
+                'month': row['month'],
+                'category': row['category'],
+                'inflow': row['inflow'],
+                'outflow': row['outflow'],
+                'net_cashflow': row['inflow'] - row['outflow'],
+                'tx_count': row['tx_count'],
+                'min_balance': row['min_balance'],
+                'avg_balance': row['balance_sum'] / row['balance_count'] if row['balance_count'] else None
+            })
+        return cells
+
+    def monthly_totals(
+        self,
+        msme_ids: Optional[List[str]] = None,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None
+    ) -> List[Tuple[str, str, float, float]]:
+        """
+        Get monthly inflow/outflow summed over categories as plain tuples, for bulk readers.
+
+        Args:
+            msme_ids: Optional MSME filter
+            start_month: Optional first month
+            end_month: Optional last month
+
+        Returns:
+            (msme_id, month, inflow, outflow) rows ordered by msme_id and month
+        """
+        where, params = self._where(msme_ids, start_month, end_month)
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(
+            "SELECT msme_id, month, SUM(inflow), SUM(outflow) "
+            f"FROM monthly_aggregates {where} GROUP BY msme_id, month ORDER BY msme_id, month",
+            params
+        ).fetchall()
+
+    def monthly_series(
+        self,
+        msme_id: str,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Get one MSME's monthly inflow/outflow in the same shape as compute_monthly_cashflow.
+
+        Args:
+            msme_id: MSME identifier
+            start_month: Optional first month
+            end_month: Optional last month
+
+        Returns:
+            Dictionary with 'inflow' and 'outflow' keys, each containing month->amount mapping
+        """
+        cells = self.query([msme_id], start_month, end_month, rollup_categories=True)
+        return {
+            'inflow': {cell['month']: cell['inflow'] for cell in cells},
+            'outflow': {cell['month']: cell['outflow'] for cell in cells}
+        }
@@ -7,6 +7,9 @@ from datetime import datetime
 import statistics
 import logging
 
+from .data_parser import transaction_ref
+from .consolidated_ledger import ensure_consolidated_ledger
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +21,9 @@ def detect_anomalies(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]
         transactions: List of transactions
         
     Returns:
-        List of anomaly dictionaries with type, description, and severity
+        List of anomaly dictionaries with type, description, and severity.
+        Transactions are referenced by 'transaction_ref' (resolvable through
+        the transaction store) plus the fields needed for display.
     """
     anomalies = []
     
@@ -42,71 +47,106 @@ def detect_anomalies(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]
                 'type': 'outlier_transaction',
                 'description': f"Unusually large transaction: {amount:,.2f}",
                 'severity': 'high' if amount > threshold * 2 else 'medium',
-                'transaction': tx,
+                'transaction_ref': transaction_ref(tx),
+                'account_id': tx.get('account_id'),
+                'amount': float(tx.get('amount', 0)),
+                'narration': str(tx.get('description', ''))[:80],
                 'date': tx.get('date')
             })
     
-    # Detect rapid balance changes
-    balances = [(parse_date(tx.get('date')), float(tx.get('balance_after', 0))) 
-                for tx in transactions if tx.get('balance_after') is not None]
-    balances.sort(key=lambda x: x[0])
-    
-    if len(balances) > 1:
-        for i in range(1, len(balances)):
-            prev_balance = balances[i-1][1]
-            curr_balance = balances[i][1]
-            change_pct = abs((curr_balance - prev_balance) / prev_balance) if prev_balance != 0 else 0
-            
-            if change_pct > 0.5:  # More than 50% change
-                anomalies.append({
-                    'type': 'rapid_balance_change',
-                    'description': f"Rapid balance change: {change_pct*100:.1f}%",
-                    'severity': 'medium',
-                    'date': balances[i][0],
-                    'previous_balance': prev_balance,
-                    'current_balance': curr_balance
-                })
+    # Detect rapid balance changes, comparing each account only with its own running balance
+    ledger = sorted(ensure_consolidated_ledger(transactions), key=lambda tx: parse_date(tx.get('date')))
+    last_balance = {}
+    for tx in ledger:
+        curr_balance = tx['account_balance']
+        if curr_balance is None:
+            continue
+        account_id = tx.get('account_id') or ''
+        prev_balance = last_balance.get(account_id)
+        last_balance[account_id] = curr_balance
+        if prev_balance is None:
+            continue
+        change_pct = abs((curr_balance - prev_balance) / prev_balance) if prev_balance != 0 else 0
+        
+        if change_pct > 0.5:  # More than 50% change
+            anomalies.append({
+                'type': 'rapid_balance_change',
+                'description': f"Rapid balance change: {change_pct*100:.1f}%",
+                'severity': 'medium',
+                'date': parse_date(tx.get('date')),
+                'transaction_ref': transaction_ref(tx),
+                'account_id': tx.get('account_id'),
+                'previous_balance': prev_balance,
+                'current_balance': curr_balance
+            })
     
     return anomalies
 
 
-def detect_red_flags(transactions: List[Dict[str, Any]], financial_health: Dict[str, Any]) -> List[str]:
+# Red flags that follow from the cashflow metrics alone
+CASHFLOW_RED_FLAGS = (
+    "Sustained negative cashflow",
+    "Extremely high cashflow volatility",
+    "Very low cashflow stability"
+)
+
+
+def detect_cashflow_red_flags(financial_health: Dict[str, Any]) -> List[str]:
     """
-    Detect lending red flags.
+    Detect the red flags that follow from the cashflow metrics alone.
     
     Args:
-        transactions: List of transactions
-        financial_health: Financial health summary dictionary
+        financial_health: Dictionary with net_cashflow, volatility_score and
+            cashflow_stability_score
         
     Returns:
-        List of red flag descriptions
+        List of red flag descriptions (a subset of CASHFLOW_RED_FLAGS)
     """
     red_flags = []
     
     # Negative cashflow
     if financial_health.get('net_cashflow', 0) < 0:
-        red_flags.append("Sustained negative cashflow")
+        red_flags.append(CASHFLOW_RED_FLAGS[0])
     
     # High volatility
     if financial_health.get('volatility_score', 0) > 0.7:
-        red_flags.append("Extremely high cashflow volatility")
+        red_flags.append(CASHFLOW_RED_FLAGS[1])
+    
+    # Low stability
+    if financial_health.get('cashflow_stability_score', 0) < 0.3:
+        red_flags.append(CASHFLOW_RED_FLAGS[2])
+    
+    return red_flags
+
+
+def detect_red_flags(transactions: List[Dict[str, Any]], financial_health: Dict[str, Any]) -> List[str]:
+    """
+    Detect lending red flags.
+    
+    Args:
+        transactions: List of transactions
+        financial_health: Financial health summary dictionary
+        
+    Returns:
+        List of red flag descriptions
+    """
+    red_flags = detect_cashflow_red_flags(financial_health)
     
     # Multiple stress indicators
     stress_count = len(financial_health.get('stress_indicators', []))
     if stress_count >= 3:
         red_flags.append(f"Multiple financial stress indicators ({stress_count})")
     
-    # Low stability
-    if financial_health.get('cashflow_stability_score', 0) < 0.3:
-        red_flags.append("Very low cashflow stability")
-    
     # Check for suspicious patterns
     emi_count = sum(1 for tx in transactions if 'emi' in str(tx.get('description', '')).lower())
     if emi_count > len(transactions) * 0.3:
         red_flags.append("High proportion of EMI payments (potential over-leverage)")
     
     # Check for bounced transactions (simplified - would need actual bounce data)
-    negative_balances = [tx for tx in transactions if tx.get('balance_after') and float(tx.get('balance_after', 0)) < 0]
+    negative_balances = [
+        tx for tx in ensure_consolidated_ledger(transactions)
+        if tx['consolidated_balance'] is not None and tx['consolidated_balance'] < 0
+    ]
     if len(negative_balances) > 5:
         red_flags.append("Multiple instances of negative balances")
     
@@ -0,0 +1,303 @@
+"""
+Tools for deterministic behavioral credit scoring.
+
+A points-based scorecard turns the tool metrics gathered by the Credit
+Scoring Agent into every BehavioralScore field without calling an LLM:
+
+- each component is mapped to 0-100 (higher is better)
+- components are combined with configurable weights; a component without
+  data (e.g. no EMI history for the repayment score) drops out and the
+  remaining weights are renormalized
+- red flags and high-severity anomalies subtract fixed points
+- the resulting 0-1000 score is mapped to a risk level with configurable bands
+
+The same metrics always give the same score, so the scorecard serves both as
+a no-LLM scoring mode and as the fallback when the LLM call fails. In tiered
+scoring it is the first tier: only profiles whose score lies within an
+uncertainty band around a lender cut-off are escalated to the LLM.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WEIGHTS = {
+    'cashflow_margin': 0.25,
+    'stability': 0.2,
+    'volatility': 0.15,
+    'repayment': 0.2,
+    'concentration': 0.1,
+    'cyclicality': 0.1
+}
+
+# Lower bounds of the low, medium and high risk bands (below the last: critical)
+DEFAULT_RISK_BANDS = (700.0, 550.0, 400.0)
+
+# Points deducted per red flag / high-severity anomaly, and their caps
+RED_FLAG_PENALTY = 40.0
+ANOMALY_PENALTY = 10.0
+MAX_RED_FLAG_PENALTY = 200.0
+MAX_ANOMALY_PENALTY = 50.0
+
+# Net margin (net cashflow / inflow) mapped linearly onto 0-100
+MARGIN_RANGE = (-0.2, 0.3)
+
+
+def _clamp(value: float, low: float = 0.0, high: float = 100.0) -> float:
+    """Clamp a value to [low, high]."""
+    return min(max(value, low), high)
+
+
+def _scale(value: float, low: float, high: float) -> float:
+    """Map value linearly from [low, high] onto 0-100."""
+    if high == low:
+        return 0.0
+    return _clamp(100.0 * (value - low) / (high - low))
+
+
+def risk_level_for(score: float, bands: Tuple[float, ...] = DEFAULT_RISK_BANDS) -> str:
+    """
+    Map a 0-1000 behavioral score to a risk level.
+
+    Args:
+        score: Behavioral score
+        bands: Lower bounds of the low, medium and high bands
+
+    Returns:
+        One of "low", "medium", "high" or "critical"
+    """
+    for level, lower in zip(('low', 'medium', 'high'), bands):
+        if score >= lower:
+            return level
+    return 'critical'
+
+
+def scorecard_components(
+    metrics: Dict[str, Any],
+    financial_health: Dict[str, Any]
+) -> Dict[str, Optional[float]]:
+    """
+    Compute the 0-100 component scores (None when there is no data).
+
+    Args:
+        metrics: Credit Scoring Agent metrics snapshot
+        financial_health: Financial health summary
+
+    Returns:
+        Component name -> score
+    """
+    cashflow = metrics.get('cashflow_metrics') or {}
+    inflow = cashflow.get('total_inflow', financial_health.get('total_inflow', 0.0)) or 0.0
+    net = cashflow.get('net_cashflow', financial_health.get('net_cashflow', 0.0)) or 0.0
+    margin = _scale(net / inflow, *MARGIN_RANGE) if inflow > 0 else (0.0 if net < 0 else None)
+
+    stability = metrics.get('stability_score')
+    if stability is None:
+        stability = financial_health.get('cashflow_stability_score')
+
+    volatility = financial_health.get('volatility_score')
+
+    recurring = metrics.get('recurring_obligations') or {}
+    concentration = metrics.get('concentration') or {}
+    seasonality = metrics.get('seasonality') or {}
+
+    return {
+        'cashflow_margin': margin,
+        'stability': _clamp(100.0 * stability) if stability is not None else None,
+        'volatility': _clamp(100.0 * (1.0 - volatility)) if volatility is not None else None,
+        'repayment': recurring.get('repayment_pattern_score'),
+        'concentration': (
+            100.0 - concentration['concentration_risk_score']
+            if concentration.get('concentration_risk_score') is not None else None
+        ),
+        'cyclicality': (
+            100.0 - seasonality['cyclicality_score']
+            if seasonality.get('cyclicality_score') is not None else None
+        )
+    }
+
+
+def _confidence(metrics: Dict[str, Any], available_weight: float) -> float:
+    """Confidence from history length and the share of weight with data."""
+    seasonality = metrics.get('seasonality') or {}
+    months = seasonality.get('months') or 0
+    transactions = metrics.get('transaction_count', 0)
+    history = min(months / 12.0, 1.0) if months else min(transactions / 100.0, 1.0)
+    return round(_clamp(0.3 + 0.4 * history + 0.3 * available_weight, 0.0, 1.0), 2)
+
+
+def compute_behavioral_scorecard(
+    metrics: Dict[str, Any],
+    financial_health: Dict[str, Any],
+    weights: Optional[Dict[str, float]] = None,
+    risk_bands: Optional[List[float]] = None
+) -> Dict[str, Any]:
+    """
+    Score behavior deterministically from the tool metrics.
+
+    Args:
+        metrics: Credit Scoring Agent metrics snapshot (cashflow_metrics,
+            stability_score, red_flags_detected, anomalies_detected,
+            recurring_obligations, concentration, seasonality)
+        financial_health: Financial health summary
+        weights: Optional component weights (defaults to DEFAULT_WEIGHTS)
+        risk_bands: Optional lower bounds of the low/medium/high bands
+
+    Returns:
+        Dictionary with every BehavioralScore field; metadata holds the
+        components, effective weights and penalties
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    bands = tuple(risk_bands or DEFAULT_RISK_BANDS)
+
+    components = scorecard_components(metrics, financial_health)
+    available = {name: score for name, score in components.items() if score is not None and weights.get(name, 0) > 0}
+    total_weight = sum(weights[name] for name in available)
+    base = (
+        sum(weights[name] * score for name, score in available.items()) / total_weight
+        if total_weight > 0 else 0.0
+    )
+
+    red_flags = list(metrics.get('red_flags_detected') or [])
+    anomalies = list(metrics.get('anomalies_detected') or [])
+    high_anomalies = sum(1 for a in anomalies if a.get('severity') == 'high')
+    red_flag_penalty = min(RED_FLAG_PENALTY * len(red_flags), MAX_RED_FLAG_PENALTY)
+    anomaly_penalty = min(ANOMALY_PENALTY * high_anomalies, MAX_ANOMALY_PENALTY)
+
+    score = round(_clamp(10.0 * base - red_flag_penalty - anomaly_penalty, 0.0, 1000.0), 2)
+    all_weight = sum(w for w in weights.values() if w > 0)
+
+    return {
+        'behavioral_score': score,
+        # Neutral defaults for components without data keep the model valid
+        'repayment_pattern_score': round(components['repayment'], 2) if components['repayment'] is not None else 50.0,
+        'concentration_risk_score': round(100.0 - components['concentration'], 2) if components['concentration'] is not None else 50.0,
+        'cyclicality_score': round(100.0 - components['cyclicality'], 2) if components['cyclicality'] is not None else 0.0,
+        'risk_level': risk_level_for(score, bands),
+        'red_flags': red_flags,
+        'anomalies': anomalies,
+        'confidence': _confidence(metrics, total_weight / all_weight if all_weight else 0.0),
+        'metadata': {
+            'engine': 'scorecard',
+            'components': {name: (round(s, 2) if s is not None else None) for name, s in components.items()},
+            'weights': {name: round(weights[name] / total_weight, 4) for name in available} if total_weight else {},
+            'base_score': round(10.0 * base, 2),
+            'penalties': {
+                'red_flags': red_flag_penalty,
+                'anomalies': anomaly_penalty
+            },
+            'risk_bands': list(bands)
+        }
+    }
+
+
+def compute_cashflow_scorecard_batch(
+    total_inflow: List[float],
+    net_cashflow: List[float],
+    stability: List[Optional[float]],
+    volatility: List[Optional[float]],
+    red_flag_counts: List[int],
+    weights: Optional[Dict[str, float]] = None,
+    risk_bands: Optional[List[float]] = None
+) -> Tuple[List[float], List[str]]:
+    """
+    Score many MSMEs from cashflow columns in one pass.
+
+    Gives the same score as compute_behavioral_scorecard on metrics holding
+    only the cashflow totals, stability, volatility and red flags (the
+    repayment, concentration and cyclicality components drop out), without
+    building a metrics dict per MSME.
+
+    Args:
+        total_inflow: Total inflow per MSME
+        net_cashflow: Net cashflow per MSME
+        stability: Cashflow stability (0-1) per MSME
+        volatility: Volatility (0-1) per MSME
+        red_flag_counts: Number of red flags per MSME
+        weights: Optional component weights (defaults to DEFAULT_WEIGHTS)
+        risk_bands: Optional lower bounds of the low/medium/high bands
+
+    Returns:
+        Tuple of (behavioral scores, risk levels)
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    bands = tuple(risk_bands or DEFAULT_RISK_BANDS)
+    w_margin = max(weights.get('cashflow_margin', 0.0), 0.0)
+    w_stability = max(weights.get('stability', 0.0), 0.0)
+    w_volatility = max(weights.get('volatility', 0.0), 0.0)
+    low, high = MARGIN_RANGE
+
+    scores = []
+    for inflow, net, stab, vol, flags in zip(total_inflow, net_cashflow, stability, volatility, red_flag_counts):
+        total = weighted = 0.0
+        if inflow > 0:
+            weighted += w_margin * _scale(net / inflow, low, high)
+            total += w_margin
+        elif net < 0:
+            total += w_margin
+        if stab is not None:
+            weighted += w_stability * _clamp(100.0 * stab)
+            total += w_stability
+        if vol is not None:
+            weighted += w_volatility * _clamp(100.0 * (1.0 - vol))
+            total += w_volatility
+        base = weighted / total if total > 0 else 0.0
+        penalty = min(RED_FLAG_PENALTY * flags, MAX_RED_FLAG_PENALTY)
+        scores.append(round(_clamp(10.0 * base - penalty, 0.0, 1000.0), 2))
+
+    return scores, [risk_level_for(score, bands) for score in scores]
+
+
+def policy_score_cutoffs(policies: List[Dict[str, Any]]) -> List[float]:
+    """
+    Collect the distinct min_behavioral_score cut-offs of lender policies.
+
+    Args:
+        policies: Lender policies with eligibility_criteria
+
+    Returns:
+        Sorted cut-offs
+    """
+    cutoffs = set()
+    for policy in policies:
+        cutoff = (policy.get('eligibility_criteria') or {}).get('min_behavioral_score')
+        if cutoff is not None:
+            cutoffs.add(float(cutoff))
+    return sorted(cutoffs)
+
+
+def escalation_decision(
+    score: float,
+    confidence: float,
+    cutoffs: List[float],
+    band: float
+) -> Dict[str, Any]:
+    """
+    Decide whether a scorecard result is borderline and needs the LLM tier.
+
+    The band is the half-width around each cut-off at full confidence; it
+    widens linearly as confidence drops, up to twice the width at zero
+    confidence.
+
+    Args:
+        score: Scorecard behavioral score
+        confidence: Scorecard confidence (0-1)
+        cutoffs: Policy min_behavioral_score cut-offs
+        band: Uncertainty band half-width in score points
+
+    Returns:
+        Dictionary with escalate, nearest_cutoff, distance and band
+    """
+    width = band * (2.0 - _clamp(confidence, 0.0, 1.0))
+    if not cutoffs:
+        return {'escalate': False, 'nearest_cutoff': None, 'distance': None, 'band': round(width, 2)}
+    nearest = min(cutoffs, key=lambda cutoff: abs(score - cutoff))
+    distance = abs(score - nearest)
+    return {
+        'escalate': distance <= width,
+        'nearest_cutoff': nearest,
+        'distance': round(distance, 2),
+        'band': round(width, 2)
+    }
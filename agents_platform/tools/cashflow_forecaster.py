@@ -0,0 +1,205 @@
+"""
+Tools for deterministic forecasting of monthly net cashflow.
+
+Two lightweight methods are used, chosen per MSME:
+
+- seasonal naive: each future month repeats the same month of the last
+  cycle, used when the seasonality detector found a significant period and at
+  least one full cycle of history is available
+- simple exponential smoothing: a flat projection of the smoothed level,
+  used otherwise
+
+Uncertainty bands come from the in-sample one-step-ahead errors. The h-step
+variance grows as (1 + (h-1) alpha^2) for smoothing and with the number of
+completed cycles for seasonal naive. Cumulative horizons add the step
+variances. Series of equal length are smoothed in lockstep, so a whole
+portfolio is processed as a handful of batches. No LLM is involved and the
+same history always gives the same forecast.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+import math
+import logging
+
+from .seasonality_detector import monthly_net_series
+from .window_metrics import month_range
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_HORIZONS = (3, 6, 12)
+
+# Two-sided 80% normal band
+DEFAULT_BAND_Z = 1.2816
+
+
+def _next_months(last_month: Optional[str], count: int) -> List[str]:
+    """The `count` month keys after last_month."""
+    if not last_month:
+        return []
+    year, month = int(last_month[:4]), int(last_month[5:7])
+    month += count
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return month_range(last_month, f"{year}-{month:02d}")[1:]
+
+
+def _rms(errors: List[float]) -> float:
+    """Root mean square of forecast errors."""
+    return math.sqrt(sum(e * e for e in errors) / len(errors)) if errors else 0.0
+
+
+def _smooth_group(series_list: List[List[float]], alpha: float) -> Tuple[List[float], List[float]]:
+    """
+    Simple exponential smoothing for equal-length series in lockstep.
+
+    Returns:
+        Tuple of (final levels, RMS one-step-ahead errors)
+    """
+    levels = [series[0] for series in series_list]
+    squared_errors = [0.0] * len(series_list)
+    n = len(series_list[0])
+    for t in range(1, n):
+        for i, series in enumerate(series_list):
+            error = series[t] - levels[i]
+            squared_errors[i] += error * error
+            levels[i] += alpha * error
+    sigmas = [math.sqrt(sq / (n - 1)) if n > 1 else 0.0 for sq in squared_errors]
+    return levels, sigmas
+
+
+def _insufficient_history(series: List[float], months: List[str], horizons: Tuple[int, ...], z: float) -> Dict[str, Any]:
+    """Forecast from the mean when there is too little history to smooth."""
+    mean = sum(series) / len(series) if series else 0.0
+    sigma = abs(mean)
+    return _build_result('insufficient_history', None, [mean] * max(horizons), [sigma] * max(horizons), months, horizons, z, len(series), sigma)
+
+
+def _build_result(
+    method: str,
+    period: Optional[int],
+    point: List[float],
+    step_sigmas: List[float],
+    months: List[str],
+    horizons: Tuple[int, ...],
+    z: float,
+    history: int,
+    sigma: float
+) -> Dict[str, Any]:
+    """Assemble monthly points and cumulative horizon bands."""
+    results = {}
+    for h in horizons:
+        expected = sum(point[:h])
+        spread = z * math.sqrt(sum(s * s for s in step_sigmas[:h]))
+        results[f"{h}m"] = {
+            'expected': expected,
+            'lower': expected - spread,
+            'upper': expected + spread,
+            'avg_monthly': expected / h
+        }
+
+    return {
+        'method': method,
+        'period': period,
+        'months_of_history': history,
+        'sigma': sigma,
+        'band_z': z,
+        'monthly_forecast': [
+            {'month': month, 'expected': value}
+            for month, value in zip(months, point)
+        ],
+        'horizons': results
+    }
+
+
+def forecast_cashflow_batch(
+    inputs: Dict[str, Dict[str, Any]],
+    horizons: Tuple[int, ...] = DEFAULT_HORIZONS,
+    alpha: float = 0.3,
+    z: float = DEFAULT_BAND_Z,
+    min_history: int = 3
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Forecast monthly net cashflow for many MSMEs at once.
+
+    Args:
+        inputs: MSME id -> {'series': dense monthly net cashflow,
+            'last_month': "YYYY-MM" of the last value, 'seasonality': optional
+            seasonality_detector result}
+        horizons: Cumulative horizons in months
+        alpha: Smoothing factor for exponential smoothing
+        z: Normal quantile for the uncertainty band
+        min_history: Minimum months needed to smooth
+
+    Returns:
+        MSME id -> {'method', 'period', 'months_of_history', 'sigma',
+        'monthly_forecast', 'horizons': {"<h>m": {'expected', 'lower',
+        'upper', 'avg_monthly'}}}
+    """
+    horizons = tuple(sorted(horizons))
+    max_h = max(horizons)
+    results = {}
+    smoothing_groups = defaultdict(list)
+
+    for msme_id, item in inputs.items():
+        series = [float(v) for v in item.get('series') or []]
+        months = _next_months(item.get('last_month'), max_h)
+        if len(series) < min_history:
+            results[msme_id] = _insufficient_history(series, months, horizons, z)
+            continue
+
+        seasonality = item.get('seasonality') or {}
+        period = seasonality.get('period')
+        if seasonality.get('seasonal') and period and len(series) > period:
+            # Seasonal naive: errors are differences against the same month one cycle earlier
+            errors = [series[t] - series[t - period] for t in range(period, len(series))]
+            sigma = _rms(errors)
+            last_cycle = series[-period:]
+            point = [last_cycle[k % period] for k in range(max_h)]
+            step_sigmas = [sigma * math.sqrt(1 + k // period) for k in range(max_h)]
+            results[msme_id] = _build_result(
+                'seasonal_naive', period, point, step_sigmas, months, horizons, z, len(series), sigma
+            )
+            continue
+
+        smoothing_groups[len(series)].append((msme_id, series, months))
+
+    for members in smoothing_groups.values():
+        levels, sigmas = _smooth_group([series for _, series, _ in members], alpha)
+        for (msme_id, series, months), level, sigma in zip(members, levels, sigmas):
+            point = [level] * max_h
+            step_sigmas = [sigma * math.sqrt(1 + k * alpha * alpha) for k in range(max_h)]
+            results[msme_id] = _build_result(
+                'exponential_smoothing', None, point, step_sigmas, months, horizons, z, len(series), sigma
+            )
+
+    return results
+
+
+def forecast_cashflow(
+    monthly_amounts: Dict[str, Dict[str, float]],
+    seasonality: Optional[Dict[str, Any]] = None,
+    horizons: Tuple[int, ...] = DEFAULT_HORIZONS
+) -> Dict[str, Any]:
+    """
+    Forecast one MSME's monthly net cashflow.
+
+    Args:
+        monthly_amounts: Month -> {'credits', 'debits', ...} mapping
+        seasonality: Optional seasonality_detector result for the same series
+        horizons: Cumulative horizons in months
+
+    Returns:
+        Forecast result (see forecast_cashflow_batch)
+    """
+    return forecast_cashflow_batch(
+        {
+            'msme': {
+                'series': monthly_net_series(monthly_amounts),
+                'last_month': max(monthly_amounts) if monthly_amounts else None,
+                'seasonality': seasonality
+            }
+        },
+        horizons
+    )['msme']
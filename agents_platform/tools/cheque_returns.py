@@ -0,0 +1,255 @@
+"""
+Tools for linking cheque returns to the original cheque entries.
+
+A bounced cheque usually shows up as several statement rows: the original
+cheque debit/credit, its reversal ("CHQ RETURN ... INSUFFICIENT FUNDS") and
+one or more return charges. Counting narrations therefore over-counts. Return
+rows are hash-joined to their originals on cheque number (or amount) within
+a date window, and charges are attached to the resulting event, so each bounce
+is counted once and classified as:
+
+- inward: a cheque issued by the MSME was returned unpaid (the debit is reversed)
+- outward: a cheque deposited by the MSME was returned (the credit is reversed)
+
+Generic words such as "return" or "fee" also occur in ordinary narrations
+("GST Return Filing Fee", "Sales return refund"), so a row only counts as a
+return when it says bounce/dishonour/insufficient funds, or when the return
+word comes with cheque/NACH context (the narration's channel or an
+inward/outward marker). Other rows with a return word only count when they
+link to an original cheque entry, and charge rows never start an event
+unless they are explicit cheque/ECS/NACH return charges.
+"""
+
+from typing import List, Dict, Any, Optional
+from collections import defaultdict
+import re
+import logging
+
+from .data_parser import parse_date
+from .narration_parser import parse_narration
+
+logger = logging.getLogger(__name__)
+
+
+# Markers that always denote a bounce, and return words that need cheque/NACH context
+BOUNCE_MARKERS = re.compile(r"\b(bounce[ds]?|dishono(?:u)?r(?:ed)?|insufficient|insuff)\b", re.IGNORECASE)
+RETURN_MARKERS = re.compile(r"\b(return(?:ed)?|rtn|ret|unpaid)\b", re.IGNORECASE)
+RETURN_CHANNELS = ('cheque', 'nach')
+CHARGE_MARKERS = re.compile(r"\b(charges?|chgs?|fee|penalty|gst on)\b", re.IGNORECASE)
+CHEQUE_NUMBER = re.compile(r"(?<!\d)(\d{6})(?!\d)")
+INWARD_MARKERS = re.compile(r"\b(inward|i/w|iw)\b", re.IGNORECASE)
+OUTWARD_MARKERS = re.compile(r"\b(outward|o/w|ow)\b", re.IGNORECASE)
+INSUFFICIENT_MARKERS = re.compile(r"\b(insufficient|funds|insuff)\b", re.IGNORECASE)
+
+
+def _classify_row(tx: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the cheque-return features of one statement row."""
+    description = str(tx.get('description', ''))
+    parsed = parse_narration(description)
+    if parsed.channel == 'cheque':
+        number = parsed.reference
+    elif parsed.channel is None:
+        # Untagged rows: a bare six-digit number is taken as a cheque number
+        match = CHEQUE_NUMBER.search(description)
+        number = match.group(1) if match else None
+    else:
+        # UPI/NEFT/IMPS/RTGS/NACH references are never cheque numbers
+        number = None
+    direction_hint = (
+        'inward' if INWARD_MARKERS.search(description)
+        else 'outward' if OUTWARD_MARKERS.search(description)
+        else None
+    )
+    return_word = bool(RETURN_MARKERS.search(description))
+    explicit = bool(BOUNCE_MARKERS.search(description)) or (
+        return_word and (parsed.channel in RETURN_CHANNELS or direction_hint is not None)
+    )
+    is_charge = bool(CHARGE_MARKERS.search(description))
+    return {
+        # Explicit return entries, and rows that only count when linked to an original cheque
+        'is_return': explicit and not is_charge,
+        'is_return_candidate': return_word and not explicit and not is_charge,
+        'is_charge': explicit and is_charge,
+        'is_cheque': parsed.channel == 'cheque' or number is not None,
+        'cheque_number': number,
+        'direction_hint': direction_hint
+    }
+
+
+def classify_bounce_entry(tx: Dict[str, Any]) -> Optional[str]:
+    """
+    Classify a statement row as a return entry, a return charge or neither.
+
+    Only the narration markers are checked (no linking), so single rows can
+    be classified as they are ingested. Since there is no original entry to
+    link to, only explicit return rows count (see _classify_row), and a
+    charge only counts as a debit; credits such as a sales return refund or
+    a reversed charge are ignored.
+
+    Args:
+        tx: Transaction dictionary
+
+    Returns:
+        "return", "charge" or None
+    """
+    features = _classify_row(tx)
+    if features['is_return']:
+        return 'return'
+    if features['is_charge'] and float(tx.get('amount', 0)) < 0:
+        return 'charge'
+    return None
+
+
+def _amount_key(amount: float) -> int:
+    """Hashable amount key in paise."""
+    return int(round(abs(amount) * 100))
+
+
+def link_cheque_returns(
+    transactions: List[Dict[str, Any]],
+    window_days: int = 10
+) -> Dict[str, Any]:
+    """
+    Link cheque return entries and their charges into bounce events.
+
+    Args:
+        transactions: List of transactions
+        window_days: Maximum days between the original entry and its return,
+            and between a return and its charges
+
+    Returns:
+        Dictionary with 'events' (one per bounce), 'inward', 'outward',
+        'unclassified', 'total_charges' and 'unlinked_returns'
+    """
+    rows = []
+    for tx in transactions:
+        description = str(tx.get('description', ''))
+        if not description:
+            continue
+        features = _classify_row(tx)
+        amount = float(tx.get('amount', 0))
+        rows.append((parse_date(tx.get('date')), amount, tx, features))
+
+    # Hash indices of candidate original cheque entries
+    by_number = defaultdict(list)
+    by_amount = defaultdict(list)
+    returns = []
+    charges = []
+    for row in rows:
+        date, amount, tx, features = row
+        if features['is_charge']:
+            charges.append(row)
+        elif features['is_return'] or features['is_return_candidate']:
+            returns.append(row)
+        elif features['is_cheque'] and amount != 0:
+            if features['cheque_number']:
+                by_number[features['cheque_number']].append(row)
+            by_amount[(amount > 0, _amount_key(amount))].append(row)
+
+    def take(candidates: List[Any], date: Any, want_credit: bool, amount: float, used: set) -> Optional[Any]:
+        """Pick the latest unused opposite-signed original within the window."""
+        best = None
+        for candidate in candidates:
+            c_date, c_amount, c_tx, _ = candidate
+            if id(c_tx) in used or (c_amount > 0) != want_credit:
+                continue
+            if _amount_key(c_amount) != _amount_key(amount):
+                continue
+            lag = (date - c_date).days
+            if 0 <= lag <= window_days and (best is None or c_date > best[0]):
+                best = candidate
+        return best
+
+    used = set()
+    events = []
+    unlinked = 0
+    for date, amount, tx, features in returns:
+        # A credit reversal undoes an issued cheque (inward); a debit reversal undoes a deposit (outward)
+        want_credit = amount < 0
+        original = None
+        if features['cheque_number']:
+            original = take(by_number.get(features['cheque_number'], []), date, want_credit, amount, used)
+        if original is None:
+            original = take(by_amount.get((want_credit, _amount_key(amount)), []), date, want_credit, amount, used)
+
+        if original is not None:
+            used.add(id(original[2]))
+        elif features['is_return_candidate']:
+            # A generic return word without cheque/NACH context or an original is not a bounce
+            continue
+        else:
+            unlinked += 1
+
+        direction = features['direction_hint'] or ('inward' if amount > 0 else 'outward' if amount < 0 else None)
+        description = str(tx.get('description', ''))
+        events.append({
+            'direction': direction or 'unclassified',
+            'cheque_number': features['cheque_number'] or (original[3]['cheque_number'] if original else None),
+            'amount': abs(amount),
+            'original_date': original[0].date().isoformat() if original else None,
+            'original_description': original[2].get('description') if original else None,
+            'return_date': date.date().isoformat(),
+            'return_description': description,
+            'reason': 'insufficient_funds' if INSUFFICIENT_MARKERS.search(description) else None,
+            'charges': [],
+            'charge_total': 0.0,
+            '_day': date.toordinal()
+        })
+
+    # Attach charges by cheque number, else to the closest preceding event in the window
+    events_by_number = {e['cheque_number']: e for e in events if e['cheque_number']}
+    events_by_day = defaultdict(list)
+    for event in events:
+        events_by_day[event['_day']].append(event)
+
+    for date, amount, tx, features in charges:
+        event = events_by_number.get(features['cheque_number']) if features['cheque_number'] else None
+        if event is None:
+            day = date.toordinal()
+            for lag in range(window_days + 1):
+                same_day = [e for e in events_by_day.get(day - lag, []) if not e['charges']]
+                if same_day:
+                    event = same_day[0]
+                    break
+
+        if event is None:
+            # Banks often post only the charge when an issued cheque is returned
+            event = {
+                'direction': features['direction_hint'] or 'unclassified',
+                'cheque_number': features['cheque_number'],
+                'amount': None,
+                'original_date': None,
+                'original_description': None,
+                'return_date': date.date().isoformat(),
+                'return_description': str(tx.get('description', '')),
+                'reason': 'insufficient_funds' if INSUFFICIENT_MARKERS.search(str(tx.get('description', ''))) else None,
+                'charges': [],
+                'charge_total': 0.0,
+                '_day': date.toordinal()
+            }
+            events.append(event)
+            events_by_day[event['_day']].append(event)
+            if event['cheque_number']:
+                events_by_number[event['cheque_number']] = event
+
+        if event['direction'] == 'unclassified' and features['direction_hint']:
+            event['direction'] = features['direction_hint']
+        event['charges'].append({
+            'date': date.date().isoformat(),
+            'amount': abs(amount),
+            'description': str(tx.get('description', ''))
+        })
+        event['charge_total'] += abs(amount)
+
+    for event in events:
+        del event['_day']
+    events.sort(key=lambda e: e['return_date'])
+
+    return {
+        'events': events,
+        'inward': sum(1 for e in events if e['direction'] == 'inward'),
+        'outward': sum(1 for e in events if e['direction'] == 'outward'),
+        'unclassified': sum(1 for e in events if e['direction'] == 'unclassified'),
+        'total_charges': sum(e['charge_total'] for e in events),
+        'unlinked_returns': unlinked
+    }
@@ -0,0 +1,148 @@
+"""
+Tools for building a consolidated ledger across an MSME's bank accounts.
+
+Each account's statement is a chronological stream with its own running
+balance. Concatenating streams and reading balance_after as one series mixes
+unrelated balances, so the streams are instead k-way merged with a heap
+(O(n log k) for k accounts) and two running balances are kept per row:
+
+- account_balance: the account's own running balance (the reported
+  balance_after where present, otherwise carried forward by the amount)
+- consolidated_balance: the sum of all accounts' current balances, i.e. the
+  MSME's total liquidity at that point of the merged ledger
+
+Each account's opening balance is backed out of its first reported balance,
+so the consolidated balance covers every account from the first row on.
+Accounts without any reported balance do not contribute.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from collections import defaultdict
+import heapq
+import logging
+
+from .data_parser import parse_date
+
+logger = logging.getLogger(__name__)
+
+
+def _reported_balance(tx: Dict[str, Any]) -> Optional[float]:
+    """Reported running balance of a row, if any."""
+    balance = tx.get('balance_after', tx.get('balance'))
+    if balance is None or balance == '':
+        return None
+    return float(balance)
+
+
+def _chronological(stream: List[Dict[str, Any]]) -> Tuple[List[datetime], List[Dict[str, Any]]]:
+    """
+    Put one account's rows in chronological order.
+
+    Streams that are already ascending are used as is and newest-first
+    statements are reversed (keeping same-day rows in balance order); only
+    unordered streams are sorted.
+
+    Returns:
+        Tuple of (dates, rows) in chronological order
+    """
+    dates = [parse_date(tx.get('date')) for tx in stream]
+    if all(a <= b for a, b in zip(dates, dates[1:])):
+        return dates, stream
+    if all(a >= b for a, b in zip(dates, dates[1:])):
+        return dates[::-1], stream[::-1]
+    order = sorted(range(len(stream)), key=dates.__getitem__)
+    return [dates[i] for i in order], [stream[i] for i in order]
+
+
+def _opening_balance(stream: List[Dict[str, Any]]) -> Optional[float]:
+    """Balance before the first row, backed out of the first reported balance."""
+    flow = 0.0
+    for tx in stream:
+        flow += float(tx.get('amount', 0))
+        balance = _reported_balance(tx)
+        if balance is not None:
+            return balance - flow
+    return None
+
+
+def build_consolidated_ledger(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-account streams into one chronological ledger.
+
+    The ledger rows are shallow copies of the input rows with
+    'account_balance' and 'consolidated_balance' (None while unknown) added;
+    the caller's rows are left unchanged. Rows on the same date keep
+    their account's statement order; ties across accounts follow account
+    order of first appearance.
+
+    Args:
+        transactions: Transactions from one or more accounts
+
+    Returns:
+        Transactions in merged chronological order
+    """
+    streams = defaultdict(list)
+    for tx in transactions:
+        streams[str(tx.get('account_id') or '')].append(dict(tx))
+    chronological = [_chronological(stream) for stream in streams.values()]
+    dates = [stream_dates for stream_dates, _ in chronological]
+    ordered = [stream for _, stream in chronological]
+
+    balances: List[Optional[float]] = [_opening_balance(stream) for stream in ordered]
+    total = sum(balance for balance in balances if balance is not None)
+    known = any(balance is not None for balance in balances)
+
+    # Heap of (date, account index, position): the next unmerged row of each account
+    heap = [(stream_dates[0], k, 0) for k, stream_dates in enumerate(dates)]
+    heapq.heapify(heap)
+
+    ledger = []
+    while heap:
+        _, k, position = heap[0]
+        stream = ordered[k]
+        tx = stream[position]
+
+        previous = balances[k]
+        reported = _reported_balance(tx)
+        if reported is not None:
+            current = reported
+        elif previous is not None:
+            current = previous + float(tx.get('amount', 0))
+        else:
+            current = None
+        if current is not None:
+            total += current - (previous or 0.0)
+            balances[k] = current
+
+        tx['account_balance'] = current
+        tx['consolidated_balance'] = total if known else None
+        ledger.append(tx)
+
+        # Advance this account's stream in place (one sift instead of pop + push)
+        if position + 1 < len(stream):
+            heapq.heapreplace(heap, (dates[k][position + 1], k, position + 1))
+        else:
+            heapq.heappop(heap)
+
+    return ledger
+
+
+def is_consolidated(transactions: List[Dict[str, Any]]) -> bool:
+    """Whether every row already comes from build_consolidated_ledger."""
+    return bool(transactions) and all('consolidated_balance' in tx for tx in transactions)
+
+
+def ensure_consolidated_ledger(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return transactions as a consolidated ledger, building it only if needed.
+
+    Args:
+        transactions: Ledger rows or plain transactions
+
+    Returns:
+        Consolidated ledger rows
+    """
+    if not transactions or is_consolidated(transactions):
+        return transactions
+    return build_consolidated_ledger(transactions)
@@ -0,0 +1,399 @@
+"""
+Tools for extracting counterparties and measuring cashflow concentration.
+
+Counterparties are pulled out of narrations, normalized and hashed into a
+per-MSME index with inflow/outflow totals. Customer (inflow) and supplier
+(outflow) concentration is then measured with the Herfindahl-Hirschman
+Index (HHI, 0-1) and top-N shares. The index can be persisted and updated
+incrementally so exposure to a counterparty can be queried across the
+portfolio.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import re
+import sqlite3
+import logging
+
+from .data_parser import transaction_key
+from .transaction_categorizer import categorize_transaction
+from .narration_parser import parse_narration
+from ..core.analytics_db import (
+    get_analytics_connection,
+    ensure_ingestion_ledger,
+    filter_unseen_keys,
+    record_seen_keys
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Narration prefixes that describe the payment, not the counterparty
+_GENERIC_PREFIXES = re.compile(
+    r"^(customer|supplier|vendor|invoice|bill|payment|transfer|trf|to|by|from|received|paid)\b[\s:/-]*",
+    re.IGNORECASE
+)
+# Narration suffixes that describe the payment, not the counterparty
+_GENERIC_SUFFIXES = re.compile(
+    r"[\s:/-]*\b(payment|payments|purchase|transfer|trf|credit|debit|receipt|received|paid|deposit)$",
+    re.IGNORECASE
+)
+_NOISE = re.compile(r"[^a-z0-9@&. ]+")
+_DIGIT_RUNS = re.compile(r"\b\d{4,}\b")
+_SPACES = re.compile(r"\s+")
+
+# Categories that never represent trading counterparties (taxes, loan repayments)
+DEFAULT_EXCLUDED_CATEGORIES = ('tax', 'financing')
+
+# Narrations of non-trading flows: payroll, rent, cash withdrawals, interest and owner drawings
+NON_TRADING_MARKERS = re.compile(
+    r"\b(salary|salaries|wages?|payroll|rent|atm|withdrawals?|interest|int\.? ?(?:pd|cr)|dividend|self|personal)\b",
+    re.IGNORECASE
+)
+
+# Index entry collecting the flows without an identifiable counterparty
+UNATTRIBUTED_KEY = "unattributed"
+
+# Minimum share of inflows attributed to named customers for a concentration risk score
+MIN_ATTRIBUTED_SHARE = 0.5
+
+
+def normalize_counterparty(name: str) -> str:
+    """Lowercase, strip punctuation and reference numbers, collapse spaces."""
+    name = _NOISE.sub(" ", str(name).lower())
+    name = _DIGIT_RUNS.sub(" ", name)
+    return _SPACES.sub(" ", name).strip()
+
+
+def _strip_generic(name: str) -> str:
+    """Strip generic payment words from both ends of a normalized name."""
+    while True:
+        shorter = _GENERIC_SUFFIXES.sub("", _GENERIC_PREFIXES.sub("", name).strip()).strip()
+        if shorter == name:
+            return name
+        name = shorter
+
+
+def extract_counterparty(tx: Dict[str, Any]) -> Optional[str]:
+    """
+    Extract a normalized counterparty name from a transaction.
+
+    Uses a structured 'counterparty' field when present (filled at ingestion
+    from UPI/NEFT/IMPS/RTGS/NACH/cheque narrations), then the parsed
+    payment-rail narration; otherwise the part of the narration after a
+    separator (e.g. "Customer Payment - ABC Retail"), falling back to the
+    narration itself with generic payment words removed. Narrations made of
+    generic words only (e.g. "Customer Payment") have no identifiable party.
+
+    Args:
+        tx: Transaction dictionary
+
+    Returns:
+        Normalized counterparty name, or None if nothing usable remains
+    """
+    if tx.get('counterparty'):
+        return normalize_counterparty(tx['counterparty']) or None
+
+    description = str(tx.get('description', ''))
+    parsed = parse_narration(description)
+    if parsed.counterparty:
+        candidate = normalize_counterparty(parsed.counterparty)
+        if candidate:
+            return candidate
+
+    for separator in (' - ', ' from ', ' to ', ':'):
+        if separator in description:
+            candidate = _strip_generic(normalize_counterparty(description.rsplit(separator, 1)[-1]))
+            if candidate:
+                return candidate
+
+    return _strip_generic(normalize_counterparty(description)) or None
+
+
+def is_trading_flow(tx: Dict[str, Any], exclude_categories: Tuple[str, ...] = DEFAULT_EXCLUDED_CATEGORIES) -> bool:
+    """
+    Check whether a transaction is a trade with a customer or supplier.
+
+    Internal transfers, excluded categories and non-trading narrations
+    (salary, rent, ATM/cash, interest, owner drawings) are not.
+
+    Args:
+        tx: Transaction dictionary
+        exclude_categories: Transaction categories to leave out
+
+    Returns:
+        True for customer receipts and supplier payments
+    """
+    if tx.get('internal_transfer'):
+        return False
+    category = tx.get('category') or categorize_transaction(tx)[1].value
+    if category in exclude_categories:
+        return False
+    return not NON_TRADING_MARKERS.search(str(tx.get('description', '')))
+
+
+def counterparty_key(name: str) -> str:
+    """Stable 12-character hash of a normalized counterparty name."""
+    return hashlib.sha1(normalize_counterparty(name).encode('utf-8')).hexdigest()[:12]
+
+
+def build_counterparty_index(
+    transactions: List[Dict[str, Any]],
+    exclude_categories: Tuple[str, ...] = DEFAULT_EXCLUDED_CATEGORIES
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Build a hashed counterparty index in one pass.
+
+    Only trading flows are indexed (see is_trading_flow). Flows without an
+    identifiable counterparty are collected under UNATTRIBUTED_KEY.
+
+    Args:
+        transactions: List of (categorized) transactions
+        exclude_categories: Transaction categories to leave out (e.g. tax)
+
+    Returns:
+        Counterparty key -> {'name', 'inflow', 'outflow', 'credit_count', 'debit_count'}
+    """
+    index = {}
+    for tx in transactions:
+        if not is_trading_flow(tx, exclude_categories):
+            continue
+        amount = float(tx.get('amount', 0))
+        if amount == 0:
+            continue
+
+        name = extract_counterparty(tx)
+        key = counterparty_key(name) if name else UNATTRIBUTED_KEY
+        entry = index.get(key)
+        if entry is None:
+            entry = index[key] = {
+                'name': name or UNATTRIBUTED_KEY,
+                'inflow': 0.0,
+                'outflow': 0.0,
+                'credit_count': 0,
+                'debit_count': 0
+            }
+
+        if amount > 0:
+            entry['inflow'] += amount
+            entry['credit_count'] += 1
+        else:
+            entry['outflow'] += -amount
+            entry['debit_count'] += 1
+
+    return index
+
+
+def _hhi(values: List[float], top_n: int) -> Dict[str, Any]:
+    """HHI and top-N share for one side (customers or suppliers)."""
+    total = sum(values)
+    if total <= 0:
+        return {'hhi': 0.0, 'top_n_share': 0.0, 'counterparties': 0, 'effective_counterparties': 0.0}
+
+    shares = sorted((v / total for v in values if v > 0), reverse=True)
+    hhi = sum(share * share for share in shares)
+    return {
+        'hhi': hhi,
+        'top_n_share': sum(shares[:top_n]),
+        'counterparties': len(shares),
+        'effective_counterparties': 1.0 / hhi if hhi > 0 else 0.0
+    }
+
+
+def compute_concentration(index: Dict[str, Dict[str, Any]], top_n: int = 3) -> Dict[str, Any]:
+    """
+    Compute customer and supplier concentration from a counterparty index.
+
+    Args:
+        index: Output of build_counterparty_index (or a persisted index)
+        top_n: Number of largest counterparties for the dependency share
+
+    Flows without an identifiable counterparty are left out of the HHI and
+    the top-N shares and reported as 'unattributed_share'. The risk score is
+    None when less than MIN_ATTRIBUTED_SHARE of inflows is attributed.
+
+    Returns:
+        Dictionary with 'customers', 'suppliers', 'top_customers', 'top_suppliers',
+        'unattributed_share' and a 0-100 'concentration_risk_score'
+    """
+    unattributed = index.get(UNATTRIBUTED_KEY) or {'inflow': 0.0, 'outflow': 0.0}
+    entries = [(key, e) for key, e in index.items() if key != UNATTRIBUTED_KEY]
+    customers = _hhi([e['inflow'] for _, e in entries], top_n)
+    suppliers = _hhi([e['outflow'] for _, e in entries], top_n)
+
+    total_inflow = sum(e['inflow'] for _, e in entries) or 1.0
+    total_outflow = sum(e['outflow'] for _, e in entries) or 1.0
+    all_inflow = sum(e['inflow'] for _, e in entries) + unattributed['inflow']
+    all_outflow = sum(e['outflow'] for _, e in entries) + unattributed['outflow']
+    unattributed_share = {
+        'inflow': unattributed['inflow'] / all_inflow if all_inflow > 0 else 0.0,
+        'outflow': unattributed['outflow'] / all_outflow if all_outflow > 0 else 0.0
+    }
+    scored = all_inflow > 0 and 1.0 - unattributed_share['inflow'] >= MIN_ATTRIBUTED_SHARE
+    top_customers = sorted((e for _, e in entries if e['inflow'] > 0), key=lambda e: e['inflow'], reverse=True)[:top_n]
+    top_suppliers = sorted((e for _, e in entries if e['outflow'] > 0), key=lambda e: e['outflow'], reverse=True)[:top_n]
+
+    return {
+        'customers': customers,
+        'suppliers': suppliers,
+        'top_customers': [
+            {'name': e['name'], 'share': e['inflow'] / total_inflow} for e in top_customers
+        ],
+        'top_suppliers': [
+            {'name': e['name'], 'share': e['outflow'] / total_outflow} for e in top_suppliers
+        ],
+        'unattributed_share': unattributed_share,
+        'concentration_risk_score': concentration_risk_score(customers, suppliers) if scored else None
+    }
+
+
+def concentration_risk_score(customers: Dict[str, Any], suppliers: Dict[str, Any]) -> float:
+    """
+    Map customer/supplier HHI to a 0-100 risk score (higher is more concentrated).
+
+    Revenue dependency weighs more than supplier dependency.
+    """
+    score = 100.0 * (0.7 * customers['hhi'] + 0.3 * suppliers['hhi'])
+    return round(min(max(score, 0.0), 100.0), 2)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counterparty_index (
+    msme_id TEXT NOT NULL,
+    counterparty_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inflow REAL NOT NULL DEFAULT 0,
+    outflow REAL NOT NULL DEFAULT 0,
+    credit_count INTEGER NOT NULL DEFAULT 0,
+    debit_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (msme_id, counterparty_key)
+);
+CREATE INDEX IF NOT EXISTS idx_counterparty_index_key ON counterparty_index (counterparty_key);
+"""
+
+_UPSERT = """
+INSERT INTO counterparty_index
+    (msme_id, counterparty_key, name, inflow, outflow, credit_count, debit_count)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (msme_id, counterparty_key) DO UPDATE SET
+    inflow = inflow + excluded.inflow,
+    outflow = outflow + excluded.outflow,
+    credit_count = credit_count + excluded.credit_count,
+    debit_count = debit_count + excluded.debit_count
+"""
+
+
+class CounterpartyIndexStore:
+    """
+    SQLite-backed counterparty index, updated incrementally per MSME.
+    """
+
+    CONSUMER = "counterparty_index"
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the store.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+        ensure_ingestion_ledger(self.conn)
+
+    def ingest(self, msme_id: str, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Fold new transactions into an MSME's counterparty index.
+
+        Args:
+            msme_id: MSME identifier
+            transactions: Transactions to ingest
+
+        Returns:
+            Number of transactions newly added
+        """
+        if not transactions:
+            return 0
+
+        keyed = {transaction_key(tx): tx for tx in transactions}
+        unseen = filter_unseen_keys(self.conn, self.CONSUMER, msme_id, list(keyed.keys()))
+        if not unseen:
+            return 0
+
+        delta = build_counterparty_index([tx for key, tx in keyed.items() if key in unseen])
+        with self.conn:
+            self.conn.executemany(
+                _UPSERT,
+                [
+                    (msme_id, key, e['name'], e['inflow'], e['outflow'], e['credit_count'], e['debit_count'])
+                    for key, e in delta.items()
+                ]
+            )
+            record_seen_keys(self.conn, self.CONSUMER, msme_id, list(unseen))
+
+        logger.info(f"Counterparty index: ingested {len(unseen)} transactions for {msme_id}")
+        return len(unseen)
+
+    def get_index(self, msme_id: str) -> Dict[str, Dict[str, Any]]:
+        """Load an MSME's persisted counterparty index."""
+        rows = self.conn.execute(
+            "SELECT counterparty_key, name, inflow, outflow, credit_count, debit_count "
+            "FROM counterparty_index WHERE msme_id = ?",
+            (msme_id,)
+        ).fetchall()
+        return {
+            row['counterparty_key']: {
+                'name': row['name'],
+                'inflow': row['inflow'],
+                'outflow': row['outflow'],
+                'credit_count': row['credit_count'],
+                'debit_count': row['debit_count']
+            }
+            for row in rows
+        }
+
+    def concentration(self, msme_id: str, top_n: int = 3) -> Dict[str, Any]:
+        """Concentration metrics from the persisted index."""
+        return compute_concentration(self.get_index(msme_id), top_n)
+
+    def exposure(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Find every MSME that trades with a counterparty.
+
+        Args:
+            name: Counterparty name (normalized and hashed before lookup)
+
+        Shares are of the MSME's attributed flows, as in compute_concentration.
+
+        Returns:
+            List of {'msme_id', 'inflow', 'outflow', 'inflow_share', 'outflow_share'}
+            sorted by total volume
+        """
+        key = counterparty_key(name)
+        rows = self.conn.execute(
+            """
+            SELECT c.msme_id, c.inflow, c.outflow,
+                   t.total_inflow, t.total_outflow
+            FROM counterparty_index c
+            JOIN (
+                SELECT msme_id, SUM(inflow) AS total_inflow, SUM(outflow) AS total_outflow
+                FROM counterparty_index
+                WHERE msme_id IN (SELECT msme_id FROM counterparty_index WHERE counterparty_key = ?)
+                  AND counterparty_key != ?
+                GROUP BY msme_id
+            ) t ON t.msme_id = c.msme_id
+            WHERE c.counterparty_key = ?
+            ORDER BY c.inflow + c.outflow DESC
+            """,
+            (key, UNATTRIBUTED_KEY, key)
+        ).fetchall()
+        return [
+            {
+                'msme_id': row['msme_id'],
+                'inflow': row['inflow'],
+                'outflow': row['outflow'],
+                'inflow_share': row['inflow'] / row['total_inflow'] if row['total_inflow'] else 0.0,
+                'outflow_share': row['outflow'] / row['total_outflow'] if row['total_outflow'] else 0.0
+            }
+            for row in rows
+        ]
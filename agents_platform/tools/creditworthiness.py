@@ -0,0 +1,208 @@
+"""
+Tools for the overall creditworthiness score and portfolio re-ranking.
+
+The overall score (0-100) is a weighted sum of three 0-100 components:
+
+- financial_health: net cashflow, stability and volatility
+- behavioral: the 0-1000 behavioral score scaled to 0-100
+- policy_match: share of evaluated products the MSME is eligible for
+
+Components are persisted per report in the analytics database, so a change
+of weights re-ranks the whole portfolio with a single SQL query over the
+stored components, without re-running any agent.
+"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import sqlite3
+import logging
+
+from ..core.analytics_db import get_analytics_connection
+
+logger = logging.getLogger(__name__)
+
+
+COMPONENTS = ('financial_health', 'behavioral', 'policy_match')
+
+# Net cashflow at which the cashflow part of financial_health saturates
+NET_CASHFLOW_SCALE = 100000.0
+
+
+def creditworthiness_components(
+    financial_health: Dict[str, Any],
+    behavioral_score: Dict[str, Any],
+    product_recommendations: Dict[str, Any]
+) -> Dict[str, float]:
+    """
+    Compute the 0-100 components of the overall creditworthiness score.
+
+    Args:
+        financial_health: Financial health summary
+        behavioral_score: Behavioral score data
+        product_recommendations: Product recommendations
+
+    Returns:
+        Component name -> score
+    """
+    # Financial health component (0-100)
+    net_cf = financial_health.get('net_cashflow', 0)
+    stability = financial_health.get('cashflow_stability_score', 0)
+    volatility = financial_health.get('volatility_score', 0)
+
+    cf_score = min(100, max(0, (net_cf / NET_CASHFLOW_SCALE) * 100)) if net_cf > 0 else 0
+    health_score = (cf_score * 0.4 + stability * 100 * 0.4 + (1 - volatility) * 100 * 0.2)
+
+    # Behavioral score component (0-100)
+    b_score = behavioral_score.get('behavioral_score', 0)
+    behavioral_component = (b_score / 1000) * 100
+
+    # Product eligibility component (0-100)
+    best_fit = product_recommendations.get('best_fit_products', [])
+    eligible_count = len([p for p in best_fit if p.get('eligible', False)])
+    total_evaluated = product_recommendations.get('total_products_evaluated', 1)
+    eligibility_score = (eligible_count / max(total_evaluated, 1)) * 100 if total_evaluated > 0 else 0
+
+    return {
+        'financial_health': health_score,
+        'behavioral': behavioral_component,
+        'policy_match': eligibility_score
+    }
+
+
+def combine_components(components: Dict[str, float], weights: Dict[str, float]) -> float:
+    """
+    Combine components into the overall 0-100 creditworthiness score.
+
+    Args:
+        components: Component name -> score
+        weights: Component name -> weight (missing components weigh 0)
+
+    Returns:
+        Overall score, clamped to 0-100 and rounded to 2 decimals
+    """
+    overall = sum(components.get(name, 0.0) * weights.get(name, 0.0) for name in COMPONENTS)
+    return round(max(0, min(100, overall)), 2)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_components (
+    report_id TEXT PRIMARY KEY,
+    msme_id TEXT NOT NULL,
+    generated_at TEXT NOT NULL,
+    financial_health REAL NOT NULL,
+    behavioral REAL NOT NULL,
+    policy_match REAL NOT NULL,
+    overall REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_components_msme ON report_components (msme_id, generated_at);
+"""
+
+
+class CreditworthinessStore:
+    """
+    SQLite-backed creditworthiness components per report.
+    """
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the store.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+
+    def save(
+        self,
+        report_id: str,
+        msme_id: str,
+        components: Dict[str, float],
+        overall: float,
+        generated_at: Optional[datetime] = None
+    ) -> None:
+        """
+        Persist the components of one report (replacing a previous save).
+
+        Args:
+            report_id: Report identifier
+            msme_id: MSME identifier
+            components: Component name -> score
+            overall: Overall score under the weights used for the report
+            generated_at: Report timestamp (defaults to now)
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO report_components "
+                "(report_id, msme_id, generated_at, financial_health, behavioral, policy_match, overall) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report_id,
+                    msme_id,
+                    (generated_at or datetime.now()).isoformat(),
+                    *(float(components.get(name, 0.0)) for name in COMPONENTS),
+                    float(overall)
+                )
+            )
+
+    def rerank(
+        self,
+        weights: Dict[str, float],
+        msme_ids: Optional[List[str]] = None,
+        latest_only: bool = True,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rescore and rank persisted reports under new component weights.
+
+        The weighted sum, clamping and ordering run inside one SQL query.
+
+        Args:
+            weights: Component name -> weight (missing components weigh 0)
+            msme_ids: Optional MSME filter (None for the whole portfolio)
+            latest_only: Only rank each MSME's most recent report
+            limit: Optional number of top-ranked reports to return
+
+        Returns:
+            Reports ordered by the new score, each with rank, score,
+            previous_score, the components and report/MSME identifiers
+        """
+        clauses, params = [], []
+        if msme_ids:
+            clauses.append(f"msme_id IN ({','.join('?' * len(msme_ids))})")
+            params.extend(msme_ids)
+        if latest_only:
+            clauses.append(
+                "generated_at = (SELECT MAX(generated_at) FROM report_components latest "
+                "WHERE latest.msme_id = report_components.msme_id)"
+            )
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        query = (
+            "SELECT report_id, msme_id, generated_at, financial_health, behavioral, policy_match, "
+            "overall AS previous_score, "
+            "ROUND(MAX(0, MIN(100, financial_health * ? + behavioral * ? + policy_match * ?)), 2) AS score "
+            f"FROM report_components {where} "
+            "ORDER BY score DESC, msme_id, report_id"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        rows = self.conn.execute(
+            query,
+            [float(weights.get(name, 0.0)) for name in COMPONENTS] + params
+        ).fetchall()
+
+        return [
+            {
+                'rank': rank,
+                'report_id': row['report_id'],
+                'msme_id': row['msme_id'],
+                'generated_at': row['generated_at'],
+                'score': row['score'],
+                'previous_score': row['previous_score'],
+                'components': {name: round(row[name], 2) for name in COMPONENTS}
+            }
+            for rank, row in enumerate(rows, start=1)
+        ]
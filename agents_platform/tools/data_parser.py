@@ -4,10 +4,14 @@ Tools for parsing various data formats (CSV, PDF, JSON).
 
 import json
 import csv
+import hashlib
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 
+from ..core.config import settings
+from .narration_parser import annotate_narrations
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,12 +58,33 @@ def parse_csv_data(file_path: str) -> List[Dict[str, Any]]:
         raise
 
 
-def extract_transactions_from_json(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+def extract_transactions_from_json(
+    data: Dict[str, Any],
+    net_transfers: Optional[bool] = None,
+    consolidate: bool = True,
+    statement_rows: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
     """
     Extract transaction data from JSON structure.
     
+    With several bank_accounts, transfers between the MSME's own accounts are
+    matched and, when there is transfer evidence, tagged 'internal_transfer'
+    and excluded when netting is on (see transfer_netting).
+    
+    Narrations are parsed into 'channel', 'reference_no', 'vpa', 'ifsc' and
+    'counterparty' columns (see narration_parser).
+    
+    By default the result is the consolidated ledger: accounts are merged in
+    chronological order and every row carries 'account_balance' and
+    'consolidated_balance' (see consolidated_ledger).
+    
     Args:
         data: JSON data dictionary
+        net_transfers: Exclude evidenced internal transfers (defaults to settings.NET_INTERNAL_TRANSFERS)
+        consolidate: Merge accounts into the consolidated ledger (False keeps statement order)
+        statement_rows: Optional list that is filled with the normalized rows in
+            statement order, before consolidation and netting (e.g. for balance
+            continuity checks without a second extraction)
         
     Returns:
         List of transaction dictionaries
@@ -105,13 +130,76 @@ def extract_transactions_from_json(data: Dict[str, Any]) -> List[Dict[str, Any]]
             'type': tx.get('type', 'unknown'),
             'category': tx.get('category'),
             'account_id': tx.get('account_id', ''),
-            'bank': tx.get('bank', '')
+            'bank': tx.get('bank', ''),
+            'page': tx.get('page', tx.get('page_number')),
+            'counterparty': tx.get('counterparty')
         }
         normalized.append(normalized_tx)
     
+    annotate_narrations(normalized)
+    if statement_rows is not None:
+        statement_rows.extend(normalized)
+    
+    if consolidate:
+        from .consolidated_ledger import build_consolidated_ledger
+        normalized = build_consolidated_ledger(normalized)
+    
+    if 'bank_accounts' in data:
+        from .transfer_netting import net_internal_transfers
+        if net_transfers is None:
+            net_transfers = settings.NET_INTERNAL_TRANSFERS
+        normalized = net_internal_transfers(
+            normalized,
+            window_days=settings.TRANSFER_MATCH_WINDOW_DAYS,
+            exclude=net_transfers
+        )
+    
     return normalized
 
 
+def transaction_key(tx: Dict[str, Any]) -> str:
+    """
+    Build a stable content hash for a transaction.
+    
+    The key only depends on the account, date, amount, narration and running
+    balance, so re-ingesting the same statement yields the same keys.
+    
+    Args:
+        tx: Transaction dictionary (normalized or raw)
+        
+    Returns:
+        16-character hex digest
+    """
+    date = parse_date(tx.get('date', tx.get('transaction_date', '')))
+    balance = tx.get('balance_after', tx.get('balance'))
+    raw = "|".join([
+        str(tx.get('account_id', '')),
+        date.isoformat(),
+        f"{float(tx.get('amount', tx.get('transaction_amount', 0))):.2f}",
+        str(tx.get('description', tx.get('desc', tx.get('narration', tx.get('remarks', ''))))),
+        f"{float(balance):.2f}" if balance not in (None, '') else ''
+    ])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def transaction_ref(tx: Dict[str, Any]) -> str:
+    """
+    Build a compact, stable reference to a transaction ("<account_id>:<key>").
+    
+    Reports carry this reference instead of the full transaction; it can be
+    resolved through the transaction store.
+    
+    Args:
+        tx: Transaction dictionary (normalized or raw)
+        
+    Returns:
+        Reference string
+    """
+    account_id = str(tx.get('account_id') or '')
+    key = transaction_key(tx)
+    return f"{account_id}:{key}" if account_id else key
+
+
 def parse_date(date_str: Any) -> datetime:
     """
     Parse date string to datetime object.
@@ -0,0 +1,566 @@
+"""
+Tools for incremental early-warning monitoring of existing borrowers.
+
+Declarative rules (loaded from DATA_DIR/early_warning_rules.json, or the
+defaults below) are evaluated only on newly ingested transactions against a
+compact per-borrower state kept in the analytics database:
+
+- balance_below: consolidated balance below a threshold for N days
+- cheque_bounce: a return entry (or a charge-only bounce) within the last N days
+- inflow_drop: a closed month's inflow dropped by a share from the month before
+- new_emi: an EMI debit to a lender (or of an amount) not seen before
+
+The state holds each account's last balance, the running low-balance streak
+per rule, the inflow of the last few months, recent bounce days and the known
+EMI payees, so an ingestion costs O(new transactions) regardless of how much
+history a borrower has and no report is recomputed. A borrower's first
+ingestion (the underwriting statement) builds the state without raising
+alerts. Transactions are keyed through the shared ingestion ledger, so
+re-sending a statement never raises the same alert twice.
+"""
+
+from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from datetime import datetime
+import copy
+import json
+import os
+import sqlite3
+import logging
+
+from .data_parser import parse_date, transaction_key
+from .cheque_returns import classify_bounce_entry
+from .recurring_payments import is_emi_transaction
+from .counterparty_analyzer import extract_counterparty, normalize_counterparty
+from .window_metrics import month_range
+from ..core.analytics_db import (
+    get_analytics_connection,
+    ensure_ingestion_ledger,
+    filter_unseen_keys,
+    record_seen_keys
+)
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Rule type -> default parameters
+RULE_PARAMETERS = {
+    'balance_below': {'threshold': 10000.0, 'days': 7},
+    'cheque_bounce': {'window_days': 30},
+    'inflow_drop': {'min_drop': 0.3, 'min_previous_inflow': 0.0},
+    'new_emi': {'amount_tolerance': 0.05}
+}
+
+DEFAULT_EARLY_WARNING_RULES = [
+    {"rule_id": "low_balance_7d", "type": "balance_below", "threshold": 10000.0, "days": 7, "severity": "high"},
+    {"rule_id": "bounce_30d", "type": "cheque_bounce", "window_days": 30, "severity": "high"},
+    {"rule_id": "inflow_drop_30pct", "type": "inflow_drop", "min_drop": 0.3, "severity": "medium"},
+    {"rule_id": "new_emi", "type": "new_emi", "amount_tolerance": 0.05, "severity": "medium"}
+]
+
+# Months of inflow kept per borrower (the open month and the two before it)
+STATE_MONTHS = 3
+
+# Days a return charge is attributed to an earlier bounce instead of counting as a new one
+CHARGE_WINDOW_DAYS = 10
+
+
+def normalize_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a rule and fill in default parameters.
+
+    Args:
+        rule: Rule with rule_id, type, optional severity and parameters
+
+    Returns:
+        Normalized rule
+
+    Raises:
+        ValueError: If the rule has no id or an unknown type
+    """
+    rule_type = rule.get('type')
+    if rule_type not in RULE_PARAMETERS:
+        raise ValueError(f"Unknown early-warning rule type: {rule_type}")
+    if not rule.get('rule_id'):
+        raise ValueError(f"Early-warning rule of type {rule_type} has no rule_id")
+    return {'severity': 'medium', **RULE_PARAMETERS[rule_type], **rule}
+
+
+def load_early_warning_rules() -> List[Dict[str, Any]]:
+    """
+    Load early-warning rules from DATA_DIR/early_warning_rules.json.
+
+    Falls back to the default rules when the file is missing, unreadable or
+    empty; invalid rules are skipped with a warning.
+
+    Returns:
+        List of normalized rules
+    """
+    rules = []
+    rule_file = os.path.join(settings.DATA_DIR, 'early_warning_rules.json')
+    if os.path.exists(rule_file):
+        try:
+            with open(rule_file, 'r') as f:
+                rules = json.load(f)
+            logger.info(f"Loaded {len(rules)} early-warning rules from file")
+        except Exception as e:
+            logger.warning(f"Could not load early-warning rules from file: {e}")
+
+    if not rules:
+        rules = copy.deepcopy(DEFAULT_EARLY_WARNING_RULES)
+
+    normalized = []
+    for rule in rules:
+        try:
+            normalized.append(normalize_rule(rule))
+        except ValueError as e:
+            logger.warning(f"Skipping early-warning rule: {e}")
+    return normalized
+
+
+def new_borrower_state() -> Dict[str, Any]:
+    """Empty monitoring state of a borrower."""
+    return {
+        'last_day': None,
+        'balances': {},
+        'current_month': None,
+        'months': {},
+        'bounces': [],
+        'emis': [],
+        'rules': {}
+    }
+
+
+def _alert(rule: Dict[str, Any], day: int, message: str, details: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an alert raised by a rule on a day (ordinal)."""
+    return {
+        'rule_id': rule['rule_id'],
+        'rule_type': rule['type'],
+        'severity': rule['severity'],
+        'event_date': datetime.fromordinal(day).date().isoformat(),
+        'message': message,
+        'details': details
+    }
+
+
+def _check_balance(rule: Dict[str, Any], rule_state: Dict[str, Any], day: int, balance: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Extend or reset a low-balance streak and alert once it lasts the rule's days."""
+    if balance is None or balance >= rule['threshold']:
+        rule_state['low_since'] = None
+        rule_state['alerted'] = False
+        return None
+
+    if rule_state.get('low_since') is None:
+        rule_state['low_since'] = day
+    days = day - rule_state['low_since'] + 1
+    if days < rule['days'] or rule_state.get('alerted'):
+        return None
+
+    rule_state['alerted'] = True
+    return _alert(
+        rule,
+        day,
+        f"Balance below ₹{rule['threshold']:,.0f} for {days} days (₹{balance:,.2f})",
+        {'balance': round(balance, 2), 'threshold': rule['threshold'], 'days': days,
+         'low_since': datetime.fromordinal(rule_state['low_since']).date().isoformat()}
+    )
+
+
+def _check_inflow_drop(rule: Dict[str, Any], month: str, inflow: float, previous: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Alert when a closed month's inflow dropped from the month before."""
+    if previous is None or previous <= 0 or previous < rule['min_previous_inflow']:
+        return None
+    drop = 1.0 - inflow / previous
+    if drop < rule['min_drop']:
+        return None
+    year, number = int(month[:4]), int(month[5:7])
+    last_day = datetime(year + number // 12, number % 12 + 1, 1).toordinal() - 1
+    return _alert(
+        rule,
+        last_day,
+        f"Inflow in {month} dropped {drop:.0%} from the previous month (₹{inflow:,.2f} vs ₹{previous:,.2f})",
+        {'month': month, 'inflow': round(inflow, 2), 'previous_inflow': round(previous, 2), 'drop': round(drop, 4)}
+    )
+
+
+def _close_months(
+    state: Dict[str, Any],
+    up_to: str,
+    rules: List[Dict[str, Any]],
+    alerts: List[Dict[str, Any]],
+    emit: bool
+) -> None:
+    """Close every tracked month before up_to and evaluate the inflow-drop rules on each."""
+    current = state['current_month']
+    if current is None or up_to <= current:
+        return
+
+    months = state['months']
+    for month in month_range(current, up_to)[:-1]:
+        inflow = months.setdefault(month, 0.0)
+        earlier = [m for m in months if m < month]
+        previous = months[max(earlier)] if earlier else None
+        if emit:
+            for rule in rules:
+                alert = _check_inflow_drop(rule, month, inflow, previous)
+                if alert:
+                    alerts.append(alert)
+    state['current_month'] = up_to
+
+
+def _record_bounce(
+    state: Dict[str, Any],
+    rules: List[Dict[str, Any]],
+    tx: Dict[str, Any],
+    kind: str,
+    day: int,
+    reference_day: int,
+    alerts: List[Dict[str, Any]],
+    emit: bool
+) -> None:
+    """Record a return entry or charge and alert when it is recent enough."""
+    bounces = state['bounces']
+    if kind == 'charge' and any(0 <= day - other <= CHARGE_WINDOW_DAYS for other in bounces):
+        # Charge for a bounce already counted
+        return
+    bounces.append(day)
+
+    if not emit:
+        return
+    for rule in rules:
+        if reference_day - day > rule['window_days']:
+            continue
+        recent = sum(1 for other in bounces if 0 <= reference_day - other <= rule['window_days'])
+        alerts.append(_alert(
+            rule,
+            day,
+            f"Bounce in the last {rule['window_days']} days: {tx.get('description', '')}",
+            {'amount': abs(float(tx.get('amount', 0))), 'description': str(tx.get('description', '')),
+             'bounces_in_window': recent}
+        ))
+
+
+def _record_emi(
+    state: Dict[str, Any],
+    rules: List[Dict[str, Any]],
+    tx: Dict[str, Any],
+    day: int,
+    alerts: List[Dict[str, Any]],
+    emit: bool
+) -> None:
+    """Record an EMI debit and alert when its lender and amount are new."""
+    lender = extract_counterparty(tx) or normalize_counterparty(tx.get('description', ''))
+    amount = abs(float(tx.get('amount', 0)))
+    tolerance = max((rule['amount_tolerance'] for rule in rules), default=0.05)
+    for known_lender, known_amount in state['emis']:
+        if known_lender == lender and abs(amount - known_amount) <= tolerance * known_amount:
+            return
+    state['emis'].append([lender, amount])
+
+    if not emit:
+        return
+    for rule in rules:
+        alerts.append(_alert(
+            rule,
+            day,
+            f"New EMI detected: ₹{amount:,.2f} to {lender}",
+            {'lender': lender, 'amount': amount, 'description': str(tx.get('description', ''))}
+        ))
+
+
+def evaluate_transactions(
+    state: Dict[str, Any],
+    transactions: List[Dict[str, Any]],
+    rules: List[Dict[str, Any]],
+    as_of: Optional[Any] = None,
+    emit: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Fold new transactions into a borrower's state and evaluate the rules.
+
+    Transactions are processed day by day in date order. Balance streaks are
+    evaluated on each day's closing consolidated balance (the sum of every
+    account's last balance) and, when as_of is later than the last
+    transaction, carried forward to as_of since the balance is unchanged
+    until then. Months are closed (and the inflow-drop rules evaluated) once
+    a later month is seen. Rows dated before the state's last day still
+    update inflows, bounces and EMIs, but not balances or streaks.
+
+    Args:
+        state: Borrower state (see new_borrower_state), updated in place
+        transactions: Newly ingested transactions
+        rules: Normalized rules
+        as_of: Optional date the statement is complete up to
+        emit: Raise alerts (False to only build the state)
+
+    Returns:
+        List of alerts
+    """
+    by_type = defaultdict(list)
+    for rule in rules:
+        by_type[rule['type']].append(rule)
+    rule_states = state['rules']
+    balances = state['balances']
+    months = state['months']
+
+    days = defaultdict(list)
+    for tx in transactions:
+        days[parse_date(tx.get('date')).toordinal()].append(tx)
+    as_of_day = parse_date(as_of).toordinal() if as_of is not None else None
+    reference_day = max([d for d in (state['last_day'], as_of_day, max(days, default=None)) if d is not None], default=0)
+
+    alerts: List[Dict[str, Any]] = []
+
+    def check_balances(day: int) -> None:
+        balance = sum(value for value, _ in balances.values()) if balances else None
+        for rule in by_type['balance_below']:
+            alert = _check_balance(rule, rule_states.setdefault(rule['rule_id'], {}), day, balance)
+            if alert and emit:
+                alerts.append(alert)
+
+    for day in sorted(days):
+        date = datetime.fromordinal(day)
+        month = f"{date.year}-{date.month:02d}"
+        if state['current_month'] is None:
+            state['current_month'] = month
+        _close_months(state, month, by_type['inflow_drop'], alerts, emit)
+
+        late = state['last_day'] is not None and day < state['last_day']
+        # Return entries are recorded before charges so a charge is attributed to its return
+        day_rows = sorted(days[day], key=lambda tx: classify_bounce_entry(tx) == 'charge')
+        for tx in day_rows:
+            amount = float(tx.get('amount', 0))
+            if amount > 0 and not tx.get('internal_transfer') and (month >= state['current_month'] or month in months):
+                months[month] = months.get(month, 0.0) + amount
+
+            account = str(tx.get('account_id') or '')
+            previous = balances.get(account)
+            if previous is None or day >= previous[1]:
+                reported = tx.get('balance_after', tx.get('balance'))
+                if reported not in (None, ''):
+                    balances[account] = [float(reported), day]
+                elif previous is not None:
+                    balances[account] = [previous[0] + amount, day]
+
+            kind = classify_bounce_entry(tx)
+            if kind:
+                _record_bounce(state, by_type['cheque_bounce'], tx, kind, day, reference_day, alerts, emit)
+            elif by_type['new_emi'] and is_emi_transaction(tx):
+                _record_emi(state, by_type['new_emi'], tx, day, alerts, emit)
+
+        if not late:
+            check_balances(day)
+            state['last_day'] = day
+
+    if as_of_day is not None and state['last_day'] is not None and as_of_day > state['last_day']:
+        check_balances(as_of_day)
+        as_of_date = datetime.fromordinal(as_of_day)
+        _close_months(state, f"{as_of_date.year}-{as_of_date.month:02d}", by_type['inflow_drop'], alerts, emit)
+
+    # Only the last STATE_MONTHS months are kept, and bounces older than every window no longer matter
+    for stale in sorted(months)[:-STATE_MONTHS]:
+        del months[stale]
+    horizon = max((rule['window_days'] for rule in by_type['cheque_bounce']), default=0) + CHARGE_WINDOW_DAYS
+    state['bounces'] = [day for day in state['bounces'] if reference_day - day <= horizon]
+
+    return alerts
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS early_warning_state (
+    msme_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS early_warning_alerts (
+    alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    msme_id TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    rule_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    event_date TEXT NOT NULL,
+    message TEXT NOT NULL,
+    details TEXT NOT NULL,
+    raised_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_early_warning_alerts_msme ON early_warning_alerts (msme_id, alert_id);
+"""
+
+
+class EarlyWarningEngine:
+    """
+    SQLite-backed early-warning state and alerts per borrower.
+    """
+
+    CONSUMER = "early_warning"
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None, rules: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+            rules: Optional rules (defaults to load_early_warning_rules())
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+        ensure_ingestion_ledger(self.conn)
+        self.rules = [normalize_rule(rule) for rule in rules] if rules is not None else load_early_warning_rules()
+
+    def _load_states(self, msme_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Load the persisted states of several borrowers."""
+        states = {}
+        for start in range(0, len(msme_ids), 500):
+            chunk = msme_ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT msme_id, state FROM early_warning_state WHERE msme_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            states.update((row['msme_id'], json.loads(row['state'])) for row in rows)
+        return states
+
+    def ingest(self, msme_id: str, transactions: List[Dict[str, Any]], as_of: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate one borrower's newly ingested transactions.
+
+        Args:
+            msme_id: MSME identifier
+            transactions: Transactions (already ingested ones are skipped)
+            as_of: Optional date the statement is complete up to
+
+        Returns:
+            List of alerts raised
+        """
+        return self.ingest_batch({msme_id: transactions}, as_of=as_of)['alerts']
+
+    def ingest_batch(self, batches: Dict[str, List[Dict[str, Any]]], as_of: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Evaluate newly ingested transactions of many borrowers in one database transaction.
+
+        A borrower seen for the first time gets a baseline state and no alerts.
+
+        Args:
+            batches: MSME id -> transactions
+            as_of: Optional date the statements are complete up to
+
+        Returns:
+            Dictionary with borrowers (updated), transactions (new), baselined and alerts
+        """
+        now = datetime.now().isoformat()
+        state_rows = []
+        alert_rows = []
+        alerts = []
+        new_count = 0
+        baselined = 0
+
+        # Read, evaluate and write states under one write lock, so engines
+        # sharing the database file cannot overwrite each other's updates
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            states = self._load_states(list(batches))
+
+            for msme_id, transactions in batches.items():
+                keyed = {transaction_key(tx): tx for tx in transactions or []}
+                unseen = filter_unseen_keys(self.conn, self.CONSUMER, msme_id, list(keyed)) if keyed else set()
+                state = states.get(msme_id)
+                if not unseen and (state is None or as_of is None):
+                    continue
+
+                baseline = state is None
+                if baseline:
+                    state = new_borrower_state()
+                    baselined += 1
+                raised = evaluate_transactions(
+                    state,
+                    [tx for key, tx in keyed.items() if key in unseen],
+                    self.rules,
+                    as_of=as_of,
+                    emit=not baseline
+                )
+
+                state_rows.append((msme_id, json.dumps(state), now))
+                record_seen_keys(self.conn, self.CONSUMER, msme_id, list(unseen))
+                new_count += len(unseen)
+                for alert in raised:
+                    alert = {'msme_id': msme_id, **alert, 'raised_at': now}
+                    alerts.append(alert)
+                    alert_rows.append((
+                        msme_id, alert['rule_id'], alert['rule_type'], alert['severity'],
+                        alert['event_date'], alert['message'], json.dumps(alert['details']), now
+                    ))
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO early_warning_state (msme_id, state, updated_at) VALUES (?, ?, ?)",
+                state_rows
+            )
+            self.conn.executemany(
+                "INSERT INTO early_warning_alerts "
+                "(msme_id, rule_id, rule_type, severity, event_date, message, details, raised_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                alert_rows
+            )
+
+        if alerts:
+            logger.info(f"Early warning: {len(alerts)} alerts for {len(batches)} borrowers")
+        return {
+            'borrowers': len(state_rows),
+            'transactions': new_count,
+            'baselined': baselined,
+            'alerts': alerts
+        }
+
+    def alerts(
+        self,
+        msme_ids: Optional[List[str]] = None,
+        rule_ids: Optional[List[str]] = None,
+        severity: Optional[str] = None,
+        since: Optional[Any] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Query raised alerts, newest first.
+
+        Args:
+            msme_ids: Optional MSME filter
+            rule_ids: Optional rule filter
+            severity: Optional severity filter
+            since: Optional earliest event date
+            limit: Maximum number of alerts
+
+        Returns:
+            List of alerts
+        """
+        conditions = []
+        params: List[Any] = []
+        if msme_ids:
+            conditions.append(f"msme_id IN ({','.join('?' * len(msme_ids))})")
+            params.extend(msme_ids)
+        if rule_ids:
+            conditions.append(f"rule_id IN ({','.join('?' * len(rule_ids))})")
+            params.extend(rule_ids)
+        if severity:
+            conditions.append("severity = ?")
+            params.append(severity)
+        if since is not None:
+            conditions.append("event_date >= ?")
+            params.append(parse_date(since).date().isoformat())
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+        rows = self.conn.execute(
+            f"SELECT * FROM early_warning_alerts {where}ORDER BY alert_id DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [{**dict(row), 'details': json.loads(row['details'])} for row in rows]
+
+    def state(self, msme_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a borrower's monitoring state.
+
+        Args:
+            msme_id: MSME identifier
+
+        Returns:
+            State dictionary or None when the borrower is not monitored
+        """
+        return self._load_states([msme_id]).get(msme_id)
@@ -0,0 +1,259 @@
+"""
+Tools for the what-if eligibility frontier of an MSME across lender products.
+
+Policy matching says which requirements a product failed; the frontier says
+what it would take to pass them. Every eligibility criterion is a one-sided
+threshold and every risk bucket an interval on behavioral score and
+volatility, so the minimal change of a metric is its distance to the
+threshold or interval, in closed form:
+
+- to become eligible: the gap of each unmet criterion (net cashflow,
+  behavioral score, volatility, stability, red flags and trailing-window
+  criteria)
+- to reach a better risk bucket: the move of behavioral score (up) and
+  volatility (down) onto each lower-risk bucket's bounds than the current one
+
+Only risk-reducing moves are suggested. A bucket range with a volatility
+floor or a score ceiling can exclude an MSME that is on the better side of
+it (e.g. volatility below a medium bucket's range); such a bound counts as
+met, and the bucket gets a note that the gap is in the policy's bucket
+classification rather than in the MSME's metrics.
+
+Changes are per metric with the other metrics held constant; the behavioral
+score is itself derived from cashflow metrics, so moving one of those may
+also move the score.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from .window_metrics import WINDOW_CRITERION_PATTERN, WINDOW_METRIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+# Metric -> (eligibility criterion, bound, default value of the criterion)
+ELIGIBILITY_CRITERIA = {
+    'net_cashflow': ('min_net_cashflow', 'min', 0),
+    'behavioral_score': ('min_behavioral_score', 'min', 0),
+    'volatility': ('max_volatility', 'max', 1.0),
+    'stability': ('min_stability_score', 'min', 0),
+    'red_flags': ('max_red_flags', 'max', 999)
+}
+
+# Risk buckets from lowest to highest risk
+RISK_TIER_ORDER = ('low', 'medium', 'high')
+
+# Metrics that decide the risk bucket, and whether a higher value is less risky
+BUCKET_METRICS = (('behavioral_score', True), ('volatility', False))
+
+
+def eligibility_metrics(
+    financial_health: Dict[str, Any],
+    behavioral_score: Dict[str, Any],
+    features: Optional[Dict[str, Any]] = None
+) -> Dict[str, float]:
+    """
+    Collect the metrics lender eligibility criteria are checked against.
+
+    Net cashflow, volatility and stability are read from the feature vector
+    when given, otherwise from the financial health summary.
+
+    Args:
+        financial_health: Financial health summary
+        behavioral_score: Behavioral score
+        features: Optional feature vector
+
+    Returns:
+        Dictionary with net_cashflow, behavioral_score, volatility, stability and red_flags
+    """
+    derived = features or financial_health
+    return {
+        'net_cashflow': derived.get('net_cashflow', 0),
+        'behavioral_score': behavioral_score.get('behavioral_score', 0),
+        'volatility': derived.get('volatility_score', 1.0),
+        'stability': derived.get('cashflow_stability_score', 0),
+        'red_flags': len(behavioral_score.get('red_flags', []))
+    }
+
+
+def _threshold_change(current: Optional[float], bound: str, limit: float) -> Optional[Dict[str, Any]]:
+    """Change needed to meet a one-sided threshold (None when already met)."""
+    if current is not None and (current >= limit if bound == 'min' else current <= limit):
+        return None
+    return {
+        'current': current,
+        'required': limit,
+        'change': round(limit - current, 4) if current is not None else None
+    }
+
+
+def _bucket_intervals(bucket: Dict[str, Any]) -> Optional[Tuple[Tuple[Optional[float], Optional[float]], ...]]:
+    """
+    Behavioral score and volatility intervals of a risk bucket.
+
+    Mirrors the bucket semantics of policy matching: a one-element or scalar
+    score is a minimum, a one-element or scalar volatility a maximum, and a
+    pair is an inclusive range. Buckets with an empty range never match.
+    """
+    score = bucket.get('behavioral_score', [])
+    volatility = bucket.get('volatility', [])
+    if isinstance(score, list):
+        if len(score) not in (1, 2):
+            return None
+        score_interval = (score[0], score[1] if len(score) == 2 else None)
+    else:
+        score_interval = (score, None)
+    if isinstance(volatility, list):
+        if len(volatility) not in (1, 2):
+            return None
+        volatility_interval = tuple(volatility) if len(volatility) == 2 else (None, volatility[0])
+    else:
+        volatility_interval = (None, volatility)
+    return score_interval, volatility_interval
+
+
+def _interval_change(
+    current: float,
+    interval: Tuple[Optional[float], Optional[float]],
+    higher_is_better: bool
+) -> Optional[Dict[str, Any]]:
+    """
+    Risk-reducing change needed to meet a bucket interval (None when met).
+
+    Only the bound on the risky side is a target; the metric being past the
+    other bound (e.g. volatility below the range) counts as met.
+    """
+    low, high = interval
+    if higher_is_better and low is not None and current < low:
+        target = low
+    elif not higher_is_better and high is not None and current > high:
+        target = high
+    else:
+        return None
+    return {'current': current, 'required': target, 'change': round(target - current, 4)}
+
+
+def _past_safe_bound(current: float, interval: Tuple[Optional[float], Optional[float]], higher_is_better: bool) -> bool:
+    """Whether a metric lies outside an interval on its less risky side."""
+    low, high = interval
+    if higher_is_better:
+        return high is not None and current > high
+    return low is not None and current < low
+
+
+def compute_eligibility_frontier(
+    product: Dict[str, Any],
+    metrics: Dict[str, float],
+    window_metrics: Optional[Dict[str, Any]] = None,
+    risk_bucket: str = 'high'
+) -> Dict[str, Any]:
+    """
+    Compute the minimal metric changes for one product.
+
+    Args:
+        product: Lender policy with eligibility_criteria and risk_buckets
+        metrics: Eligibility metrics (see eligibility_metrics)
+        window_metrics: Optional trailing-window metrics keyed by "<n>m"
+        risk_bucket: The MSME's current risk bucket for the product
+
+    Returns:
+        Dictionary with eligible, risk_bucket, to_eligible (metric -> current,
+        required and change for every unmet criterion) and better_buckets
+        (lower-risk buckets with the score/volatility changes to reach them)
+    """
+    criteria = product.get('eligibility_criteria', {})
+    window_metrics = window_metrics or {}
+
+    to_eligible = {}
+    for metric, (criterion, bound, default) in ELIGIBILITY_CRITERIA.items():
+        change = _threshold_change(metrics[metric], bound, criteria.get(criterion, default))
+        if change:
+            to_eligible[metric] = change
+
+    for criterion, limit in criteria.items():
+        match = WINDOW_CRITERION_PATTERN.match(criterion)
+        if not match:
+            continue
+        bound, metric, months = match.groups()
+        window = window_metrics.get(f"{months}m")
+        current = window[WINDOW_METRIC_FIELDS[metric]] if window and window.get('months') else None
+        change = _threshold_change(current, bound, limit)
+        if change:
+            to_eligible[f"{metric}_{months}m"] = change
+
+    rank = RISK_TIER_ORDER.index(risk_bucket) if risk_bucket in RISK_TIER_ORDER else len(RISK_TIER_ORDER)
+    rates = product.get('interest_rate_range', {})
+    better_buckets = []
+    for name, bucket in product.get('risk_buckets', {}).items():
+        if name not in RISK_TIER_ORDER or RISK_TIER_ORDER.index(name) >= rank:
+            continue
+        intervals = _bucket_intervals(bucket)
+        if intervals is None:
+            continue
+        changes = {}
+        past_bounds = []
+        for (metric, higher_is_better), interval in zip(BUCKET_METRICS, intervals):
+            change = _interval_change(metrics[metric], interval, higher_is_better)
+            if change:
+                changes[metric] = change
+            elif _past_safe_bound(metrics[metric], interval, higher_is_better):
+                past_bounds.append(metric.replace('_', ' '))
+        note = None
+        if past_bounds:
+            note = (
+                f"{' and '.join(past_bounds).capitalize()} already better than this bucket's range; "
+                f"the bucket classification, not the metric, keeps the MSME out of it"
+            )
+        better_buckets.append({
+            'risk_bucket': name,
+            'interest_rate': rates.get(name),
+            'changes': changes,
+            'note': note
+        })
+    better_buckets.sort(key=lambda b: RISK_TIER_ORDER.index(b['risk_bucket']), reverse=True)
+
+    return {
+        'product_id': product.get('product_id'),
+        'product_name': product.get('product_name'),
+        'lender_name': product.get('lender_name'),
+        'eligible': not to_eligible,
+        'risk_bucket': risk_bucket,
+        'to_eligible': to_eligible,
+        'better_buckets': better_buckets
+    }
+
+
+def compute_eligibility_frontiers(
+    policies: List[Dict[str, Any]],
+    metrics: Dict[str, float],
+    window_metrics: Optional[Dict[str, Any]] = None,
+    risk_buckets: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compute the eligibility frontier across all products.
+
+    Products are ordered by how close they are: eligible products first,
+    then by the number of criteria still to meet.
+
+    Args:
+        policies: Lender policies
+        metrics: Eligibility metrics (see eligibility_metrics)
+        window_metrics: Optional trailing-window metrics keyed by "<n>m"
+        risk_buckets: Optional product id -> current risk bucket (defaults to "high")
+
+    Returns:
+        List of per-product frontiers
+    """
+    risk_buckets = risk_buckets or {}
+    frontiers = [
+        compute_eligibility_frontier(
+            product,
+            metrics,
+            window_metrics,
+            risk_buckets.get(product.get('product_id'), 'high')
+        )
+        for product in policies
+    ]
+    frontiers.sort(key=lambda f: len(f['to_eligible']))
+    return frontiers
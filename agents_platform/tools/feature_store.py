@@ -0,0 +1,296 @@
+"""
+Tools for the per-MSME feature store.
+
+The analysis stage derives one typed FeatureVector per MSME per as-of date
+(cashflow totals, stability, volatility, red flags, EMI and cheque bounce
+counts, GST compliance) and writes it once; scoring, policy matching,
+explainability and portfolio jobs read it instead of re-deriving the same
+values from loose dicts.
+
+Vectors are stored in the analytics database with one column per feature,
+keyed by (MSME, as-of date, version). The version is FEATURE_VERSION, bumped
+whenever a feature definition changes, so vectors computed under an older
+definition are never mixed with current ones. Reads are point lookups (the
+latest vector as of a date) or batch scans across MSMEs.
+"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import json
+import sqlite3
+import logging
+
+from .data_parser import parse_date
+from .anomaly_detector import detect_red_flags
+from .health_calculator import count_emi_transactions, count_cheque_bounces, analyze_gst_data
+from ..core.analytics_db import get_analytics_connection
+from ..core.types import FeatureVector
+
+logger = logging.getLogger(__name__)
+
+
+FEATURE_VERSION = 2
+
+# Scalar features and profile attributes stored as columns (red_flags is stored as JSON)
+FEATURE_COLUMNS = {
+    'total_inflow': 'REAL',
+    'total_outflow': 'REAL',
+    'net_cashflow': 'REAL',
+    'average_balance': 'REAL',
+    'cashflow_stability_score': 'REAL',
+    'volatility_score': 'REAL',
+    'transaction_count': 'INTEGER',
+    'red_flag_count': 'INTEGER',
+    'emi_count': 'INTEGER',
+    'cheque_bounces': 'INTEGER',
+    'gst_filings': 'INTEGER',
+    'gst_compliance_rate': 'REAL',
+    'sector': 'TEXT',
+    'msme_type': 'TEXT'
+}
+
+
+def _as_of_date(value: Any) -> str:
+    """ISO date (YYYY-MM-DD) of an as-of value."""
+    return parse_date(value).date().isoformat()
+
+
+def build_feature_vector(
+    msme_id: str,
+    financial_health: Dict[str, Any],
+    transactions: Optional[List[Dict[str, Any]]] = None,
+    health_analysis: Optional[Dict[str, Any]] = None,
+    gst_data: Optional[Dict[str, Any]] = None,
+    red_flags: Optional[List[str]] = None,
+    as_of: Optional[Any] = None,
+    msme_profile: Optional[Dict[str, Any]] = None
+) -> FeatureVector:
+    """
+    Derive an MSME's feature vector.
+
+    Counts come from the health analysis when it is available, otherwise
+    from the transactions; red flags are detected when not given.
+
+    Args:
+        msme_id: MSME identifier
+        financial_health: Financial health summary
+        transactions: Normalized transactions
+        health_analysis: Optional health analysis summary
+        gst_data: Optional input data with 'gst_filings'
+        red_flags: Optional red flags already detected
+        as_of: As-of date (defaults to the financial health period end)
+        msme_profile: Optional MSME profile (sector, msme_type)
+
+    Returns:
+        FeatureVector
+    """
+    transactions = transactions or []
+    msme_profile = msme_profile or {}
+    if red_flags is None:
+        red_flags = detect_red_flags(transactions, financial_health)
+
+    if health_analysis:
+        emi_count = health_analysis.get('emi_transactions', 0)
+        cheque_bounces = health_analysis.get('cheque_bounces', 0)
+        gst = health_analysis.get('gst_analysis') or {}
+    else:
+        emi_count = count_emi_transactions(transactions)
+        cheque_bounces = count_cheque_bounces(transactions)
+        gst = analyze_gst_data(gst_data) if gst_data else {}
+
+    gst_filings = gst.get('total_filings', 0)
+    return FeatureVector(
+        msme_id=msme_id,
+        as_of=_as_of_date(as_of or financial_health.get('period_end') or datetime.now()),
+        version=FEATURE_VERSION,
+        computed_at=datetime.now(),
+        total_inflow=financial_health.get('total_inflow', 0.0),
+        total_outflow=financial_health.get('total_outflow', 0.0),
+        net_cashflow=financial_health.get('net_cashflow', 0.0),
+        average_balance=financial_health.get('average_balance', 0.0),
+        cashflow_stability_score=financial_health.get('cashflow_stability_score', 0.0),
+        volatility_score=financial_health.get('volatility_score', 0.0),
+        transaction_count=financial_health.get('transaction_count', len(transactions)),
+        red_flag_count=len(red_flags),
+        red_flags=list(red_flags),
+        emi_count=emi_count,
+        cheque_bounces=cheque_bounces,
+        gst_filings=gst_filings,
+        gst_compliance_rate=gst.get('compliance_rate') if gst_filings else None,
+        sector=msme_profile.get('sector'),
+        msme_type=msme_profile.get('msme_type')
+    )
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS feature_vectors (
+    msme_id TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    computed_at TEXT NOT NULL,
+    {', '.join(f'{name} {sql_type}' for name, sql_type in FEATURE_COLUMNS.items())},
+    red_flags TEXT NOT NULL,
+    PRIMARY KEY (msme_id, version, as_of)
+);
+"""
+
+_COLUMNS = ['msme_id', 'as_of', 'version', 'computed_at', *FEATURE_COLUMNS, 'red_flags']
+
+
+class FeatureStore:
+    """
+    SQLite-backed feature vectors per (MSME, as-of date, version).
+    """
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the store.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+
+    def put(self, vectors: List[FeatureVector]) -> int:
+        """
+        Write feature vectors (replacing any vector with the same key).
+
+        Args:
+            vectors: Feature vectors
+
+        Returns:
+            Number of vectors written
+        """
+        rows = []
+        for vector in vectors:
+            values = vector.model_dump()
+            values['computed_at'] = vector.computed_at.isoformat()
+            values['red_flags'] = json.dumps(vector.red_flags)
+            rows.append(tuple(values[column] for column in _COLUMNS))
+
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO feature_vectors ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def _to_vector(row: sqlite3.Row) -> FeatureVector:
+        values = {column: row[column] for column in _COLUMNS}
+        values['red_flags'] = json.loads(values['red_flags'])
+        return FeatureVector(**values)
+
+    def get(self, msme_id: str, as_of: Optional[Any] = None, version: int = FEATURE_VERSION) -> Optional[FeatureVector]:
+        """
+        Point lookup of an MSME's latest vector on or before a date.
+
+        Args:
+            msme_id: MSME identifier
+            as_of: Optional as-of date (None for the latest vector)
+            version: Feature definition version
+
+        Returns:
+            FeatureVector or None
+        """
+        query = "SELECT * FROM feature_vectors WHERE msme_id = ? AND version = ?"
+        params: List[Any] = [msme_id, version]
+        if as_of is not None:
+            query += " AND as_of <= ?"
+            params.append(_as_of_date(as_of))
+        row = self.conn.execute(query + " ORDER BY as_of DESC LIMIT 1", params).fetchone()
+        return self._to_vector(row) if row else None
+
+    def scan(
+        self,
+        msme_ids: Optional[List[str]] = None,
+        as_of: Optional[Any] = None,
+        version: int = FEATURE_VERSION
+    ) -> Dict[str, FeatureVector]:
+        """
+        Batch scan of each MSME's latest vector on or before a date.
+
+        Args:
+            msme_ids: Optional MSME filter (None for the whole portfolio)
+            as_of: Optional as-of date (None for the latest vectors)
+            version: Feature definition version
+
+        Returns:
+            MSME id -> FeatureVector
+        """
+        rows = self._latest("f.*", msme_ids, as_of, version)
+        return {row['msme_id']: self._to_vector(row) for row in rows}
+
+    def profiles(
+        self,
+        msme_ids: Optional[List[str]] = None,
+        as_of: Optional[Any] = None,
+        version: int = FEATURE_VERSION
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Batch scan of the profile attributes and red flags of each MSME's latest vector.
+
+        Lighter than scan for portfolio-wide readers that need no numeric features.
+
+        Args:
+            msme_ids: Optional MSME filter (None for the whole portfolio)
+            as_of: Optional as-of date (None for the latest vectors)
+            version: Feature definition version
+
+        Returns:
+            MSME id -> dictionary with sector, msme_type and red_flags
+        """
+        rows = self._latest("f.msme_id, f.sector, f.msme_type, f.red_flags", msme_ids, as_of, version)
+        return {
+            row['msme_id']: {
+                'sector': row['sector'],
+                'msme_type': row['msme_type'],
+                'red_flags': json.loads(row['red_flags'])
+            }
+            for row in rows
+        }
+
+    def _latest(
+        self,
+        select: str,
+        msme_ids: Optional[List[str]],
+        as_of: Optional[Any],
+        version: int
+    ) -> List[sqlite3.Row]:
+        """Rows of each MSME's latest vector on or before a date."""
+        clauses = ["version = ?"]
+        params: List[Any] = [version]
+        if as_of is not None:
+            clauses.append("as_of <= ?")
+            params.append(_as_of_date(as_of))
+        if msme_ids:
+            clauses.append(f"msme_id IN ({','.join('?' * len(msme_ids))})")
+            params.extend(msme_ids)
+        where = ' AND '.join(clauses)
+
+        return self.conn.execute(
+            f"SELECT {select} FROM feature_vectors f JOIN ("
+            f"SELECT msme_id, MAX(as_of) AS as_of FROM feature_vectors WHERE {where} GROUP BY msme_id"
+            f") latest ON f.msme_id = latest.msme_id AND f.as_of = latest.as_of "
+            f"WHERE f.version = ? ORDER BY f.msme_id",
+            params + [version]
+        ).fetchall()
+
+    def history(self, msme_id: str, version: int = FEATURE_VERSION) -> List[FeatureVector]:
+        """
+        All of an MSME's vectors in as-of order.
+
+        Args:
+            msme_id: MSME identifier
+            version: Feature definition version
+
+        Returns:
+            List of FeatureVector
+        """
+        rows = self.conn.execute(
+            "SELECT * FROM feature_vectors WHERE msme_id = ? AND version = ? ORDER BY as_of",
+            (msme_id, version)
+        ).fetchall()
+        return [self._to_vector(row) for row in rows]
@@ -7,6 +7,9 @@ from datetime import datetime
 import statistics
 import logging
 
+from .quantile_sketch import QuantileSketch
+from .consolidated_ledger import ensure_consolidated_ledger
+
 logger = logging.getLogger(__name__)
 
 
@@ -51,13 +54,19 @@ def compute_balance_metrics(transactions: List[Dict[str, Any]]) -> Dict[str, flo
     """
     Compute balance-related metrics.
     
+    Balances are read from the consolidated ledger, so several accounts are
+    measured as one combined balance rather than interleaved.
+    
     Args:
         transactions: List of transactions with balance_after field
         
     Returns:
         Dictionary with balance metrics
     """
-    balances = [float(tx.get('balance_after', 0)) for tx in transactions if tx.get('balance_after') is not None]
+    balances = [
+        tx['consolidated_balance'] for tx in ensure_consolidated_ledger(transactions)
+        if tx['consolidated_balance'] is not None
+    ]
     
     if not balances:
         return {
@@ -67,15 +76,47 @@ def compute_balance_metrics(transactions: List[Dict[str, Any]]) -> Dict[str, flo
             'balance_volatility': 0.0
         }
     
+    # Exact for typical statements; sketch-based (no full sort) for very long ones
+    percentiles = QuantileSketch().extend(balances).quantiles((0.1, 0.5, 0.9))
+    
     return {
         'average_balance': statistics.mean(balances),
         'min_balance': min(balances),
         'max_balance': max(balances),
         'balance_volatility': statistics.stdev(balances) if len(balances) > 1 else 0.0,
-        'median_balance': statistics.median(balances)
+        'median_balance': percentiles[0.5],
+        'p10_balance': percentiles[0.1],
+        'p90_balance': percentiles[0.9]
     }
 
 
+def compute_distribution_metrics(transactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute p10/p50/p90 of balances and credit/debit amounts.
+    
+    Args:
+        transactions: List of transactions
+        
+    Returns:
+        Dictionary with 'balance', 'credit_amount' and 'debit_amount' summaries
+    """
+    sketches = {
+        'balance': QuantileSketch(),
+        'credit_amount': QuantileSketch(),
+        'debit_amount': QuantileSketch()
+    }
+    for tx in ensure_consolidated_ledger(transactions):
+        amount = float(tx.get('amount', 0))
+        if amount > 0:
+            sketches['credit_amount'].update(amount)
+        elif amount < 0:
+            sketches['debit_amount'].update(-amount)
+        if tx['consolidated_balance'] is not None:
+            sketches['balance'].update(tx['consolidated_balance'])
+    
+    return {metric: sketch.summary() for metric, sketch in sketches.items()}
+
+
 def compute_stability_score(transactions: List[Dict[str, Any]], period_days: Optional[int] = None) -> float:
     """
     Compute cashflow stability score (0-1, higher is more stable).
@@ -108,6 +149,19 @@ def compute_stability_score(transactions: List[Dict[str, Any]], period_days: Opt
             month_key = f"{date.year}-{date.month:02d}"
             monthly_inflows[month_key] = monthly_inflows.get(month_key, 0) + amount
     
+    return compute_stability_from_monthly_inflows(monthly_inflows)
+
+
+def compute_stability_from_monthly_inflows(monthly_inflows: Dict[str, float]) -> float:
+    """
+    Compute cashflow stability score from monthly inflow totals.
+    
+    Args:
+        monthly_inflows: Month -> total inflow
+        
+    Returns:
+        Stability score between 0 and 1
+    """
     if not monthly_inflows:
         return 0.0
     
@@ -139,14 +193,45 @@ def detect_stress_indicators(transactions: List[Dict[str, Any]]) -> List[str]:
     Returns:
         List of stress indicator descriptions
     """
-    indicators = []
-    
     if not transactions:
         return ["No transaction data available"]
     
     # Get balance metrics
+    transactions = ensure_consolidated_ledger(transactions)
     balance_metrics = compute_balance_metrics(transactions)
     cashflow_metrics = compute_cashflow_metrics(transactions)
+    negative_balances = [
+        tx for tx in transactions
+        if tx['consolidated_balance'] is not None and tx['consolidated_balance'] < 0
+    ]
+    
+    return compute_stress_indicators_from_metrics(
+        balance_metrics,
+        cashflow_metrics,
+        negative_balance_count=len(negative_balances),
+        transaction_count=len(transactions)
+    )
+
+
+def compute_stress_indicators_from_metrics(
+    balance_metrics: Dict[str, float],
+    cashflow_metrics: Dict[str, float],
+    negative_balance_count: int,
+    transaction_count: int
+) -> List[str]:
+    """
+    Derive financial stress indicators from precomputed metrics.
+    
+    Args:
+        balance_metrics: Output of compute_balance_metrics
+        cashflow_metrics: Output of compute_cashflow_metrics
+        negative_balance_count: Number of transactions leaving a negative balance
+        transaction_count: Total number of transactions
+        
+    Returns:
+        List of stress indicator descriptions
+    """
+    indicators = []
     
     # Low balance indicator
     if balance_metrics['min_balance'] < 0:
@@ -163,8 +248,7 @@ def detect_stress_indicators(transactions: List[Dict[str, Any]]) -> List[str]:
         indicators.append("High balance volatility")
     
     # Check for overdraft patterns
-    negative_balances = [tx for tx in transactions if tx.get('balance_after') and float(tx.get('balance_after', 0)) < 0]
-    if len(negative_balances) > len(transactions) * 0.1:
+    if negative_balance_count > transaction_count * 0.1:
         indicators.append("Frequent negative balances")
     
     # Check for large outflows relative to inflows
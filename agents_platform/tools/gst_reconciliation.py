@@ -0,0 +1,203 @@
+"""
+Tools for reconciling declared GST sales with bank credits.
+
+Monthly GST turnover (taxable sales plus output tax, i.e. what customers
+actually pay) is joined on period with monthly bank credits. Financing
+credits (loan disbursements) and internal transfers are left out of the bank
+side. Each period gets a coverage ratio (bank credits / GST turnover) and a
+mismatch flag when the ratio falls outside a tolerance band.
+
+For a portfolio, every MSME's periods are laid out as one flat table and the
+ratios and flags are computed in a single pass before grouping back per MSME.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+from statistics import median
+import logging
+
+from .data_parser import parse_date
+from .transaction_categorizer import categorize_transaction
+
+logger = logging.getLogger(__name__)
+
+
+# Bank credits / GST turnover outside this band is flagged as a mismatch
+DEFAULT_COVERAGE_BAND = (0.8, 1.25)
+
+# Share of mismatched periods above which the MSME as a whole is flagged
+MISMATCH_SHARE_LIMIT = 0.25
+
+
+def monthly_bank_credits(
+    transactions: List[Dict[str, Any]],
+    exclude_internal_transfers: bool = True,
+    exclude_categories: Tuple[str, ...] = ('financing',)
+) -> Dict[str, float]:
+    """
+    Sum bank credits per month for reconciliation.
+
+    Args:
+        transactions: List of transactions
+        exclude_internal_transfers: Skip rows tagged as internal transfers
+        exclude_categories: Cashflow categories that are not sales receipts
+
+    Returns:
+        Month ("YYYY-MM") -> credited amount
+    """
+    credits = defaultdict(float)
+    for tx in transactions:
+        amount = float(tx.get('amount', 0))
+        if amount <= 0:
+            continue
+        if exclude_internal_transfers and tx.get('internal_transfer'):
+            continue
+        if (tx.get('category') or categorize_transaction(tx)[1].value) in exclude_categories:
+            continue
+        date = parse_date(tx.get('date'))
+        credits[f"{date.year}-{date.month:02d}"] += amount
+    return dict(credits)
+
+
+def _gst_turnover(filing: Dict[str, Any], include_output_tax: bool) -> float:
+    """Amount a filing implies customers paid in."""
+    turnover = float(filing.get('total_sales', 0))
+    if include_output_tax:
+        turnover += float(filing.get('output_tax', 0))
+    return turnover
+
+
+def _empty_reconciliation() -> Dict[str, Any]:
+    """Result when there is nothing to reconcile."""
+    return {
+        'periods': [],
+        'matched_periods': 0,
+        'overall_coverage': None,
+        'median_coverage': None,
+        'mismatch_count': 0,
+        'mismatch_periods': [],
+        'gst_only_periods': [],
+        'bank_only_periods': [],
+        'reconciliation_score': 0.0,
+        'flagged': False
+    }
+
+
+def reconcile_gst_with_bank_batch(
+    inputs: Dict[str, Dict[str, Any]],
+    coverage_band: Tuple[float, float] = DEFAULT_COVERAGE_BAND,
+    include_output_tax: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Reconcile GST filings with bank credits for many MSMEs at once.
+
+    Args:
+        inputs: MSME id -> {'gst_filings': [...], 'monthly_credits': {month: amount}}
+        coverage_band: (lower, upper) accepted bank/GST coverage ratio
+        include_output_tax: Compare bank credits with sales including output tax
+
+    Returns:
+        MSME id -> reconciliation with per-period rows, overall and median
+        coverage, mismatch periods, a 0-100 reconciliation_score and 'flagged'
+    """
+    lower, upper = coverage_band
+
+    # Flat table: (msme_id, period, gst_turnover, bank_credits, nil_return)
+    ids, periods, gst, bank, nil = [], [], [], [], []
+    for msme_id, item in inputs.items():
+        declared = defaultdict(float)
+        nil_periods = set()
+        for filing in item.get('gst_filings') or []:
+            period = str(filing.get('period', ''))[:7]
+            if not period:
+                continue
+            declared[period] += _gst_turnover(filing, include_output_tax)
+            if filing.get('nil_return', False):
+                nil_periods.add(period)
+        credits = item.get('monthly_credits') or {}
+        for period in sorted(set(declared) | set(credits)):
+            ids.append(msme_id)
+            periods.append(period)
+            gst.append(declared.get(period) if period in declared else None)
+            bank.append(float(credits.get(period, 0.0)))
+            nil.append(period in nil_periods)
+
+    # Column-wise coverage and flags
+    coverage = [
+        (b / g) if g else None
+        for g, b in zip(gst, bank)
+    ]
+    flags = []
+    for g, b, c, is_nil in zip(gst, bank, coverage, nil):
+        if g is None:
+            flags.append('no_gst_filing')
+        elif is_nil or not g:
+            flags.append('nil_return_with_credits' if b > 0 else None)
+        elif c < lower:
+            flags.append('bank_shortfall')
+        elif c > upper:
+            flags.append('bank_excess')
+        else:
+            flags.append(None)
+
+    # Group back per MSME
+    results = {msme_id: _empty_reconciliation() for msme_id in inputs}
+    totals = defaultdict(lambda: [0.0, 0.0])
+    ratios = defaultdict(list)
+    for msme_id, period, g, b, c, flag in zip(ids, periods, gst, bank, coverage, flags):
+        result = results[msme_id]
+        result['periods'].append({
+            'period': period,
+            'gst_turnover': g,
+            'bank_credits': b,
+            'coverage_ratio': c,
+            'flag': flag
+        })
+        if g is None:
+            result['bank_only_periods'].append(period)
+            continue
+        if b == 0 and g > 0:
+            result['gst_only_periods'].append(period)
+        if c is not None:
+            result['matched_periods'] += 1
+            ratios[msme_id].append(c)
+            totals[msme_id][0] += g
+            totals[msme_id][1] += b
+        if flag is not None:
+            result['mismatch_count'] += 1
+            result['mismatch_periods'].append(period)
+
+    for msme_id, result in results.items():
+        matched = result['matched_periods']
+        if not matched:
+            continue
+        gst_total, bank_total = totals[msme_id]
+        within = sum(1 for c in ratios[msme_id] if lower <= c <= upper)
+        result['overall_coverage'] = bank_total / gst_total if gst_total else None
+        result['median_coverage'] = median(ratios[msme_id])
+        result['reconciliation_score'] = round(100.0 * within / matched, 2)
+        result['flagged'] = result['mismatch_count'] / len(result['periods']) > MISMATCH_SHARE_LIMIT
+
+    return results
+
+
+def reconcile_gst_with_bank(
+    gst_filings: List[Dict[str, Any]],
+    monthly_credits: Dict[str, float],
+    coverage_band: Optional[Tuple[float, float]] = None
+) -> Dict[str, Any]:
+    """
+    Reconcile one MSME's GST filings with its bank credits.
+
+    Args:
+        gst_filings: GST filings with 'period' ("YYYY-MM") and 'total_sales'
+        monthly_credits: Month -> bank credits (see monthly_bank_credits)
+        coverage_band: Optional (lower, upper) accepted coverage ratio
+
+    Returns:
+        Reconciliation result (see reconcile_gst_with_bank_batch)
+    """
+    return reconcile_gst_with_bank_batch(
+        {'msme': {'gst_filings': gst_filings, 'monthly_credits': monthly_credits}},
+        coverage_band or DEFAULT_COVERAGE_BAND
+    )['msme']
@@ -6,10 +6,14 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import statistics
 import logging
+from bisect import bisect_left
 from collections import defaultdict
 
 from .data_parser import parse_date
 from .data_parser import extract_gst_data
+from .recurring_payments import is_emi_transaction
+from .cheque_returns import link_cheque_returns
+from .consolidated_ledger import ensure_consolidated_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +89,8 @@ def compute_avg_monthly_balance(transactions: List[Dict[str, Any]]) -> float:
     """
     Compute average monthly balance.
     
+    Uses the consolidated balance across all accounts.
+    
     Args:
         transactions: List of transactions with balance_after field
         
@@ -94,12 +100,11 @@ def compute_avg_monthly_balance(transactions: List[Dict[str, Any]]) -> float:
     # Group balances by month
     monthly_balances = defaultdict(list)
     
-    for tx in transactions:
-        if tx.get('balance_after') is not None:
+    for tx in ensure_consolidated_ledger(transactions):
+        if tx['consolidated_balance'] is not None:
             date = parse_date(tx.get('date'))
             month_key = f"{date.year}-{date.month:02d}"
-            balance = float(tx.get('balance_after', 0))
-            monthly_balances[month_key].append(balance)
+            monthly_balances[month_key].append(tx['consolidated_balance'])
     
     if not monthly_balances:
         return 0.0
@@ -116,56 +121,110 @@ def compute_avg_monthly_balance(transactions: List[Dict[str, Any]]) -> float:
     return statistics.mean(monthly_avg_balances)
 
 
-def count_low_balance_days(transactions: List[Dict[str, Any]], threshold: float = 50000) -> int:
+def build_daily_min_balances(transactions: List[Dict[str, Any]]) -> List[float]:
+    """
+    Build a sorted array of daily minimum balances.
+    
+    A day counts as "below X" when its lowest balance is below X, so this
+    array answers any threshold query with a single binary search. Balances
+    are consolidated across all accounts.
+    
+    Args:
+        transactions: List of transactions with balance_after field
+        
+    Returns:
+        Daily minimum balances sorted in ascending order
+    """
+    daily_min = {}
+    
+    for tx in ensure_consolidated_ledger(transactions):
+        if tx['consolidated_balance'] is not None:
+            balance = tx['consolidated_balance']
+            date = parse_date(tx.get('date'))
+            day_key = date.date().isoformat()
+            if day_key not in daily_min or balance < daily_min[day_key]:
+                daily_min[day_key] = balance
+    
+    return sorted(daily_min.values())
+
+
+def count_days_below(daily_min_balances: List[float], threshold: float) -> int:
+    """
+    Count days whose minimum balance is below threshold.
+    
+    Args:
+        daily_min_balances: Sorted output of build_daily_min_balances
+        threshold: Balance threshold
+        
+    Returns:
+        Number of days with balance below threshold
+    """
+    return bisect_left(daily_min_balances, threshold)
+
+
+def compute_low_balance_curve(daily_min_balances: List[float], thresholds: List[float]) -> Dict[str, int]:
+    """
+    Compute the low balance days curve for several thresholds.
+    
+    Args:
+        daily_min_balances: Sorted output of build_daily_min_balances
+        thresholds: Balance thresholds to evaluate
+        
+    Returns:
+        Dictionary mapping threshold (as string) -> days below threshold
+    """
+    curve = {}
+    for threshold in sorted(thresholds):
+        key = str(int(threshold)) if float(threshold).is_integer() else str(threshold)
+        curve[key] = count_days_below(daily_min_balances, threshold)
+    
+    return curve
+
+
+def count_low_balance_days(
+    transactions: List[Dict[str, Any]],
+    threshold: float = 50000,
+    daily_min_balances: Optional[List[float]] = None
+) -> int:
     """
     Count days with balance below threshold.
     
     Args:
         transactions: List of transactions with balance_after field
         threshold: Balance threshold (default 50000)
+        daily_min_balances: Optional prebuilt output of build_daily_min_balances
         
     Returns:
         Number of days with balance below threshold
     """
-    low_balance_days = set()
+    if daily_min_balances is None:
+        daily_min_balances = build_daily_min_balances(transactions)
     
-    for tx in transactions:
-        if tx.get('balance_after') is not None:
-            balance = float(tx.get('balance_after', 0))
-            if balance < threshold:
-                date = parse_date(tx.get('date'))
-                day_key = date.date().isoformat()
-                low_balance_days.add(day_key)
-    
-    return len(low_balance_days)
+    return count_days_below(daily_min_balances, threshold)
 
 
 def count_emi_transactions(transactions: List[Dict[str, Any]]) -> int:
     """
     Count EMI transactions.
     
+    Only debits are counted, so loan disbursements are excluded, and
+    NACH/ECS mandate debits are recognised even without "EMI" in the narration.
+    
     Args:
         transactions: List of transactions
         
     Returns:
         Number of EMI transactions
     """
-    emi_count = 0
-    
-    for tx in transactions:
-        desc = str(tx.get('description', '')).lower()
-        tx_type = str(tx.get('type', '')).lower()
-        
-        # Check for EMI indicators
-        if 'emi' in desc or 'loan' in desc or tx_type == 'emi':
-            emi_count += 1
-    
-    return emi_count
+    return sum(1 for tx in transactions if is_emi_transaction(tx))
 
 
 def count_cheque_bounces(transactions: List[Dict[str, Any]]) -> int:
     """
-    Count cheque bounce transactions.
+    Count cheque bounces.
+    
+    Return entries are linked to their original cheque and charge rows, so a
+    bounce is counted once however many statement rows it produced.
     
     Args:
         transactions: List of transactions
@@ -173,39 +232,27 @@ def count_cheque_bounces(transactions: List[Dict[str, Any]]) -> int:
     Returns:
         Number of cheque bounces
     """
-    bounce_count = 0
-    
-    for tx in transactions:
-        desc = str(tx.get('description', '')).lower()
-        
-        # Check for bounce indicators
-        if any(keyword in desc for keyword in ['bounce', 'returned', 'dishonour', 'insufficient']):
-            bounce_count += 1
-    
-    return bounce_count
+    return len(link_cheque_returns(transactions)['events'])
 
 
-def count_overdraft_days(transactions: List[Dict[str, Any]]) -> int:
+def count_overdraft_days(
+    transactions: List[Dict[str, Any]],
+    daily_min_balances: Optional[List[float]] = None
+) -> int:
     """
     Count days with negative balance (overdraft).
     
     Args:
         transactions: List of transactions with balance_after field
+        daily_min_balances: Optional prebuilt output of build_daily_min_balances
         
     Returns:
         Number of days with negative balance
     """
-    overdraft_days = set()
+    if daily_min_balances is None:
+        daily_min_balances = build_daily_min_balances(transactions)
     
-    for tx in transactions:
-        if tx.get('balance_after') is not None:
-            balance = float(tx.get('balance_after', 0))
-            if balance < 0:
-                date = parse_date(tx.get('date'))
-                day_key = date.date().isoformat()
-                overdraft_days.add(day_key)
-    
-    return len(overdraft_days)
+    return count_days_below(daily_min_balances, 0)
 
 
 def analyze_gst_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,176 @@
+"""
+Tools for parsing bank narrations into structured payment fields.
+
+Narrations of the Indian payment rails follow loose but recognisable layouts,
+for example:
+
+    UPI/412345678901/ACME TRADERS/acme@okhdfc/Payment
+    NEFT-HDFC0001234-ACME LTD-N012345678901
+    IMPS/P2A/412345678901/RAVI KUMAR/SBIN
+    RTGS/HDFCR52024010112345678/ACME LTD/HDFC0001234
+    ACH D- BAJAJ FINANCE LTD-UMRN HDFC7000000012345678
+    CHQ DEP 123456 ABC RETAIL
+
+Each channel has its own compiled pattern for the channel marker and for its
+reference number (UPI/IMPS RRN, NEFT/RTGS UTR, NACH UMRN, cheque number).
+VPA and IFSC are picked out with shared patterns and the counterparty name is
+the first remaining text token. Results are memoized by narration, since the
+same narration recurs many times across a statement.
+"""
+
+from typing import List, Dict, Any, Optional, NamedTuple
+from functools import lru_cache
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedNarration(NamedTuple):
+    """Structured fields of a narration (None when not present)."""
+    channel: Optional[str]
+    reference: Optional[str]
+    counterparty: Optional[str]
+    vpa: Optional[str]
+    ifsc: Optional[str]
+    remarks: str
+
+
+# Channel markers at the start of the narration (optionally after BY/TO/TRF,
+# e.g. "BY TRANSFER-NEFT-..."). Cheque words are also common in ordinary
+# text, so a cheque marker must lead the narration (optionally after an
+# inward/outward marker) or sit next to a six-digit instrument number.
+_LEAD = r"^\s*(?:(?:by|to|trf|transfer)[\s:/-]+){0,2}"
+_CHEQUE = r"(?:chq|cheque|clg)"
+CHANNEL_PATTERNS = (
+    ('upi', re.compile(_LEAD + r"upi\b", re.IGNORECASE)),
+    ('imps', re.compile(_LEAD + r"(?:imps|mmt)\b", re.IGNORECASE)),
+    ('neft', re.compile(_LEAD + r"neft\b", re.IGNORECASE)),
+    ('rtgs', re.compile(_LEAD + r"rtgs\b", re.IGNORECASE)),
+    ('nach', re.compile(_LEAD + r"(?:nach|ach|ecs)\b", re.IGNORECASE)),
+    ('cheque', re.compile(
+        _LEAD + r"(?:(?:i/w|o/w|inward|outward|iw|ow)[\s:/-]+)?" + _CHEQUE + r"\b"
+        r"|\b" + _CHEQUE + r"\b[\s:/.#-]*(?:no\b[\s:/.#-]*)?\d{6}(?!\d)"
+        r"|(?<!\d)\d{6}[\s:/.#-]*" + _CHEQUE + r"\b",
+        re.IGNORECASE
+    )),
+)
+
+# Reference number per channel
+REFERENCE_PATTERNS = {
+    'upi': re.compile(r"(?<![0-9A-Za-z])(\d{6,12})(?![0-9A-Za-z])"),
+    'imps': re.compile(r"(?<![0-9A-Za-z])(\d{12})(?![0-9A-Za-z])"),
+    'neft': re.compile(r"(?<![0-9A-Za-z])([A-Z]{4}[A-Z0-9]?N\d{8,}|N\d{9,}|\d{10,16})(?![0-9A-Za-z])", re.IGNORECASE),
+    'rtgs': re.compile(r"(?<![0-9A-Za-z])([A-Z]{4}R[A-Z0-9]{11,})(?![0-9A-Za-z])", re.IGNORECASE),
+    'nach': re.compile(r"(?<![0-9A-Za-z])([A-Z]{4}\d{16}|\d{6,})(?![0-9A-Za-z])", re.IGNORECASE),
+    'cheque': re.compile(r"(?<!\d)(\d{6})(?!\d)"),
+}
+
+VPA_PATTERN = re.compile(r"(?<![\w.])([\w.]{2,}@[a-z]{2,})(?![\w])", re.IGNORECASE)
+IFSC_PATTERN = re.compile(r"(?<![0-9A-Za-z])([A-Z]{4}0[A-Z0-9]{6})(?![0-9A-Za-z])", re.IGNORECASE)
+
+_SEPARATORS = re.compile(r"\s*[/:|-]\s*")
+
+# Leading words that describe the rail, direction or return, not the counterparty
+_NON_NAME_WORDS = re.compile(
+    r"^(?:(?:by|to|trf|transfer|upi|imps|mmt|neft|rtgs|nach|ach|ecs|chq|cheque|clg|clearing|umrn|"
+    r"dr|cr|d|c|p2a|p2m|p2p|inward|outward|iw|ow|dep|deposit|paid|payment|pay|ref|utr|rrn|na|"
+    r"return(?:ed)?|rtn|ret|bounced?|insufficient|funds|charges?|chgs?)\b[\s.]*)+",
+    re.IGNORECASE
+)
+_LETTERS = re.compile(r"[A-Za-z]")
+_WORDS = re.compile(r"[a-z0-9&]+")
+
+# Placeholder left where the VPA was, so UPI names can be read from before it
+_VPA_MARK = "\x01"
+
+
+def _name_from(token: str) -> Optional[str]:
+    """Counterparty name in a token, after dropping leading rail words."""
+    name = _NON_NAME_WORDS.sub("", token).strip()
+    if len(_LETTERS.findall(name)) < 2:
+        return None
+    # Bank codes such as "SBIN" or "HDFC" on their own
+    if name.isupper() and len(name) == 4 and name.isalpha():
+        return None
+    return name
+
+
+@lru_cache(maxsize=65536)
+def parse_narration(narration: str) -> ParsedNarration:
+    """
+    Parse one narration (memoized).
+
+    Args:
+        narration: Raw narration text
+
+    Returns:
+        ParsedNarration; channel is one of upi, imps, neft, rtgs, nach,
+        cheque or None, and counterparty is only set for recognised channels
+    """
+    text = str(narration or '').strip()
+
+    channel = None
+    for name, pattern in CHANNEL_PATTERNS:
+        if pattern.search(text):
+            channel = name
+            break
+
+    vpa_match = VPA_PATTERN.search(text)
+    vpa = vpa_match.group(1).lower() if vpa_match else None
+    rest = VPA_PATTERN.sub(f" {_VPA_MARK} ", text)
+
+    ifsc_match = IFSC_PATTERN.search(rest)
+    ifsc = ifsc_match.group(1).upper() if ifsc_match else None
+    rest = IFSC_PATTERN.sub(" ", rest)
+
+    reference = None
+    if channel is not None:
+        reference_match = REFERENCE_PATTERNS[channel].search(rest)
+        if reference_match:
+            reference = reference_match.group(1).upper()
+            rest = rest[:reference_match.start(1)] + " " + rest[reference_match.end(1):]
+
+    counterparty = None
+    if channel is not None:
+        for token in _SEPARATORS.split(rest):
+            token = token.strip()
+            if token == _VPA_MARK:
+                # A UPI payee name, when present, precedes the VPA
+                if channel == 'upi':
+                    break
+                continue
+            counterparty = _name_from(token)
+            if counterparty:
+                break
+        if counterparty is None and vpa:
+            counterparty = vpa.split('@', 1)[0]
+
+    remarks = " ".join(_WORDS.findall(rest.lower()))
+    return ParsedNarration(channel, reference, counterparty, vpa, ifsc, remarks)
+
+
+def annotate_narrations(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add structured narration columns to transactions (in place).
+
+    Sets 'channel', 'reference_no', 'vpa' and 'ifsc', and fills
+    'counterparty' when the statement did not provide one. Consumers that
+    get rows without these columns call parse_narration directly; the cache
+    makes both paths equally cheap.
+
+    Args:
+        transactions: List of transactions
+
+    Returns:
+        The same transactions
+    """
+    for tx in transactions:
+        parsed = parse_narration(str(tx.get('description', '')))
+        tx['channel'] = parsed.channel
+        tx['reference_no'] = parsed.reference
+        tx['vpa'] = parsed.vpa
+        tx['ifsc'] = parsed.ifsc
+        if not tx.get('counterparty') and parsed.counterparty:
+            tx['counterparty'] = parsed.counterparty
+    return transactions
@@ -0,0 +1,573 @@
+"""
+Tools for reusing previously generated narratives of similar MSME profiles.
+
+Explainability and recommendation narratives are generated by Gemini, yet
+MSMEs of the same sector and size band often have near-identical profiles.
+Every narrative Gemini generates is stored with the profile's normalized
+feature vector; before calling Gemini again, the agents look up the nearest
+stored profile and reuse its narrative when it lies within a configurable
+distance.
+
+- Profiles are only compared within a partition (agent, sector, size band,
+  risk level, red flags, eligible products, GST history), since those
+  values are named in the narrative text.
+- Within a partition, the nearest profile is found with a KD-tree over the
+  normalized vectors (every dimension scaled to roughly 0-1).
+- Before a narrative is stored, the profile's values (amounts, scores,
+  percentages) and the business name are replaced with placeholders; reuse
+  fills them in with the new profile's values.
+- Narratives also quote numbers that are not profile values (an EMI amount,
+  a month count, a margin), which no placeholder covers. A narrative that
+  still contains any number after templating is never stored or reused, so
+  the text never quotes another MSME's numbers.
+
+Narratives are persisted in the analytics database; each process builds its
+trees from it lazily and picks up rows written by other processes on lookup.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple, Type
+from datetime import datetime
+import json
+import math
+import re
+import sqlite3
+import threading
+import logging
+
+from pydantic import BaseModel
+
+from ..core.analytics_db import get_analytics_connection
+from ..core.config import settings
+from ..core.types import AgentOutput
+
+logger = logging.getLogger(__name__)
+
+
+# Dimensions of the normalized profile vector
+VECTOR_DIMENSIONS = (
+    'behavioral_score',
+    'net_margin',
+    'log_inflow',
+    'stability',
+    'volatility',
+    'emi_count',
+    'cheque_bounces',
+    'gst_compliance'
+)
+
+# Formats tried when turning numbers into placeholders (longest rendering first)
+NUMBER_FORMATS = (',.2f', 'inr.2', ',.0f', 'inr', '.2f', '.1f', '.0f')
+
+_PLACEHOLDER = re.compile(r"\{\{(\w+):([^{}]*)\}\}")
+_DIGIT = re.compile(r"\d")
+
+
+def _clamp(value: float, low: float = 0.0, high: float = 1.0) -> float:
+    """Clamp a value to [low, high]."""
+    return min(max(value, low), high)
+
+
+def profile_vector(features: Dict[str, Any], behavioral_score: Dict[str, Any]) -> Tuple[float, ...]:
+    """
+    Normalize an MSME profile into a vector with every dimension in 0-1.
+
+    Args:
+        features: Feature vector (or financial health summary)
+        behavioral_score: Behavioral score data
+
+    Returns:
+        Tuple ordered as VECTOR_DIMENSIONS
+    """
+    inflow = features.get('total_inflow') or 0.0
+    net = features.get('net_cashflow') or 0.0
+    compliance = features.get('gst_compliance_rate')
+    return (
+        _clamp((behavioral_score.get('behavioral_score') or 0.0) / 1000.0),
+        _clamp(0.5 + 0.5 * (net / inflow)) if inflow > 0 else 0.0,
+        _clamp(math.log10(1.0 + max(inflow, 0.0)) / 10.0),
+        _clamp(features.get('cashflow_stability_score') or 0.0),
+        _clamp(features.get('volatility_score') or 0.0),
+        _clamp((features.get('emi_count') or 0) / 24.0),
+        _clamp((features.get('cheque_bounces') or 0) / 5.0),
+        _clamp(compliance / 100.0) if compliance is not None else 0.0
+    )
+
+
+def profile_partition(
+    agent: str,
+    msme_profile: Dict[str, Any],
+    features: Dict[str, Any],
+    behavioral_score: Dict[str, Any],
+    product_recommendations: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Key of the partition whose narratives may be reused for a profile.
+
+    Args:
+        agent: Agent name
+        msme_profile: MSME profile (sector, msme_type)
+        features: Feature vector (or financial health summary)
+        behavioral_score: Behavioral score data
+        product_recommendations: Optional product recommendations
+
+    Returns:
+        Partition key
+    """
+    eligible = sorted(
+        str(product.get('product_id') or product.get('product_name'))
+        for product in (product_recommendations or {}).get('best_fit_products', [])
+        if product.get('eligible', False)
+    )
+    return json.dumps([
+        agent,
+        str(msme_profile.get('sector') or '').strip().lower(),
+        str(msme_profile.get('msme_type') or '').strip().lower(),
+        behavioral_score.get('risk_level'),
+        sorted(behavioral_score.get('red_flags') or []),
+        eligible,
+        features.get('gst_compliance_rate') is not None
+    ])
+
+
+def narrative_values(
+    features: Dict[str, Any],
+    behavioral_score: Dict[str, Any],
+    msme_profile: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Profile values that narratives quote and that are templated on reuse.
+
+    Args:
+        features: Feature vector (or financial health summary)
+        behavioral_score: Behavioral score data
+        msme_profile: MSME profile
+
+    Returns:
+        Placeholder name -> value
+    """
+    values = {
+        'business_name': msme_profile.get('business_name'),
+        'net_cashflow': abs(features.get('net_cashflow') or 0.0),
+        'total_inflow': features.get('total_inflow'),
+        'total_outflow': features.get('total_outflow'),
+        'average_balance': features.get('average_balance'),
+        'behavioral_score': behavioral_score.get('behavioral_score'),
+        'stability_pct': 100.0 * (features.get('cashflow_stability_score') or 0.0),
+        'volatility_pct': 100.0 * (features.get('volatility_score') or 0.0),
+        'gst_compliance_rate': features.get('gst_compliance_rate')
+    }
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def narrative_profile(
+    agent: str,
+    features: Dict[str, Any],
+    behavioral_score: Dict[str, Any],
+    msme_profile: Dict[str, Any],
+    product_recommendations: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Everything the index needs to look up or store an agent's narrative for a profile.
+
+    Args:
+        agent: Agent name
+        features: Feature vector (or financial health summary)
+        behavioral_score: Behavioral score data
+        msme_profile: MSME profile
+        product_recommendations: Optional product recommendations
+
+    Returns:
+        Dictionary with agent, partition, vector and values
+    """
+    return {
+        'agent': agent,
+        'partition': profile_partition(agent, msme_profile, features, behavioral_score, product_recommendations),
+        'vector': profile_vector(features, behavioral_score),
+        'values': narrative_values(features, behavioral_score, msme_profile)
+    }
+
+
+def _format_inr(value: float, decimals: int = 0) -> str:
+    """Indian digit grouping (12,34,567.89)."""
+    whole, _, fraction = f"{abs(value):.{decimals}f}".partition('.')
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    grouped = ','.join(groups + [tail]) if groups else tail
+    return ('-' if value < 0 else '') + grouped + (f".{fraction}" if fraction else '')
+
+
+def _render(value: Any, spec: str) -> str:
+    """Render a value with a placeholder format."""
+    if spec == 's':
+        return str(value)
+    if spec.startswith('inr'):
+        return _format_inr(float(value), int(spec[4:] or 0))
+    return format(float(value), spec)
+
+
+def to_template(narrative: Any, values: Dict[str, Any]) -> Any:
+    """
+    Replace the profile's values in a narrative's strings with placeholders.
+
+    Only renderings with at least two digits are replaced, and a rendering
+    shared by two values is left alone, so short or ambiguous numbers are
+    kept as written.
+
+    Args:
+        narrative: Narrative (nested dicts, lists and strings)
+        values: Placeholder name -> value
+
+    Returns:
+        Narrative with {{name:format}} placeholders
+    """
+    # rendering -> (name, placeholder); name is None when two values share the rendering
+    renderings: Dict[str, Tuple[Optional[str], str]] = {}
+    for name, value in values.items():
+        if isinstance(value, str):
+            if len(value) >= 3:
+                renderings.setdefault(value, (name, f"{{{{{name}:s}}}}"))
+            continue
+        for spec in NUMBER_FORMATS:
+            text = _render(value, spec)
+            if sum(ch.isdigit() for ch in text) < 2:
+                continue
+            owner, placeholder = renderings.setdefault(text, (name, f"{{{{{name}:{spec}}}}}"))
+            if owner != name:
+                renderings[text] = (None, placeholder)
+
+    patterns = [
+        (
+            re.compile(re.escape(text) if not text[0].isdigit() else rf"(?<![\d.,]){re.escape(text)}(?![\d]|[.,]\d)"),
+            placeholder
+        )
+        for text, (owner, placeholder) in sorted(renderings.items(), key=lambda item: -len(item[0]))
+        if owner is not None
+    ]
+
+    def convert(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {key: convert(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [convert(value) for value in node]
+        if isinstance(node, str):
+            for pattern, placeholder in patterns:
+                node = pattern.sub(lambda _: placeholder, node)
+        return node
+
+    return convert(narrative)
+
+
+def has_untemplated_numbers(template: Any) -> bool:
+    """
+    Whether a narrative template still quotes numbers outside its placeholders.
+
+    Args:
+        template: Narrative with {{name:format}} placeholders
+
+    Returns:
+        True when a string has a digit outside a placeholder or a value is numeric
+    """
+    if isinstance(template, dict):
+        return any(has_untemplated_numbers(value) for value in template.values())
+    if isinstance(template, list):
+        return any(has_untemplated_numbers(value) for value in template)
+    if isinstance(template, str):
+        return bool(_DIGIT.search(_PLACEHOLDER.sub('', template)))
+    return isinstance(template, (int, float)) and not isinstance(template, bool)
+
+
+def fill_template(template: Any, values: Dict[str, Any]) -> Optional[Any]:
+    """
+    Fill a narrative template's placeholders with new values.
+
+    Args:
+        template: Narrative with {{name:format}} placeholders
+        values: Placeholder name -> value
+
+    Returns:
+        Filled narrative, or None when a placeholder has no value
+    """
+    missing = []
+
+    def replace(match: re.Match) -> str:
+        name, spec = match.group(1), match.group(2)
+        if name not in values:
+            missing.append(name)
+            return match.group(0)
+        return _render(values[name], spec)
+
+    def fill(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {key: fill(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [fill(value) for value in node]
+        if isinstance(node, str):
+            return _PLACEHOLDER.sub(replace, node)
+        return node
+
+    filled = fill(template)
+    return None if missing else filled
+
+
+class KDTree:
+    """
+    Static KD-tree for nearest-neighbor search in Euclidean space.
+    """
+
+    def __init__(self, points: List[Tuple[float, ...]], payloads: List[Any]):
+        """
+        Build the tree.
+
+        Args:
+            points: Points of equal dimension
+            payloads: Payload per point
+        """
+        self._dimensions = len(points[0]) if points else 0
+        self._root = self._build(list(zip(points, payloads)), 0)
+
+    def _build(self, items: List[Tuple[Tuple[float, ...], Any]], depth: int) -> Optional[tuple]:
+        if not items:
+            return None
+        axis = depth % self._dimensions
+        items.sort(key=lambda item: item[0][axis])
+        middle = len(items) // 2
+        point, payload = items[middle]
+        return (
+            point,
+            payload,
+            axis,
+            self._build(items[:middle], depth + 1),
+            self._build(items[middle + 1:], depth + 1)
+        )
+
+    def nearest(self, target: Tuple[float, ...]) -> Optional[Tuple[float, Any]]:
+        """
+        Find the point nearest to a target.
+
+        Args:
+            target: Query point
+
+        Returns:
+            (distance, payload) of the nearest point, or None for an empty tree
+        """
+        best: List[Any] = [math.inf, None]
+
+        def search(node: Optional[tuple]) -> None:
+            if node is None:
+                return
+            point, payload, axis, left, right = node
+            distance = math.dist(point, target)
+            if distance < best[0]:
+                best[0], best[1] = distance, payload
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            search(near)
+            # The far side can only hold a closer point if the splitting plane is within reach
+            if abs(offset) < best[0]:
+                search(far)
+
+        search(self._root)
+        return (best[0], best[1]) if best[1] is not None else None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS narratives (
+    narrative_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent TEXT NOT NULL,
+    partition_key TEXT NOT NULL,
+    vector TEXT NOT NULL,
+    template TEXT NOT NULL,
+    msme_id TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_narratives_agent ON narratives (agent, narrative_id);
+"""
+
+
+class NarrativeIndex:
+    """
+    SQLite-backed narrative templates with per-partition KD-trees.
+    """
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the index.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # (agent, partition) -> (points, payloads) and the trees built from them
+        self._entries: Dict[Tuple[str, str], Tuple[List[Tuple[float, ...]], List[Dict[str, Any]]]] = {}
+        self._trees: Dict[Tuple[str, str], KDTree] = {}
+        self._loaded_until: Dict[str, int] = {}
+        self._stats = {'lookups': 0, 'hits': 0}
+
+    def _refresh(self, agent: str) -> None:
+        """Load the agent's narratives written since the last refresh."""
+        rows = self.conn.execute(
+            "SELECT narrative_id, partition_key, vector, template, msme_id FROM narratives "
+            "WHERE agent = ? AND narrative_id > ? ORDER BY narrative_id",
+            (agent, self._loaded_until.get(agent, 0))
+        ).fetchall()
+        for row in rows:
+            key = (agent, row['partition_key'])
+            points, payloads = self._entries.setdefault(key, ([], []))
+            points.append(tuple(json.loads(row['vector'])))
+            payloads.append({
+                'narrative_id': row['narrative_id'],
+                'template': row['template'],
+                'msme_id': row['msme_id']
+            })
+            self._trees.pop(key, None)
+            self._loaded_until[agent] = row['narrative_id']
+
+    def lookup(self, profile: Dict[str, Any], max_distance: float) -> Optional[Dict[str, Any]]:
+        """
+        Reuse the narrative of the nearest stored profile within a distance.
+
+        Args:
+            profile: Profile from narrative_profile
+            max_distance: Largest Euclidean distance at which to reuse
+
+        Returns:
+            Dictionary with the filled 'narrative', 'distance', 'narrative_id'
+            and source 'msme_id', or None when nothing is close enough
+        """
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._refresh(profile['agent'])
+            key = (profile['agent'], profile['partition'])
+            if key not in self._entries:
+                return None
+            tree = self._trees.get(key)
+            if tree is None:
+                tree = self._trees[key] = KDTree(*self._entries[key])
+            match = tree.nearest(tuple(profile['vector']))
+            if match is None or match[0] > max_distance:
+                return None
+
+            distance, payload = match
+            template = json.loads(payload['template'])
+            if has_untemplated_numbers(template):
+                return None
+            narrative = fill_template(template, profile['values'])
+            if narrative is None:
+                return None
+            self._stats['hits'] += 1
+
+        return {
+            'narrative': narrative,
+            'distance': round(distance, 4),
+            'narrative_id': payload['narrative_id'],
+            'msme_id': payload['msme_id']
+        }
+
+    def add(self, profile: Dict[str, Any], narrative: Dict[str, Any], msme_id: Optional[str] = None) -> None:
+        """
+        Store a generated narrative as a template for similar profiles.
+
+        Narratives that still quote numbers after templating are skipped.
+
+        Args:
+            profile: Profile from narrative_profile
+            narrative: Generated narrative (its 'metadata' is not stored)
+            msme_id: Optional MSME identifier of the profile
+        """
+        template = to_template({k: v for k, v in narrative.items() if k != 'metadata'}, profile['values'])
+        if has_untemplated_numbers(template):
+            logger.debug(f"Narrative of {profile['agent']} not stored: it quotes numbers that are not profile values")
+            return
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO narratives (agent, partition_key, vector, template, msme_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    profile['agent'],
+                    profile['partition'],
+                    json.dumps(list(profile['vector'])),
+                    json.dumps(template, default=str),
+                    msme_id,
+                    datetime.now().isoformat()
+                )
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup and hit counts of this process."""
+        with self._lock:
+            lookups, hits = self._stats['lookups'], self._stats['hits']
+            return {
+                'lookups': lookups,
+                'hits': hits,
+                'hit_rate': round(hits / lookups, 4) if lookups else None
+            }
+
+
+class NarrativeReuseMixin:
+    """
+    Narrative reuse for Gemini-backed agents (mix in before BaseAgent).
+
+    Subclasses set NARRATIVE_MODEL to the report model their narratives are
+    validated against.
+    """
+
+    NARRATIVE_MODEL: Type[BaseModel]
+    # Opened on first use when narrative reuse is enabled
+    _narrative_index: Optional[NarrativeIndex] = None
+
+    @property
+    def narrative_index(self) -> NarrativeIndex:
+        """Index of previously generated narratives (opened lazily)."""
+        if self._narrative_index is None:
+            self._narrative_index = NarrativeIndex()
+        return self._narrative_index
+
+    def _reuse_narrative(self, profile: Dict[str, Any]) -> Optional[AgentOutput]:
+        """Report reused from the nearest similar profile, if one is close enough."""
+        try:
+            match = self.narrative_index.lookup(profile, settings.NARRATIVE_REUSE_DISTANCE)
+            if match is None:
+                return None
+            rep_model = self.NARRATIVE_MODEL(**match["narrative"])
+        except Exception as exc:
+            self.logger.warning("Narrative reuse lookup failed: %s", exc)
+            return None
+
+        rep_model = rep_model.model_copy(update={
+            "metadata": {
+                "generated_at": datetime.now().isoformat(),
+                "engine": "narrative-reuse",
+                "reused_from": match["msme_id"],
+                "narrative_id": match["narrative_id"],
+                "distance": match["distance"],
+            }
+        })
+        self.log_step(f"Reused the narrative of a similar profile (distance {match['distance']})")
+        return self.create_output(
+            success=True,
+            data=rep_model.model_dump(),
+            metadata={
+                "agent": self.name,
+                "timestamp": datetime.now().isoformat(),
+                "narrative_reused": True,
+            },
+        )
+
+    def _remember_narrative(
+        self,
+        profile: Dict[str, Any],
+        narrative: Dict[str, Any],
+        context: Optional[Dict[str, Any]]
+    ) -> None:
+        """Store a Gemini-generated narrative for reuse by similar profiles."""
+        try:
+            self.narrative_index.add(profile, narrative, (context or {}).get("msme_id"))
+        except Exception as exc:
+            self.logger.warning("Failed to store narrative for reuse: %s", exc)
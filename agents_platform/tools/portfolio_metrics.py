@@ -0,0 +1,403 @@
+"""
+Tools for computing deterministic health metrics for a whole portfolio in one pass.
+
+All MSMEs' transactions are concatenated into flat columns with a segment id
+per row. Contiguous segments are described by an offsets array, so every
+reduction is a single scan and slice-based detectors never copy data.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+import logging
+
+from .data_parser import extract_transactions_from_json, parse_date
+from .transaction_categorizer import categorize_transaction, summarize_cashflow_patterns
+from .financial_calculator import (
+    compute_stability_from_monthly_inflows,
+    compute_stress_indicators_from_metrics
+)
+from .window_metrics import compute_window_metrics
+from .quantile_sketch import QuantileSketch
+from .seasonality_detector import monthly_net_series, detect_seasonality_batch
+from .cashflow_forecaster import forecast_cashflow_batch
+from .health_calculator import (
+    compute_cashflow_volatility,
+    count_days_below,
+    compute_low_balance_curve,
+    count_emi_transactions,
+    analyze_gst_data
+)
+from .recurring_payments import analyze_recurring_obligations
+from .cheque_returns import link_cheque_returns
+from .gst_reconciliation import monthly_bank_credits, reconcile_gst_with_bank_batch
+from .anomaly_detector import detect_red_flags
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_portfolio_frame(portfolio: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Concatenate the transactions of many MSMEs into one columnar frame.
+
+    Args:
+        portfolio: MSME id -> input data (same structure accepted by the orchestrator)
+
+    Returns:
+        Dictionary with 'msme_ids', 'offsets' (segment boundaries), the flat
+        'transactions' list (consolidated ledger order per MSME) and per-row
+        columns ('segment', 'amount', 'date', 'month', 'day', consolidated
+        'balance', 'category')
+    """
+    msme_ids = []
+    offsets = [0]
+    rows = []
+
+    for msme_id, input_data in portfolio.items():
+        try:
+            transactions = extract_transactions_from_json(input_data)
+        except Exception as e:
+            logger.warning(f"Could not extract transactions for {msme_id}: {e}")
+            transactions = []
+        msme_ids.append(msme_id)
+        rows.extend(transactions)
+        offsets.append(len(rows))
+
+    segment, amount, dates, month, day, balance, category = [], [], [], [], [], [], []
+    for seg_id in range(len(msme_ids)):
+        for tx in rows[offsets[seg_id]:offsets[seg_id + 1]]:
+            date = parse_date(tx.get('date'))
+            segment.append(seg_id)
+            amount.append(float(tx.get('amount', 0)))
+            dates.append(date)
+            month.append(f"{date.year}-{date.month:02d}")
+            day.append(date.date().isoformat())
+            balance.append(tx['consolidated_balance'])
+            category.append(categorize_transaction(tx)[1].value)
+
+    return {
+        'msme_ids': msme_ids,
+        'offsets': offsets,
+        'transactions': rows,
+        'segment': segment,
+        'amount': amount,
+        'date': dates,
+        'month': month,
+        'day': day,
+        'balance': balance,
+        'category': category
+    }
+
+
+def _new_segment_state() -> Dict[str, Any]:
+    """Create the running reduction state for one segment."""
+    return {
+        'count': 0,
+        'inflow': 0.0,
+        'outflow': 0.0,
+        'inflow_count': 0,
+        'outflow_count': 0,
+        'monthly_inflow': defaultdict(float),
+        'monthly_outflow': defaultdict(float),
+        'monthly_count': defaultdict(int),
+        'monthly_balance_sum': defaultdict(float),
+        'monthly_balance_count': defaultdict(int),
+        'daily_min': {},
+        'balance_count': 0,
+        'balance_mean': 0.0,
+        'balance_m2': 0.0,
+        'balance_min': None,
+        'balance_max': None,
+        'negative_balance_count': 0,
+        'categories': defaultdict(int),
+        'sketches': {
+            'balance': QuantileSketch(),
+            'credit_amount': QuantileSketch(),
+            'debit_amount': QuantileSketch()
+        },
+        'period_start': None,
+        'period_end': None
+    }
+
+
+def segmented_reduce(frame: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Run every per-MSME reduction over the concatenated frame in a single pass.
+
+    Args:
+        frame: Output of build_portfolio_frame
+
+    Returns:
+        List of reduction states, one per segment
+    """
+    states = [_new_segment_state() for _ in frame['msme_ids']]
+
+    segment = frame['segment']
+    amount = frame['amount']
+    dates = frame['date']
+    month = frame['month']
+    day = frame['day']
+    balance = frame['balance']
+    category = frame['category']
+
+    for i in range(len(segment)):
+        st = states[segment[i]]
+        value = amount[i]
+        month_key = month[i]
+
+        st['count'] += 1
+        st['monthly_count'][month_key] += 1
+        st['categories'][category[i]] += 1
+
+        if value > 0:
+            st['inflow'] += value
+            st['inflow_count'] += 1
+            st['monthly_inflow'][month_key] += value
+            st['sketches']['credit_amount'].update(value)
+        else:
+            if value < 0:
+                st['outflow'] += -value
+                st['outflow_count'] += 1
+                st['sketches']['debit_amount'].update(-value)
+            st['monthly_outflow'][month_key] += abs(value)
+
+        date = dates[i]
+        if st['period_start'] is None or date < st['period_start']:
+            st['period_start'] = date
+        if st['period_end'] is None or date > st['period_end']:
+            st['period_end'] = date
+
+        bal = balance[i]
+        if bal is not None:
+            # Welford update keeps the sample variance numerically stable in one pass
+            st['balance_count'] += 1
+            delta = bal - st['balance_mean']
+            st['balance_mean'] += delta / st['balance_count']
+            st['balance_m2'] += delta * (bal - st['balance_mean'])
+            if st['balance_min'] is None or bal < st['balance_min']:
+                st['balance_min'] = bal
+            if st['balance_max'] is None or bal > st['balance_max']:
+                st['balance_max'] = bal
+            st['sketches']['balance'].update(bal)
+            if bal < 0:
+                st['negative_balance_count'] += 1
+            st['monthly_balance_sum'][month_key] += bal
+            st['monthly_balance_count'][month_key] += 1
+            day_key = day[i]
+            if day_key not in st['daily_min'] or bal < st['daily_min'][day_key]:
+                st['daily_min'][day_key] = bal
+
+    return states
+
+
+def _monthly_breakdown(st: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Monthly credits/debits/count in the shape produced by detect_cashflow_patterns."""
+    return {
+        month_key: {
+            'credits': st['monthly_inflow'].get(month_key, 0),
+            'debits': st['monthly_outflow'].get(month_key, 0),
+            'count': count
+        }
+        for month_key, count in sorted(st['monthly_count'].items())
+    }
+
+
+def _finalize_financial_health(
+    st: Dict[str, Any],
+    window_months: Optional[List[int]] = None,
+    as_of: Optional[str] = None,
+    seasonality: Optional[Dict[str, Any]] = None,
+    forecast: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Turn a reduction state into FinancialHealthSummary fields."""
+    cashflow_metrics = {
+        'total_inflow': st['inflow'],
+        'total_outflow': st['outflow'],
+        'net_cashflow': st['inflow'] - st['outflow'],
+        'inflow_count': st['inflow_count'],
+        'outflow_count': st['outflow_count']
+    }
+
+    if st['balance_count']:
+        balance_metrics = {
+            'average_balance': st['balance_mean'],
+            'min_balance': st['balance_min'],
+            'max_balance': st['balance_max'],
+            'balance_volatility': (st['balance_m2'] / (st['balance_count'] - 1)) ** 0.5 if st['balance_count'] > 1 else 0.0
+        }
+    else:
+        balance_metrics = {
+            'average_balance': 0.0,
+            'min_balance': 0.0,
+            'max_balance': 0.0,
+            'balance_volatility': 0.0
+        }
+
+    patterns = summarize_cashflow_patterns(_monthly_breakdown(st), seasonality)
+
+    stability_score = compute_stability_from_monthly_inflows(dict(st['monthly_inflow'])) if st['count'] >= 2 else 0.0
+    stress_indicators = compute_stress_indicators_from_metrics(
+        balance_metrics,
+        cashflow_metrics,
+        negative_balance_count=st['negative_balance_count'],
+        transaction_count=st['count']
+    )
+
+    return {
+        'total_inflow': cashflow_metrics['total_inflow'],
+        'total_outflow': cashflow_metrics['total_outflow'],
+        'net_cashflow': cashflow_metrics['net_cashflow'],
+        'average_balance': balance_metrics['average_balance'],
+        'min_balance': balance_metrics['min_balance'],
+        'max_balance': balance_metrics['max_balance'],
+        'volatility_score': patterns['volatility'],
+        'seasonality_detected': patterns['has_seasonality'],
+        'stress_indicators': stress_indicators,
+        'cashflow_stability_score': stability_score,
+        'transaction_count': st['count'],
+        'period_start': st['period_start'],
+        'period_end': st['period_end'],
+        'categorized_transactions': dict(st['categories']),
+        'metadata': {
+            'pattern_analysis': patterns,
+            'balance_volatility': balance_metrics['balance_volatility'],
+            'inflow_count': cashflow_metrics['inflow_count'],
+            'outflow_count': cashflow_metrics['outflow_count'],
+            'window_metrics': compute_window_metrics(
+                dict(st['monthly_inflow']),
+                dict(st['monthly_outflow']),
+                windows=window_months,
+                as_of=as_of
+            ),
+            'distribution_metrics': {metric: sketch.summary() for metric, sketch in st['sketches'].items()},
+            'cashflow_forecast': forecast,
+            'as_of_date': str(as_of) if as_of else None
+        }
+    }
+
+
+def _finalize_health_analysis(
+    st: Dict[str, Any],
+    transactions: List[Dict[str, Any]],
+    input_data: Dict[str, Any],
+    low_balance_threshold: float,
+    low_balance_thresholds: List[float]
+) -> Dict[str, Any]:
+    """Turn a reduction state (plus its row slice) into HealthAnalysisSummary fields."""
+    monthly_inflow = dict(st['monthly_inflow'])
+    monthly_outflow = dict(st['monthly_outflow'])
+    total_inflow = sum(monthly_inflow.values())
+    total_outflow = sum(monthly_outflow.values())
+
+    monthly_avg_balances = [
+        st['monthly_balance_sum'][month_key] / st['monthly_balance_count'][month_key]
+        for month_key in st['monthly_balance_count']
+    ]
+    avg_balance = sum(monthly_avg_balances) / len(monthly_avg_balances) if monthly_avg_balances else 0.0
+
+    daily_min_balances = sorted(st['daily_min'].values())
+    recurring = analyze_recurring_obligations(transactions, monthly_inflow)
+    cheque_returns = link_cheque_returns(transactions)
+
+    return {
+        'monthly_inflow': monthly_inflow,
+        'monthly_outflow': monthly_outflow,
+        'net_cashflow': total_inflow - total_outflow,
+        'cashflow_volatility': compute_cashflow_volatility(monthly_inflow, monthly_outflow),
+        'avg_balance': avg_balance,
+        'low_balance_days': count_days_below(daily_min_balances, low_balance_threshold),
+        'low_balance_curve': compute_low_balance_curve(daily_min_balances, low_balance_thresholds),
+        'emi_transactions': count_emi_transactions(transactions),
+        'cheque_bounces': len(cheque_returns['events']),
+        'overdraft_days': count_days_below(daily_min_balances, 0),
+        'gst_analysis': analyze_gst_data(input_data),
+        'period_start': st['period_start'],
+        'period_end': st['period_end'],
+        'metadata': {
+            'total_inflow': total_inflow,
+            'total_outflow': total_outflow,
+            'months_analyzed': len(set(list(monthly_inflow.keys()) + list(monthly_outflow.keys()))),
+            'recurring_obligations': recurring,
+            'foir': recurring['foir'],
+            'cheque_returns': cheque_returns
+        }
+    }
+
+
+def compute_portfolio_metrics(
+    portfolio: Dict[str, Dict[str, Any]],
+    low_balance_threshold: float = 50000,
+    low_balance_thresholds: Optional[List[float]] = None,
+    window_months: Optional[List[int]] = None,
+    as_of: Optional[str] = None
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Compute FinancialHealthSummary and HealthAnalysisSummary fields for every MSME.
+
+    Args:
+        portfolio: MSME id -> input data
+        low_balance_threshold: Threshold used for low_balance_days
+        low_balance_thresholds: Thresholds for the low balance curve (defaults to
+            settings.LOW_BALANCE_THRESHOLDS, as in the single-MSME health analysis)
+        window_months: Trailing window lengths for window metrics
+        as_of: Optional cut-off month/date for the window metrics
+
+    Returns:
+        Tuple of (MSME id -> {'financial_health', 'health_analysis', 'red_flags'}, MSME id -> error)
+    """
+    frame = build_portfolio_frame(portfolio)
+    states = segmented_reduce(frame)
+    thresholds = low_balance_thresholds or settings.LOW_BALANCE_THRESHOLDS
+
+    # Seasonality and cashflow forecasts for every MSME in one batch each
+    breakdowns = {
+        msme_id: _monthly_breakdown(states[seg_id])
+        for seg_id, msme_id in enumerate(frame['msme_ids'])
+    }
+    series = {msme_id: monthly_net_series(breakdown) for msme_id, breakdown in breakdowns.items()}
+    seasonality = detect_seasonality_batch(series)
+    forecasts = forecast_cashflow_batch({
+        msme_id: {
+            'series': series[msme_id],
+            'last_month': max(breakdown) if breakdown else None,
+            'seasonality': seasonality[msme_id]
+        }
+        for msme_id, breakdown in breakdowns.items()
+    })
+
+    results = {}
+    errors = {}
+    reconciliation_inputs = {}
+    for seg_id, msme_id in enumerate(frame['msme_ids']):
+        st = states[seg_id]
+        if not st['count']:
+            errors[msme_id] = "No transactions found in input data"
+            continue
+
+        transactions = frame['transactions'][frame['offsets'][seg_id]:frame['offsets'][seg_id + 1]]
+        reconciliation_inputs[msme_id] = {
+            'gst_filings': portfolio[msme_id].get('gst_filings', []),
+            'monthly_credits': monthly_bank_credits(transactions)
+        }
+        financial_health = _finalize_financial_health(
+            st, window_months, as_of, seasonality[msme_id], forecasts[msme_id]
+        )
+        results[msme_id] = {
+            'financial_health': financial_health,
+            'health_analysis': _finalize_health_analysis(
+                st,
+                transactions,
+                portfolio[msme_id],
+                low_balance_threshold,
+                thresholds
+            ),
+            'red_flags': detect_red_flags(transactions, financial_health)
+        }
+
+    # GST-to-bank reconciliation for every MSME in one batch
+    reconciliation = reconcile_gst_with_bank_batch(reconciliation_inputs)
+    for msme_id, result in results.items():
+        result['health_analysis']['gst_analysis']['bank_reconciliation'] = reconciliation[msme_id]
+
+    logger.info(f"Computed portfolio metrics for {len(results)} MSMEs ({len(errors)} skipped)")
+    return results, errors
@@ -0,0 +1,263 @@
+"""
+Tools for a fast preview score computed on a stratified sample of a statement.
+
+Rows are stratified by (account, month) and each stratum is sampled in
+proportion to its size (at least one row per stratum), so every account and
+month stays represented and the sample is close to self-weighting. The
+deterministic score is computed on the sample, and confidence bounds come
+from the random group method: the sample is split into interleaved groups,
+each group is scored on its own, and the spread of the group scores gives
+the standard error of the sample score. Groups are scored only while the
+time budget lasts.
+
+The preview estimates the deterministic scorecard score of the full
+statement, not the score of an LLM run. Several scorecard components
+(volatility, stability, cyclicality) are biased on thin samples, so
+statements up to `exact_max_rows` rows are scored in full instead of
+sampled.
+
+Totals (inflow, outflow, net cashflow) are estimated with the stratum
+weights N_h / n_h. Statements no larger than the sample size are scored
+exactly.
+"""
+
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from collections import defaultdict
+from datetime import datetime
+import math
+import random
+import time
+import logging
+
+from .data_parser import parse_date, extract_transactions_from_json
+from .behavioral_scorecard import risk_level_for, DEFAULT_RISK_BANDS
+
+logger = logging.getLogger(__name__)
+
+
+# Two-sided 95% normal quantile for the confidence bounds
+Z_95 = 1.96
+
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+
+
+def _month_key(value: Any, cache: Dict[Any, str]) -> str:
+    """'YYYY-MM' of a raw date value (parsed once per distinct value)."""
+    if isinstance(value, datetime):
+        return f"{value.year}-{value.month:02d}"
+    key = cache.get(value)
+    if key is None:
+        date = parse_date(value)
+        key = cache[value] = f"{date.year}-{date.month:02d}"
+    return key
+
+
+def _account_rows(data: Dict[str, Any]) -> List[Tuple[str, Optional[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Raw rows per account as (account_id, account fields, rows)."""
+    if 'bank_accounts' in data:
+        return [
+            (
+                str(account.get('account_id', '')),
+                {k: v for k, v in account.items() if k != 'transactions'},
+                account.get('transactions') or []
+            )
+            for account in data['bank_accounts']
+        ]
+    rows = data['transactions'] if isinstance(data.get('transactions'), list) else extract_transactions_from_json(data)
+    by_account = defaultdict(list)
+    for tx in rows:
+        by_account[str(tx.get('account_id') or '')].append(tx)
+    return [(account_id, None, account_rows) for account_id, account_rows in by_account.items()]
+
+
+def _subset(
+    data: Dict[str, Any],
+    accounts: List[Tuple[str, Optional[Dict[str, Any]], List[Dict[str, Any]]]],
+    keep: List[List[int]]
+) -> Dict[str, Any]:
+    """Input data restricted to the kept row positions (statement order preserved)."""
+    if 'bank_accounts' in data:
+        return {
+            **data,
+            'bank_accounts': [
+                {**fields, 'transactions': [rows[i] for i in sorted(positions)]}
+                for (_, fields, rows), positions in zip(accounts, keep)
+            ]
+        }
+    return {
+        **data,
+        'transactions': [rows[i] for (_, _, rows), positions in zip(accounts, keep) for i in sorted(positions)]
+    }
+
+
+def stratified_sample(
+    data: Dict[str, Any],
+    sample_size: int,
+    groups: int = 0,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Draw a stratified (account x month) sample of a statement.
+
+    Args:
+        data: Input data (bank_accounts or transactions format)
+        sample_size: Target number of sampled rows
+        groups: Number of random groups to split the sample into (0 for none)
+        seed: Random seed (the same input and seed give the same sample)
+
+    Returns:
+        Dictionary with 'sample' (input data restricted to the sample),
+        'groups' (one input data per random group), 'weights'
+        ((account_id, month) -> N_h / n_h), 'population', 'sampled' and 'strata'
+    """
+    accounts = _account_rows(data)
+    cache: Dict[Any, str] = {}
+    strata = defaultdict(list)
+    for a, (_, _, rows) in enumerate(accounts):
+        for i, tx in enumerate(rows):
+            strata[(a, _month_key(tx.get('date', tx.get('transaction_date', '')), cache))].append(i)
+
+    population = sum(len(rows) for _, _, rows in accounts)
+    fraction = min(1.0, sample_size / population) if population else 1.0
+    rng = random.Random(seed)
+
+    keep: List[List[int]] = [[] for _ in accounts]
+    group_keep = [[[] for _ in accounts] for _ in range(groups)]
+    population_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+    sample_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+    for (a, month), positions in strata.items():
+        take = min(len(positions), max(1, round(fraction * len(positions))))
+        chosen = positions if take == len(positions) else rng.sample(positions, take)
+        keep[a].extend(chosen)
+        # rng.sample returns rows in random order, so j % groups deals them out at random
+        for j, position in enumerate(chosen if groups else ()):
+            group_keep[j % groups][a].append(position)
+        population_counts[(accounts[a][0], month)] += len(positions)
+        sample_counts[(accounts[a][0], month)] += take
+
+    return {
+        'sample': _subset(data, accounts, keep),
+        'groups': [_subset(data, accounts, group) for group in group_keep],
+        'weights': {key: population_counts[key] / sample_counts[key] for key in population_counts},
+        'population': population,
+        'sampled': sum(len(positions) for positions in keep),
+        'strata': len(strata)
+    }
+
+
+def estimate_totals(transactions: List[Dict[str, Any]], weights: Dict[Tuple[str, str], float]) -> Dict[str, float]:
+    """
+    Estimate statement totals from sampled transactions with stratum weights.
+
+    Args:
+        transactions: Normalized sampled transactions
+        weights: (account_id, month) -> N_h / n_h
+
+    Returns:
+        Dictionary with estimated total_inflow, total_outflow and net_cashflow
+    """
+    inflow = outflow = 0.0
+    for tx in transactions:
+        date = parse_date(tx.get('date'))
+        weight = weights.get((str(tx.get('account_id') or ''), f"{date.year}-{date.month:02d}"), 1.0)
+        amount = float(tx.get('amount', 0))
+        if amount > 0:
+            inflow += weight * amount
+        else:
+            outflow -= weight * amount
+    return {
+        'total_inflow': round(inflow, 2),
+        'total_outflow': round(outflow, 2),
+        'net_cashflow': round(inflow - outflow, 2)
+    }
+
+
+def compute_preview_score(
+    data: Dict[str, Any],
+    score_fn: Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]],
+    sample_size: int = 2000,
+    time_budget_ms: float = 1500.0,
+    groups: int = 5,
+    risk_bands: Optional[List[float]] = None,
+    seed: int = 0,
+    exact_max_rows: int = 0
+) -> Dict[str, Any]:
+    """
+    Estimate a statement's scorecard score from a stratified sample within a time budget.
+
+    Args:
+        data: Input data (bank_accounts or transactions format)
+        score_fn: Scores (input data, normalized transactions) into a
+            BehavioralScore dict (e.g. the behavioral scorecard)
+        sample_size: Target number of sampled rows
+        time_budget_ms: Budget after which no further random group is scored
+        groups: Number of random groups used for the confidence bounds
+        risk_bands: Lower bounds of the low/medium/high risk bands
+        seed: Random seed for the sample
+        exact_max_rows: Statements with at most this many rows are scored in full
+
+    Returns:
+        Dictionary with the sample score ('score'), 'bounds' (95% interval,
+        the full 0-1000 range when no standard error could be computed in
+        the budget), 'standard_error', the 'risk_levels' the bounds span,
+        estimated 'totals', 'sample' statistics, 'exact' and timing
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0
+
+    population = sum(len(rows) for _, _, rows in _account_rows(data))
+    if population <= exact_max_rows:
+        sample_size = population
+
+    drawn = stratified_sample(data, sample_size, groups=groups, seed=seed)
+    exact = drawn['sampled'] == drawn['population']
+
+    transactions = extract_transactions_from_json(drawn['sample'])
+    score = score_fn(drawn['sample'], transactions)
+    value = score['behavioral_score']
+
+    group_scores = []
+    if not exact:
+        for group in drawn['groups']:
+            if time.perf_counter() >= deadline:
+                break
+            group_transactions = extract_transactions_from_json(group)
+            if group_transactions:
+                group_scores.append(score_fn(group, group_transactions)['behavioral_score'])
+
+    standard_error = None
+    if exact:
+        standard_error = 0.0
+    elif len(group_scores) >= 2:
+        # Each group holds about 1/groups of the sample, so Var(sample) ~ Var(group) / groups
+        mean = sum(group_scores) / len(group_scores)
+        group_variance = sum((s - mean) ** 2 for s in group_scores) / (len(group_scores) - 1)
+        standard_error = math.sqrt(group_variance / groups)
+
+    if standard_error is None:
+        lower, upper = 0.0, 1000.0
+    else:
+        lower = max(0.0, value - Z_95 * standard_error)
+        upper = min(1000.0, value + Z_95 * standard_error)
+    bands = tuple(risk_bands or DEFAULT_RISK_BANDS)
+    levels = RISK_LEVELS[RISK_LEVELS.index(risk_level_for(upper, bands)):RISK_LEVELS.index(risk_level_for(lower, bands)) + 1]
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return {
+        'score': score,
+        'exact': exact,
+        'bounds': {'lower': round(lower, 2), 'upper': round(upper, 2), 'level': 0.95},
+        'standard_error': round(standard_error, 2) if standard_error is not None else None,
+        'risk_levels': list(levels),
+        'totals': estimate_totals(transactions, drawn['weights']),
+        'sample': {
+            'population': drawn['population'],
+            'sampled': drawn['sampled'],
+            'strata': drawn['strata'],
+            'fraction': round(drawn['sampled'] / drawn['population'], 4) if drawn['population'] else 1.0,
+            'groups_scored': len(group_scores)
+        },
+        'elapsed_ms': round(elapsed_ms, 2),
+        'time_budget_ms': time_budget_ms,
+        'budget_exceeded': elapsed_ms > time_budget_ms
+    }
@@ -0,0 +1,379 @@
+"""
+Tools for mergeable quantile sketches over balances and transaction amounts.
+
+QuantileSketch keeps every value while the input is small (exact mode, with
+linear interpolation so the median matches statistics.median). Beyond
+``exact_limit`` values it switches to a KLL-style sketch: a stack of
+compactors where level h holds items of weight 2^h; once the sketch holds
+more items than its levels' combined capacity, the lowest overflowing level
+is sorted and every other item is promoted. Compacting lazily keeps the
+levels full between compactions, so rank error stays around 0.5% at the
+default k. Memory stays O(k log(n/k)) and sketches for different accounts
+or MSMEs merge by concatenating levels.
+
+Sketches serialize to JSON and are persisted per (MSME, account, metric) in
+the analytics database, updated incrementally at ingestion.
+"""
+
+from typing import List, Dict, Any, Optional, Iterable
+from collections import defaultdict
+import json
+import math
+import sqlite3
+import logging
+
+from .data_parser import transaction_key
+from ..core.analytics_db import (
+    get_analytics_connection,
+    ensure_ingestion_ledger,
+    filter_unseen_keys,
+    record_seen_keys
+)
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+# Metrics maintained per account at ingestion
+SKETCH_METRICS = ('balance', 'credit_amount', 'debit_amount')
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with an exact mode for small inputs.
+    """
+
+    def __init__(self, k: int = 200, exact_limit: int = 2048):
+        """
+        Initialize an empty sketch.
+
+        Args:
+            k: Capacity of the top compactor (accuracy roughly 1/k of rank)
+            exact_limit: Largest input kept exactly before compacting
+        """
+        self.k = k
+        self.exact_limit = exact_limit
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.exact = True
+        self.levels: List[List[float]] = [[]]
+        self._flips: List[int] = [0]
+        # Updates left before the sketch is full (set by _compress)
+        self._room = 0
+
+    def update(self, value: float) -> None:
+        """Add one value."""
+        value = float(value)
+        self.n += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        self.levels[0].append(value)
+        if self.exact:
+            if self.n > self.exact_limit:
+                self.exact = False
+                self._compress()
+        else:
+            self._room -= 1
+            if self._room <= 0:
+                self._compress()
+
+    def extend(self, values: Iterable[float]) -> "QuantileSketch":
+        """Add many values."""
+        for value in values:
+            self.update(value)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Merge another sketch into this one (in place)."""
+        if other.n == 0:
+            return self
+
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+            self._flips.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+
+        if self.exact and other.exact and self.n <= self.exact_limit:
+            return self
+        self.exact = False
+        self._compress()
+        return self
+
+    def _capacity(self, level: int) -> int:
+        """Compactor capacity; lower levels shrink geometrically."""
+        depth = len(self.levels) - level - 1
+        return max(8, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _free_capacity(self) -> int:
+        """Combined capacity of the levels minus the items they hold."""
+        return sum(self._capacity(level) - len(items) for level, items in enumerate(self.levels))
+
+    def _compress(self) -> None:
+        """Compact the lowest overflowing level until the sketch is no longer full."""
+        while self._free_capacity() <= 0:
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                    self._flips.append(0)
+
+                items.sort()
+                leftover = [items.pop()] if len(items) % 2 else []
+                # Alternate the kept half per level so compaction error does not drift one way
+                offset = self._flips[level] & 1
+                self._flips[level] += 1
+                self.levels[level + 1].extend(items[offset::2])
+                self.levels[level] = leftover
+                break
+        self._room = self._free_capacity()
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[float, Optional[float]]:
+        """
+        Estimate several quantiles at once.
+
+        Args:
+            qs: Quantiles in [0, 1]
+
+        Returns:
+            Quantile -> value (None for an empty sketch)
+        """
+        qs = list(qs)
+        if self.n == 0:
+            return {q: None for q in qs}
+
+        if self.exact:
+            values = sorted(self.levels[0])
+            results = {}
+            for q in qs:
+                position = min(max(q, 0.0), 1.0) * (len(values) - 1)
+                lower = int(math.floor(position))
+                upper = min(lower + 1, len(values) - 1)
+                results[q] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+            return results
+
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.levels)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        results = {}
+        for q in qs:
+            if q <= 0:
+                results[q] = self.min
+                continue
+            if q >= 1:
+                results[q] = self.max
+                continue
+            target = q * total
+            cumulative = 0
+            results[q] = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results[q] = value
+                    break
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a single quantile."""
+        return self.quantiles([q])[q]
+
+    def summary(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        """Quantiles keyed "p10", "p50", ... plus count, min, max and mode."""
+        result = {f"p{int(round(q * 100))}": value for q, value in self.quantiles(qs).items()}
+        result.update({'count': self.n, 'min': self.min, 'max': self.max, 'exact': self.exact})
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the sketch."""
+        return {
+            'k': self.k,
+            'exact_limit': self.exact_limit,
+            'n': self.n,
+            'min': self.min,
+            'max': self.max,
+            'exact': self.exact,
+            'levels': self.levels,
+            'flips': self._flips
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        """Deserialize a sketch produced by to_dict."""
+        sketch = cls(k=data.get('k', 200), exact_limit=data.get('exact_limit', 2048))
+        sketch.n = data.get('n', 0)
+        sketch.min = data.get('min')
+        sketch.max = data.get('max')
+        sketch.exact = data.get('exact', True)
+        sketch.levels = [list(items) for items in data.get('levels', [[]])] or [[]]
+        sketch._flips = list(data.get('flips') or [0] * len(sketch.levels))
+        if not sketch.exact:
+            sketch._room = sketch._free_capacity()
+        return sketch
+
+
+def summarize_quantiles(values: Iterable[float], qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+    """
+    Quantile summary of a list of values (exact for small inputs).
+
+    Args:
+        values: Values to summarize
+        qs: Quantiles in [0, 1]
+
+    Returns:
+        Dictionary with "p10", "p50", ... keys plus count, min, max and exact
+    """
+    return QuantileSketch().extend(values).summary(qs)
+
+
+def build_transaction_sketches(transactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, QuantileSketch]]:
+    """
+    Build per-account sketches for balances and credit/debit amounts.
+
+    Args:
+        transactions: List of transactions
+
+    Returns:
+        Account id -> metric -> QuantileSketch
+    """
+    sketches = defaultdict(lambda: {metric: QuantileSketch() for metric in SKETCH_METRICS})
+    for tx in transactions:
+        account = sketches[str(tx.get('account_id') or '')]
+        amount = float(tx.get('amount', 0))
+        if amount > 0:
+            account['credit_amount'].update(amount)
+        elif amount < 0:
+            account['debit_amount'].update(-amount)
+        if tx.get('balance_after') is not None:
+            account['balance'].update(float(tx['balance_after']))
+    return dict(sketches)
+
+
+def merge_sketches(sketches: Iterable[QuantileSketch]) -> QuantileSketch:
+    """Merge sketches (e.g. across accounts or MSMEs) into a new sketch."""
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quantile_sketches (
+    msme_id TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (msme_id, account_id, metric)
+);
+"""
+
+
+class QuantileSketchStore:
+    """
+    SQLite-backed quantile sketches per (MSME, account, metric).
+    """
+
+    CONSUMER = "quantile_sketches"
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the store.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+        ensure_ingestion_ledger(self.conn)
+
+    def _load(self, msme_id: str, account_id: str, metric: str) -> Optional[QuantileSketch]:
+        """Load one persisted sketch."""
+        row = self.conn.execute(
+            "SELECT sketch FROM quantile_sketches WHERE msme_id = ? AND account_id = ? AND metric = ?",
+            (msme_id, account_id, metric)
+        ).fetchone()
+        return QuantileSketch.from_dict(json.loads(row['sketch'])) if row else None
+
+    def ingest(self, msme_id: str, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Fold new transactions into an MSME's sketches.
+
+        Args:
+            msme_id: MSME identifier
+            transactions: Transactions to ingest
+
+        Returns:
+            Number of transactions newly added
+        """
+        if not transactions:
+            return 0
+
+        keyed = {transaction_key(tx): tx for tx in transactions}
+        unseen = filter_unseen_keys(self.conn, self.CONSUMER, msme_id, list(keyed.keys()))
+        if not unseen:
+            return 0
+
+        delta = build_transaction_sketches([tx for key, tx in keyed.items() if key in unseen])
+        rows = []
+        for account_id, metrics in delta.items():
+            for metric, sketch in metrics.items():
+                if sketch.n == 0:
+                    continue
+                existing = self._load(msme_id, account_id, metric)
+                if existing is not None:
+                    sketch = existing.merge(sketch)
+                rows.append((msme_id, account_id, metric, json.dumps(sketch.to_dict())))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO quantile_sketches (msme_id, account_id, metric, sketch) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            record_seen_keys(self.conn, self.CONSUMER, msme_id, list(unseen))
+
+        logger.info(f"Quantile sketches: ingested {len(unseen)} transactions for {msme_id}")
+        return len(unseen)
+
+    def get(
+        self,
+        metric: str,
+        msme_ids: Optional[List[str]] = None,
+        account_ids: Optional[List[str]] = None
+    ) -> QuantileSketch:
+        """
+        Load and merge sketches for a metric across accounts and MSMEs.
+
+        Args:
+            metric: One of SKETCH_METRICS
+            msme_ids: Optional MSME filter (None for the whole portfolio)
+            account_ids: Optional account filter
+
+        Returns:
+            Merged QuantileSketch
+        """
+        conditions = ["metric = ?"]
+        params: List[Any] = [metric]
+        if msme_ids:
+            conditions.append(f"msme_id IN ({','.join('?' * len(msme_ids))})")
+            params.extend(msme_ids)
+        if account_ids:
+            conditions.append(f"account_id IN ({','.join('?' * len(account_ids))})")
+            params.extend(account_ids)
+
+        rows = self.conn.execute(
+            f"SELECT sketch FROM quantile_sketches WHERE {' AND '.join(conditions)}",
+            params
+        ).fetchall()
+        return merge_sketches(QuantileSketch.from_dict(json.loads(row['sketch'])) for row in rows)
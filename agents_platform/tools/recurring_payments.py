@@ -0,0 +1,239 @@
+"""
+Tools for detecting recurring payments (EMIs, rent, salaries) and FOIR.
+
+Debits are grouped by counterparty and clustered by amount (within a
+tolerance) with a sort-and-scan over amounts. Each cluster's dates are then
+sorted and scanned: the median gap decides whether it is a weekly or monthly
+series, and the gaps/due days expose missed and late instances. Obligations
+flagged as loan repayments (EMI/loan/NACH/ECS mandate narrations) give the
+repayment pattern score and the fixed obligation to income ratio (FOIR).
+"""
+
+from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from datetime import timedelta
+from statistics import median
+import re
+import logging
+
+from .data_parser import parse_date
+from .counterparty_analyzer import extract_counterparty, normalize_counterparty
+from .window_metrics import month_range
+
+logger = logging.getLogger(__name__)
+
+
+# Narration markers for loan repayments, including mandate-only debits
+EMI_MARKERS = re.compile(
+    r"\b(emi|loan|nach|ach|ecs|mandate|umrn|installment|instalment)\b",
+    re.IGNORECASE
+)
+
+# Frequency -> (nominal period in days, accepted median gap range)
+FREQUENCIES = {
+    'weekly': (7, (5, 9)),
+    'monthly': (30, (25, 35))
+}
+
+
+def is_emi_transaction(tx: Dict[str, Any]) -> bool:
+    """Check whether a debit looks like a loan repayment."""
+    if float(tx.get('amount', 0)) >= 0:
+        return False
+    if str(tx.get('type', '')).lower() == 'emi':
+        return True
+    return bool(EMI_MARKERS.search(str(tx.get('description', ''))))
+
+
+def _cluster_by_amount(debits: List[Dict[str, Any]], tolerance: float) -> List[List[Dict[str, Any]]]:
+    """Split one counterparty's debits into clusters of similar amounts."""
+    ordered = sorted(debits, key=lambda tx: abs(float(tx.get('amount', 0))))
+    clusters = []
+    current = []
+    base = 0.0
+    for tx in ordered:
+        amount = abs(float(tx.get('amount', 0)))
+        if current and amount <= base * (1 + tolerance):
+            current.append(tx)
+            continue
+        if current:
+            clusters.append(current)
+        current = [tx]
+        base = amount
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def _classify_frequency(gaps: List[int]) -> Optional[str]:
+    """Map the median gap between payments to a frequency."""
+    if not gaps:
+        return None
+    median_gap = median(gaps)
+    for frequency, (_, (low, high)) in FREQUENCIES.items():
+        if low <= median_gap <= high:
+            return frequency
+    return None
+
+
+def _scan_monthly(dates: List[Any], grace_days: int) -> Dict[str, Any]:
+    """Missed months and late payments against the usual due day."""
+    expected_day = int(median(d.day for d in dates))
+    paid_months = {f"{d.year}-{d.month:02d}" for d in dates}
+    months = month_range(min(paid_months), max(paid_months))
+    missed = [m for m in months if m not in paid_months]
+    late = [d for d in dates if d.day - expected_day > grace_days]
+    return {
+        'expected_day': expected_day,
+        'expected_instances': len(months),
+        'missed_periods': missed,
+        'late_dates': late
+    }
+
+
+def _scan_weekly(dates: List[Any], grace_days: int) -> Dict[str, Any]:
+    """Missed weeks and late payments from the gaps between payments."""
+    period = FREQUENCIES['weekly'][0]
+    missed = []
+    late = []
+    for previous, current in zip(dates, dates[1:]):
+        gap = (current - previous).days
+        periods = max(1, round(gap / period))
+        for k in range(1, periods):
+            missed.append((previous + timedelta(days=k * period)).date().isoformat())
+        if gap - periods * period > grace_days:
+            late.append(current)
+    return {
+        'expected_day': None,
+        'expected_instances': len(dates) + len(missed),
+        'missed_periods': missed,
+        'late_dates': late
+    }
+
+
+def detect_recurring_payments(
+    transactions: List[Dict[str, Any]],
+    amount_tolerance: float = 0.05,
+    min_occurrences: int = 3,
+    grace_days: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Detect periodic debit series (weekly or monthly).
+
+    Args:
+        transactions: List of transactions
+        amount_tolerance: Relative amount spread allowed within one series
+        min_occurrences: Minimum payments for a series to count
+        grace_days: Days past the due day before a payment counts as late
+
+    Returns:
+        List of obligations with counterparty, frequency, amount, monthly_amount,
+        occurrences, regularity, on_time_ratio, missed/late instances and is_emi,
+        sorted by monthly amount (largest first)
+    """
+    by_counterparty = defaultdict(list)
+    for tx in transactions:
+        if float(tx.get('amount', 0)) < 0:
+            by_counterparty[extract_counterparty(tx) or normalize_counterparty(tx.get('description', ''))].append(tx)
+
+    obligations = []
+    for counterparty, debits in by_counterparty.items():
+        if len(debits) < min_occurrences:
+            continue
+
+        for cluster in _cluster_by_amount(debits, amount_tolerance):
+            if len(cluster) < min_occurrences:
+                continue
+
+            dates = sorted(parse_date(tx.get('date')) for tx in cluster)
+            gaps = [(b - a).days for a, b in zip(dates, dates[1:])]
+            frequency = _classify_frequency(gaps)
+            if frequency is None:
+                continue
+
+            scan = _scan_monthly(dates, grace_days) if frequency == 'monthly' else _scan_weekly(dates, grace_days)
+
+            amount = median(abs(float(tx.get('amount', 0))) for tx in cluster)
+            monthly_amount = amount if frequency == 'monthly' else amount * 52 / 12
+
+            mean_gap = sum(gaps) / len(gaps)
+            gap_std = (sum((g - mean_gap) ** 2 for g in gaps) / len(gaps)) ** 0.5
+            regularity = max(0.0, 1.0 - gap_std / mean_gap) if mean_gap > 0 else 0.0
+
+            expected = max(scan['expected_instances'], len(dates))
+            on_time = len(dates) - len(scan['late_dates'])
+
+            obligations.append({
+                'counterparty': counterparty,
+                'frequency': frequency,
+                'amount': amount,
+                'monthly_amount': monthly_amount,
+                'occurrences': len(dates),
+                'first_date': dates[0].date().isoformat(),
+                'last_date': dates[-1].date().isoformat(),
+                'expected_day': scan['expected_day'],
+                'regularity': regularity,
+                'on_time_ratio': on_time / expected if expected else 0.0,
+                'missed_count': len(scan['missed_periods']),
+                'late_count': len(scan['late_dates']),
+                'missed_periods': scan['missed_periods'],
+                'late_dates': [d.date().isoformat() for d in scan['late_dates']],
+                'is_emi': any(is_emi_transaction(tx) for tx in cluster)
+            })
+
+    obligations.sort(key=lambda o: o['monthly_amount'], reverse=True)
+    return obligations
+
+
+def compute_repayment_pattern_score(obligations: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Score loan repayment discipline (0-100) from EMI obligations.
+
+    The on-time ratio of each EMI series is weighted by its monthly amount.
+
+    Args:
+        obligations: Output of detect_recurring_payments
+
+    Returns:
+        Score, or None when no EMI series was found
+    """
+    emis = [o for o in obligations if o['is_emi']]
+    total_weight = sum(o['monthly_amount'] for o in emis)
+    if not emis or total_weight <= 0:
+        return None
+    score = 100.0 * sum(o['on_time_ratio'] * o['monthly_amount'] for o in emis) / total_weight
+    return round(min(max(score, 0.0), 100.0), 2)
+
+
+def analyze_recurring_obligations(
+    transactions: List[Dict[str, Any]],
+    monthly_inflow: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Detect recurring obligations and derive FOIR and the repayment score.
+
+    Args:
+        transactions: List of transactions
+        monthly_inflow: Month -> inflow amount (income base for FOIR)
+
+    Returns:
+        Dictionary with 'obligations', 'emi_obligations', 'monthly_emi',
+        'monthly_recurring_outflow', 'avg_monthly_income', 'foir' and
+        'repayment_pattern_score'
+    """
+    obligations = detect_recurring_payments(transactions)
+    monthly_emi = sum(o['monthly_amount'] for o in obligations if o['is_emi'])
+    monthly_recurring = sum(o['monthly_amount'] for o in obligations)
+
+    income_values = [v for v in monthly_inflow.values() if v > 0]
+    avg_income = sum(income_values) / len(income_values) if income_values else 0.0
+
+    return {
+        'obligations': obligations,
+        'emi_obligations': sum(1 for o in obligations if o['is_emi']),
+        'monthly_emi': monthly_emi,
+        'monthly_recurring_outflow': monthly_recurring,
+        'avg_monthly_income': avg_income,
+        'foir': monthly_emi / avg_income if avg_income > 0 else None,
+        'repayment_pattern_score': compute_repayment_pattern_score(obligations)
+    }
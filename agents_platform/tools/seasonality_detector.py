@@ -0,0 +1,145 @@
+"""
+Tools for detecting seasonality in monthly net cashflow.
+
+Each series is linearly detrended and its sample autocorrelation is scanned
+over candidate periods (2 to 12 months, with at least two full cycles of
+history). The strongest positive autocorrelation is tested against the
+white-noise bound 1/sqrt(n), Bonferroni-adjusted for the number of lags
+tried, so stable businesses are no longer flagged as seasonal.
+
+Series of equal length share the same trend design and lag set, so a whole
+portfolio is processed as a handful of batches.
+"""
+
+from typing import List, Dict, Any
+from collections import defaultdict
+import math
+import logging
+
+from .window_metrics import month_range
+
+logger = logging.getLogger(__name__)
+
+
+def monthly_net_series(monthly_amounts: Dict[str, Dict[str, float]]) -> List[float]:
+    """
+    Build a dense, chronologically ordered monthly net cashflow series.
+
+    Args:
+        monthly_amounts: Month -> {'credits', 'debits', ...} mapping
+
+    Returns:
+        Net cashflow per month (months without activity count as zero)
+    """
+    if not monthly_amounts:
+        return []
+
+    months = month_range(min(monthly_amounts), max(monthly_amounts))
+    series = []
+    for month_key in months:
+        m = monthly_amounts.get(month_key)
+        series.append(float(m['credits']) - float(m['debits']) if m else 0.0)
+    return series
+
+
+def _not_seasonal(n: int) -> Dict[str, Any]:
+    """Result for series that cannot be tested or show no cycle."""
+    return {
+        'seasonal': False,
+        'period': None,
+        'strength': 0.0,
+        'p_value': 1.0,
+        'significance_score': 0.0,
+        'cyclicality_score': 0.0,
+        'months': n
+    }
+
+
+def detect_seasonality_batch(
+    series_by_id: Dict[str, List[float]],
+    max_period: int = 12,
+    min_cycles: int = 2,
+    alpha: float = 0.05,
+    min_strength: float = 0.3
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Detect seasonality for many monthly net cashflow series at once.
+
+    Args:
+        series_by_id: Identifier -> dense monthly net cashflow series
+        max_period: Longest candidate period in months
+        min_cycles: Full cycles of history required to test a period
+        alpha: Significance level for the adjusted p-value
+        min_strength: Minimum autocorrelation to call a cycle seasonal
+
+    Returns:
+        Identifier -> {'seasonal', 'period', 'strength', 'p_value',
+        'significance_score', 'cyclicality_score', 'months'}
+    """
+    by_length = defaultdict(list)
+    for series_id, series in series_by_id.items():
+        by_length[len(series)].append(series_id)
+
+    results = {}
+    for n, series_ids in by_length.items():
+        lags = list(range(2, min(max_period, n // min_cycles) + 1))
+        if not lags:
+            for series_id in series_ids:
+                results[series_id] = _not_seasonal(n)
+            continue
+
+        # Shared linear-trend design for every series of this length
+        t_mean = (n - 1) / 2.0
+        t_centered = [t - t_mean for t in range(n)]
+        t_ss = sum(t * t for t in t_centered)
+        bound = 1.0 / math.sqrt(n)
+
+        for series_id in series_ids:
+            values = series_by_id[series_id]
+            mean = sum(values) / n
+            slope = sum(tc * (v - mean) for tc, v in zip(t_centered, values)) / t_ss
+            residuals = [v - mean - slope * tc for v, tc in zip(values, t_centered)]
+
+            c0 = sum(r * r for r in residuals) / n
+            if c0 <= 1e-12:
+                results[series_id] = _not_seasonal(n)
+                continue
+
+            best_lag, best_acf = None, 0.0
+            for lag in lags:
+                acf = sum(residuals[i] * residuals[i + lag] for i in range(n - lag)) / n / c0
+                if acf > best_acf:
+                    best_lag, best_acf = lag, acf
+
+            if best_lag is None:
+                results[series_id] = _not_seasonal(n)
+                continue
+
+            z = best_acf / bound
+            p_value = min(1.0, 0.5 * math.erfc(z / math.sqrt(2)) * len(lags))
+            seasonal = p_value < alpha and best_acf >= min_strength
+
+            results[series_id] = {
+                'seasonal': seasonal,
+                'period': best_lag,
+                'strength': best_acf,
+                'p_value': p_value,
+                'significance_score': 1.0 - p_value,
+                'cyclicality_score': round(100.0 * min(best_acf, 1.0) * (1.0 - p_value), 2),
+                'months': n
+            }
+
+    return results
+
+
+def detect_seasonality(monthly_amounts: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Detect seasonality for a single MSME.
+
+    Args:
+        monthly_amounts: Month -> {'credits', 'debits', ...} mapping
+
+    Returns:
+        Seasonality result (see detect_seasonality_batch)
+    """
+    return detect_seasonality_batch({'series': monthly_net_series(monthly_amounts)})['series']
@@ -0,0 +1,237 @@
+"""
+Tools for verifying the running balance of uploaded bank statements.
+
+Within an account every row should satisfy
+
+    balance_after[i] == balance_after[i-1] + amount[i]
+
+A statement that was edited or had rows or pages dropped breaks this chain.
+Rows are grouped per account in statement order and the chain is checked in a
+single pass over two flat columns (amounts and balances). Statements listed
+newest-first are detected and checked in reverse.
+
+Breaks are classified as:
+
+- edited_row: a break immediately undone by the next row, i.e. one row's
+  balance (or amount) was altered
+- missing_page: a single break at a statement page boundary
+- gap: any other single break, i.e. rows are missing (or an amount was
+  altered together with its balance)
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+import logging
+
+from .data_parser import parse_date, transaction_ref
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TOLERANCE = 0.01
+
+# Individual breaks listed in the result; counts always cover all of them
+DEFAULT_MAX_BREAKS = 100
+
+
+def _balance_of(tx: Dict[str, Any]) -> Optional[float]:
+    """Reported running balance of a row, if any."""
+    balance = tx.get('balance_after', tx.get('balance'))
+    if balance is None or balance == '':
+        return None
+    return float(balance)
+
+
+def _scan(
+    amounts: List[float],
+    balances: List[Optional[float]],
+    tolerance: float
+) -> Tuple[int, List[Tuple[int, float]]]:
+    """
+    Check the balance chain in order.
+
+    Rows without a balance are skipped and restart the chain.
+
+    Returns:
+        Tuple of (rows checked, [(position, discrepancy), ...])
+    """
+    checked = 0
+    breaks = []
+    prev = None
+    for i, (amount, balance) in enumerate(zip(amounts, balances)):
+        if balance is None:
+            prev = None
+            continue
+        if prev is not None:
+            checked += 1
+            diff = balance - prev - amount
+            if diff > tolerance or diff < -tolerance:
+                breaks.append((i, diff))
+        prev = balance
+    return checked, breaks
+
+
+def _classify(
+    breaks: List[Tuple[int, float]],
+    rows: List[Dict[str, Any]],
+    tolerance: float
+) -> List[Tuple[str, int, float]]:
+    """
+    Classify raw breaks (positions in scan order).
+
+    Returns:
+        List of (type, position, discrepancy)
+    """
+    classified = []
+    i = 0
+    while i < len(breaks):
+        position, diff = breaks[i]
+        if i + 1 < len(breaks):
+            next_position, next_diff = breaks[i + 1]
+            if next_position == position + 1 and abs(diff + next_diff) <= tolerance:
+                classified.append(('edited_row', position, diff))
+                i += 2
+                continue
+        page, prev_page = rows[position].get('page'), rows[position - 1].get('page')
+        if page is not None and prev_page is not None and page != prev_page:
+            classified.append(('missing_page', position, diff))
+        else:
+            classified.append(('gap', position, diff))
+        i += 1
+    return classified
+
+
+def _check_account(
+    rows: List[Dict[str, Any]],
+    tolerance: float,
+    max_breaks: int
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Check one account's rows (in statement order).
+
+    Only the first max_breaks breaks are described in detail.
+
+    Returns:
+        Tuple of (account summary, break details)
+    """
+    amounts = [float(tx.get('amount', 0)) for tx in rows]
+    balances = [_balance_of(tx) for tx in rows]
+    checked, breaks = _scan(amounts, balances, tolerance)
+    order = 'chronological'
+
+    # Newest-first statements satisfy the same identity when read backwards
+    if breaks and len(breaks) * 2 > checked:
+        reverse_checked, reverse_breaks = _scan(amounts[::-1], balances[::-1], tolerance)
+        if len(reverse_breaks) < len(breaks):
+            rows, amounts, balances = rows[::-1], amounts[::-1], balances[::-1]
+            checked, breaks = reverse_checked, reverse_breaks
+            order = 'reverse'
+
+    classified = _classify(breaks, rows, tolerance)
+
+    details = []
+    for kind, position, diff in classified[:max_breaks]:
+        tx, prev_tx = rows[position], rows[position - 1]
+        days = (parse_date(tx.get('date')) - parse_date(prev_tx.get('date'))).days
+        details.append({
+            'type': kind,
+            'account_id': tx.get('account_id'),
+            # Position in the uploaded statement, whatever the scan direction
+            'position': len(rows) - 1 - position if order == 'reverse' else position,
+            'transaction_ref': transaction_ref(tx),
+            'previous_transaction_ref': transaction_ref(prev_tx),
+            'date': parse_date(tx.get('date')).isoformat(),
+            'days_since_previous': abs(days),
+            'expected_balance': balances[position - 1] + amounts[position],
+            'reported_balance': balances[position],
+            'discrepancy': diff,
+            'page': tx.get('page')
+        })
+
+    counts = defaultdict(int)
+    for kind, _, _ in classified:
+        counts[kind] += 1
+    summary = {
+        'account_id': rows[0].get('account_id') if rows else None,
+        'rows': len(rows),
+        'rows_checked': checked,
+        'rows_without_balance': sum(1 for balance in balances if balance is None),
+        'order': order,
+        'breaks': len(classified),
+        'edited_rows': counts['edited_row'],
+        'gaps': counts['gap'],
+        'missing_pages': counts['missing_page'],
+        'integrity_score': _integrity_score(checked, len(classified))
+    }
+    return summary, details
+
+
+def _integrity_score(checked: int, breaks: int) -> Optional[float]:
+    """Share of checked rows that continue the balance chain (0-100)."""
+    if not checked:
+        return None
+    return round(100.0 * max(checked - breaks, 0) / checked, 2)
+
+
+def check_balance_continuity(
+    transactions: List[Dict[str, Any]],
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_breaks: int = DEFAULT_MAX_BREAKS
+) -> Dict[str, Any]:
+    """
+    Verify running balances per account and locate breaks.
+
+    Must be given statement rows before internal-transfer netting, since
+    dropped rows would otherwise show up as gaps.
+
+    Args:
+        transactions: Statement rows with 'amount' and 'balance_after' (in
+            statement order; an optional 'page' enables missing-page detection)
+        tolerance: Accepted absolute rounding difference
+        max_breaks: Maximum number of individual breaks listed
+
+    Returns:
+        Dictionary with 'status' (verified, warnings, failed or
+        unverifiable), 'integrity_score', row and break counts, per-account
+        summaries and the first max_breaks breaks with their positions
+    """
+    by_account = defaultdict(list)
+    for tx in transactions:
+        by_account[str(tx.get('account_id') or '')].append(tx)
+
+    accounts = []
+    breaks = []
+    for rows in by_account.values():
+        summary, details = _check_account(rows, tolerance, max_breaks)
+        accounts.append(summary)
+        breaks.extend(details)
+
+    break_count = sum(a['breaks'] for a in accounts)
+    checked = sum(a['rows_checked'] for a in accounts)
+    edited = sum(a['edited_rows'] for a in accounts)
+    if not checked:
+        status = 'unverifiable'
+    elif edited:
+        status = 'failed'
+    elif break_count:
+        status = 'warnings'
+    else:
+        status = 'verified'
+
+    if break_count:
+        logger.info(f"Statement integrity: {break_count} balance breaks in {checked} checked rows")
+
+    return {
+        'status': status,
+        'integrity_score': _integrity_score(checked, break_count),
+        'rows': len(transactions),
+        'rows_checked': checked,
+        'rows_without_balance': sum(a['rows_without_balance'] for a in accounts),
+        'break_count': break_count,
+        'edited_rows': edited,
+        'gaps': sum(a['gaps'] for a in accounts),
+        'missing_pages': sum(a['missing_pages'] for a in accounts),
+        'accounts': accounts,
+        'breaks': breaks[:max_breaks],
+        'truncated': break_count > max_breaks
+    }
@@ -0,0 +1,371 @@
+"""
+Tools for stress-testing a portfolio under shock scenarios.
+
+A scenario shocks the monthly inflows and outflows of the MSMEs it targets
+(by sector, size band or id), e.g. "inflows -20% and outflows +10% across
+textiles", optionally only over each MSME's last N months. The portfolio is
+held as a columnar frame of monthly aggregates (from the aggregate cube)
+plus each MSME's non-cashflow red flags and profile (from the feature
+store), and every scenario is evaluated column-wise over the whole frame:
+
+- cashflow metrics (totals, net cashflow, volatility, stability)
+- cashflow red flags (negative cashflow, volatility, stability)
+- deterministic behavioral scores with the scorecard batch scorer
+- policy eligibility per product
+
+The baseline is evaluated once; each scenario recomputes only the MSMEs it
+targets and reports how many borrowers migrate between risk levels, the
+eligibility lost or gained per product and the most affected MSMEs.
+
+Scores come from the cashflow components of the scorecard only, so they
+can differ from a full-pipeline score; baseline and stressed scores are
+computed the same way, so migrations are consistent.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+import math
+import time
+import logging
+
+from .anomaly_detector import CASHFLOW_RED_FLAGS, detect_cashflow_red_flags
+from .behavioral_scorecard import compute_cashflow_scorecard_batch
+from .window_metrics import build_monthly_prefix, window_metrics, WINDOW_CRITERION_PATTERN, WINDOW_METRIC_FIELDS
+from .aggregate_cube import AggregateCube
+from .feature_store import FeatureStore
+
+logger = logging.getLogger(__name__)
+
+
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+
+
+def build_stress_frame(
+    rows: List[Tuple[str, str, float, float]],
+    profiles: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Build the columnar stress frame from monthly aggregates.
+
+    Args:
+        rows: (msme_id, month, inflow, outflow) rows ordered by msme_id and
+            month (e.g. AggregateCube.monthly_totals)
+        profiles: Optional MSME id -> sector, msme_type and red_flags
+            (e.g. FeatureStore.profiles)
+
+    Returns:
+        Frame with one entry per MSME in each column: msme_ids, sectors,
+        msme_types, months, inflow, outflow and fixed_red_flags (red flags
+        that shocks do not change)
+    """
+    profiles = profiles or {}
+    frame = {key: [] for key in ('msme_ids', 'sectors', 'msme_types', 'months', 'inflow', 'outflow', 'fixed_red_flags')}
+    current = None
+    months = inflows = outflows = None
+    for msme_id, month, inflow, outflow in rows:
+        if msme_id != current:
+            current = msme_id
+            profile = profiles.get(msme_id) or {}
+            frame['msme_ids'].append(msme_id)
+            frame['sectors'].append(profile.get('sector'))
+            frame['msme_types'].append(profile.get('msme_type'))
+            frame['fixed_red_flags'].append(
+                [flag for flag in profile.get('red_flags') or [] if flag not in CASHFLOW_RED_FLAGS]
+            )
+            months, inflows, outflows = [], [], []
+            frame['months'].append(months)
+            frame['inflow'].append(inflows)
+            frame['outflow'].append(outflows)
+        months.append(month)
+        inflows.append(float(inflow or 0.0))
+        outflows.append(float(outflow or 0.0))
+    return frame
+
+
+def load_stress_frame(
+    cube: AggregateCube,
+    feature_store: Optional[FeatureStore] = None,
+    msme_ids: Optional[List[str]] = None,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Load the stress frame from the aggregate cube and the feature store.
+
+    Args:
+        cube: Aggregate cube with the monthly aggregates
+        feature_store: Optional feature store (profiles and red flags)
+        msme_ids: Optional MSME filter (None for the whole portfolio)
+        start_month: Optional first month ("YYYY-MM")
+        end_month: Optional last month ("YYYY-MM")
+
+    Returns:
+        Stress frame (see build_stress_frame)
+    """
+    rows = cube.monthly_totals(msme_ids, start_month, end_month)
+    profiles = feature_store.profiles(msme_ids=msme_ids) if feature_store else {}
+    return build_stress_frame(rows, profiles)
+
+
+def _inflow_dispersion(inflows: List[float]) -> Tuple[float, float]:
+    """
+    Volatility and stability of monthly inflows in one pass.
+
+    Volatility is the population CV capped at 1 (as summarize_cashflow_patterns),
+    stability is 1 / (1 + sample CV) (as compute_stability_from_monthly_inflows).
+    """
+    count = len(inflows)
+    if not count:
+        return 0.0, 0.0
+    mean = sum(inflows) / count
+    squares = sum((value - mean) ** 2 for value in inflows)
+    volatility = min(math.sqrt(squares / count) / mean, 1.0) if mean > 0 else 0.0
+    if count < 2:
+        stability = 0.5
+    elif mean == 0:
+        stability = 0.0
+    else:
+        stability = min(max(1.0 / (1.0 + math.sqrt(squares / (count - 1)) / mean), 0.0), 1.0)
+    return volatility, stability
+
+
+def _window_requirements(policies: List[Dict[str, Any]]) -> List[Tuple[str, str, str, int, float]]:
+    """(product_id, bound, metric, months, limit) of every trailing-window criterion."""
+    requirements = []
+    for policy in policies:
+        for criterion, limit in (policy.get('eligibility_criteria') or {}).items():
+            match = WINDOW_CRITERION_PATTERN.match(criterion)
+            if match:
+                bound, metric, months = match.groups()
+                requirements.append((policy['product_id'], bound, metric, int(months), limit))
+    return requirements
+
+
+def evaluate_columns(
+    months: List[List[str]],
+    inflow: List[List[float]],
+    outflow: List[List[float]],
+    fixed_red_flags: List[List[str]],
+    policies: List[Dict[str, Any]],
+    weights: Optional[Dict[str, float]] = None,
+    risk_bands: Optional[List[float]] = None
+) -> Dict[str, Any]:
+    """
+    Compute metrics, scores and policy eligibility column-wise.
+
+    Args:
+        months: Months with activity per MSME
+        inflow: Monthly inflows per MSME
+        outflow: Monthly outflows per MSME
+        fixed_red_flags: Red flags per MSME that do not follow from cashflow
+        policies: Lender policies
+        weights: Optional scorecard component weights
+        risk_bands: Optional lower bounds of the low/medium/high risk bands
+
+    Returns:
+        Columns total_inflow, net_cashflow, volatility, stability,
+        red_flags, scores, risk_levels and eligible (product_id -> flags)
+    """
+    total_inflow = [sum(values) for values in inflow]
+    net_cashflow = [inflow_total - sum(values) for inflow_total, values in zip(total_inflow, outflow)]
+    dispersion = [_inflow_dispersion(values) for values in inflow]
+    volatility = [vol for vol, _ in dispersion]
+    stability = [stab for _, stab in dispersion]
+    red_flags = [
+        fixed + detect_cashflow_red_flags({
+            'net_cashflow': net,
+            'volatility_score': vol,
+            'cashflow_stability_score': stab
+        })
+        for fixed, net, vol, stab in zip(fixed_red_flags, net_cashflow, volatility, stability)
+    ]
+    flag_counts = [len(flags) for flags in red_flags]
+    scores, risk_levels = compute_cashflow_scorecard_batch(
+        total_inflow, net_cashflow, stability, volatility, flag_counts, weights, risk_bands
+    )
+
+    eligible = {}
+    for policy in policies:
+        criteria = policy.get('eligibility_criteria') or {}
+        min_cashflow = criteria.get('min_net_cashflow', 0)
+        min_score = criteria.get('min_behavioral_score', 0)
+        max_volatility = criteria.get('max_volatility', 1.0)
+        min_stability = criteria.get('min_stability_score', 0)
+        max_red_flags = criteria.get('max_red_flags', 999)
+        eligible[policy['product_id']] = [
+            net >= min_cashflow and score >= min_score and vol <= max_volatility
+            and stab >= min_stability and flags <= max_red_flags
+            for net, score, vol, stab, flags in zip(net_cashflow, scores, volatility, stability, flag_counts)
+        ]
+
+    # Trailing-window criteria need the monthly series; prefixes are built only when a policy uses them
+    requirements = _window_requirements(policies)
+    if requirements:
+        prefixes = [
+            build_monthly_prefix(dict(zip(keys, inflows)), dict(zip(keys, outflows)))
+            for keys, inflows, outflows in zip(months, inflow, outflow)
+        ]
+        for product_id, bound, metric, window, limit in requirements:
+            flags = eligible[product_id]
+            for i, prefix in enumerate(prefixes):
+                if not flags[i]:
+                    continue
+                metrics = window_metrics(prefix, window)
+                value = metrics[WINDOW_METRIC_FIELDS[metric]]
+                flags[i] = bool(metrics['months']) and (value >= limit if bound == 'min' else value <= limit)
+
+    return {
+        'total_inflow': total_inflow,
+        'net_cashflow': net_cashflow,
+        'volatility': volatility,
+        'stability': stability,
+        'red_flags': red_flags,
+        'scores': scores,
+        'risk_levels': risk_levels,
+        'eligible': eligible
+    }
+
+
+def _in_scope(frame: Dict[str, Any], scenario: Dict[str, Any]) -> List[int]:
+    """Positions of the MSMEs a scenario targets."""
+    sectors = {s.strip().lower() for s in scenario.get('sectors') or []}
+    msme_types = {t.strip().lower() for t in scenario.get('msme_types') or []}
+    msme_ids = set(scenario.get('msme_ids') or [])
+    return [
+        i for i, (msme_id, sector, msme_type) in enumerate(zip(frame['msme_ids'], frame['sectors'], frame['msme_types']))
+        if (not sectors or (sector or '').strip().lower() in sectors)
+        and (not msme_types or (msme_type or '').strip().lower() in msme_types)
+        and (not msme_ids or msme_id in msme_ids)
+    ]
+
+
+def _shock(values: List[float], change: float, shock_months: Optional[int]) -> List[float]:
+    """Apply a relative change to all months, or only to the last shock_months."""
+    factor = max(0.0, 1.0 + change)
+    if not change:
+        return values
+    if shock_months is None or shock_months >= len(values):
+        return [value * factor for value in values]
+    split = len(values) - shock_months
+    return values[:split] + [value * factor for value in values[split:]]
+
+
+def run_stress_scenarios(
+    frame: Dict[str, Any],
+    scenarios: List[Dict[str, Any]],
+    policies: List[Dict[str, Any]],
+    weights: Optional[Dict[str, float]] = None,
+    risk_bands: Optional[List[float]] = None,
+    top_n: int = 10
+) -> Dict[str, Any]:
+    """
+    Evaluate shock scenarios against the baseline of a stress frame.
+
+    Args:
+        frame: Stress frame (see build_stress_frame)
+        scenarios: Scenarios with name, inflow_change and outflow_change
+            (relative, e.g. -0.2), optional shock_months and optional
+            sectors / msme_types / msme_ids filters
+        policies: Lender policies
+        weights: Optional scorecard component weights
+        risk_bands: Optional lower bounds of the low/medium/high risk bands
+        top_n: Number of most affected MSMEs reported per scenario
+
+    Returns:
+        Dictionary with the 'baseline' risk distribution and eligibility
+        counts, and one result per scenario with the risk migration matrix,
+        downgrade/upgrade counts, score and cashflow changes, eligibility
+        changes per product and the most affected MSMEs
+    """
+    started = time.perf_counter()
+    baseline = evaluate_columns(
+        frame['months'], frame['inflow'], frame['outflow'], frame['fixed_red_flags'],
+        policies, weights, risk_bands
+    )
+    baseline_ms = (time.perf_counter() - started) * 1000
+
+    distribution = defaultdict(int)
+    for level in baseline['risk_levels']:
+        distribution[level] += 1
+
+    results = []
+    for scenario in scenarios:
+        scenario_started = time.perf_counter()
+        scope = _in_scope(frame, scenario)
+        shock_months = scenario.get('shock_months')
+        stressed = evaluate_columns(
+            [frame['months'][i] for i in scope],
+            [_shock(frame['inflow'][i], scenario.get('inflow_change', 0.0), shock_months) for i in scope],
+            [_shock(frame['outflow'][i], scenario.get('outflow_change', 0.0), shock_months) for i in scope],
+            [frame['fixed_red_flags'][i] for i in scope],
+            policies, weights, risk_bands
+        )
+
+        migration = {level: {to: 0 for to in RISK_LEVELS} for level in RISK_LEVELS}
+        downgraded = upgraded = 0
+        affected = []
+        for j, i in enumerate(scope):
+            before, after = baseline['risk_levels'][i], stressed['risk_levels'][j]
+            migration[before][after] += 1
+            step = RISK_LEVELS.index(after) - RISK_LEVELS.index(before)
+            downgraded += step > 0
+            upgraded += step < 0
+            affected.append((stressed['scores'][j] - baseline['scores'][i], i, j))
+
+        eligibility = {}
+        for product_id, before_flags in baseline['eligible'].items():
+            after_flags = stressed['eligible'][product_id]
+            lost = sum(1 for j, i in enumerate(scope) if before_flags[i] and not after_flags[j])
+            gained = sum(1 for j, i in enumerate(scope) if after_flags[j] and not before_flags[i])
+            eligibility[product_id] = {
+                'baseline': sum(1 for i in scope if before_flags[i]),
+                'stressed': sum(after_flags),
+                'lost': lost,
+                'gained': gained
+            }
+
+        count = len(scope)
+        affected.sort()
+        results.append({
+            'scenario': scenario,
+            'msme_count': count,
+            'risk_migration': migration,
+            'downgraded': downgraded,
+            'upgraded': upgraded,
+            'unchanged': count - downgraded - upgraded,
+            'average_score': {
+                'baseline': round(sum(baseline['scores'][i] for i in scope) / count, 2) if count else None,
+                'stressed': round(sum(stressed['scores']) / count, 2) if count else None
+            },
+            'net_cashflow': {
+                'baseline': round(sum(baseline['net_cashflow'][i] for i in scope), 2),
+                'stressed': round(sum(stressed['net_cashflow']), 2)
+            },
+            'eligibility': eligibility,
+            'most_affected': [
+                {
+                    'msme_id': frame['msme_ids'][i],
+                    'baseline_score': baseline['scores'][i],
+                    'stressed_score': stressed['scores'][j],
+                    'baseline_risk_level': baseline['risk_levels'][i],
+                    'stressed_risk_level': stressed['risk_levels'][j],
+                    'lost_products': [
+                        product_id for product_id, flags in baseline['eligible'].items()
+                        if flags[i] and not stressed['eligible'][product_id][j]
+                    ]
+                }
+                for change, i, j in affected[:top_n] if change < 0
+            ],
+            'elapsed_ms': round((time.perf_counter() - scenario_started) * 1000, 2)
+        })
+
+    return {
+        'msme_count': len(frame['msme_ids']),
+        'baseline': {
+            'risk_distribution': {level: distribution[level] for level in RISK_LEVELS},
+            'eligible': {product_id: sum(flags) for product_id, flags in baseline['eligible'].items()},
+            'elapsed_ms': round(baseline_ms, 2)
+        },
+        'scenarios': results,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
@@ -2,38 +2,52 @@
 Tools for categorizing transactions and detecting patterns.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 import re
 import logging
 
 from ..core.types import TransactionType, CashflowCategory
+from .seasonality_detector import detect_seasonality
+from .narration_parser import parse_narration
 
 logger = logging.getLogger(__name__)
 
 
+# Whole-word keyword groups, matched against the parsed narration text
+EMI_KEYWORDS = re.compile(r"\b(emis?|loans?|repayments?|installments?)\b")
+TAX_KEYWORDS = re.compile(r"\b(gst|tax|taxes|tds|cgst|sgst|igst)\b")
+OPERATIONAL_KEYWORDS = re.compile(r"\b(salary|salaries|wages?|payments?|invoices?|bills?)\b")
+INVESTMENT_KEYWORDS = re.compile(r"\b(investments?|deposits?|fds?|mutual funds?)\b")
+
+
 def categorize_transaction(transaction: Dict[str, Any]) -> tuple[TransactionType, CashflowCategory]:
     """
     Categorize a single transaction.
     
+    Keywords are matched as whole words in the parsed narration, with
+    reference numbers, VPAs and IFSC codes removed, and NACH/ECS debits are
+    treated as EMIs.
+    
     Args:
         transaction: Transaction dictionary
         
     Returns:
         Tuple of (TransactionType, CashflowCategory)
     """
-    description = str(transaction.get('description', '')).lower()
+    parsed = parse_narration(str(transaction.get('description', '')))
+    description = parsed.remarks
     amount = float(transaction.get('amount', 0))
     
     # Determine transaction type
     tx_type = TransactionType.UNKNOWN
     
-    # Check for EMI patterns
-    if any(keyword in description for keyword in ['emi', 'loan', 'repayment', 'installment']):
+    # Check for EMI patterns (mandate debits carry no EMI wording)
+    if EMI_KEYWORDS.search(description) or (parsed.channel == 'nach' and amount < 0):
         tx_type = TransactionType.EMI
     
     # Check for GST patterns
-    elif any(keyword in description for keyword in ['gst', 'tax', 'tds', 'cgst', 'sgst', 'igst']):
+    elif TAX_KEYWORDS.search(description):
         if amount < 0:
             tx_type = TransactionType.GST_PAYMENT
         else:
@@ -52,9 +66,9 @@ def categorize_transaction(transaction: Dict[str, Any]) -> tuple[TransactionType
         category = CashflowCategory.FINANCING
     elif tx_type in [TransactionType.GST_PAYMENT, TransactionType.GST_RECEIPT]:
         category = CashflowCategory.TAX
-    elif any(keyword in description for keyword in ['salary', 'wage', 'payment', 'invoice', 'bill']):
+    elif OPERATIONAL_KEYWORDS.search(description):
         category = CashflowCategory.OPERATIONAL
-    elif any(keyword in description for keyword in ['investment', 'deposit', 'fd', 'mutual fund']):
+    elif INVESTMENT_KEYWORDS.search(description):
         category = CashflowCategory.INVESTMENT
     elif tx_type in [TransactionType.CREDIT, TransactionType.DEBIT]:
         category = CashflowCategory.OPERATIONAL
@@ -98,7 +112,8 @@ def detect_cashflow_patterns(transactions: List[Dict[str, Any]]) -> Dict[str, An
             'has_seasonality': False,
             'volatility': 0.0,
             'regular_credits': False,
-            'regular_debits': False
+            'regular_debits': False,
+            'seasonality': detect_seasonality({})
         }
     
     # Extract amounts by month
@@ -116,6 +131,23 @@ def detect_cashflow_patterns(transactions: List[Dict[str, Any]]) -> Dict[str, An
             monthly_amounts[month_key]['debits'] += abs(amount)
         monthly_amounts[month_key]['count'] += 1
     
+    return summarize_cashflow_patterns(monthly_amounts)
+
+
+def summarize_cashflow_patterns(
+    monthly_amounts: Dict[str, Dict[str, float]],
+    seasonality: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Summarize cashflow patterns from monthly credit/debit aggregates.
+    
+    Args:
+        monthly_amounts: Month -> {'credits', 'debits', 'count'} mapping
+        seasonality: Optional precomputed detect_seasonality result (batch callers)
+        
+    Returns:
+        Dictionary with pattern analysis
+    """
     # Calculate volatility (coefficient of variation)
     credit_amounts = [m['credits'] for m in monthly_amounts.values()]
     if credit_amounts:
@@ -126,8 +158,10 @@ def detect_cashflow_patterns(transactions: List[Dict[str, Any]]) -> Dict[str, An
     else:
         volatility = 0.0
     
-    # Detect seasonality (simplified - check for consistent patterns)
-    has_seasonality = len(monthly_amounts) >= 3 and volatility < 0.5
+    # Detect seasonality (autocorrelation of detrended monthly net cashflow)
+    if seasonality is None:
+        seasonality = detect_seasonality(monthly_amounts)
+    has_seasonality = seasonality['seasonal']
     
     # Check for regular patterns
     regular_credits = len([m for m in monthly_amounts.values() if m['credits'] > 0]) >= len(monthly_amounts) * 0.7
@@ -138,6 +172,7 @@ def detect_cashflow_patterns(transactions: List[Dict[str, Any]]) -> Dict[str, An
         'volatility': min(volatility, 1.0),  # Cap at 1.0
         'regular_credits': regular_credits,
         'regular_debits': regular_debits,
+        'seasonality': seasonality,
         'monthly_breakdown': monthly_amounts
     }
 
@@ -0,0 +1,128 @@
+"""
+Tools for storing ingested transactions so reports can reference them.
+
+Reports and anomalies carry a compact transaction reference (see
+data_parser.transaction_ref) instead of the full transaction. The store keeps
+one row per (MSME, reference) in the analytics database so references can be
+resolved on demand.
+"""
+
+from typing import List, Dict, Any, Optional
+import json
+import sqlite3
+import logging
+
+from .data_parser import parse_date, transaction_ref
+from ..core.analytics_db import get_analytics_connection
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    msme_id TEXT NOT NULL,
+    tx_ref TEXT NOT NULL,
+    account_id TEXT,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT,
+    balance_after REAL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (msme_id, tx_ref)
+);
+"""
+
+
+class TransactionStore:
+    """
+    SQLite-backed store of ingested transactions keyed by transaction reference.
+    """
+
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        """
+        Initialize the store.
+
+        Args:
+            conn: Optional sqlite3 connection (defaults to the analytics database)
+        """
+        self.conn = conn or get_analytics_connection()
+        self.conn.executescript(_SCHEMA)
+
+    def ingest(self, msme_id: str, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Store transactions (already stored references are left untouched).
+
+        Args:
+            msme_id: MSME identifier
+            transactions: Transactions to store
+
+        Returns:
+            Number of transactions newly stored
+        """
+        if not transactions:
+            return 0
+
+        rows = []
+        for tx in transactions:
+            rows.append((
+                msme_id,
+                transaction_ref(tx),
+                tx.get('account_id'),
+                parse_date(tx.get('date')).isoformat(),
+                float(tx.get('amount', 0)),
+                str(tx.get('description', '')),
+                float(tx['balance_after']) if tx.get('balance_after') is not None else None,
+                json.dumps(tx, default=str)
+            ))
+
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO transactions "
+                "(msme_id, tx_ref, account_id, date, amount, description, balance_after, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = self.conn.total_changes - before
+
+        if added:
+            logger.info(f"Transaction store: stored {added} transactions for {msme_id}")
+        return added
+
+    def get(self, msme_id: str, tx_ref: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve one transaction reference.
+
+        Args:
+            msme_id: MSME identifier
+            tx_ref: Transaction reference
+
+        Returns:
+            Stored transaction (with 'transaction_ref') or None
+        """
+        found = self.get_many(msme_id, [tx_ref])
+        return found.get(tx_ref)
+
+    def get_many(self, msme_id: str, tx_refs: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Resolve several transaction references in one query.
+
+        Args:
+            msme_id: MSME identifier
+            tx_refs: Transaction references
+
+        Returns:
+            Reference -> stored transaction (unknown references are omitted)
+        """
+        if not tx_refs:
+            return {}
+
+        placeholders = ",".join("?" * len(tx_refs))
+        rows = self.conn.execute(
+            f"SELECT tx_ref, payload FROM transactions WHERE msme_id = ? AND tx_ref IN ({placeholders})",
+            [msme_id, *tx_refs]
+        ).fetchall()
+        return {
+            row['tx_ref']: {**json.loads(row['payload']), 'transaction_ref': row['tx_ref']}
+            for row in rows
+        }
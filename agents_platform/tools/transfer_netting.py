@@ -0,0 +1,190 @@
+"""
+Tools for netting transfers between an MSME's own bank accounts.
+
+When statements from several accounts are merged, money moved between them
+shows up as a debit in one account and a credit of the same amount in
+another, inflating total inflow and outflow. Rows are hash-partitioned by
+absolute amount; within each partition debits and credits are sorted by date
+and matched greedily (earliest first) across different accounts within a date
+window, so the whole pass is O(n log n).
+
+An equal amount within a few days is also how an ordinary sale and purchase
+can look, so a matched pair only counts as an internal transfer when there is
+evidence for it: a self/own-account/TRF marker in either narration, the same
+reference number or VPA on both rows, or one narration quoting the other
+account's number. Within the window, evidenced candidates are preferred.
+Pairs without evidence are tagged but kept in the totals.
+"""
+
+from typing import List, Dict, Any, Tuple, Optional
+from collections import defaultdict
+import re
+import logging
+
+from .data_parser import parse_date
+from .narration_parser import parse_narration
+
+logger = logging.getLogger(__name__)
+
+
+TRANSFER_MARKERS = re.compile(
+    r"\b(self|own\s*(?:a/?c|acc(?:oun)?t)|trf|tfr|sweep|inter\s*(?:a/?c|acc(?:oun)?t))\b",
+    re.IGNORECASE
+)
+_DIGIT_RUNS = re.compile(r"\d{4,}")
+
+
+def _account_tail(account_id: Any) -> Optional[str]:
+    """Last four digits of an account number (None when it has fewer)."""
+    digits = re.sub(r"\D", "", str(account_id or ''))
+    return digits[-4:] if len(digits) >= 4 else None
+
+
+def _quotes_account(description: str, account_id: Any) -> bool:
+    """Whether a narration quotes an account number (full or masked to its last digits)."""
+    tail = _account_tail(account_id)
+    return tail is not None and any(run.endswith(tail) for run in _DIGIT_RUNS.findall(description))
+
+
+def transfer_evidence(debit: Dict[str, Any], credit: Dict[str, Any]) -> Optional[str]:
+    """
+    Evidence that a debit and a credit are one transfer between own accounts.
+
+    Args:
+        debit: Debit transaction
+        credit: Credit transaction
+
+    Returns:
+        "marker", "reference", "vpa" or "account", or None without evidence
+    """
+    debit_text = str(debit.get('description', ''))
+    credit_text = str(credit.get('description', ''))
+    if TRANSFER_MARKERS.search(debit_text) or TRANSFER_MARKERS.search(credit_text):
+        return 'marker'
+
+    debit_parsed = parse_narration(debit_text)
+    credit_parsed = parse_narration(credit_text)
+    debit_reference = debit.get('reference_no') or debit_parsed.reference
+    if debit_reference and debit_reference == (credit.get('reference_no') or credit_parsed.reference):
+        return 'reference'
+    debit_vpa = debit.get('vpa') or debit_parsed.vpa
+    if debit_vpa and debit_vpa == (credit.get('vpa') or credit_parsed.vpa):
+        return 'vpa'
+    if _quotes_account(debit_text, credit.get('account_id')) or _quotes_account(credit_text, debit.get('account_id')):
+        return 'account'
+    return None
+
+
+def match_internal_transfers(
+    transactions: List[Dict[str, Any]],
+    window_days: int = 3
+) -> List[Tuple[int, int]]:
+    """
+    Pair opposite-signed, equal-amount entries across different accounts.
+
+    A debit takes the earliest credit within the window that has transfer
+    evidence (see transfer_evidence), else the earliest credit.
+
+    Args:
+        transactions: List of transactions with 'account_id'
+        window_days: Maximum days between the debit and the credit
+
+    Returns:
+        List of (debit index, credit index) pairs into transactions
+    """
+    accounts = {tx.get('account_id') for tx in transactions}
+    if len(accounts) < 2:
+        return []
+
+    # Hash partition by amount in paise, then sort each side by date
+    buckets = defaultdict(lambda: ([], []))
+    for i, tx in enumerate(transactions):
+        amount = float(tx.get('amount', 0))
+        if amount == 0:
+            continue
+        debits, credits = buckets[int(round(abs(amount) * 100))]
+        (debits if amount < 0 else credits).append((parse_date(tx.get('date')).toordinal(), i))
+
+    pairs = []
+    for debits, credits in buckets.values():
+        if not debits or not credits:
+            continue
+        debits.sort()
+        credits.sort()
+
+        # Greedy merge: each debit takes the earliest unused credit in another account within
+        # the window, preferring one with transfer evidence
+        used = [False] * len(credits)
+        start = 0
+        for debit_day, debit_idx in debits:
+            while start < len(credits) and (used[start] or credits[start][0] < debit_day - window_days):
+                start += 1
+            debit = transactions[debit_idx]
+            chosen = None
+            for j in range(start, len(credits)):
+                credit_day, credit_idx = credits[j]
+                if credit_day > debit_day + window_days:
+                    break
+                if used[j] or transactions[credit_idx].get('account_id') == debit.get('account_id'):
+                    continue
+                if transfer_evidence(debit, transactions[credit_idx]):
+                    chosen = j
+                    break
+                if chosen is None:
+                    chosen = j
+            if chosen is not None:
+                used[chosen] = True
+                pairs.append((debit_idx, credits[chosen][1]))
+
+    return pairs
+
+
+def net_internal_transfers(
+    transactions: List[Dict[str, Any]],
+    window_days: int = 3,
+    exclude: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Tag matched inter-account transfers and optionally drop them.
+
+    Matched rows get a shared 'transfer_pair_id' and their
+    'transfer_evidence' (see transfer_evidence). Only pairs with evidence
+    get 'internal_transfer' set to True and are excluded; matched pairs
+    without evidence are kept with 'internal_transfer' False, as are all
+    unmatched rows.
+
+    Args:
+        transactions: List of normalized transactions
+        window_days: Maximum days between the debit and the credit
+        exclude: If True, evidenced pairs are removed from the result
+
+    Returns:
+        Tagged (or filtered) list of transactions
+    """
+    pairs = match_internal_transfers(transactions, window_days)
+    pair_of = {}
+    evidenced = 0
+    for pair_id, (debit_idx, credit_idx) in enumerate(pairs):
+        evidence = transfer_evidence(transactions[debit_idx], transactions[credit_idx])
+        evidenced += evidence is not None
+        pair_of[debit_idx] = (pair_id, evidence)
+        pair_of[credit_idx] = (pair_id, evidence)
+
+    result = []
+    for i, tx in enumerate(transactions):
+        pair_id, evidence = pair_of.get(i, (None, None))
+        if evidence is not None and exclude:
+            continue
+        tx['internal_transfer'] = evidence is not None
+        if pair_id is not None:
+            tx['transfer_pair_id'] = pair_id
+            tx['transfer_evidence'] = evidence
+        result.append(tx)
+
+    if pairs:
+        action = "excluded" if exclude else "tagged"
+        logger.info(
+            f"Internal transfers: {action} {evidenced} evidenced pairs across accounts, "
+            f"tagged {len(pairs) - evidenced} unevidenced pairs"
+        )
+    return result
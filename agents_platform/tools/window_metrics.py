@@ -0,0 +1,190 @@
+"""
+Tools for trailing-window and as-of cashflow metrics using prefix sums.
+
+Monthly aggregates are laid out on a dense month axis (months without
+activity count as zero) and turned into prefix-sum / prefix-square arrays
+once. Any trailing window or as-of cut-off is then answered in O(1) from two
+array lookups per moment.
+"""
+
+from typing import List, Dict, Any, Optional, Union
+from datetime import datetime
+from bisect import bisect_right
+import re
+import logging
+
+from .data_parser import parse_date
+
+logger = logging.getLogger(__name__)
+
+
+# Trailing-window criteria, e.g. "min_net_cashflow_3m" or "max_volatility_6m"
+WINDOW_CRITERION_PATTERN = re.compile(r"^(min|max)_(net_cashflow|volatility|stability_score)_(\d+)m$")
+WINDOW_METRIC_FIELDS = {
+    'net_cashflow': 'net_cashflow',
+    'volatility': 'volatility',
+    'stability_score': 'stability'
+}
+
+
+def month_range(first: str, last: str) -> List[str]:
+    """Return every "YYYY-MM" key from first to last inclusive."""
+    year, month = int(first[:4]), int(first[5:7])
+    end_year, end_month = int(last[:4]), int(last[5:7])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def _to_month_key(as_of: Union[str, datetime]) -> str:
+    """Normalize an as-of date ("YYYY-MM", any parseable date, or datetime) to a month key."""
+    if isinstance(as_of, str) and len(as_of) == 7:
+        return as_of
+    date = parse_date(as_of)
+    return f"{date.year}-{date.month:02d}"
+
+
+def build_monthly_prefix(monthly_inflow: Dict[str, float], monthly_outflow: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Build prefix-sum and prefix-moment arrays over monthly aggregates.
+
+    Args:
+        monthly_inflow: Month -> inflow amount
+        monthly_outflow: Month -> outflow amount
+
+    Returns:
+        Dictionary with the dense 'months' axis and prefix arrays (length months + 1)
+        for inflow, inflow squared, outflow, net and net squared
+    """
+    all_months = set(monthly_inflow) | set(monthly_outflow)
+    months = month_range(min(all_months), max(all_months)) if all_months else []
+
+    prefix = {key: [0.0] for key in ('inflow', 'inflow_sq', 'outflow', 'net', 'net_sq')}
+    for month_key in months:
+        inflow = float(monthly_inflow.get(month_key, 0))
+        outflow = float(monthly_outflow.get(month_key, 0))
+        net = inflow - outflow
+        prefix['inflow'].append(prefix['inflow'][-1] + inflow)
+        prefix['inflow_sq'].append(prefix['inflow_sq'][-1] + inflow * inflow)
+        prefix['outflow'].append(prefix['outflow'][-1] + outflow)
+        prefix['net'].append(prefix['net'][-1] + net)
+        prefix['net_sq'].append(prefix['net_sq'][-1] + net * net)
+
+    return {'months': months, **prefix}
+
+
+def _sample_std(total: float, total_sq: float, count: int) -> float:
+    """Sample standard deviation from a sum and sum of squares."""
+    if count < 2:
+        return 0.0
+    mean = total / count
+    variance = (total_sq - count * mean * mean) / (count - 1)
+    return max(variance, 0.0) ** 0.5
+
+
+def window_metrics(
+    prefix: Dict[str, Any],
+    window_months: Optional[int] = None,
+    as_of: Optional[Union[str, datetime]] = None
+) -> Dict[str, Any]:
+    """
+    Compute cashflow metrics over a trailing window in O(1).
+
+    Volatility follows compute_cashflow_volatility (CV of monthly net cashflow,
+    scaled to 0-1) and stability follows compute_stability_score
+    (1 / (1 + CV) of monthly inflows).
+
+    Args:
+        prefix: Output of build_monthly_prefix
+        window_months: Number of trailing months (None for the full history)
+        as_of: Optional cut-off month/date; the window ends at that month, and
+            months after the last data month count as zero months
+
+    Returns:
+        Dictionary with window bounds, net_cashflow, totals, volatility and stability
+    """
+    months = prefix['months']
+    end = len(months) if as_of is None else bisect_right(months, _to_month_key(as_of))
+    if as_of is not None and months and _to_month_key(as_of) > months[-1]:
+        # Months after the last data month up to as_of count as silent (zero) months
+        months = months + month_range(months[-1], _to_month_key(as_of))[1:]
+        end = len(months)
+    last = len(prefix['months'])
+    start = 0 if window_months is None else max(0, end - window_months)
+    count = end - start
+
+    if count <= 0:
+        return {
+            'months': 0,
+            'start_month': None,
+            'end_month': None,
+            'net_cashflow': 0.0,
+            'avg_monthly_net_cashflow': 0.0,
+            'total_inflow': 0.0,
+            'total_outflow': 0.0,
+            'volatility': 0.5,
+            'stability': 0.0
+        }
+
+    def span(key: str) -> float:
+        return prefix[key][min(end, last)] - prefix[key][min(start, last)]
+
+    net_total = span('net')
+    inflow_total = span('inflow')
+    net_mean = net_total / count
+    inflow_mean = inflow_total / count
+
+    if count < 2:
+        volatility = 0.5
+    elif net_mean == 0:
+        volatility = 1.0
+    else:
+        volatility = min(1.0, abs(_sample_std(net_total, span('net_sq'), count) / net_mean) / 2.0)
+
+    if inflow_mean <= 0:
+        stability = 0.0
+    elif count < 2:
+        stability = 0.5
+    else:
+        stability = 1.0 / (1.0 + _sample_std(inflow_total, span('inflow_sq'), count) / inflow_mean)
+
+    return {
+        'months': count,
+        'start_month': months[start],
+        'end_month': months[end - 1],
+        'net_cashflow': net_total,
+        'avg_monthly_net_cashflow': net_mean,
+        'total_inflow': inflow_total,
+        'total_outflow': span('outflow'),
+        'volatility': volatility,
+        'stability': min(max(stability, 0.0), 1.0)
+    }
+
+
+def compute_window_metrics(
+    monthly_inflow: Dict[str, float],
+    monthly_outflow: Dict[str, float],
+    windows: Optional[List[int]] = None,
+    as_of: Optional[Union[str, datetime]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute trailing-window metrics for several window lengths.
+
+    Args:
+        monthly_inflow: Month -> inflow amount
+        monthly_outflow: Month -> outflow amount
+        windows: Window lengths in months (default 3, 6, 12)
+        as_of: Optional cut-off month/date for back-dated applications
+
+    Returns:
+        Dictionary mapping "<n>m" (and "all") -> window metrics
+    """
+    prefix = build_monthly_prefix(monthly_inflow, monthly_outflow)
+
+    results = {f"{n}m": window_metrics(prefix, n, as_of) for n in (windows or [3, 6, 12])}
+    results['all'] = window_metrics(prefix, None, as_of)
+    return results
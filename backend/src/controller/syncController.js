@@ -39,24 +39,43 @@ const runPythonScript = (modulePath, args = []) => {
     });
 };
 
+// Progress of the latest sync, polled by the frontend while the analysis runs
+let syncState = { status: 'idle', preview: null, startedAt: null };
+
 export const startSync = async (req, res) => {
     try {
         console.log("Starting sync process...");
+        syncState = { status: 'processing', preview: null, startedAt: new Date().toISOString() };
 
         // 1. Run seed_db to reset/populate data
         console.log("Running seed_db...");
         await runPythonScript('agents_platform.scripts.seed_db');
         console.log("seed_db completed.");
 
-        // 2. Run run_end_to_end to perform analysis
-        console.log("Running run_end_to_end...");
+        // 2. Run run_preview for a sampled preview score (non-critical) alongside
+        //    run_end_to_end, so the preview never delays the full analysis
+        console.log("Running run_preview and run_end_to_end...");
+        const sync = syncState;
+        const preview = runPythonScript('agents_platform.examples.run_preview')
+            .then((previewOutput) => {
+                const previewMatch = previewOutput.match(/Preview JSON: (.+)/);
+                sync.preview = previewMatch ? JSON.parse(previewMatch[1]) : null;
+                console.log("run_preview completed.");
+            })
+            .catch((error) => {
+                console.error("Preview failed, continuing with full analysis:", error.message);
+            });
+
+        // 3. Run run_end_to_end to perform analysis
         const analysisOutput = await runPythonScript('agents_platform.examples.run_end_to_end');
         console.log("run_end_to_end completed.");
+        await preview;
 
         // Extract Report ID if possible, or just return success
         // The python script prints "Report ID: <uuid>"
         const reportIdMatch = analysisOutput.match(/Report ID: ([a-f0-9\-]+)/);
         const reportId = reportIdMatch ? reportIdMatch[1] : null;
+        syncState.status = 'completed';
 
         res.status(200).json({
             success: true,
@@ -66,6 +85,7 @@ export const startSync = async (req, res) => {
 
     } catch (error) {
         console.error("Sync failed:", error);
+        syncState.status = 'failed';
         res.status(500).json({
             success: false,
             message: "Sync process failed.",
@@ -73,3 +93,7 @@ export const startSync = async (req, res) => {
         });
     }
 };
+
+export const getSyncStatus = (req, res) => {
+    res.status(200).json({ success: true, ...syncState });
+};
@@ -1,8 +1,9 @@
 import express from 'express';
-import { startSync } from '../controller/syncController.js';
+import { startSync, getSyncStatus } from '../controller/syncController.js';
 
 const router = express.Router();
 
 router.post('/start', startSync);
+router.get('/status', getSyncStatus);
 
 export default router;
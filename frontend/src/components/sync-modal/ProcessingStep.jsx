@@ -19,6 +19,7 @@ const ProcessingStep = ({ onComplete, onClose }) => {
   const [elapsedTime, setElapsedTime] = useState(0);
   const [status, setStatus] = useState('processing'); // processing, success, error
   const [errorMsg, setErrorMsg] = useState('');
+  const [preview, setPreview] = useState(null);
   const startTimeRef = useRef(Date.now());
 
   // Stopwatch effect
@@ -41,6 +42,23 @@ const ProcessingStep = ({ onComplete, onClose }) => {
     }
   }, [processingLogIndex, status]);
 
+  // Poll for the sampled preview score while the full analysis runs
+  useEffect(() => {
+    if (status !== 'processing' || preview) return;
+    const poll = setInterval(async () => {
+      try {
+        const response = await fetch('http://localhost:5000/api/sync/status');
+        const data = await response.json();
+        if (data.preview) {
+          setPreview(data.preview);
+        }
+      } catch (error) {
+        // Preview is best-effort; the final result still arrives from /start
+      }
+    }, 1000);
+    return () => clearInterval(poll);
+  }, [status, preview]);
+
   // Trigger Backend Sync
   useEffect(() => {
     const startSync = async () => {
@@ -111,6 +129,21 @@ const ProcessingStep = ({ onComplete, onClose }) => {
         <p className="text-gray-400 mb-6 max-w-sm">Please wait while our Agentic AI Orchestrator processes your raw banking data.</p>
       )}
 
+      {/* Preview score from a sampled statement, refined when the full analysis completes */}
+      {preview && status !== 'error' && (
+        <div className="bg-gray-900/50 px-4 py-3 rounded-xl border border-gray-800 mb-6 text-sm">
+          <span className="text-gray-400">{status === 'processing' ? 'Preview score' : 'Preview was'} </span>
+          <span className="font-mono text-white text-lg">{Math.round(preview.behavioral_score)}</span>
+          <span className="text-gray-500"> / 1000</span>
+          {!preview.exact && (
+            <div className="text-xs text-gray-500 mt-1">
+              Likely range {Math.round(preview.bounds.lower)}-{Math.round(preview.bounds.upper)}
+              {status === 'processing' ? ' · refining with all transactions...' : ''}
+            </div>
+          )}
+        </div>
+      )}
+
       {/* Stopwatch */}
       <div className="flex items-center space-x-2 bg-gray-900/50 px-4 py-2 rounded-full border border-gray-800 mb-8">
         <Clock size={16} className="text-[#00FF75]" />